@@ -2,6 +2,8 @@
 ASGI config for ElDawliya_sys project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn ElDawliya_sys.asgi:application``)
+for the async streaming endpoints such as ``api/v1/ai/chat/stream/``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
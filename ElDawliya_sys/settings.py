@@ -265,6 +265,51 @@ except ImportError:
     # dotenv not installed, continue without it
     pass
 
+# Cache Configuration
+# ذاكرة مشتركة بين كل العمليات: Redis عند تعريف REDIS_URL وتوفر المكتبة،
+# وإلا ملفات SQLite محلية لا تحتاج أي خدمة خارجية
+CACHE_DIR = os.environ.get('DJANGO_CACHE_DIR', str(BASE_DIR / 'cache'))
+REDIS_URL = os.environ.get('REDIS_URL')
+
+try:
+    import redis  # noqa: F401
+    REDIS_AVAILABLE = bool(REDIS_URL)
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+def shared_cache(alias, max_entries=None, **options):
+    if REDIS_AVAILABLE:
+        # حجم Redis يحدده maxmemory وسياسة الإخلاء على الخادم
+        backend = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}
+    else:
+        backend = {'BACKEND': 'core.cache.SQLiteCache', 'LOCATION': os.path.join(CACHE_DIR, f'{alias}.sqlite3')}
+        if max_entries:
+            backend['OPTIONS'] = {'MAX_ENTRIES': max_entries}
+    backend['KEY_PREFIX'] = f'eldawliya:{alias}'
+    backend.update(options)
+    return backend
+
+
+# default: version keys and settings; throttle: API rate counters;
+# stats: cached reports and dashboard statistics; ai: model responses;
+# local: per-process only
+CACHES = {
+    'default': shared_cache('default'),
+    'throttle': shared_cache('throttle'),
+    'stats': shared_cache('stats', TIMEOUT=600),
+    'ai': shared_cache('ai', max_entries=int(os.environ.get('AI_RESPONSE_CACHE_MAX_ENTRIES', 1000)),
+                       TIMEOUT=int(os.environ.get('AI_RESPONSE_CACHE_TIMEOUT', 60 * 60 * 6))),
+    'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'eldawliya-local'},
+}
+
+# الاختبارات لا تشارك عداداتها مع الخادم أو مع تشغيل سابق
+if 'test' in sys.argv:
+    CACHES = {
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'test-{alias}'}
+        for alias in CACHES
+    }
+
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -278,15 +323,15 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'api.throttling.SlidingWindowAnonRateThrottle',
+        'api.throttling.SlidingWindowUserRateThrottle'
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '10/min',
         'user': '60/min'
     },
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'api.renderers.FastJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
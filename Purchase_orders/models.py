@@ -1,6 +1,9 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from core.sequences import document_number
 from inventory.models import TblProducts
 
 User = get_user_model()
@@ -44,6 +47,11 @@ class PurchaseRequest(models.Model):
     def __str__(self):
         return f"طلب شراء #{self.request_number}"
 
+    @classmethod
+    def new_request_number(cls):
+        """رقم طلب شراء جديد مثل PR-2025-00001"""
+        return document_number(cls, 'request_number', f"PR-{timezone.now().year}-", width=5)
+
     class Meta:
         verbose_name = _('طلب شراء')
         verbose_name_plural = _('طلبات الشراء')
@@ -13,9 +13,9 @@ from Purchase_orders.decorators import purchase_module_permission_required, purc
 
 from .models import PurchaseRequest, PurchaseRequestItem, Vendor
 from .forms import PurchaseRequestForm, PurchaseRequestItemForm, PurchaseRequestApprovalForm
+from core.fastjson import FastJsonResponse
 from inventory.models import TblProducts
 
-import uuid
 import json
 
 @login_required
@@ -148,7 +148,7 @@ def create_purchase_request(request):
             return redirect('Purchase_orders:purchase_request_detail', pk=purchase_request.pk)
     else:
         # إنشاء رقم طلب فريد
-        request_number = f"PR-{uuid.uuid4().hex[:8].upper()}"
+        request_number = PurchaseRequest.new_request_number()
         form = PurchaseRequestForm(initial={'request_number': request_number})
 
     # إضافة الموردين إلى السياق
@@ -287,7 +287,7 @@ def transfer_product_to_purchase_request(request):
 
         if not pending_request and action == 'add':
             # إنشاء طلب شراء جديد إذا لم يكن هناك طلب قيد الانتظار
-            request_number = f"PR-{uuid.uuid4().hex[:8].upper()}"
+            request_number = PurchaseRequest.new_request_number()
             pending_request = PurchaseRequest.objects.create(
                 request_number=request_number,
                 requested_by=request.user,
@@ -623,24 +623,25 @@ def get_products_api(request):
         products_data = []
 
         try:
-            # جلب البيانات من TblProducts
-            products = TblProducts.objects.all().order_by('product_name')
-
-            for product in products:
-                product_data = {
-                    'product_id': product.product_id,
-                    'product_name': product.product_name,
-                    'qte_in_stock': float(product.qte_in_stock or 0),
-                    'minimum_threshold': float(product.minimum_threshold or 0),
-                    'maximum_threshold': float(product.maximum_threshold or 0),
-                    'unit_price': float(product.unit_price or 0),
-                    'cat_name': product.cat_name or '',
-                    'cat_id': product.cat.cat_id if product.cat else None,
-                    'unit_name': product.unit_name or '',
-                    'unit_id': product.unit.unit_id if product.unit else None,
-                    'location': product.location or '',
+            # جلب البيانات من TblProducts: الأعمدة المطلوبة فقط، والأرقام العشرية
+            # يحولها المرمز مباشرة دون حلقة تحويل
+            products = TblProducts.objects.order_by('product_name').values(
+                'product_id', 'product_name', 'qte_in_stock', 'minimum_threshold', 'maximum_threshold',
+                'unit_price', 'cat_name', 'cat_id', 'unit_name', 'unit_id', 'location',
+            )
+            products_data = [
+                {
+                    **product,
+                    'qte_in_stock': product['qte_in_stock'] or 0,
+                    'minimum_threshold': product['minimum_threshold'] or 0,
+                    'maximum_threshold': product['maximum_threshold'] or 0,
+                    'unit_price': product['unit_price'] or 0,
+                    'cat_name': product['cat_name'] or '',
+                    'unit_name': product['unit_name'] or '',
+                    'location': product['location'] or '',
                 }
-                products_data.append(product_data)
+                for product in products
+            ]
 
         except Exception as e:
             print(f"Error fetching from TblProducts: {str(e)}")
@@ -677,7 +678,7 @@ def get_products_api(request):
                     'message': f'خطأ في جلب بيانات قطع الغيار: {str(local_e)}'
                 }, status=500)
 
-        return JsonResponse({
+        return FastJsonResponse({
             'success': True,
             'products': products_data,
             'results': products_data,  # للتوافق مع الكود الموجود
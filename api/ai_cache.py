@@ -0,0 +1,164 @@
+"""
+التخزين المؤقت لردود الذكاء الاصطناعي
+(Response cache and request coalescing for Gemini calls)
+
+``cached_generate`` answers a prompt from the ``ai`` cache when the same
+model was already asked the same thing about the same data:
+
+* the key hashes the model name, the prompt with its whitespace collapsed,
+  the temperature and token limit, and a snapshot version — the version
+  counters (``core.changes.model_versions``) of the models the prompt was
+  built from, so any write to them retires the stored answers;
+* entries expire after the ``ai`` cache's ``TIMEOUT`` and the cache holds
+  at most ``MAX_ENTRIES`` of them (``AI_RESPONSE_CACHE_TIMEOUT`` and
+  ``AI_RESPONSE_CACHE_MAX_ENTRIES`` in the environment);
+* only successful responses are stored.
+
+Identical requests that arrive while the first one is still waiting for
+the model are coalesced: threads of the same process wait for the
+leader's result, other processes wait on a lock key in the shared cache
+and then read the stored answer. Hits, misses and coalesced requests are
+counted in the ``stats`` cache (``response_cache_metrics``).
+"""
+import hashlib
+import re
+import threading
+import time
+
+from core.cache import ai_cache, stats_cache
+from core.changes import model_versions
+
+RESPONSE_KEY = 'ai:response:{digest}'
+LOCK_KEY = 'ai:lock:{digest}'
+METRIC_KEY = 'ai:metrics:{name}'
+METRICS = ('hits', 'misses', 'coalesced')
+# أقصى انتظار لطلب مماثل قيد التنفيذ في عملية أخرى
+LOCK_TIMEOUT = 60
+POLL_INTERVAL = 0.2
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class _Call:
+    """طلب قيد التنفيذ ينتظره الآخرون (An in-flight request other threads wait on)"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+
+def normalize_prompt(prompt):
+    return _WHITESPACE.sub(' ', prompt).strip()
+
+
+def snapshot_version(models):
+    """إصدار البيانات التي بني منها الطلب (Version string of the data behind a prompt)"""
+    return '.'.join(str(version) for version in model_versions(models))
+
+
+def response_key(model_name, prompt, temperature, max_tokens, snapshot=''):
+    """مفتاح الرد المخزن (Digest identifying a request in the cache)"""
+    parts = [
+        model_name,
+        hashlib.sha256(normalize_prompt(prompt).encode('utf-8')).hexdigest(),
+        repr(float(temperature)),
+        str(max_tokens),
+        snapshot,
+    ]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _count(name):
+    key = METRIC_KEY.format(name=name)
+    try:
+        stats_cache.incr(key)
+    except ValueError:
+        stats_cache.set(key, 1, None)
+
+
+def response_cache_metrics():
+    """
+    إحصائيات ذاكرة الردود
+    (Hit, miss and coalesced counts, and the share of requests not sent to the model)
+    """
+    values = stats_cache.get_many([METRIC_KEY.format(name=name) for name in METRICS])
+    metrics = {name: values.get(METRIC_KEY.format(name=name), 0) for name in METRICS}
+    total = sum(metrics.values())
+    metrics['hit_ratio'] = round((metrics['hits'] + metrics['coalesced']) / total, 4) if total else 0.0
+    return metrics
+
+
+def _shared(result):
+    return dict(result, cached=True) if result.get('success') else result
+
+
+def _generate_once(digest, key, generate):
+    """استدعاء النموذج مرة واحدة عبر كل العمليات (Call the model once across processes)"""
+    lock = LOCK_KEY.format(digest=digest)
+    locked = ai_cache.add(lock, 1, LOCK_TIMEOUT)
+    if not locked:
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            result = ai_cache.get(key)
+            if result is not None:
+                _count('coalesced')
+                return _shared(result)
+            if ai_cache.get(lock) is None:
+                # فشل الطلب الآخر أو لم يخزن رده
+                break
+
+    _count('misses')
+    try:
+        result = generate()
+        if result.get('success'):
+            ai_cache.set(key, result)
+    finally:
+        # القفل لعملية أخرى ما زالت تنتظر ردها
+        if locked:
+            ai_cache.delete(lock)
+    return result
+
+
+def cached_generate(digest, generate):
+    """
+    الرد من الذاكرة المؤقتة أو من النموذج
+    (Result for ``digest`` from the cache, or from ``generate()`` called once)
+
+    ``generate`` takes no arguments and returns the ``GeminiService`` result
+    dict. Answers served without calling it carry ``cached: True``.
+    """
+    key = RESPONSE_KEY.format(digest=digest)
+    result = ai_cache.get(key)
+    if result is not None:
+        _count('hits')
+        return _shared(result)
+
+    with _calls_lock:
+        call = _calls.get(digest)
+        leader = call is None
+        if leader:
+            call = _calls[digest] = _Call()
+    if not leader:
+        call.done.wait()
+        if call.result is None:
+            _count('misses')
+            return generate()
+        if not call.result.get('success'):
+            # رد فاشل لا يعد من الذاكرة المؤقتة
+            _count('misses')
+            return call.result
+        _count('coalesced')
+        return _shared(call.result)
+
+    try:
+        call.result = _generate_once(digest, key, generate)
+    finally:
+        with _calls_lock:
+            del _calls[digest]
+        call.done.set()
+    return call.result
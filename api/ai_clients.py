@@ -0,0 +1,227 @@
+"""
+سجل عملاء Gemini لكل عملية
+(Per-process registry of configured Gemini clients)
+
+Building a ``GeminiService`` used to query the provider and the user's
+``AIConfiguration``, call ``genai.configure`` and construct a new
+``GenerativeModel`` on every request. Here both steps are done once per
+process and reused:
+
+* ``resolve_config`` keeps the configuration picked for each user, tagged
+  with the ``AIConfiguration`` version counter (``core.changes``); saving
+  or deleting any configuration bumps the counter, which every process
+  notices with one cache read;
+* ``get_model`` keeps one model per (configuration id, API key hash,
+  model name). ``genai.configure`` is global, so instead of the SDK's
+  default client each model calls an explicit ``GenerativeServiceClient``
+  built with its own key in ``client_options``;
+* ``get_async_model`` does the same for streaming, once per event loop,
+  because an async gRPC channel cannot be shared between loops.
+
+If the configuration cannot be read (database unavailable), the
+environment's key is used, as before, and the lookup is retried on the
+next request.
+
+The ``gemini`` provider row is created after ``migrate`` instead of by the
+first request that needed it.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import weakref
+from collections import namedtuple
+
+from django.db.models.signals import post_delete, post_migrate, post_save
+
+from core.changes import model_versions
+
+try:
+    import google.ai.generativelanguage as glm
+    import google.generativeai as genai
+    from google.generativeai.types import generation_types
+    GEMINI_AVAILABLE = True
+except ImportError:
+    genai = None
+    GEMINI_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = 'gemini-1.5-flash'
+
+ClientConfig = namedtuple('ClientConfig', ['config_id', 'api_key', 'model_name', 'source'])
+NO_CONFIG = ClientConfig(None, None, DEFAULT_MODEL_NAME, 'none')
+
+_lock = threading.Lock()
+_configs = {}
+_models = {}
+# حلقة الأحداث -> النماذج غير المتزامنة المبنية عليها
+_async_models = weakref.WeakKeyDictionary()
+
+
+def _configuration_model():
+    from .models import AIConfiguration
+    return AIConfiguration
+
+
+def _environment_config():
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        return NO_CONFIG
+    return ClientConfig(None, api_key, os.getenv('GEMINI_MODEL') or DEFAULT_MODEL_NAME, 'environment')
+
+
+def resolve_config(user=None):
+    """
+    إعداد Gemini المستخدم لهذا المستخدم
+    (The user's active default Gemini configuration, or the environment's)
+    """
+    if user is None or not user.is_authenticated:
+        return _environment_config()
+
+    AIConfiguration = _configuration_model()
+    try:
+        version = model_versions([AIConfiguration])[0]
+        cached = _configs.get(user.pk)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        row = AIConfiguration.objects.filter(
+            user=user, provider__name='gemini', is_active=True,
+        ).order_by('-is_default').values_list('id', 'api_key', 'model_name').first()
+    except Exception as e:
+        logger.warning(f"Error getting user Gemini configuration: {str(e)}")
+        return _environment_config()
+    if row:
+        config = ClientConfig(row[0], row[1], row[2], 'user_config')
+    else:
+        config = _environment_config()
+    _configs[user.pk] = (version, config)
+    return config
+
+
+class KeyedModel:
+    """
+    نموذج Gemini يستدعي عميلاً مبنياً بمفتاحه
+    (The subset of ``GenerativeModel`` used here, over an explicit client)
+
+    ``generate_content`` and ``generate_content_async`` take a text prompt
+    and the same ``generation_config``/``safety_settings`` arguments, and
+    return the SDK's response types.
+    """
+
+    def __init__(self, model_name, client=None, async_client=None):
+        self.model_name = model_name if '/' in model_name else f'models/{model_name}'
+        self.client = client
+        self.async_client = async_client
+
+    def _request(self, prompt, generation_config=None, safety_settings=None):
+        return genai.protos.GenerateContentRequest(
+            model=self.model_name,
+            contents=[genai.protos.Content(role='user', parts=[genai.protos.Part(text=prompt)])],
+            generation_config=generation_types.to_generation_config_dict(generation_config),
+            safety_settings=[
+                genai.protos.SafetySetting(category=category, threshold=threshold)
+                for category, threshold in (safety_settings or {}).items()
+            ],
+        )
+
+    def generate_content(self, prompt, generation_config=None, safety_settings=None, stream=False):
+        request = self._request(prompt, generation_config, safety_settings)
+        if stream:
+            return genai.types.GenerateContentResponse.from_iterator(self.client.stream_generate_content(request))
+        return genai.types.GenerateContentResponse.from_response(self.client.generate_content(request))
+
+    async def generate_content_async(self, prompt, generation_config=None, safety_settings=None, stream=False):
+        request = self._request(prompt, generation_config, safety_settings)
+        if stream:
+            iterator = await self.async_client.stream_generate_content(request)
+            return await genai.types.AsyncGenerateContentResponse.from_aiterator(iterator)
+        response = await self.async_client.generate_content(request)
+        return genai.types.AsyncGenerateContentResponse.from_response(response)
+
+
+def _client_options(config):
+    return {'api_key': config.api_key}
+
+
+def _client_key(config):
+    key_hash = hashlib.sha256(config.api_key.encode('utf-8')).hexdigest()
+    return config.config_id, key_hash, config.model_name
+
+
+def get_model(config):
+    """
+    نموذج مهيأ لهذا الإعداد، يبنى مرة واحدة لكل عملية
+    (``GenerativeModel`` for ``config``, built once per process)
+    """
+    key = _client_key(config)
+    model = _models.get(key)
+    if model is not None:
+        return model
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            # عميل صريح بمفتاح الإعداد بدلاً من الإعداد العام للمكتبة
+            model = KeyedModel(
+                config.model_name, client=glm.GenerativeServiceClient(client_options=_client_options(config)),
+            )
+            _models[key] = model
+            logger.info('Gemini client created for model %s (%s)', config.model_name, config.source)
+    return model
+
+
+def get_async_model(config):
+    """
+    نموذج للاستدعاء غير المتزامن من حلقة الأحداث الحالية
+    (``GenerativeModel`` pinned to an async client, built once per event loop)
+    """
+    key = _client_key(config)
+    with _lock:
+        models = _async_models.setdefault(asyncio.get_running_loop(), {})
+        model = models.get(key)
+        if model is None:
+            model = KeyedModel(
+                config.model_name,
+                async_client=glm.GenerativeServiceAsyncClient(client_options=_client_options(config)),
+            )
+            models[key] = model
+    return model
+
+
+def evict_config(config_id):
+    """إزالة عملاء إعداد تغير (Drop the clients built from a changed configuration)"""
+    with _lock:
+        for models in [_models, *_async_models.values()]:
+            for key in [key for key in models if key[0] == config_id]:
+                del models[key]
+
+
+def clear_registry():
+    with _lock:
+        _models.clear()
+        _async_models.clear()
+        _configs.clear()
+
+
+def _configuration_changed(sender, instance, **kwargs):
+    evict_config(instance.pk)
+
+
+def ensure_gemini_provider(sender, using, **kwargs):
+    """إنشاء مقدم خدمة Gemini بعد الترحيل (Create the ``gemini`` provider after migrate)"""
+    from .models import AIProvider
+    AIProvider.objects.using(using).get_or_create(name='gemini', defaults={
+        'display_name': 'Google Gemini',
+        'description': 'Google Gemini models provide advanced AI capabilities.',
+        'is_active': True,
+        'requires_api_key': True,
+    })
+
+
+def connect_client_registry(app_config):
+    AIConfiguration = _configuration_model()
+    post_save.connect(_configuration_changed, sender=AIConfiguration, dispatch_uid='ai_client_registry_save')
+    post_delete.connect(_configuration_changed, sender=AIConfiguration, dispatch_uid='ai_client_registry_delete')
+    post_migrate.connect(ensure_gemini_provider, sender=app_config, dispatch_uid='ensure_gemini_provider')
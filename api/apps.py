@@ -8,4 +8,6 @@ class ApiConfig(AppConfig):
 
     def ready(self):
         """Initialize API configurations when Django starts"""
-        pass
+        # عملاء Gemini المشتركة ومقدم الخدمة الافتراضي
+        from .ai_clients import connect_client_registry
+        connect_client_registry(self)
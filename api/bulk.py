@@ -0,0 +1,235 @@
+"""
+الكتابة الدفعية عبر واجهة البرمجة
+(Batch create/update endpoints)
+
+A bulk endpoint accepts a JSON array of up to ``API_BULK_MAX_ITEMS``
+objects (default 1000) and answers with one result per item, in order:
+
+    {"created": 2, "updated": 1, "failed": 1, "results": [
+        {"index": 0, "status": "created", "id": 41},
+        {"index": 3, "status": "error", "errors": {"end_date": ["..."]}}]}
+
+Items that carry the lookup field (``id`` for tasks, ``product_id`` for
+products) update that row, the others are created. Invalid items are
+reported and skipped; the valid ones are written together in a single
+transaction with ``bulk_create`` / ``bulk_update``.
+
+The cost of a batch does not grow with a query per item: the rows to
+update are read with one ``in_bulk``, related objects named by the items
+(``PrefetchedRelatedField``) are resolved with one ``in_bulk`` per
+relation, and the writes go out in batches of ``BULK_BATCH_SIZE``.
+``Model.save`` is not called, so model validation runs through
+``full_clean`` here, changes to delta-sync tracked models are logged
+explicitly, and ``core.signals.bulk_saved`` is sent in place of
+``post_save`` so that receivers (task and low-stock notifications) can
+handle the whole batch at once.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.response import Response
+
+from core.changes import is_tracked, record_changes
+from core.signals import bulk_saved
+
+DEFAULT_MAX_ITEMS = 1000
+# حد آمن لعدد المعاملات في استعلام واحد على SQL Server
+BULK_BATCH_SIZE = 500
+
+
+class BulkRequestError(Exception):
+    """طلب دفعي غير صالح ككل (The batch itself is malformed; no item was looked at)"""
+
+
+class PrefetchedRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    حقل علاقة يقرأ من السجلات المحملة مسبقاً للدفعة
+    (``PrimaryKeyRelatedField`` that resolves against objects loaded once per batch)
+    """
+
+    def to_internal_value(self, data):
+        prefetched = self.context.get('prefetched', {}).get(self.field_name)
+        if prefetched is None:
+            return super().to_internal_value(data)
+        try:
+            key = self.get_queryset().model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = prefetched.get(key)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
+def max_items():
+    return getattr(settings, 'API_BULK_MAX_ITEMS', DEFAULT_MAX_ITEMS)
+
+
+def _keys(items, name, pk_field):
+    """القيم الصالحة لحقل في كل العناصر (Distinct, type-converted values of ``name``)"""
+    keys = set()
+    for item in items:
+        if isinstance(item, dict) and item.get(name) is not None:
+            try:
+                keys.add(pk_field.to_python(item[name]))
+            except (TypeError, ValueError, DjangoValidationError):
+                pass
+    return keys
+
+
+def _prefetch_related(serializer_class, items):
+    prefetched = {}
+    for name, field in serializer_class().fields.items():
+        if isinstance(field, PrefetchedRelatedField) and not field.read_only:
+            queryset = field.get_queryset()
+            prefetched[name] = queryset.in_bulk(_keys(items, name, queryset.model._meta.pk))
+    return prefetched
+
+
+def _changed_fields(instance, data):
+    """الحقول التي ستتغير قيمتها (Names in ``data`` whose value differs from ``instance``)"""
+    opts = instance._meta
+    changed = set()
+    for name, value in data.items():
+        field = opts.get_field(name)
+        if field.is_relation and value is not None:
+            value = value.pk
+        if getattr(instance, field.attname) != value:
+            changed.add(name)
+    return changed
+
+
+def bulk_write(serializer_class, items, *, context=None, lookup_field=None, allow_create=True, create_kwargs=None):
+    """
+    التحقق من عناصر الدفعة وكتابتها في معاملة واحدة
+    (Validate ``items`` with ``serializer_class`` and write the valid ones)
+
+    Returns the response body described in the module docstring. Raises
+    ``BulkRequestError`` when ``items`` is not a list or is too long.
+    """
+    if not isinstance(items, list):
+        raise BulkRequestError('Expected a JSON array of objects')
+    if len(items) > max_items():
+        raise BulkRequestError(f'At most {max_items()} items per request')
+
+    model = serializer_class.Meta.model
+    opts = model._meta
+    writable = [
+        name for name, field in serializer_class().fields.items() if not field.read_only
+    ]
+    existing = {}
+    if lookup_field:
+        lookup = opts.get_field(lookup_field)
+        existing = model._default_manager.only(lookup_field, *writable).in_bulk(
+            _keys(items, lookup_field, lookup), field_name=lookup_field,
+        )
+
+    context = dict(context or {}, prefetched=_prefetch_related(serializer_class, items))
+    relations = {field.name for field in opts.fields if field.is_relation}
+    results, to_create, to_update, update_fields = [], [], [], set()
+    changed_fields = {}
+
+    for index, item in enumerate(items):
+        instance = None
+        if lookup_field and isinstance(item, dict) and item.get(lookup_field) is not None:
+            try:
+                instance = existing.get(lookup.to_python(item[lookup_field]))
+            except (TypeError, ValueError, DjangoValidationError):
+                pass
+            if instance is None:
+                results.append({'index': index, 'status': 'error', 'errors': {lookup_field: ['Not found']}})
+                continue
+        elif not allow_create:
+            results.append({'index': index, 'status': 'error', 'errors': {lookup_field: ['This field is required.']}})
+            continue
+
+        serializer = serializer_class(instance, data=item, partial=instance is not None, context=context)
+        if not serializer.is_valid():
+            results.append({'index': index, 'status': 'error', 'errors': serializer.errors})
+            continue
+
+        data = serializer.validated_data
+        if instance is None:
+            instance = model(**data, **(create_kwargs or {}))
+        else:
+            changed_fields.setdefault(instance.pk, set()).update(_changed_fields(instance, data))
+            for name, value in data.items():
+                setattr(instance, name, value)
+            update_fields.update(data)
+        try:
+            # العلاقات تم التحقق منها دفعة واحدة، والحقول غير المحملة لم تتغير
+            instance.full_clean(
+                exclude=relations | instance.get_deferred_fields(),
+                validate_unique=False,
+                validate_constraints=False,
+            )
+        except DjangoValidationError as error:
+            results.append({'index': index, 'status': 'error', 'errors': error.message_dict})
+            continue
+
+        if instance._state.adding:
+            to_create.append(instance)
+            results.append({'index': index, 'status': 'created', 'instance': instance})
+        else:
+            to_update.append(instance)
+            results.append({'index': index, 'status': 'updated', 'instance': instance})
+
+    if to_update:
+        now = timezone.now()
+        for field in opts.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                update_fields.add(field.name)
+                for instance in to_update:
+                    setattr(instance, field.attname, now)
+
+    with transaction.atomic():
+        if to_create:
+            model._default_manager.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+        if to_update and update_fields:
+            model._default_manager.bulk_update(to_update, sorted(update_fields), batch_size=BULK_BATCH_SIZE)
+        if is_tracked(model):
+            record_changes(model, [instance.pk for instance in to_create + to_update])
+        if to_create or to_update:
+            bulk_saved.send(
+                sender=model, created=to_create, updated=to_update,
+                changed_fields={instance.pk: changed_fields[instance.pk] for instance in to_update},
+            )
+
+    for result in results:
+        instance = result.pop('instance', None)
+        if instance is not None:
+            result['id'] = instance.pk
+    return {
+        'created': len(to_create),
+        'updated': len(to_update),
+        'failed': len(items) - len(to_create) - len(to_update),
+        'results': results,
+    }
+
+
+class BulkWriteMixin:
+    """
+    Answers a bulk request with ``bulk_write``, after checking that the
+    user may add and/or change the model's rows
+    """
+
+    def bulk_response(self, request, serializer_class, *, lookup_field=None, allow_create=True, create_kwargs=None):
+        opts = serializer_class.Meta.model._meta
+        perms = []
+        if allow_create:
+            perms.append(f'{opts.app_label}.add_{opts.model_name}')
+        if lookup_field:
+            perms.append(f'{opts.app_label}.change_{opts.model_name}')
+        if not request.user.has_perms(perms):
+            raise PermissionDenied()
+        try:
+            body = bulk_write(
+                serializer_class, request.data, context=self.get_serializer_context(),
+                lookup_field=lookup_field, allow_create=allow_create, create_kwargs=create_kwargs,
+            )
+        except BulkRequestError as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(body)
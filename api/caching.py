@@ -0,0 +1,81 @@
+"""
+التخزين المؤقت للردود والطلبات الشرطية
+(Response caching and conditional GET for the read-only viewsets)
+
+The ETag of a list or detail response is a hash of the request (path,
+query string, user, renderer) and of the version counters of the models
+the response is built from (``core.changes.model_versions``). Computing
+it reads a few cache keys and no table, so:
+
+* a request whose ``If-None-Match`` matches is answered ``304 Not
+  Modified`` without querying the data or serializing anything;
+* otherwise the serialized data is kept in the ``default`` cache under the
+  ETag, and later requests from the same user get it back while the
+  models are unchanged.
+
+Any save or delete of one of the models bumps its version, which changes
+the ETag and orphans the cached entries.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, urlencode
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.changes import model_versions
+
+RESPONSE_CACHE_KEY = 'api:response:{etag}'
+RESPONSE_CACHE_TIMEOUT = 60 * 5
+
+
+class ConditionalGetMixin:
+    """
+    ETags and cached data for ``list`` and ``retrieve``; ``cache_models``
+    lists every model the serializer reads (the viewset's model by default)
+    """
+    cache_models = None
+    response_cache_timeout = RESPONSE_CACHE_TIMEOUT
+
+    def get_cache_models(self):
+        return self.cache_models or [self.get_serializer_class().Meta.model]
+
+    def get_etag(self, request):
+        parts = [
+            request.path,
+            urlencode(sorted(request.query_params.lists()), doseq=True),
+            str(request.user.pk),
+            request.accepted_renderer.format,
+        ]
+        parts.extend(str(version) for version in model_versions(self.get_cache_models()))
+        return hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        quoted = f'"{etag}"'
+        # المقارنة الضعيفة كما في RFC 9110 لطلبات If-None-Match
+        client_etags = [tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))]
+        if quoted in client_etags:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            key = RESPONSE_CACHE_KEY.format(etag=etag)
+            data = cache.get(key)
+            if data is not None:
+                response = Response(data)
+            else:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, self.response_cache_timeout)
+        response['ETag'] = quoted
+        # يعاد التحقق في كل مرة لأن الرد خاص بالمستخدم
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization', 'Cookie'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,122 @@
+"""
+الحقول المختارة في ردود واجهة البرمجة
+(Sparse fieldsets: ``?fields=`` and ``?expand=`` for the read-only viewsets)
+
+``?fields=product_id,product_name`` limits the response to those fields.
+Relations named in ``fields`` are rendered as their primary key; naming
+them in ``?expand=`` renders the nested object instead, and ``expand``
+alone also adds the relation to the fieldset. Without ``?fields=`` the
+response keeps every field, as before.
+
+The same fieldset drives the SQL: the queryset is reduced with ``only()``
+to the columns the serializer reads, and joined with ``select_related``
+only for the nested relations it renders. Columns that no serializer
+reads (e.g. ``TblProducts.image_product``) are never fetched.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+FIELDS_QUERY_PARAM = 'fields'
+EXPAND_QUERY_PARAM = 'expand'
+
+
+def _names(request, param):
+    value = request.query_params.get(param) if request is not None else None
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def requested_fieldset(request):
+    """
+    قراءة الحقول المطلوبة من الطلب
+    (``(fields, expand)`` from the query string; ``fields`` is None when not given)
+    """
+    return _names(request, FIELDS_QUERY_PARAM), _names(request, EXPAND_QUERY_PARAM) or set()
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Drops the fields a top-level serializer was not asked for, and collapses
+    relations that were not expanded to their primary key.
+    """
+
+    def _is_top_level(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self._is_top_level():
+            return fields
+        wanted, expand = requested_fieldset(self.context.get('request'))
+        if wanted is None:
+            return fields
+
+        model = self.Meta.model
+        sparse = {}
+        for name, field in fields.items():
+            if name in expand:
+                sparse[name] = field
+            elif name in wanted:
+                source = field.source or name
+                if isinstance(field, serializers.BaseSerializer) and source != '*':
+                    # الإبقاء على المعرف فقط دون تحميل السجل المرتبط
+                    attname = model._meta.get_field(source).attname
+                    field = serializers.ReadOnlyField(source=attname)
+                sparse[name] = field
+        return sparse
+
+
+def model_projection(serializer, prefix=''):
+    """
+    الأعمدة والعلاقات التي يقرأها المسلسل
+    (``(only, select_related)`` lists for the fields ``serializer`` renders,
+    or ``None`` when a field reads something other than a model column)
+    """
+    opts = serializer.Meta.model._meta
+    only, related = [], []
+    for field in serializer.fields.values():
+        if field.source == '*':
+            return None
+        try:
+            model_field = opts.get_field(field.source.split('.')[0])
+        except FieldDoesNotExist:
+            # خاصية أو دالة قد تعتمد على أي عمود
+            return None
+        if model_field.many_to_many or model_field.one_to_many:
+            continue
+        path = prefix + model_field.name
+        if isinstance(field, serializers.BaseSerializer):
+            nested = model_projection(field, path + '__')
+            if nested is None:
+                return None
+            related.append(path)
+            only.extend(nested[0])
+            related.extend(nested[1])
+        elif '.' in field.source:
+            # حقل متداخل بالمصدر المنقط يحتاج العلاقة كاملة
+            return None
+        else:
+            only.append(path)
+    return only, related
+
+
+class SparseFieldsetViewMixin:
+    """Projects the viewset's queryset onto the fields its serializer renders"""
+
+    def project_queryset(self, queryset):
+        projection = model_projection(self.get_serializer())
+        if projection is None:
+            return queryset
+        only, related = projection
+        ordering = getattr(self, 'cursor_ordering', None)
+        if ordering:
+            only.append(ordering.lstrip('-'))
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*only)
+
+    def filter_queryset(self, queryset):
+        return self.project_queryset(super().filter_queryset(queryset))
@@ -0,0 +1,117 @@
+"""
+ترقيم صفحات واجهة البرمجة
+(API pagination: page numbers, page numbers without COUNT, and keyset cursors)
+
+Page-number pagination costs an ``OFFSET`` scan plus a ``COUNT(*)`` for
+every page, which grows with the depth of the page. Two cheaper modes are
+available on the same endpoints:
+
+* ``?count=false`` keeps page numbers but skips the ``COUNT(*)``; the page
+  is fetched with one extra row to know whether a next page exists.
+* ``?cursor=`` (empty for the first page) switches to keyset pagination on
+  the view's ``cursor_ordering``. Each page is one index range scan, so a
+  client syncing a whole table pays the same for the last page as for the
+  first. Follow ``next`` until it is ``null``.
+"""
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from core.pagination import InvalidCursor, keyset_paginate
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    """Standard pagination for API responses"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    # صفحات المزامنة الكاملة يمكن أن تكون أكبر
+    max_cursor_page_size = 1000
+
+    def get_cursor_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_cursor_page_size)
+
+    def wants_count(self, request):
+        return request.query_params.get(self.count_query_param, 'true').lower() not in ('false', '0', 'no')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.mode = 'page'
+        if self.cursor_query_param in request.query_params:
+            return self._paginate_keyset(queryset, request, view)
+        if not self.wants_count(request):
+            return self._paginate_without_count(queryset, request)
+        return super().paginate_queryset(queryset, request, view)
+
+    def _paginate_keyset(self, queryset, request, view):
+        self.mode = 'cursor'
+        ordering = getattr(view, 'cursor_ordering', None) or queryset.model._meta.pk.name
+        field_name = ordering.lstrip('-')
+        try:
+            items, self.next_cursor = keyset_paginate(
+                queryset,
+                request.query_params.get(self.cursor_query_param),
+                self.get_cursor_page_size(request),
+                field_name,
+                descending=ordering.startswith('-'),
+            )
+        except InvalidCursor:
+            raise NotFound('Invalid cursor')
+        return items
+
+    def _paginate_without_count(self, queryset, request):
+        self.mode = 'uncounted'
+        page_size = self.get_page_size(request)
+        try:
+            self.page_number = max(int(request.query_params.get(self.page_query_param, 1)), 1)
+        except ValueError:
+            self.page_number = 1
+        offset = (self.page_number - 1) * page_size
+        items = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(items) > page_size
+        return items[:page_size]
+
+    def get_next_link(self):
+        if self.mode == 'cursor':
+            if self.next_cursor is None:
+                return None
+            return replace_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor,
+            )
+        if self.mode == 'uncounted':
+            if not self.has_next:
+                return None
+            return replace_query_param(
+                self.request.build_absolute_uri(), self.page_query_param, self.page_number + 1,
+            )
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.mode == 'cursor':
+            # المؤشر يتقدم فقط (Keyset cursors only move forward)
+            return None
+        if self.mode == 'uncounted':
+            if self.page_number <= 1:
+                return None
+            url = self.request.build_absolute_uri()
+            if self.page_number == 2:
+                return remove_query_param(url, self.page_query_param)
+            return replace_query_param(url, self.page_query_param, self.page_number - 1)
+        return super().get_previous_link()
+
+    def get_paginated_response(self, data):
+        if self.mode == 'page':
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
@@ -0,0 +1,23 @@
+"""
+عارض JSON السريع لواجهة البرمجة
+(DRF renderer backed by ``core.fastjson``)
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.fastjson import dumps
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Same media type and ``indent`` handling as DRF's ``JSONRenderer``, but
+    encoded with orjson when it is installed. Types neither encoder knows
+    (querysets, generators, timedeltas...) go through DRF's encoder.
+    """
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        return dumps(data, indent=bool(indent), default=self.encoder.default)
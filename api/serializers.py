@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from .bulk import PrefetchedRelatedField
+from .fieldsets import SparseFieldsetSerializerMixin
 from .models import APIKey, GeminiConversation, GeminiMessage, APIUsageLog
 
 # Import models from other apps
@@ -7,6 +9,8 @@ from hr_stubs.models import Employee, Department
 from inventory.models import TblProducts, TblCategories, TblSuppliers
 from tasks.models import Task
 from meetings.models import Meeting
+from employee_management.models import Employee as StaffEmployee
+from payroll_management.models import PayrollPeriod, PayrollTransaction
 
 User = get_user_model()
 
@@ -63,19 +67,16 @@ class DepartmentSerializer(serializers.ModelSerializer):
     """Serializer for Department model"""
     class Meta:
         model = Department
-        fields = ['id', 'dept_name', 'dept_description', 'dept_manager', 'created_at']
+        fields = ['dept_code', 'dept_name']
 
 
-class EmployeeSerializer(serializers.ModelSerializer):
+class EmployeeSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for Employee model"""
     department = DepartmentSerializer(read_only=True)
 
     class Meta:
         model = Employee
-        fields = [
-            'id', 'emp_name', 'emp_email', 'emp_phone', 'emp_position',
-            'department', 'emp_hire_date', 'emp_salary', 'emp_status'
-        ]
+        fields = ['emp_code', 'emp_name', 'department']
 
 
 # Inventory Serializers
@@ -93,7 +94,7 @@ class SupplierSerializer(serializers.ModelSerializer):
         fields = ['supplier_id', 'supplier_name']
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for Product model"""
     category = CategorySerializer(source='cat', read_only=True)
 
@@ -107,31 +108,79 @@ class ProductSerializer(serializers.ModelSerializer):
 
 
 # Task Serializers
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for Task model"""
     assigned_to = UserSerializer(read_only=True)
     created_by = UserSerializer(read_only=True)
+    due_date = serializers.DateTimeField(source='end_date', read_only=True)
 
     class Meta:
         model = Task
         fields = [
             'id', 'title', 'description', 'assigned_to', 'created_by',
-            'priority', 'status', 'due_date', 'created_at', 'updated_at'
+            'priority', 'status', 'start_date', 'due_date', 'created_at', 'updated_at'
         ]
 
 
 # Meeting Serializers
-class MeetingSerializer(serializers.ModelSerializer):
+class MeetingSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for Meeting model"""
-    organizer = UserSerializer(read_only=True)
+    organizer = UserSerializer(source='created_by', read_only=True)
+    description = serializers.CharField(source='topic', read_only=True)
+    date_time = serializers.DateTimeField(source='date', read_only=True)
 
     class Meta:
         model = Meeting
+        fields = ['id', 'title', 'description', 'organizer', 'date_time', 'status']
+
+
+# Bulk Write Serializers
+class TaskBulkSerializer(serializers.ModelSerializer):
+    """Serializer for one item of a bulk task create/update"""
+    assigned_to = PrefetchedRelatedField(queryset=User.objects.all())
+    meeting = PrefetchedRelatedField(queryset=Meeting.objects.all(), required=False, allow_null=True)
+
+    class Meta:
+        model = Task
+        fields = [
+            'id', 'title', 'description', 'assigned_to', 'meeting',
+            'priority', 'status', 'start_date', 'end_date'
+        ]
+
+
+class ProductThresholdSerializer(serializers.ModelSerializer):
+    """Serializer for one item of a bulk product threshold update"""
+
+    class Meta:
+        model = TblProducts
+        fields = ['product_id', 'minimum_threshold', 'maximum_threshold']
+        extra_kwargs = {'product_id': {'read_only': True}}
+
+    def validate(self, attrs):
+        minimum = attrs.get('minimum_threshold', getattr(self.instance, 'minimum_threshold', None))
+        maximum = attrs.get('maximum_threshold', getattr(self.instance, 'maximum_threshold', None))
+        if minimum is not None and maximum is not None and minimum > maximum:
+            raise serializers.ValidationError('الحد الأدنى لا يمكن أن يتجاوز الحد الأقصى')
+        return attrs
+
+
+class PayrollTransactionBulkSerializer(serializers.ModelSerializer):
+    """Serializer for one item of a bulk payroll transaction import"""
+    employee = PrefetchedRelatedField(queryset=StaffEmployee.objects.all())
+    payroll_period = PrefetchedRelatedField(queryset=PayrollPeriod.objects.all())
+
+    class Meta:
+        model = PayrollTransaction
         fields = [
-            'id', 'title', 'description', 'organizer', 'date_time',
-            'duration', 'location', 'status', 'created_at'
+            'id', 'employee', 'payroll_period', 'transaction_type',
+            'description', 'amount', 'reference_number', 'reference_date'
         ]
 
+    def validate_payroll_period(self, value):
+        if not value.is_editable:
+            raise serializers.ValidationError('فترة الراتب مغلقة ولا يمكن إضافة معاملات إليها')
+        return value
+
 
 # Gemini AI Request/Response Serializers
 class GeminiChatRequestSerializer(serializers.Serializer):
@@ -1,7 +1,6 @@
-import os
 import json
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Any, AsyncIterator, Dict, List, Optional
 from django.conf import settings
 from django.db.models import Count, Q
 from django.utils import timezone
@@ -15,6 +14,8 @@ except ImportError:
     GEMINI_AVAILABLE = False
     genai = None
 
+from .ai_cache import cached_generate, response_key, snapshot_version
+from .ai_clients import get_async_model, get_model, resolve_config
 from .models import GeminiConversation, GeminiMessage
 from hr_stubs.models import Employee
 from hr_stubs.models import Department
@@ -30,72 +31,18 @@ class GeminiService:
 
     def __init__(self, user=None):
         self.user = user
-        self.api_key = None
-        self.model_name = 'gemini-1.5-flash'
-        self.config_source = 'none'
-        
-        # First try to get API key from user configuration
-        if user:
-            try:
-                from .models import AIConfiguration, AIProvider
-                
-                # Try to get the Gemini provider
-                try:
-                    provider = AIProvider.objects.get(name='gemini')
-                    logger.info(f"Found Gemini provider: {provider.id}")
-                    
-                    # Try to get user's default Gemini configuration
-                    config = AIConfiguration.objects.filter(
-                        user=user,
-                        provider=provider,
-                        is_active=True
-                    ).order_by('-is_default').first()
-                    
-                    if config:
-                        self.api_key = config.api_key
-                        self.model_name = config.model_name
-                        self.config_source = 'user_config'
-                        logger.info(f"Using Gemini configuration for user {user.username}, API key: {self.api_key[:5]}..., model: {self.model_name}")
-                    else:
-                        logger.warning(f"No active Gemini configuration found for user {user.username}")
-                
-                except AIProvider.DoesNotExist:
-                    logger.warning("Gemini provider does not exist in the database")
-                    
-                    # Create the provider
-                    provider = AIProvider.objects.create(
-                        name='gemini',
-                        display_name='Google Gemini',
-                        description='Google Gemini AI models',
-                        is_active=True,
-                        requires_api_key=True
-                    )
-                    logger.info(f"Created Gemini provider: {provider.id}")
-                
-            except Exception as e:
-                import traceback
-                error_traceback = traceback.format_exc()
-                logger.warning(f"Error getting user Gemini configuration: {str(e)}\n{error_traceback}")
-        
-        # If no API key from user config, try environment variable
-        if not self.api_key:
-            env_api_key = os.getenv('GEMINI_API_KEY')
-            if env_api_key:
-                self.api_key = env_api_key
-                self.config_source = 'environment'
-                env_model = os.getenv('GEMINI_MODEL')
-                if env_model:
-                    self.model_name = env_model
-                logger.info(f"Using Gemini configuration from environment variables, API key: {self.api_key[:5]}..., model: {self.model_name}")
-        
+        # الإعداد والعميل من السجل المشترك للعملية (see api.ai_clients)
+        config = self.config = resolve_config(user)
+        self.api_key = config.api_key
+        self.model_name = config.model_name
+        self.config_source = config.source
+
         # Check if configuration is valid
         self.is_configured = bool(self.api_key and GEMINI_AVAILABLE)
 
         if self.is_configured:
             try:
-                genai.configure(api_key=self.api_key)
-                self.model = genai.GenerativeModel(self.model_name)
-                logger.info(f"Gemini AI configured successfully with model: {self.model_name}")
+                self.model = get_model(config)
             except Exception as e:
                 self.is_configured = False
                 logger.error(f"Failed to configure Gemini AI: {str(e)}")
@@ -111,8 +58,14 @@ class GeminiService:
         """Check if Gemini service is available"""
         return self.is_configured
 
-    def generate_response(self, prompt: str, temperature: float = 0.7, max_tokens: int = 1000) -> Dict[str, Any]:
-        """Generate a response using Gemini AI"""
+    def generate_response(self, prompt: str, temperature: float = 0.7, max_tokens: int = 1000,
+                          snapshot: Optional[str] = None) -> Dict[str, Any]:
+        """Generate a response using Gemini AI
+
+        When ``snapshot`` is given (the version of the data the prompt was
+        built from, see ``api.ai_cache``) identical requests are answered
+        from the response cache instead of calling the model again.
+        """
         if not self.is_configured:
             return {
                 'success': False,
@@ -121,29 +74,33 @@ class GeminiService:
                 'tokens_used': 0
             }
 
-        try:
-            # Configure generation parameters
-            generation_config = genai.types.GenerationConfig(
+        if snapshot is None:
+            return self._generate(prompt, temperature, max_tokens)
+        digest = response_key(self.model_name, prompt, temperature, max_tokens, snapshot)
+        return cached_generate(digest, lambda: self._generate(prompt, temperature, max_tokens))
+
+    def _generation_options(self, temperature: float, max_tokens: int) -> Dict[str, Any]:
+        """Generation parameters and safety settings for a request"""
+        return {
+            'generation_config': genai.types.GenerationConfig(
                 temperature=temperature,
                 max_output_tokens=max_tokens,
                 top_p=0.8,
                 top_k=40
-            )
-
-            # Safety settings
-            safety_settings = {
+            ),
+            'safety_settings': {
                 HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
                 HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
                 HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
                 HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-            }
+            },
+        }
 
+    def _generate(self, prompt: str, temperature: float, max_tokens: int) -> Dict[str, Any]:
+        """Call the model"""
+        try:
             # Generate response
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config,
-                safety_settings=safety_settings
-            )
+            response = self.model.generate_content(prompt, **self._generation_options(temperature, max_tokens))
 
             # Extract response text
             response_text = response.text if response.text else "عذراً، لم أتمكن من إنتاج رد مناسب."
@@ -172,42 +129,71 @@ class GeminiService:
                 'api_source': self.config_source
             }
 
-    def chat_with_context(self, user, message: str, conversation_id: Optional[str] = None,
-                         temperature: float = 0.7, max_tokens: int = 1000) -> Dict[str, Any]:
-        """Chat with Gemini AI maintaining conversation context"""
-        try:
-            # Get or create conversation
-            if conversation_id:
-                try:
-                    conversation = GeminiConversation.objects.get(
-                        id=conversation_id,
-                        user=user,
-                        is_active=True
-                    )
-                except GeminiConversation.DoesNotExist:
-                    conversation = GeminiConversation.objects.create(
-                        user=user,
-                        title=message[:50] + "..." if len(message) > 50 else message
-                    )
-            else:
+    async def stream_response(self, prompt: str, temperature: float = 0.7,
+                              max_tokens: int = 1000) -> AsyncIterator[str]:
+        """Yield the response text in chunks as the model produces them
+
+        Runs on the event loop: the model is called through its async client
+        (``api.ai_clients.get_async_model``), so no worker thread waits for it.
+        """
+        model = get_async_model(self.config)
+        response = await model.generate_content_async(
+            prompt, stream=True, **self._generation_options(temperature, max_tokens)
+        )
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # جزء بلا نص (مثل سبب انتهاء أو حظر أمان)
+                continue
+            if text:
+                yield text
+
+    def prepare_chat(self, user, message: str, conversation_id: Optional[str] = None):
+        """Get or create the conversation and build the prompt for ``message``
+
+        Returns ``(conversation, prompt)``.
+        """
+        conversation = self.get_conversation(user, message, conversation_id)
+        return conversation, self.build_prompt(user, conversation, message)
+
+    def get_conversation(self, user, message: str, conversation_id: Optional[str] = None):
+        """Get the user's active conversation, or start one titled after ``message``"""
+        # Get or create conversation
+        if conversation_id:
+            try:
+                conversation = GeminiConversation.objects.get(
+                    id=conversation_id,
+                    user=user,
+                    is_active=True
+                )
+            except GeminiConversation.DoesNotExist:
                 conversation = GeminiConversation.objects.create(
                     user=user,
                     title=message[:50] + "..." if len(message) > 50 else message
                 )
-
-            # Build context from previous messages
-            previous_messages = conversation.messages.order_by('timestamp')[:10]  # Last 10 messages
-            context = ""
-
-            if previous_messages.exists():
-                context = "السياق السابق للمحادثة:\n"
-                for msg in previous_messages:
-                    role_ar = "المستخدم" if msg.role == "user" else "المساعد"
-                    context += f"{role_ar}: {msg.content}\n"
-                context += "\n"
-
-            # Add system context about the ElDawliya system
-            system_context = """
+        else:
+            conversation = GeminiConversation.objects.create(
+                user=user,
+                title=message[:50] + "..." if len(message) > 50 else message
+            )
+        return conversation
+
+    def build_prompt(self, user, conversation, message: str) -> str:
+        """Prompt for ``message``: system context, system data and the last messages"""
+        # Build context from previous messages
+        previous_messages = conversation.messages.order_by('timestamp')[:10]  # Last 10 messages
+        context = ""
+
+        if previous_messages.exists():
+            context = "السياق السابق للمحادثة:\n"
+            for msg in previous_messages:
+                role_ar = "المستخدم" if msg.role == "user" else "المساعد"
+                context += f"{role_ar}: {msg.content}\n"
+            context += "\n"
+
+        # Add system context about the ElDawliya system
+        system_context = """
 أنت مساعد ذكي لنظام الدولية للإدارة. النظام يحتوي على:
 - إدارة الموارد البشرية (الموظفين والأقسام)
 - إدارة المخزون (المنتجات والموردين)
@@ -218,97 +204,114 @@ class GeminiService:
 
 يرجى تقديم إجابات مفيدة ودقيقة باللغة العربية.
 """
-            
-            # First, detect if this is a system data analysis request
-            try:
-                # Check for inventory analysis queries
+        system_context += self.data_context(user, message)
+
+        # Combine context with current message
+        return f"{system_context}\n{context}المستخدم: {message}\nالمساعد:"
+
+    def data_context(self, user, message: str) -> str:
+        """System data to add to the prompt when ``message`` asks about it"""
+        system_context = ""
+
+        # First, detect if this is a system data analysis request
+        try:
+            # Check for inventory analysis queries
+            if any(keyword in message.lower() for keyword in [
+                'المخزون', 'الاصناف', 'المنتجات', 'البضاعة', 'الرصيد', 'الأصناف', 
+                'ناقص', 'الكميات', 'منتهية الصلاحية', 'منخفضة', 'المستودع', 'حد أدنى', 'قائمة'
+            ]):
+                # Initialize data service just once for better performance
+                data_service = DataAnalysisService(user=user)
+                
+                # First check for low stock items since it's the most specific
                 if any(keyword in message.lower() for keyword in [
-                    'المخزون', 'الاصناف', 'المنتجات', 'البضاعة', 'الرصيد', 'الأصناف', 
-                    'ناقص', 'الكميات', 'منتهية الصلاحية', 'منخفضة', 'المستودع', 'حد أدنى', 'قائمة'
+                    'منخفض', 'أقل من', 'قليل', 'ناقص', 'الحد الأدنى', 'نواقص', 'نفذت', 
+                    'الكميات القليلة', 'تحت الحد', 'الأصناف الناقصة'
                 ]):
-                    # Initialize data service just once for better performance
-                    data_service = DataAnalysisService(user=user)
-                    
-                    # First check for low stock items since it's the most specific
-                    if any(keyword in message.lower() for keyword in [
-                        'منخفض', 'أقل من', 'قليل', 'ناقص', 'الحد الأدنى', 'نواقص', 'نفذت', 
-                        'الكميات القليلة', 'تحت الحد', 'الأصناف الناقصة'
-                    ]):
-                        # Add info about low stock items to the system context
-                        system_context += "\n\n--- معلومات المخزون ---\n"
-                        system_context += "قمت بالبحث عن الأصناف منخفضة المخزون في قاعدة البيانات. "
-                        
-                        # Try to get low stock items
-                        try:
-                            low_stock_data = data_service.get_low_stock_items()
-                            if low_stock_data['success'] and low_stock_data['low_stock_count'] > 0:
-                                system_context += f"وجدت {low_stock_data['low_stock_count']} من الأصناف منخفضة المخزون. "
-                                system_context += "تفاصيل الأصناف:\n"
-                                
-                                # Add information about each item
-                                for item in low_stock_data['items'][:5]:  # Limit to first 5 for brevity
-                                    system_context += f"- {item['اسم الصنف']}: الرصيد الحالي {item['الرصيد الحالي']} "
-                                    system_context += f"(الحد الأدنى {item['الحد الأدنى']})\n"
-                                
-                                if len(low_stock_data['items']) > 5:
-                                    system_context += f"... وهناك {len(low_stock_data['items']) - 5} أصناف أخرى منخفضة المخزون.\n"
-                            else:
-                                system_context += "لم أجد أي أصناف منخفضة المخزون في النظام."
-                        except Exception as e:
-                            logger.error(f"Error fetching low stock items: {str(e)}")
-                            system_context += "واجهت مشكلة في استعلام البيانات من النظام."
+                    # Add info about low stock items to the system context
+                    system_context += "\n\n--- معلومات المخزون ---\n"
+                    system_context += "قمت بالبحث عن الأصناف منخفضة المخزون في قاعدة البيانات. "
                     
-                    # General inventory analysis as a fallback
-                    else:
-                        # Add general inventory info to the system context
-                        system_context += "\n\n--- معلومات عامة عن المخزون ---\n"
-                        try:
-                            inventory_data = data_service.analyze_inventory()
-                            if inventory_data['success']:
-                                summary = inventory_data['data_summary']
-                                system_context += f"إجمالي المنتجات في المخزون: {summary['total_products']}\n"
-                                system_context += f"عدد الأصناف منخفضة المخزون: {summary['low_stock_items']}\n"
-                                
-                                # Add category distribution if available
-                                if 'categories' in summary and len(summary['categories']) > 0:
-                                    system_context += "توزيع الفئات:\n"
-                                    for cat in summary['categories'][:3]:  # Show top 3 categories
-                                        if isinstance(cat, dict) and 'name' in cat and 'product_count' in cat:
-                                            system_context += f"- {cat['name']}: {cat['product_count']} صنف\n"
-                            else:
-                                system_context += "لم أتمكن من تحليل بيانات المخزون."
-                        except Exception as e:
-                            logger.error(f"Error analyzing inventory: {str(e)}")
-                            system_context += "واجهت مشكلة في تحليل بيانات المخزون."
-            except Exception as e:
-                logger.error(f"Error in data analysis integration: {str(e)}")
-                # Continue without integrated data if there's an error
-            
-            # Combine context with current message
-            full_prompt = f"{system_context}\n{context}المستخدم: {message}\nالمساعد:"
+                    # Try to get low stock items
+                    try:
+                        low_stock_data = data_service.get_low_stock_items()
+                        if low_stock_data['success'] and low_stock_data['low_stock_count'] > 0:
+                            system_context += f"وجدت {low_stock_data['low_stock_count']} من الأصناف منخفضة المخزون. "
+                            system_context += "تفاصيل الأصناف:\n"
+                            
+                            # Add information about each item
+                            for item in low_stock_data['items'][:5]:  # Limit to first 5 for brevity
+                                system_context += f"- {item['اسم الصنف']}: الرصيد الحالي {item['الرصيد الحالي']} "
+                                system_context += f"(الحد الأدنى {item['الحد الأدنى']})\n"
+                            
+                            if len(low_stock_data['items']) > 5:
+                                system_context += f"... وهناك {len(low_stock_data['items']) - 5} أصناف أخرى منخفضة المخزون.\n"
+                        else:
+                            system_context += "لم أجد أي أصناف منخفضة المخزون في النظام."
+                    except Exception as e:
+                        logger.error(f"Error fetching low stock items: {str(e)}")
+                        system_context += "واجهت مشكلة في استعلام البيانات من النظام."
+                
+                # General inventory analysis as a fallback
+                else:
+                    # Add general inventory info to the system context
+                    system_context += "\n\n--- معلومات عامة عن المخزون ---\n"
+                    try:
+                        inventory_data = data_service.analyze_inventory()
+                        if inventory_data['success']:
+                            summary = inventory_data['data_summary']
+                            system_context += f"إجمالي المنتجات في المخزون: {summary['total_products']}\n"
+                            system_context += f"عدد الأصناف منخفضة المخزون: {summary['low_stock_items']}\n"
+                            
+                            # Add category distribution if available
+                            if 'categories' in summary and len(summary['categories']) > 0:
+                                system_context += "توزيع الفئات:\n"
+                                for cat in summary['categories'][:3]:  # Show top 3 categories
+                                    if isinstance(cat, dict) and 'name' in cat and 'product_count' in cat:
+                                        system_context += f"- {cat['name']}: {cat['product_count']} صنف\n"
+                        else:
+                            system_context += "لم أتمكن من تحليل بيانات المخزون."
+                    except Exception as e:
+                        logger.error(f"Error analyzing inventory: {str(e)}")
+                        system_context += "واجهت مشكلة في تحليل بيانات المخزون."
+        except Exception as e:
+            logger.error(f"Error in data analysis integration: {str(e)}")
+            # Continue without integrated data if there's an error
+
+        return system_context
+
+    def save_exchange(self, conversation, message: str, response: str, tokens_used: int) -> None:
+        """Save the user's message and the assistant's response"""
+        # Save user message
+        GeminiMessage.objects.create(
+            conversation=conversation,
+            role='user',
+            content=message
+        )
+
+        # Save assistant response
+        GeminiMessage.objects.create(
+            conversation=conversation,
+            role='assistant',
+            content=response,
+            tokens_used=tokens_used
+        )
+
+        # Update conversation timestamp
+        conversation.updated_at = timezone.now()
+        conversation.save()
+
+    def chat_with_context(self, user, message: str, conversation_id: Optional[str] = None,
+                         temperature: float = 0.7, max_tokens: int = 1000) -> Dict[str, Any]:
+        """Chat with Gemini AI maintaining conversation context"""
+        try:
+            conversation, full_prompt = self.prepare_chat(user, message, conversation_id)
 
             # Generate response
             result = self.generate_response(full_prompt, temperature, max_tokens)
 
             if result['success']:
-                # Save user message
-                GeminiMessage.objects.create(
-                    conversation=conversation,
-                    role='user',
-                    content=message
-                )
-
-                # Save assistant response
-                GeminiMessage.objects.create(
-                    conversation=conversation,
-                    role='assistant',
-                    content=result['response'],
-                    tokens_used=result['tokens_used']
-                )
-
-                # Update conversation timestamp
-                conversation.updated_at = timezone.now()
-                conversation.save()
+                self.save_exchange(conversation, message, result['response'], result['tokens_used'])
 
                 return {
                     'success': True,
@@ -365,7 +368,9 @@ class DataAnalysisService:
 3. التوصيات لتحسين إدارة الموارد البشرية
 """
 
-            result = self.gemini_service.generate_response(prompt)
+            result = self.gemini_service.generate_response(
+                prompt, snapshot=snapshot_version([Employee, Department]),
+            )
 
             if result['success']:
                 return {
@@ -406,6 +411,7 @@ class DataAnalysisService:
                 categories = Category.objects.annotate(product_count=Count('products')).values('name', 'product_count')
                 from django.db import models as django_models
                 low_stock_items = products.filter(quantity__lte=django_models.F('minimum_threshold')).count()
+                snapshot = snapshot_version([Product, Category])
 
             except (ImportError, ModuleNotFoundError):
                 # Fallback to the original models if local models aren't available
@@ -422,6 +428,7 @@ class DataAnalysisService:
                 categories = products.values('cat_name').annotate(count=Count('product_id'))
                 from django.db import models as django_models
                 low_stock_items = products.filter(qte_in_stock__lte=django_models.F('minimum_threshold')).count()
+                snapshot = snapshot_version([TblProducts, TblCategories])
 
             # Create analysis prompt
             prompt = f"""
@@ -436,7 +443,7 @@ class DataAnalysisService:
 3. توصيات لتحسين إدارة المخزون
 """
 
-            result = self.gemini_service.generate_response(prompt)
+            result = self.gemini_service.generate_response(prompt, snapshot=snapshot)
 
             if result['success']:
                 return {
@@ -472,6 +479,7 @@ class DataAnalysisService:
                     quantity__lt=django_models.F('minimum_threshold'),
                     minimum_threshold__gt=0
                 ).values('product_id', 'name', 'quantity', 'minimum_threshold', 'category__name', 'unit__name')
+                snapshot = snapshot_version([Product])
                 
                 # Format output for display
                 formatted_items = []
@@ -496,6 +504,7 @@ class DataAnalysisService:
                     qte_in_stock__lt=django_models.F('minimum_threshold'),
                     minimum_threshold__gt=0
                 ).values('product_id', 'product_name', 'qte_in_stock', 'minimum_threshold', 'cat_name', 'unit_name')
+                snapshot = snapshot_version([TblProducts])
                 
                 # Format output for display
                 formatted_items = []
@@ -528,7 +537,7 @@ class DataAnalysisService:
 ملاحظة: قدم التقرير بتنسيق واضح ومنظم مع عناوين وجداول واضحة.
 """
                 
-                result = self.gemini_service.generate_response(prompt, temperature=0.2)
+                result = self.gemini_service.generate_response(prompt, temperature=0.2, snapshot=snapshot)
                 
                 if result['success']:
                     return {
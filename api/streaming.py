@@ -0,0 +1,198 @@
+"""
+بث ردود المحادثة
+(Streaming chat responses as server-sent events)
+
+``POST ai/chat/stream/`` takes the same body as ``ai/chat/`` and answers
+``text/event-stream``:
+
+    event: start
+    data: {"conversation_id": "..."}
+
+    event: token
+    data: {"text": "..."}          (once per chunk, as the model sends it)
+
+    event: done
+    data: {"conversation_id": "...", "tokens_used": 412}
+
+or ``event: error`` if the model fails midway. The exchange is saved to the
+conversation only after the last chunk, so an interrupted stream leaves no
+half answer behind. The prompt, with any system data the message asks
+about, is built after ``start`` is sent, so those lookups do not delay
+the first byte.
+
+Requests go through the API's authentication, ``HasAPIAccess`` and the
+default throttle classes, and are recorded in ``APIUsageLog`` like the
+other endpoints (the response time is the time to the first byte).
+
+The view is async and the model is called through its async client: under
+ASGI (``ElDawliya_sys.asgi``) a long answer holds an open connection, not
+a worker. Each user may have ``AI_STREAM_MAX_PER_USER`` streams open at
+once (default 2), counted in the shared ``throttle`` cache; more answer
+``429``. Under WSGI the view still works but Django buffers the whole
+stream before sending it.
+"""
+import json
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponseNotAllowed, StreamingHttpResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from core.cache import throttle_cache
+from core.fastjson import FastJsonResponse, dumps
+
+from .permissions import HasAPIAccess
+from .serializers import GeminiChatRequestSerializer
+from .services import GeminiService
+from .views import APIUsageLogMixin
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_STREAMS_PER_USER = 2
+STREAM_SLOTS_KEY = 'ai:streams:{user_id}'
+# يسقط العداد تلقائياً إذا توقفت العملية دون تحرير مكانها،
+# والمدة تبدأ من آخر بث حجز مكاناً
+STREAM_SLOT_TIMEOUT = 60 * 5
+
+
+def sse(event, data):
+    """حدث بتنسيق SSE (One server-sent event with a JSON payload)"""
+    return b'event: ' + event.encode('ascii') + b'\ndata: ' + dumps(data) + b'\n\n'
+
+
+def max_streams():
+    return getattr(settings, 'AI_STREAM_MAX_PER_USER', DEFAULT_MAX_STREAMS_PER_USER)
+
+
+async def acquire_stream_slot(user_id):
+    """حجز مكان بث للمستخدم (Reserve one of the user's concurrent streams)"""
+    key = STREAM_SLOTS_KEY.format(user_id=user_id)
+    await throttle_cache.aadd(key, 0, STREAM_SLOT_TIMEOUT)
+    try:
+        active = await throttle_cache.aincr(key)
+    except ValueError:
+        await throttle_cache.aset(key, 1, STREAM_SLOT_TIMEOUT)
+        active = 1
+    if active > max_streams():
+        await release_stream_slot(user_id)
+        return False
+    # aadd يضبط المدة عند الإنشاء فقط؛ كل بث جديد يمدها حتى لا يسقط العداد أثناء بث قائم
+    await throttle_cache.atouch(key, STREAM_SLOT_TIMEOUT)
+    return True
+
+
+async def release_stream_slot(user_id):
+    try:
+        await throttle_cache.adecr(STREAM_SLOTS_KEY.format(user_id=user_id))
+    except ValueError:
+        pass
+
+
+def authenticate(request):
+    """
+    مصادقة وصلاحيات وتحديد معدل نقاط API
+    (The API's authentication, ``HasAPIAccess`` and throttle classes; returns the user)
+
+    Raises the ``APIException`` DRF would have answered with.
+    """
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    user = drf_request.user
+    if not user or not user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    if not HasAPIAccess().has_permission(drf_request, None):
+        raise exceptions.PermissionDenied(HasAPIAccess.message)
+    for throttle in [throttle_class() for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES]:
+        if not throttle.allow_request(drf_request, None):
+            raise exceptions.Throttled(throttle.wait())
+    return user
+
+
+def _error_response(error):
+    response = FastJsonResponse({'error': str(error.detail)}, status=error.status_code)
+    if getattr(error, 'wait', None) is not None:
+        response['Retry-After'] = str(int(error.wait))
+    return response
+
+
+async def _event_stream(service, user, conversation, message, temperature, max_tokens):
+    try:
+        yield sse('start', {'conversation_id': str(conversation.id)})
+        # بيانات النظام قد تستدعي النموذج، لذلك تبنى بعد أول بايت
+        prompt = await sync_to_async(service.build_prompt)(user, conversation, message)
+        chunks = []
+        async for text in service.stream_response(prompt, temperature, max_tokens):
+            chunks.append(text)
+            yield sse('token', {'text': text})
+
+        response = ''.join(chunks) or "عذراً، لم أتمكن من إنتاج رد مناسب."
+        tokens_used = len(prompt.split()) + len(response.split())
+        await sync_to_async(service.save_exchange)(conversation, message, response, tokens_used)
+        yield sse('done', {'conversation_id': str(conversation.id), 'tokens_used': tokens_used})
+    except Exception as e:
+        logger.error(f"Error streaming Gemini response: {str(e)}")
+        yield sse('error', {'error': f"Error generating Gemini response: {str(e)}"})
+    finally:
+        await release_stream_slot(user.pk)
+
+
+async def gemini_chat_stream(request):
+    """Chat with Gemini AI, streaming the response as server-sent events"""
+    started = time.time()
+    response = await _chat_stream(request)
+    await sync_to_async(APIUsageLogMixin().log_api_usage)(request, response, started)
+    return response
+
+
+async def _chat_stream(request):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    try:
+        user = await sync_to_async(authenticate)(request)
+    except exceptions.APIException as error:
+        return _error_response(error)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return FastJsonResponse({'error': 'Invalid JSON'}, status=400)
+    serializer = GeminiChatRequestSerializer(data=data)
+    if not serializer.is_valid():
+        return FastJsonResponse(serializer.errors, status=400)
+    message = serializer.validated_data['message']
+
+    service = await sync_to_async(GeminiService)(user=user)
+    if not service.is_available():
+        return FastJsonResponse({'error': 'Gemini AI service is not available'}, status=503)
+
+    if not await acquire_stream_slot(user.pk):
+        return FastJsonResponse({'error': 'Too many chat streams in progress'}, status=429)
+    try:
+        conversation = await sync_to_async(service.get_conversation)(
+            user, message, serializer.validated_data.get('conversation_id'),
+        )
+    except Exception as e:
+        await release_stream_slot(user.pk)
+        logger.error(f"Error preparing chat: {str(e)}")
+        return FastJsonResponse({'error': str(e)}, status=500)
+
+    response = StreamingHttpResponse(
+        _event_stream(
+            service, user, conversation, message,
+            serializer.validated_data['temperature'], serializer.validated_data['max_tokens'],
+        ),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # منع التخزين المؤقت في nginx حتى تصل الأجزاء فوراً
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# مثل csrf_exempt (غير المتوافق مع الدوال غير المتزامنة في Django 4.2)؛
+# SessionAuthentication تتحقق من CSRF لمستخدمي الجلسة كما في بقية نقاط API
+gemini_chat_stream.csrf_exempt = True
@@ -0,0 +1,87 @@
+"""
+نقاط المزامنة التزايدية
+(Delta-sync endpoints for the read-only API viewsets)
+
+``GET <resource>/changes/`` returns what changed in a collection since the
+client's last sync, read from ``core.changes``:
+
+* ``?since=<token>`` — changes after a token returned by a previous call;
+* ``?updated_since=<ISO datetime>`` — changes after a point in time;
+* no parameter — no rows, only the current ``next_token``. Take the token
+  first, then download the collection once (``?cursor=``), then follow up
+  with ``?since=``.
+
+The response holds the current representation of every added or modified
+row (``upserts``), the primary keys of deleted rows (``deletes``), and
+``next_token``. Rows that changed so that they no longer match the
+request's filters (or the user's queryset) are reported as deletes. While ``has_more`` is true the client calls again straight
+away. A token older than the retained log answers ``410 Gone`` and the
+client starts over with a full download.
+"""
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from core.changes import ChangeTokenExpired, changes_since, current_token
+
+# حد آمن لعدد المعاملات في استعلام IN على SQL Server
+MAX_CHANGES_PER_PAGE = 1000
+DEFAULT_CHANGES_PER_PAGE = 500
+
+
+class DeltaSyncMixin:
+    """Adds a ``changes`` list route to a read-only model viewset"""
+
+    def _changes_limit(self, request):
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_CHANGES_PER_PAGE))
+        except ValueError:
+            limit = DEFAULT_CHANGES_PER_PAGE
+        return min(max(limit, 1), MAX_CHANGES_PER_PAGE)
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """التغييرات منذ آخر مزامنة (Upserts and deletes since a change token)"""
+        token = request.query_params.get('since')
+        updated_since = request.query_params.get('updated_since')
+        if token is None and updated_since is None:
+            return Response({'upserts': [], 'deletes': [], 'next_token': str(current_token()), 'has_more': False})
+
+        since_time = None
+        if token is not None:
+            try:
+                token = int(token)
+            except ValueError:
+                return Response({'error': 'Invalid change token'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            try:
+                since_time = parse_datetime(updated_since)
+            except ValueError:
+                since_time = None
+            if since_time is None:
+                return Response({'error': 'updated_since must be an ISO 8601 datetime'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(since_time):
+                since_time = timezone.make_aware(since_time)
+
+        model = self.get_queryset().model
+        try:
+            upserted, deleted, next_token, has_more = changes_since(
+                model, token=token, since_time=since_time, limit=self._changes_limit(request),
+            )
+        except ChangeTokenExpired:
+            return Response({'error': 'Change token expired; download the collection again'},
+                            status=status.HTTP_410_GONE)
+
+        objects = list(self.filter_queryset(self.get_queryset()).filter(pk__in=upserted)) if upserted else []
+        # الصفوف التي لم تعد تطابق عوامل التصفية تحذف من نسخة العميل
+        visible = {obj.pk for obj in objects}
+        deleted.extend(pk for pk in upserted if pk not in visible)
+        return Response({
+            'upserts': self.get_serializer(objects, many=True).data,
+            'deletes': deleted,
+            'next_token': str(next_token),
+            'has_more': has_more,
+        })
@@ -1,9 +1,32 @@
-from django.test import TestCase
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.test import RequestFactory, TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
-from .models import APIKey, GeminiConversation, GeminiMessage
+
+from core.cache import ai_cache, stats_cache, throttle_cache
+from core.models import ChangeLogEntry
+from inventory.models import TblCategories, TblProducts
+from inventory.models_local import Product
+from notifications.models import Notification
+from tasks.models import Task
+from .ai_cache import LOCK_KEY, cached_generate, response_cache_metrics
+from .ai_clients import KeyedModel, clear_registry, resolve_config
+from .models import AIConfiguration, AIProvider, APIKey, APIUsageLog, GeminiConversation, GeminiMessage
+from .services import GEMINI_AVAILABLE, DataAnalysisService, GeminiService
+from .streaming import STREAM_SLOT_TIMEOUT, acquire_stream_slot
+from .throttling import SlidingWindowUserRateThrottle
 import secrets
 
 User = get_user_model()
@@ -157,6 +180,667 @@ class APIEndpointsTest(APITestCase):
         self.assertIn('results', response.data)
 
 
+class CursorPaginationTest(APITestCase):
+    """Test cases for keyset cursors and uncounted pages"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='syncer', password='testpass123', is_staff=True)
+        self.client.force_authenticate(self.user)
+        start = timezone.now()
+        for number in range(5):
+            Task.objects.create(
+                description=f'مهمة {number}', assigned_to=self.user,
+                start_date=start, end_date=start + timedelta(days=1),
+            )
+        TblProducts.objects.bulk_create(
+            TblProducts(product_id=f'P{number:03d}', product_name=f'صنف {number}') for number in range(5)
+        )
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(item.get('id', item.get('product_id')) for item in response.data['results'])
+            url, pages = response.data['next'], pages + 1
+        return ids, pages
+
+    def test_cursor_walks_every_row_once(self):
+        ids, pages = self.walk('/api/v1/tasks/?cursor=&page_size=2')
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, list(Task.objects.order_by('-created_at', '-id').values_list('id', flat=True)))
+
+        ids, _ = self.walk('/api/v1/products/?cursor=&page_size=2')
+        self.assertEqual(ids, ['P000', 'P001', 'P002', 'P003', 'P004'])
+
+    def test_corrupt_cursor_is_not_found(self):
+        response = self.client.get('/api/v1/tasks/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_uncounted_pages_skip_count_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/products/?count=false&page_size=2&page=3')
+        self.assertEqual([item['product_id'] for item in response.data['results']], ['P004'])
+        self.assertIsNone(response.data['next'])
+        self.assertIn('page=2', response.data['previous'])
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+
+
+@override_settings(CHANGE_LOG_LAG_SECONDS=0)
+class DeltaSyncTest(APITestCase):
+    """Test cases for the change-log backed delta-sync endpoints"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='delta', password='testpass123', is_staff=True)
+        self.client.force_authenticate(self.user)
+        self.start = timezone.now()
+
+    def make_task(self, number):
+        return Task.objects.create(
+            description=f'مهمة {number}', assigned_to=self.user,
+            start_date=self.start, end_date=self.start + timedelta(days=1),
+        )
+
+    def sync(self, token, **params):
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+        return self.client.get(f'/api/v1/tasks/changes/?since={token}&{query}')
+
+    def test_upserts_and_tombstones_after_token(self):
+        kept, removed = self.make_task(1), self.make_task(2)
+        token = self.client.get('/api/v1/tasks/changes/').data['next_token']
+
+        kept.description = 'معدلة'
+        kept.save()
+        removed_id = removed.id
+        removed.delete()
+        added = self.make_task(3)
+
+        response = self.sync(token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(item['id'] for item in response.data['upserts']), [kept.id, added.id])
+        self.assertEqual(response.data['deletes'], [removed_id])
+        self.assertFalse(response.data['has_more'])
+
+        response = self.sync(response.data['next_token'])
+        self.assertEqual(response.data['upserts'], [])
+        self.assertEqual(response.data['deletes'], [])
+
+    def test_limit_pages_through_changes(self):
+        token = self.client.get('/api/v1/tasks/changes/').data['next_token']
+        tasks = [self.make_task(number) for number in range(3)]
+
+        seen = []
+        while True:
+            response = self.sync(token, limit=2)
+            seen.extend(item['id'] for item in response.data['upserts'])
+            token = response.data['next_token']
+            if not response.data['has_more']:
+                break
+        self.assertEqual(sorted(seen), [task.id for task in tasks])
+
+    def test_expired_token_is_gone(self):
+        self.make_task(1)
+        self.make_task(2)
+        ChangeLogEntry.objects.order_by('id').first().delete()
+        oldest = ChangeLogEntry.objects.order_by('id').first().id
+
+        self.assertEqual(self.sync(oldest - 2).status_code, status.HTTP_410_GONE)
+        self.assertEqual(self.sync('abc').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rows_leaving_the_filter_are_deleted(self):
+        moved, stays = self.make_task(1), self.make_task(2)
+        token = self.client.get('/api/v1/tasks/changes/').data['next_token']
+
+        for task in (moved, stays):
+            task.status = 'completed' if task is moved else 'in_progress'
+            task.save()
+        stays.status = 'pending'
+        stays.save()
+
+        response = self.sync(token, status='pending')
+        self.assertEqual([item['id'] for item in response.data['upserts']], [stays.id])
+        self.assertEqual(response.data['deletes'], [moved.id])
+
+    @override_settings(CHANGE_LOG_LAG_SECONDS=10)
+    def test_late_commit_is_logged_again(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            task = self.make_task(1)
+        first = ChangeLogEntry.objects.order_by('-id').values_list('id', flat=True).first()
+
+        late = timezone.now() + timedelta(seconds=6)
+        with mock.patch('django.utils.timezone.now', return_value=late):
+            for callback in callbacks:
+                callback()
+        entries = ChangeLogEntry.objects.filter(object_pk=str(task.id), id__gt=first)
+        self.assertEqual(entries.count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_task(2)
+        self.assertEqual(ChangeLogEntry.objects.count(), 3)
+
+    def test_updated_since(self):
+        old = self.make_task(1)
+        ChangeLogEntry.objects.update(changed_at=self.start - timedelta(hours=1))
+        new = self.make_task(2)
+
+        since = (self.start - timedelta(minutes=1)).strftime('%Y-%m-%dT%H:%M:%S')
+        response = self.client.get(f'/api/v1/tasks/changes/?updated_since={since}')
+        ids = [item['id'] for item in response.data['upserts']]
+        self.assertIn(new.id, ids)
+        self.assertNotIn(old.id, ids)
+
+
+class SparseFieldsetTest(APITestCase):
+    """Test cases for ?fields= / ?expand= and the projected queries"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='sparse', password='testpass123', is_staff=True)
+        self.client.force_authenticate(self.user)
+        start = timezone.now()
+        Task.objects.create(
+            description='مهمة', assigned_to=self.user, start_date=start, end_date=start + timedelta(days=1),
+        )
+        TblProducts.objects.create(product_id='P001', product_name='صنف')
+
+    def get_with_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sql = [query['sql'] for query in queries if 'tbl_products' in query['sql'].lower()
+               or 'tasks_task' in query['sql'].lower()]
+        return response, sql[-1]
+
+    def test_default_response_skips_unserialized_columns(self):
+        response, sql = self.get_with_queries('/api/v1/products/')
+        self.assertIn('unit_price', response.data['results'][0])
+        self.assertNotIn('image_product', sql)
+
+    def test_fields_trim_output_and_projection(self):
+        response, sql = self.get_with_queries('/api/v1/products/?fields=product_id,product_name')
+        self.assertEqual(response.data['results'], [{'product_id': 'P001', 'product_name': 'صنف'}])
+        self.assertNotIn('unit_price', sql)
+        self.assertNotIn('JOIN', sql)
+
+    def test_relations_collapse_unless_expanded(self):
+        response, sql = self.get_with_queries('/api/v1/tasks/?fields=id,assigned_to')
+        self.assertEqual(response.data['results'][0]['assigned_to'], self.user.pk)
+        self.assertNotIn('JOIN', sql)
+
+        response, sql = self.get_with_queries('/api/v1/tasks/?fields=id&expand=assigned_to')
+        task = response.data['results'][0]
+        self.assertEqual(set(task), {'id', 'assigned_to'})
+        self.assertEqual(task['assigned_to']['username'], 'sparse')
+        self.assertIn('JOIN', sql)
+
+
+class BulkWriteTest(APITestCase):
+    """Test cases for the bulk task and product endpoints"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='importer', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.start = timezone.now()
+
+    def task_item(self, number, **overrides):
+        item = {
+            'description': f'مهمة {number}', 'assigned_to': self.user.pk,
+            'start_date': self.start.isoformat(), 'end_date': (self.start + timedelta(days=1)).isoformat(),
+        }
+        item.update(overrides)
+        return item
+
+    def post_tasks(self, items):
+        return self.client.post('/api/v1/tasks/bulk/', items, format='json')
+
+    def test_creates_and_updates_with_per_item_results(self):
+        existing = Task.objects.create(
+            description='قديمة', assigned_to=self.user,
+            start_date=self.start, end_date=self.start + timedelta(days=1),
+        )
+        response = self.post_tasks([
+            self.task_item(1),
+            {'id': existing.id, 'status': 'completed'},
+            self.task_item(2, assigned_to=999999),
+            self.task_item(3, end_date=(self.start - timedelta(days=1)).isoformat()),
+            {'id': 999999, 'status': 'completed'},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['failed']), (1, 1, 3))
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results],
+                         ['created', 'updated', 'error', 'error', 'error'])
+        self.assertIn('assigned_to', results[2]['errors'])
+        self.assertIn('end_date', results[3]['errors'])
+
+        created = Task.objects.get(pk=results[0]['id'])
+        self.assertEqual(created.created_by, self.user)
+        existing.refresh_from_db()
+        self.assertEqual(existing.status, 'completed')
+        self.assertEqual(existing.description, 'قديمة')
+
+    def test_query_count_does_not_grow_with_batch(self):
+        with CaptureQueriesContext(connection) as small:
+            self.post_tasks([self.task_item(number) for number in range(2)])
+        with CaptureQueriesContext(connection) as large:
+            self.post_tasks([self.task_item(number) for number in range(20)])
+        self.assertEqual(Task.objects.count(), 22)
+        self.assertEqual(len(small), len(large))
+
+    def test_rejects_malformed_batches(self):
+        self.assertEqual(self.post_tasks({'description': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(API_BULK_MAX_ITEMS=2):
+            response = self.post_tasks([self.task_item(number) for number in range(3)])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        clerk = User.objects.create_user(username='clerk', password='testpass123', is_staff=True)
+        self.client.force_authenticate(clerk)
+        self.assertEqual(self.post_tasks([self.task_item(1)]).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_product_thresholds(self):
+        TblProducts.objects.create(product_id='P001', product_name='صنف', maximum_threshold=50)
+        response = self.client.post('/api/v1/products/bulk-thresholds/', [
+            {'product_id': 'P001', 'minimum_threshold': '5'},
+            {'product_id': 'P001', 'minimum_threshold': '80'},
+            {'minimum_threshold': '1'},
+        ], format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], ['updated', 'error', 'error'])
+        product = TblProducts.objects.get(pk='P001')
+        self.assertEqual(product.minimum_threshold, 5)
+        self.assertEqual(product.product_name, 'صنف')
+
+    def test_bulk_writes_send_notifications(self):
+        assignee = User.objects.create_user(username='assignee', password='testpass123')
+        existing = Task.objects.create(
+            description='قديمة', assigned_to=assignee, created_by=self.user,
+            start_date=self.start, end_date=self.start + timedelta(days=1),
+        )
+        Notification.objects.all().delete()
+        response = self.post_tasks([
+            self.task_item(1, assigned_to=assignee.pk),
+            {'id': existing.id, 'status': 'completed'},
+            {'id': existing.id, 'priority': 'high'},
+        ])
+        self.assertEqual(response.data['failed'], 0)
+        self.assertEqual(
+            sorted(Notification.objects.values_list('user__username', 'title')),
+            [('assignee', 'تم تكليفك بمهمة جديدة'), ('importer', 'تم إكمال المهمة'),
+             ('importer', 'تم إنشاء مهمة جديدة')],
+        )
+
+        TblProducts.objects.create(product_id='P002', product_name='صنف', qte_in_stock=3)
+        Notification.objects.all().delete()
+        self.client.post('/api/v1/products/bulk-thresholds/', [
+            {'product_id': 'P002', 'minimum_threshold': '5'},
+        ], format='json')
+        notification = Notification.objects.get(user=self.user)
+        self.assertEqual((notification.notification_type, notification.priority), ('inventory', 'high'))
+
+
+class ConditionalGetTest(APITestCase):
+    """Test cases for ETags and cached responses of the read-only viewsets"""
+
+    def setUp(self):
+        cache.clear()
+        stats_cache.clear()
+        self.user = User.objects.create_user(username='poller', password='testpass123', is_staff=True)
+        self.client.force_authenticate(self.user)
+        self.category = TblCategories.objects.create(cat_id=1, cat_name='أدوات')
+
+    def get(self, url, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, **headers)
+        touched = any('tbl_categories' in query['sql'].lower() for query in queries)
+        return response, touched
+
+    def test_matching_etag_answers_304_without_querying(self):
+        response, touched = self.get('/api/v1/categories/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(touched)
+        etag = response['ETag']
+
+        response, touched = self.get('/api/v1/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(touched)
+
+        response, touched = self.get('/api/v1/categories/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['cat_name'], 'أدوات')
+        self.assertFalse(touched)
+
+    def test_writes_change_the_etag(self):
+        etag = self.client.get('/api/v1/categories/')['ETag']
+        product_etag = self.client.get('/api/v1/products/')['ETag']
+
+        self.category.cat_name = 'معدات'
+        self.category.save()
+
+        response = self.client.get('/api/v1/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['cat_name'], 'معدات')
+        self.assertNotEqual(response['ETag'], etag)
+        # الأصناف تعرض التصنيف لذلك يتغير وسمها أيضاً
+        self.assertNotEqual(self.client.get('/api/v1/products/')['ETag'], product_etag)
+
+    def test_lost_counters_never_reuse_an_etag(self):
+        stats_cache.clear()
+        etag = self.client.get('/api/v1/categories/')['ETag']
+        self.category.cat_name = 'معدات'
+        self.category.save()
+        stats_cache.clear()
+
+        response = self.client.get('/api/v1/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['cat_name'], 'معدات')
+
+    def test_etag_depends_on_query_and_user(self):
+        etag = self.client.get('/api/v1/categories/')['ETag']
+        self.assertNotEqual(self.client.get('/api/v1/categories/?page_size=5')['ETag'], etag)
+
+        other = User.objects.create_user(username='other', password='testpass123', is_staff=True)
+        self.client.force_authenticate(other)
+        response = self.client.get('/api/v1/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class StubGenerativeModel:
+    """نموذج محلي يعد الاستدعاءات (Local stand-in for ``genai.GenerativeModel``)"""
+
+    def __init__(self, delay=0):
+        self.calls = 0
+        self.delay = delay
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        return type('StubResponse', (), {'text': f'تحليل رقم {self.calls}'})()
+
+
+@skipUnless(GEMINI_AVAILABLE, 'google-generativeai is not installed')
+class AIResponseCacheTest(TestCase):
+    """Cached and coalesced Gemini responses"""
+
+    def setUp(self):
+        ai_cache.clear()
+        stats_cache.clear()
+        self.model = StubGenerativeModel()
+        self.service = self._service(self.model)
+
+    def _service(self, model):
+        service = GeminiService()
+        service.is_configured = True
+        service.model_name = 'stub'
+        service.model = model
+        return service
+
+    def test_repeated_prompt_is_answered_from_cache(self):
+        first = self.service.generate_response('حلل  المخزون\n', temperature=0.2, snapshot='1')
+        second = self.service.generate_response('حلل المخزون', temperature=0.2, snapshot='1')
+        self.assertEqual(self.model.calls, 1)
+        self.assertEqual(second['response'], first['response'])
+        self.assertTrue(second['cached'])
+        self.assertNotIn('cached', first)
+        self.assertEqual(response_cache_metrics()['hits'], 1)
+        self.assertEqual(response_cache_metrics()['misses'], 1)
+
+    def test_snapshot_temperature_and_opt_out_miss(self):
+        self.service.generate_response('حلل المخزون', snapshot='1')
+        self.service.generate_response('حلل المخزون', snapshot='2')
+        self.service.generate_response('حلل المخزون', temperature=0.1, snapshot='2')
+        self.service.generate_response('حلل المخزون')
+        self.assertEqual(self.model.calls, 4)
+
+    def test_failures_are_not_cached(self):
+        self.model.generate_content = lambda prompt, **kwargs: 1 / 0
+        self.assertFalse(self.service.generate_response('حلل', snapshot='1')['success'])
+        self.model = StubGenerativeModel()
+        self.service.model = self.model
+        self.assertTrue(self.service.generate_response('حلل', snapshot='1')['success'])
+        self.assertEqual(self.model.calls, 1)
+
+    def test_concurrent_identical_requests_call_the_model_once(self):
+        model = StubGenerativeModel(delay=0.2)
+        results = []
+
+        def ask():
+            service = self._service(model)
+            results.append(service.generate_response('حلل المخزون', snapshot='1'))
+
+        threads = [threading.Thread(target=ask) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(model.calls, 1)
+        self.assertEqual({result['response'] for result in results}, {'تحليل رقم 1'})
+        metrics = response_cache_metrics()
+        self.assertEqual(metrics['misses'], 1)
+        self.assertEqual(metrics['hits'] + metrics['coalesced'], 3)
+
+    def test_followers_of_a_failed_request_are_misses(self):
+        calls = []
+
+        def fail():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'success': False, 'error': 'boom'}
+
+        threads = [threading.Thread(target=cached_generate, args=('failed', fail)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        metrics = response_cache_metrics()
+        self.assertEqual((metrics['misses'], metrics['coalesced']), (3, 0))
+
+    def test_waiting_request_leaves_the_other_process_lock(self):
+        lock = LOCK_KEY.format(digest='held')
+        ai_cache.add(lock, 1, 60)
+        with mock.patch('api.ai_cache.LOCK_TIMEOUT', 0.3):
+            result = cached_generate('held', lambda: {'success': True, 'response': 'ok'})
+        self.assertEqual(result['response'], 'ok')
+        self.assertEqual(ai_cache.get(lock), 1)
+
+    def test_analysis_is_reused_until_products_change(self):
+        product = Product.objects.create(product_id='P1', name='ورق', quantity=1, minimum_threshold=5)
+        analysis = DataAnalysisService()
+        analysis.gemini_service = self.service
+        self.assertTrue(analysis.get_low_stock_items()['success'])
+        analysis.get_low_stock_items()
+        self.assertEqual(self.model.calls, 1)
+
+        product.quantity = 2
+        product.save()
+        analysis.get_low_stock_items()
+        self.assertEqual(self.model.calls, 2)
+
+
+@skipUnless(GEMINI_AVAILABLE, 'google-generativeai is not installed')
+class GeminiClientRegistryTest(TestCase):
+    """Configured clients are reused across requests"""
+
+    def setUp(self):
+        clear_registry()
+        stats_cache.clear()
+        self.user = User.objects.create_user(username='aiuser', password='testpass123')
+        self.config = AIConfiguration.objects.create(
+            user=self.user, provider=AIProvider.objects.get(name='gemini'),
+            api_key='user-key', model_name='gemini-1.5-pro',
+        )
+
+    def test_provider_is_created_by_migrate(self):
+        self.assertTrue(AIProvider.objects.filter(name='gemini', is_active=True).exists())
+
+    def test_service_reuses_configuration_and_client(self):
+        first = GeminiService(user=self.user)
+        with self.assertNumQueries(0):
+            second = GeminiService(user=self.user)
+        self.assertEqual(second.config_source, 'user_config')
+        self.assertEqual(second.model_name, 'gemini-1.5-pro')
+        self.assertIs(second.model, first.model)
+
+    def test_saving_configuration_invalidates_client(self):
+        first = GeminiService(user=self.user)
+        self.config.model_name = 'gemini-1.5-flash'
+        self.config.save()
+        second = GeminiService(user=self.user)
+        self.assertEqual(second.model_name, 'gemini-1.5-flash')
+        self.assertIsNot(second.model, first.model)
+
+        self.config.delete()
+        self.assertNotEqual(GeminiService(user=self.user).config_source, 'user_config')
+
+    def test_database_errors_fall_back_to_the_environment_key(self):
+        with mock.patch.dict(os.environ, {'GEMINI_API_KEY': 'env-key'}), \
+                mock.patch.object(AIConfiguration.objects, 'filter', side_effect=DatabaseError('down')):
+            config = resolve_config(self.user)
+        self.assertEqual((config.api_key, config.source), ('env-key', 'environment'))
+        self.assertEqual(resolve_config(self.user).source, 'user_config')
+
+    @skipUnless(GEMINI_AVAILABLE, 'google-generativeai is not installed')
+    def test_model_calls_its_own_client(self):
+        import google.generativeai as genai
+
+        class RecordingClient:
+            def generate_content(self, request):
+                self.request = request
+                return genai.protos.GenerateContentResponse(candidates=[{
+                    'content': {'role': 'model', 'parts': [{'text': 'مرحباً'}]}, 'finish_reason': 'STOP',
+                }])
+
+        client = RecordingClient()
+        service = GeminiService(user=self.user)
+        service.model = KeyedModel(service.model_name, client=client)
+        result = service.generate_response('سؤال', temperature=0.3, max_tokens=50)
+        self.assertEqual(result['response'], 'مرحباً')
+        self.assertEqual(client.request.model, 'models/gemini-1.5-pro')
+        self.assertEqual(client.request.contents[0].parts[0].text, 'سؤال')
+        self.assertEqual(client.request.generation_config.max_output_tokens, 50)
+        self.assertEqual(len(client.request.safety_settings), 4)
+
+
+class FakeStreamingModel:
+    """نموذج محلي يبث الرد على أجزاء (Local stand-in streaming a fixed answer)"""
+
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        return self._stream()
+
+    async def _stream(self):
+        for text in self.chunks:
+            yield type('StubChunk', (), {'text': text})()
+        if self.error:
+            raise self.error
+
+
+@skipUnless(GEMINI_AVAILABLE, 'google-generativeai is not installed')
+class ChatStreamTest(TestCase):
+    """Server-sent event chat endpoint"""
+
+    def setUp(self):
+        clear_registry()
+        stats_cache.clear()
+        throttle_cache.clear()
+        environ = mock.patch.dict(os.environ, {'GEMINI_API_KEY': 'test-key'})
+        environ.start()
+        self.addCleanup(environ.stop)
+        self.user = User.objects.create_superuser(username='streamer', password='testpass123')
+        self.client.force_login(self.user)
+        self.async_client.cookies = self.client.cookies
+        self.url = reverse('api:gemini_chat_stream')
+
+    async def _events(self, model, **data):
+        with mock.patch('api.services.get_async_model', return_value=model):
+            response = await self.async_client.post(
+                self.url, dict({'message': 'مرحبا'}, **data), content_type='application/json',
+            )
+            body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = []
+        for block in body.decode('utf-8').strip().split('\n\n'):
+            event, data = block.split('\n')
+            events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+        return events
+
+    async def test_tokens_are_streamed_and_saved_at_the_end(self):
+        events = await self._events(FakeStreamingModel(['أهلاً ', 'بك']))
+        self.assertEqual([name for name, _ in events], ['start', 'token', 'token', 'done'])
+        self.assertEqual(''.join(data['text'] for name, data in events if name == 'token'), 'أهلاً بك')
+
+        conversation = await GeminiConversation.objects.aget(id=events[0][1]['conversation_id'])
+        contents = [content async for content in conversation.messages.order_by('timestamp').values_list('content', flat=True)]
+        self.assertEqual(contents, ['مرحبا', 'أهلاً بك'])
+        self.assertEqual(throttle_cache.get('ai:streams:%s' % self.user.pk), 0)
+
+    async def test_failed_stream_saves_nothing(self):
+        events = await self._events(FakeStreamingModel(['أهلاً'], error=RuntimeError('quota exceeded')))
+        self.assertEqual([name for name, _ in events], ['start', 'token', 'error'])
+        self.assertFalse(await GeminiMessage.objects.aexists())
+        self.assertEqual(throttle_cache.get('ai:streams:%s' % self.user.pk), 0)
+
+    @override_settings(AI_STREAM_MAX_PER_USER=1)
+    async def test_concurrent_streams_are_limited_per_user(self):
+        self.assertTrue(await acquire_stream_slot(self.user.pk))
+        response = await self.async_client.post(self.url, {'message': 'مرحبا'}, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+
+    async def test_each_acquire_extends_the_slot_timeout(self):
+        key = 'ai:streams:%s' % self.user.pk
+        with mock.patch.object(throttle_cache, 'atouch', wraps=throttle_cache.atouch) as touch:
+            self.assertTrue(await acquire_stream_slot(self.user.pk))
+            self.assertTrue(await acquire_stream_slot(self.user.pk))
+        self.assertEqual(touch.await_args_list, [mock.call(key, STREAM_SLOT_TIMEOUT)] * 2)
+
+    async def test_stream_is_throttled_and_logged(self):
+        with mock.patch.dict(SlidingWindowUserRateThrottle.THROTTLE_RATES, {'user': '1/min'}):
+            events = await self._events(FakeStreamingModel(['أهلاً']))
+            response = await self.async_client.post(self.url, {'message': 'مرحبا'}, content_type='application/json')
+        self.assertEqual(events[-1][0], 'done')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        statuses = [code async for code in APIUsageLog.objects.filter(endpoint=self.url).values_list('status_code', flat=True)]
+        self.assertEqual(sorted(statuses), [200, 429])
+
+    async def test_requires_authentication(self):
+        self.async_client.cookies.clear()
+        response = await self.async_client.post(self.url, {'message': 'مرحبا'}, content_type='application/json')
+        self.assertIn(response.status_code, (401, 403))
+
+
+class SlidingWindowThrottleTest(TestCase):
+    """Test cases for the shared sliding-window throttle"""
+
+    def setUp(self):
+        throttle_cache.clear()
+        self.request = RequestFactory().get('/api/v1/status/')
+        self.request.user = User.objects.create_user(username='throttled', password='testpass123')
+        self.now = 1000 * 60.0
+
+    def allow(self):
+        throttle = SlidingWindowUserRateThrottle()
+        throttle.rate, throttle.num_requests, throttle.duration = '3/min', 3, 60
+        throttle.timer = lambda: self.now
+        return throttle, throttle.allow_request(self.request, None)
+
+    def test_previous_window_is_weighted(self):
+        self.assertEqual([self.allow()[1] for _ in range(4)], [True, True, True, False])
+
+        # منتصف النافذة التالية: 3 × 0.5 + 1 = 2.5 طلب
+        self.now += 90
+        self.assertTrue(self.allow()[1])
+        throttle, allowed = self.allow()
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(throttle.wait(), 10)
+
+        self.now += 10
+        self.assertTrue(self.allow()[1])
+
+
 class GeminiAITest(APITestCase):
     """Test cases for Gemini AI functionality"""
 
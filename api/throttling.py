@@ -0,0 +1,84 @@
+"""
+تحديد معدل الطلبات بنافذة منزلقة
+(Sliding-window rate throttles backed by the shared ``throttle`` cache)
+
+DRF's stock throttles keep a list of request timestamps per client and
+rewrite it on every request (read, modify, write), so concurrent requests
+can overwrite each other's entries. These throttles use the sliding-window
+counter approximation instead: one integer counter per client and window,
+advanced with the cache's atomic ``add`` / ``incr``. The count of the
+previous window is weighted by how much of it still overlaps the sliding
+window:
+
+    estimate = previous * (1 - elapsed / duration) + current
+
+Rejected requests are not counted. The counters live in the ``throttle``
+cache alias, which is shared by every worker process.
+"""
+from rest_framework.throttling import AnonRateThrottle, SimpleRateThrottle, UserRateThrottle
+
+from core.cache import throttle_cache
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """
+    أساس التحديد بنافذة منزلقة
+    (Base class; subclasses provide ``scope`` and ``get_cache_key``)
+    """
+    cache = throttle_cache
+
+    def _window_keys(self):
+        window = int(self.now // self.duration)
+        return f'{self.key}:{window}', f'{self.key}:{window - 1}'
+
+    def _increment(self, key):
+        # المفتاح ينتهي بعد نافذتين لأنه يستخدم كنافذة سابقة أيضاً
+        timeout = self.duration * 2
+        if self.cache.add(key, 1, timeout):
+            return 1
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # انتهت صلاحية المفتاح بين الاستدعاءين
+            self.cache.add(key, 1, timeout)
+            return 1
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        current_key, previous_key = self._window_keys()
+        # الجزء المتبقي من النافذة السابقة داخل النافذة المنزلقة بالثواني
+        self.overlap = self.duration - self.now % self.duration
+        self.previous = self.cache.get(previous_key, 0)
+        self.current = self._increment(current_key)
+        if self.previous * self.overlap <= (self.num_requests - self.current) * self.duration:
+            return True
+
+        try:
+            self.cache.decr(current_key)
+        except ValueError:
+            pass
+        self.current -= 1
+        return False
+
+    def wait(self):
+        """الثواني حتى يسمح بالطلب التالي (Seconds until the next request fits the window)"""
+        if self.current >= self.num_requests or not self.previous:
+            # لا بد من انتظار النافذة التالية
+            return self.overlap
+        # الوقت حتى يقل وزن النافذة السابقة بما يكفي لطلب واحد
+        fits_overlap = (self.num_requests - self.current - 1) * self.duration / self.previous
+        return max(self.overlap - fits_overlap, 0)
+
+
+class SlidingWindowAnonRateThrottle(SlidingWindowRateThrottle, AnonRateThrottle):
+    scope = 'anon'
+
+
+class SlidingWindowUserRateThrottle(SlidingWindowRateThrottle, UserRateThrottle):
+    scope = 'user'
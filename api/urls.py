@@ -12,6 +12,7 @@ from rest_framework import permissions
 from . import views
 from . import web_views
 from . import debug_view
+from . import streaming
 
 # API Documentation Schema
 schema_view = get_schema_view(
@@ -101,8 +102,12 @@ urlpatterns = [
 
     # Gemini AI Endpoints
     path('ai/chat/', views.gemini_chat, name='gemini_chat'),
+    path('ai/chat/stream/', streaming.gemini_chat_stream, name='gemini_chat_stream'),
     path('ai/analyze/', views.gemini_analyze_data, name='gemini_analyze'),
 
+    # Bulk write endpoints
+    path('payroll-transactions/bulk/', views.PayrollTransactionBulkView.as_view(), name='payroll_transaction_bulk'),
+
     # ViewSet URLs
     path('', include(router.urls)),
 ]
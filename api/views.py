@@ -3,12 +3,10 @@ import logging
 from django.shortcuts import render
 from django.contrib.auth import get_user_model
 from django.db.models import Q
-from rest_framework import viewsets, status, permissions
+from rest_framework import generics, viewsets, status, permissions
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
@@ -19,11 +17,19 @@ from .serializers import (
     DepartmentSerializer, ProductSerializer, CategorySerializer,
     TaskSerializer, MeetingSerializer, GeminiChatRequestSerializer,
     GeminiChatResponseSerializer, GeminiAnalysisRequestSerializer,
-    GeminiAnalysisResponseSerializer
+    GeminiAnalysisResponseSerializer, TaskBulkSerializer, ProductThresholdSerializer,
+    PayrollTransactionBulkSerializer
 )
+from .ai_cache import response_cache_metrics
 from .services import GeminiService, DataAnalysisService
 from .authentication import APIKeyAuthentication
+from .bulk import BulkWriteMixin
+from .caching import ConditionalGetMixin
+from .fieldsets import SparseFieldsetViewMixin
+from .pagination import StandardResultsSetPagination
 from .permissions import HasAPIAccess
+from .sync import DeltaSyncMixin
+from .throttling import SlidingWindowUserRateThrottle
 
 # Import models from other apps
 from hr_stubs.models import Employee
@@ -36,13 +42,6 @@ User = get_user_model()
 logger = logging.getLogger(__name__)
 
 
-class StandardResultsSetPagination(PageNumberPagination):
-    """Standard pagination for API responses"""
-    page_size = 20
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
-
 class APIUsageLogMixin:
     """Mixin to log API usage"""
 
@@ -119,12 +118,14 @@ class UserViewSet(APIUsageLogMixin, viewsets.ReadOnlyModelViewSet):
 
 
 # HR Views
-class EmployeeViewSet(APIUsageLogMixin, viewsets.ReadOnlyModelViewSet):
+class EmployeeViewSet(APIUsageLogMixin, DeltaSyncMixin, SparseFieldsetViewMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for employee data"""
     serializer_class = EmployeeSerializer
     permission_classes = [IsAuthenticated, HasAPIAccess]
     pagination_class = StandardResultsSetPagination
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [SlidingWindowUserRateThrottle]
+    cache_models = [Employee, Department]
+    cursor_ordering = 'emp_code'
 
     def get_queryset(self):
         """Return employees with optional filtering"""
@@ -151,22 +152,24 @@ class EmployeeViewSet(APIUsageLogMixin, viewsets.ReadOnlyModelViewSet):
         return queryset.select_related('department')
 
 
-class DepartmentViewSet(APIUsageLogMixin, viewsets.ReadOnlyModelViewSet):
+class DepartmentViewSet(APIUsageLogMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for department data"""
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
     permission_classes = [IsAuthenticated, HasAPIAccess]
     pagination_class = StandardResultsSetPagination
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [SlidingWindowUserRateThrottle]
 
 
 # Inventory Views
-class ProductViewSet(APIUsageLogMixin, viewsets.ReadOnlyModelViewSet):
+class ProductViewSet(APIUsageLogMixin, DeltaSyncMixin, BulkWriteMixin, SparseFieldsetViewMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for product data"""
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated, HasAPIAccess]
     pagination_class = StandardResultsSetPagination
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [SlidingWindowUserRateThrottle]
+    cache_models = [TblProducts, TblCategories]
+    cursor_ordering = 'product_id'
 
     def get_queryset(self):
         """Return products with optional filtering"""
@@ -190,23 +193,30 @@ class ProductViewSet(APIUsageLogMixin, viewsets.ReadOnlyModelViewSet):
 
         return queryset.select_related('cat')
 
+    @action(detail=False, methods=['post'], url_path='bulk-thresholds')
+    def bulk_thresholds(self, request):
+        """تحديث حدود المخزون لعدة أصناف (Update stock thresholds of many products)"""
+        return self.bulk_response(request, ProductThresholdSerializer, lookup_field='product_id', allow_create=False)
+
 
-class CategoryViewSet(APIUsageLogMixin, viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(APIUsageLogMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for category data"""
     queryset = TblCategories.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated, HasAPIAccess]
     pagination_class = StandardResultsSetPagination
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [SlidingWindowUserRateThrottle]
 
 
 # Task Management Views
-class TaskViewSet(APIUsageLogMixin, viewsets.ReadOnlyModelViewSet):
+class TaskViewSet(APIUsageLogMixin, DeltaSyncMixin, BulkWriteMixin, SparseFieldsetViewMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for task data"""
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated, HasAPIAccess]
     pagination_class = StandardResultsSetPagination
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [SlidingWindowUserRateThrottle]
+    cache_models = [Task, User]
+    cursor_ordering = '-created_at'
 
     def get_queryset(self):
         """Return tasks with optional filtering"""
@@ -229,14 +239,23 @@ class TaskViewSet(APIUsageLogMixin, viewsets.ReadOnlyModelViewSet):
 
         return queryset.select_related('assigned_to', 'created_by')
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """إنشاء أو تحديث عدة مهام (Create tasks, or update those that carry an ``id``)"""
+        return self.bulk_response(
+            request, TaskBulkSerializer, lookup_field='id', create_kwargs={'created_by': request.user},
+        )
+
 
 # Meeting Management Views
-class MeetingViewSet(APIUsageLogMixin, viewsets.ReadOnlyModelViewSet):
+class MeetingViewSet(APIUsageLogMixin, DeltaSyncMixin, SparseFieldsetViewMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for meeting data"""
     serializer_class = MeetingSerializer
     permission_classes = [IsAuthenticated, HasAPIAccess]
     pagination_class = StandardResultsSetPagination
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [SlidingWindowUserRateThrottle]
+    cache_models = [Meeting, User]
+    cursor_ordering = '-date'
 
     def get_queryset(self):
         """Return meetings with optional filtering"""
@@ -245,14 +264,28 @@ class MeetingViewSet(APIUsageLogMixin, viewsets.ReadOnlyModelViewSet):
         # Filter by organizer
         organizer = self.request.query_params.get('organizer', None)
         if organizer:
-            queryset = queryset.filter(organizer__username=organizer)
+            queryset = queryset.filter(created_by__username=organizer)
 
         # Filter by status
         status_filter = self.request.query_params.get('status', None)
         if status_filter:
             queryset = queryset.filter(status=status_filter)
 
-        return queryset.select_related('organizer')
+        return queryset.select_related('created_by')
+
+
+# Payroll Views
+class PayrollTransactionBulkView(APIUsageLogMixin, BulkWriteMixin, generics.GenericAPIView):
+    """Bulk import of manual payroll transactions"""
+    serializer_class = PayrollTransactionBulkSerializer
+    permission_classes = [IsAuthenticated, HasAPIAccess]
+    throttle_classes = [SlidingWindowUserRateThrottle]
+
+    def post(self, request):
+        """استيراد معاملات الرواتب دفعة واحدة (Create many payroll transactions)"""
+        return self.bulk_response(
+            request, PayrollTransactionBulkSerializer, create_kwargs={'created_by': request.user},
+        )
 
 
 # Gemini AI Views
@@ -261,7 +294,7 @@ class GeminiConversationViewSet(APIUsageLogMixin, viewsets.ModelViewSet):
     serializer_class = GeminiConversationSerializer
     permission_classes = [IsAuthenticated, HasAPIAccess]
     pagination_class = StandardResultsSetPagination
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [SlidingWindowUserRateThrottle]
 
     def get_queryset(self):
         """Return conversations for the current user"""
@@ -369,6 +402,7 @@ def api_status(request):
             'gemini_ai': gemini_service.is_available(),
             'database': True,  # If we reach here, DB is working
         },
+        'ai_cache': response_cache_metrics(),
         'user': {
             'username': request.user.username,
             'is_authenticated': request.user.is_authenticated,
@@ -0,0 +1,251 @@
+"""
+برامج تشغيل أجهزة الحضور
+(Attendance device drivers)
+
+Every driver implements ``BaseDeviceDriver``: ``ping()`` and
+``fetch_records(since)``, the latter returning punch dicts in the format
+accepted by ``ingestion.ingest_punches``.
+
+``SimulatorDriver`` talks to ``DeviceSimulator``, a TCP stand-in that serves
+any number of fake devices (one port each) so the whole sync pipeline can
+be load-tested locally. Set ``ATTENDANCE_DEVICE_DRIVER = 'simulator'`` to
+route every device through it.
+"""
+import asyncio
+import json
+import random
+import socket
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+try:
+    from zk import ZK
+    PYZK_AVAILABLE = True
+except ImportError:
+    PYZK_AVAILABLE = False
+    ZK = None
+
+DEFAULT_TIMEOUT = 10
+
+
+class DeviceError(Exception):
+    """تعذر الاتصال بالجهاز أو قراءة سجلاته (Device unreachable or unreadable)"""
+
+
+class BaseDeviceDriver:
+    """
+    الواجهة المشتركة لبرامج تشغيل الأجهزة
+    (Protocol every device driver implements)
+    """
+
+    def __init__(self, device, timeout=DEFAULT_TIMEOUT):
+        self.device = device
+        self.timeout = timeout
+
+    def ping(self):
+        """التحقق من أن الجهاز متصل (Return True when the device answers)"""
+        raise NotImplementedError
+
+    def fetch_records(self, since=None):
+        """
+        السجلات الجديدة منذ العلامة المائية
+        (Punches recorded at or after ``since``; everything when ``since`` is None)
+        """
+        raise NotImplementedError
+
+
+class ZKTecoDriver(BaseDeviceDriver):
+    """أجهزة ZKTeco عبر مكتبة pyzk (ZKTeco devices through pyzk)"""
+
+    def _connect(self):
+        if not PYZK_AVAILABLE:
+            raise DeviceError('pyzk is not installed')
+        try:
+            return ZK(self.device.ip_address, port=self.device.port, timeout=self.timeout).connect()
+        except Exception as exc:
+            raise DeviceError(str(exc)) from exc
+
+    def ping(self):
+        try:
+            self._connect().disconnect()
+        except DeviceError:
+            return False
+        return True
+
+    def fetch_records(self, since=None):
+        conn = self._connect()
+        try:
+            attendances = conn.get_attendance()
+        except Exception as exc:
+            raise DeviceError(str(exc)) from exc
+        finally:
+            conn.disconnect()
+
+        since = timezone.make_naive(since) if since and timezone.is_aware(since) else since
+        punch_types = {0: 'check_in', 1: 'check_out', 2: 'break_out', 3: 'break_in',
+                       4: 'overtime_in', 5: 'overtime_out'}
+        return [
+            {
+                'device_user_id': str(record.user_id),
+                'punch_time': record.timestamp.isoformat(),
+                'punch_type': punch_types.get(record.punch, 'check_in'),
+                'verification_method': 'fingerprint',
+                'device_record_id': f'{record.user_id}-{record.timestamp:%Y%m%d%H%M%S}',
+            }
+            for record in attendances
+            if since is None or record.timestamp >= since
+        ]
+
+
+class SimulatorDriver(BaseDeviceDriver):
+    """
+    جهاز محاكى عبر TCP (JSON سطر بسطر)
+    (Line-delimited JSON over TCP to ``DeviceSimulator``)
+    """
+
+    def _request(self, payload):
+        try:
+            with socket.create_connection((self.device.ip_address, self.device.port), timeout=self.timeout) as sock:
+                sock.sendall(json.dumps(payload).encode() + b'\n')
+                with sock.makefile('rb') as stream:
+                    line = stream.readline()
+        except OSError as exc:
+            raise DeviceError(str(exc)) from exc
+        if not line:
+            raise DeviceError('empty response')
+        return json.loads(line)
+
+    def ping(self):
+        try:
+            return self._request({'command': 'ping'}).get('ok', False)
+        except DeviceError:
+            return False
+
+    def fetch_records(self, since=None):
+        response = self._request({
+            'command': 'get_attendance',
+            'since': since.isoformat() if since else None,
+        })
+        return response['records']
+
+
+DRIVERS = {
+    'zk_teco': ZKTecoDriver,
+    'simulator': SimulatorDriver,
+}
+
+
+def get_driver(device, timeout=DEFAULT_TIMEOUT):
+    """برنامج التشغيل المناسب لنوع الجهاز (Driver for a device, honouring the settings override)"""
+    name = getattr(settings, 'ATTENDANCE_DEVICE_DRIVER', None) or device.device_type
+    driver_class = DRIVERS.get(name)
+    if driver_class is None:
+        raise DeviceError(f'no driver for device type {name!r}')
+    return driver_class(device, timeout=timeout)
+
+
+# --------------------------------------------------------------------------
+# Simulator
+# --------------------------------------------------------------------------
+
+class SimulatedDevice:
+    """سجل بصمات جهاز واحد محاكى (Punch log of one simulated device)"""
+
+    def __init__(self, port, user_ids, backlog_days=1, seed=0):
+        self.port = port
+        self.user_ids = list(user_ids)
+        self.random = random.Random(seed)
+        self.records = []
+        self._sequence = 0
+        today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        for offset in range(backlog_days, 0, -1):
+            self._generate_day(today - timedelta(days=offset))
+
+    def _add(self, user_id, punch_time, punch_type):
+        self._sequence += 1
+        self.records.append({
+            'device_user_id': user_id,
+            'punch_time': punch_time.isoformat(),
+            'punch_type': punch_type,
+            'verification_method': 'fingerprint',
+            'device_record_id': f'SIM-{self._sequence}',
+        })
+
+    def _generate_day(self, day_start):
+        for user_id in self.user_ids:
+            check_in = day_start + timedelta(hours=7, minutes=self.random.randint(30, 90))
+            check_out = day_start + timedelta(hours=15, minutes=self.random.randint(30, 90))
+            self._add(user_id, check_in, 'check_in')
+            self._add(user_id, check_out, 'check_out')
+
+    def tick(self, now=None):
+        """إضافة بصمة جديدة لمستخدم عشوائي (Append one live punch)"""
+        if self.user_ids:
+            now = now or timezone.localtime()
+            self._add(self.random.choice(self.user_ids), now, self.random.choice(['check_in', 'check_out']))
+
+    def records_since(self, since):
+        if not since:
+            return list(self.records)
+        since = parse_datetime(since)
+        return [r for r in self.records if datetime.fromisoformat(r['punch_time']) >= since]
+
+
+class DeviceSimulator:
+    """
+    خادم TCP يحاكي عدداً من الأجهزة، منفذ لكل جهاز
+    (asyncio TCP server simulating many devices, one port each)
+    """
+
+    def __init__(self, host='127.0.0.1', ports=(), user_ids=(), backlog_days=1,
+                 tick_seconds=None, seed=0):
+        self.host = host
+        self.devices = [
+            SimulatedDevice(port, user_ids, backlog_days, seed + index)
+            for index, port in enumerate(ports)
+        ]
+        self.tick_seconds = tick_seconds
+        self.servers = []
+
+    async def _handle(self, device, reader, writer):
+        try:
+            line = await reader.readline()
+            request = json.loads(line or b'{}')
+            if request.get('command') == 'get_attendance':
+                response = {'records': device.records_since(request.get('since'))}
+            else:
+                response = {'ok': True, 'port': device.port}
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self):
+        for device in self.devices:
+            server = await asyncio.start_server(
+                lambda r, w, device=device: self._handle(device, r, w), self.host, device.port,
+            )
+            # المنفذ 0 يعني منفذاً يختاره النظام (للاختبارات)
+            device.port = server.sockets[0].getsockname()[1]
+            self.servers.append(server)
+        return [device.port for device in self.devices]
+
+    async def _ticker(self):
+        while True:
+            await asyncio.sleep(self.tick_seconds)
+            for device in self.devices:
+                device.tick()
+
+    async def serve_forever(self):
+        await self.start()
+        if self.tick_seconds:
+            asyncio.ensure_future(self._ticker())
+        await asyncio.gather(*(server.serve_forever() for server in self.servers))
+
+    async def stop(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
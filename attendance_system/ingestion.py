@@ -0,0 +1,380 @@
+"""
+استيراد سجلات البصمة على دفعات
+(Bulk punch ingestion for AttendanceRecord)
+
+A batch of punches (CSV, JSON or a ZKTeco ``attlog`` dump) is parsed,
+validated and inserted with ``bulk_create(ignore_conflicts=True)`` on the
+``(device, device_record_id)`` unique key. Per-record signals are suppressed
+for the batch; afterwards every affected (employee, date) pair is recomputed
+exactly once and the affected monthly summaries are refreshed once each.
+"""
+import csv
+import io
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from employee_management.models import Employee
+
+from .models import AttendanceDevice, AttendanceRecord, DailyAttendance
+from .rules import get_rule_index
+from .signals import calculate_daily_attendance_metrics, suppress_attendance_signals
+from .summaries import refresh_summaries
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+
+# حد آمن لعدد المعاملات في استعلام IN على SQL Server (2100 معامل كحد أقصى)
+IN_CHUNK_SIZE = 1000
+
+SOURCE_FORMATS = ('csv', 'json', 'attlog')
+
+PUNCH_TYPES = {value for value, _ in AttendanceRecord.PUNCH_TYPES}
+VERIFICATION_METHODS = {value for value, _ in AttendanceRecord.VERIFICATION_METHODS}
+
+# رموز حالة البصمة في أجهزة ZKTeco (ZKTeco attlog status codes)
+ZK_PUNCH_CODES = {
+    '0': 'check_in',
+    '1': 'check_out',
+    '2': 'break_out',
+    '3': 'break_in',
+    '4': 'overtime_in',
+    '5': 'overtime_out',
+}
+
+# رموز طريقة التحقق في أجهزة ZKTeco (ZKTeco attlog verify codes)
+ZK_VERIFY_CODES = {
+    '0': 'password',
+    '1': 'fingerprint',
+    '2': 'card',
+    '4': 'card',
+    '15': 'face',
+}
+
+
+class PunchImportError(ValueError):
+    """خطأ في ملف البصمات المستورد (Unreadable punch batch)"""
+
+
+def _chunks(items, size=IN_CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# --------------------------------------------------------------------------
+# Parsing
+# --------------------------------------------------------------------------
+
+def parse_csv(text):
+    """قراءة ملف CSV بعناوين أعمدة (CSV with a header row)"""
+    return [dict(row) for row in csv.DictReader(io.StringIO(text))]
+
+
+def parse_json(text):
+    """قائمة JSON أو كائن يحتوي على ``punches`` (JSON list or ``{"punches": [...]}``)"""
+    try:
+        data = json.loads(text)
+    except ValueError as exc:
+        raise PunchImportError(f'invalid JSON: {exc}') from exc
+    if isinstance(data, dict):
+        data = data.get('punches')
+    if not isinstance(data, list):
+        raise PunchImportError('JSON payload must be a list of punches')
+    return data
+
+
+def parse_attlog(text):
+    """
+    قراءة ملف attlog المصدّر من أجهزة ZKTeco
+    (ZKTeco attlog dump: ``user_id<TAB>YYYY-MM-DD HH:MM:SS<TAB>verify<TAB>status ...``)
+    """
+    rows = []
+    for line in text.splitlines():
+        parts = line.split('\t') if '\t' in line else line.split()
+        parts = [part.strip() for part in parts if part.strip()]
+        if len(parts) < 2:
+            continue
+        # بعض الأجهزة تفصل التاريخ والوقت بمسافة داخل الحقل نفسه
+        if len(parts) >= 3 and ':' in parts[2] and ':' not in parts[1]:
+            parts = [parts[0], f'{parts[1]} {parts[2]}'] + parts[3:]
+        user_id, punch_time = parts[0], parts[1]
+        verify = parts[2] if len(parts) > 2 else '1'
+        status = parts[3] if len(parts) > 3 else '0'
+        rows.append({
+            'device_user_id': user_id,
+            'punch_time': punch_time,
+            'punch_type': ZK_PUNCH_CODES.get(status, 'check_in'),
+            'verification_method': ZK_VERIFY_CODES.get(verify, 'fingerprint'),
+        })
+    return rows
+
+
+def parse_punches(content, source_format):
+    """تحويل محتوى الملف إلى قائمة قواميس (Decode raw content into punch dicts)"""
+    if isinstance(content, bytes):
+        try:
+            content = content.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise PunchImportError('file is not UTF-8 encoded')
+    parsers = {'csv': parse_csv, 'json': parse_json, 'attlog': parse_attlog}
+    if source_format not in parsers:
+        raise PunchImportError(f'unsupported format: {source_format}')
+    return parsers[source_format](content)
+
+
+# --------------------------------------------------------------------------
+# Validation
+# --------------------------------------------------------------------------
+
+def _parse_punch_time(value):
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = parse_datetime(str(value or '').strip().replace('/', '-'))
+    if parsed is None:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def build_records(rows, device=None):
+    """
+    التحقق من الصفوف وبناء كائنات AttendanceRecord غير المحفوظة
+    (Validate rows and build unsaved records, resolving devices and employees in bulk)
+
+    Returns ``(records, errors)`` where ``errors`` is a list of
+    ``{'row': index, 'error': message}``.
+    """
+    errors = []
+
+    rows = list(rows)
+    objects = [row for row in rows if isinstance(row, dict)]
+    device_ids = {str(row.get('device') or row.get('device_id') or '').strip() for row in objects}
+    device_ids.discard('')
+    devices = {str(pk): pk for pk in AttendanceDevice.objects.filter(
+        pk__in=[pk for pk in device_ids if pk.isdigit()]
+    ).values_list('pk', flat=True)}
+
+    employee_codes = set()
+    for row in objects:
+        code = str(row.get('employee_id') or row.get('device_user_id') or '').strip()
+        if code:
+            employee_codes.add(code)
+    employees = {}
+    for chunk in _chunks(employee_codes):
+        employees.update(Employee.objects.filter(employee_id__in=chunk).values_list('employee_id', 'pk'))
+
+    records = []
+    seen = set()
+    for index, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({'row': index, 'error': 'row must be an object'})
+            continue
+        device_id = device.pk if device else devices.get(str(row.get('device') or row.get('device_id') or '').strip())
+        if device_id is None:
+            errors.append({'row': index, 'error': 'unknown device'})
+            continue
+
+        device_user_id = str(row.get('device_user_id') or row.get('employee_id') or '').strip()
+        employee_code = str(row.get('employee_id') or device_user_id).strip()
+        employee_id = employees.get(employee_code)
+        if employee_id is None:
+            errors.append({'row': index, 'error': f'unknown employee {employee_code!r}'})
+            continue
+
+        punch_time = _parse_punch_time(row.get('punch_time'))
+        if punch_time is None:
+            errors.append({'row': index, 'error': 'invalid punch_time'})
+            continue
+
+        punch_type = str(row.get('punch_type') or '').strip()
+        if punch_type not in PUNCH_TYPES:
+            errors.append({'row': index, 'error': f'invalid punch_type {punch_type!r}'})
+            continue
+
+        verification_method = str(row.get('verification_method') or 'fingerprint').strip()
+        if verification_method not in VERIFICATION_METHODS:
+            verification_method = 'fingerprint'
+
+        # معرف السجل في الجهاز هو مفتاح عدم التكرار، لذلك نشتقه إذا لم يرسله الجهاز
+        device_record_id = str(row.get('device_record_id') or '').strip()
+        if not device_record_id:
+            device_record_id = f'{device_user_id}-{punch_time:%Y%m%d%H%M%S}'
+
+        key = (device_id, device_record_id)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        records.append(AttendanceRecord(
+            employee_id=employee_id,
+            device_id=device_id,
+            punch_time=punch_time,
+            punch_type=punch_type,
+            verification_method=verification_method,
+            device_user_id=device_user_id[:20],
+            device_record_id=device_record_id[:50],
+        ))
+    return records, errors
+
+
+def _drop_existing(records):
+    """استبعاد السجلات الموجودة مسبقاً (Skip records whose unique key is already stored)"""
+    by_device = defaultdict(list)
+    for record in records:
+        by_device[record.device_id].append(record.device_record_id)
+
+    existing = set()
+    for device_id, record_ids in by_device.items():
+        for chunk in _chunks(record_ids):
+            existing.update(
+                (device_id, record_id) for record_id in AttendanceRecord.objects.filter(
+                    device_id=device_id, device_record_id__in=chunk
+                ).values_list('device_record_id', flat=True)
+            )
+    return [r for r in records if (r.device_id, r.device_record_id) not in existing]
+
+
+# --------------------------------------------------------------------------
+# Recomputation
+# --------------------------------------------------------------------------
+
+def _apply_punch(daily, punch_type, punch_time):
+    """نفس قواعد update_daily_attendance دون الحفظ (Same merge rules as the signal)"""
+    if punch_type == 'check_in':
+        if not daily.check_in_time or punch_time < daily.check_in_time:
+            daily.check_in_time = punch_time
+    elif punch_type == 'check_out':
+        if not daily.check_out_time or punch_time > daily.check_out_time:
+            daily.check_out_time = punch_time
+    elif punch_type == 'break_out':
+        daily.break_out_time = punch_time
+    elif punch_type == 'break_in':
+        daily.break_in_time = punch_time
+
+
+def recompute_pending_punches(employee_ids, start, end):
+    """
+    معالجة السجلات غير المعالجة لكل (موظف، يوم) مرة واحدة
+    (Fold unprocessed punches into DailyAttendance once per employee/day)
+
+    Returns the number of daily rows written.
+    """
+    punches = []
+    for chunk in _chunks(employee_ids):
+        punches.extend(
+            AttendanceRecord.objects.filter(
+                employee_id__in=chunk,
+                punch_time__gte=start,
+                punch_time__lte=end,
+                is_processed=False,
+                is_valid=True,
+            ).order_by('punch_time').values_list('pk', 'employee_id', 'punch_time', 'punch_type')
+        )
+    if not punches:
+        return 0
+
+    grouped = defaultdict(list)
+    for pk, employee_id, punch_time, punch_type in punches:
+        local = timezone.localtime(punch_time)
+        grouped[(employee_id, local.date())].append((punch_type, local.time()))
+
+    employees = Employee.objects.only('department_id', 'job_title_id').in_bulk(
+        {employee_id for employee_id, _ in grouped}
+    )
+    dates = {day for _, day in grouped}
+
+    existing = {}
+    for chunk in _chunks({employee_id for employee_id, _ in grouped}):
+        for daily in DailyAttendance.objects.filter(employee_id__in=chunk, attendance_date__in=dates):
+            existing[(daily.employee_id, daily.attendance_date)] = daily
+
+    rules = get_rule_index()
+    to_create, to_update = [], []
+    for (employee_id, day), day_punches in grouped.items():
+        daily = existing.get((employee_id, day))
+        if daily is None:
+            daily = DailyAttendance(
+                employee_id=employee_id, attendance_date=day,
+                status='incomplete', is_processed=False,
+            )
+            to_create.append(daily)
+        else:
+            to_update.append(daily)
+        daily.employee = employees[employee_id]
+        for punch_type, punch_time in day_punches:
+            _apply_punch(daily, punch_type, punch_time)
+        calculate_daily_attendance_metrics(daily, rules=rules)
+
+    now = timezone.now()
+    for daily in to_update:
+        daily.updated_at = now
+    DailyAttendance.objects.bulk_create(to_create, batch_size=DEFAULT_BATCH_SIZE)
+    DailyAttendance.objects.bulk_update(
+        to_update,
+        [
+            'check_in_time', 'check_out_time', 'break_out_time', 'break_in_time',
+            'total_work_hours', 'break_duration_minutes', 'overtime_hours',
+            'late_minutes', 'early_departure_minutes', 'status', 'attendance_rule', 'updated_at',
+        ],
+        batch_size=DEFAULT_BATCH_SIZE,
+    )
+
+    for chunk in _chunks([pk for pk, _, _, _ in punches]):
+        AttendanceRecord.objects.filter(pk__in=chunk).update(is_processed=True)
+
+    refresh_summaries(
+        {(d.employee_id, d.attendance_date.year, d.attendance_date.month) for d in to_update if d.is_processed}
+    )
+    return len(to_create) + len(to_update)
+
+
+# --------------------------------------------------------------------------
+# Entry point
+# --------------------------------------------------------------------------
+
+def ingest_punches(rows, device=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    استيراد دفعة من البصمات وإعادة حساب الحضور المتأثر
+    (Insert a batch of punches and recompute the affected attendance once)
+
+    Returns a dict with ``received``, ``inserted``, ``duplicates``,
+    ``days_recomputed`` and ``errors``.
+    """
+    records, errors = build_records(rows, device=device)
+    records = _drop_existing(records)
+
+    result = {
+        'received': len(rows),
+        'inserted': len(records),
+        'duplicates': len(rows) - len(errors) - len(records),
+        'days_recomputed': 0,
+        'errors': errors,
+    }
+    if not records:
+        return result
+
+    with transaction.atomic(), suppress_attendance_signals():
+        AttendanceRecord.objects.bulk_create(records, batch_size=batch_size, ignore_conflicts=True)
+        punch_times = [record.punch_time for record in records]
+        # هامش يوم لضمان شمول الأيام المحلية عند اختلاف المنطقة الزمنية
+        result['days_recomputed'] = recompute_pending_punches(
+            {record.employee_id for record in records},
+            min(punch_times) - timedelta(days=1),
+            max(punch_times) + timedelta(days=1),
+        )
+
+    logger.info(
+        'Punch import: received=%(received)s inserted=%(inserted)s duplicates=%(duplicates)s '
+        'days=%(days_recomputed)s',
+        {**result, 'errors': len(errors)},
+    )
+    return result
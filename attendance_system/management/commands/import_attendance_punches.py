@@ -0,0 +1,49 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance_system.ingestion import (
+    DEFAULT_BATCH_SIZE, SOURCE_FORMATS, PunchImportError, ingest_punches, parse_punches,
+)
+from attendance_system.models import AttendanceDevice
+
+
+class Command(BaseCommand):
+    help = 'استيراد دفعة من سجلات البصمة من ملف CSV أو JSON أو attlog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='مسار ملف البصمات')
+        parser.add_argument('--format', choices=SOURCE_FORMATS,
+                            help='صيغة الملف (تستنتج من الامتداد إذا لم تحدد)')
+        parser.add_argument('--device', type=int,
+                            help='معرف الجهاز لجميع السجلات (إذا لم يحتو الملف على عمود device)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='عدد السجلات في كل دفعة إدخال')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        source_format = options['format'] or {
+            '.csv': 'csv', '.json': 'json',
+        }.get(os.path.splitext(path)[1].lower(), 'attlog')
+
+        device = None
+        if options['device']:
+            try:
+                device = AttendanceDevice.objects.get(pk=options['device'])
+            except AttendanceDevice.DoesNotExist:
+                raise CommandError(f"Device {options['device']} does not exist")
+
+        try:
+            with open(path, 'rb') as handle:
+                rows = parse_punches(handle.read(), source_format)
+        except (OSError, PunchImportError) as exc:
+            raise CommandError(str(exc))
+
+        result = ingest_punches(rows, device=device, batch_size=options['batch_size'])
+        for error in result['errors'][:20]:
+            self.stderr.write(f"row {error['row']}: {error['error']}")
+        self.stdout.write(
+            f"received={result['received']} inserted={result['inserted']} "
+            f"duplicates={result['duplicates']} days={result['days_recomputed']} "
+            f"errors={len(result['errors'])}"
+        )
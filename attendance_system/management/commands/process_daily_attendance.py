@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from attendance_system.processing import process_daily_attendance
+
+
+class Command(BaseCommand):
+    help = 'معالجة الحضور اليومي لفترة محددة دفعة واحدة'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start_date',
+                            help='تاريخ البداية YYYY-MM-DD (الافتراضي: أمس)')
+        parser.add_argument('--to', dest='end_date',
+                            help='تاريخ النهاية YYYY-MM-DD (الافتراضي: تاريخ البداية)')
+        parser.add_argument('--department', type=int,
+                            help='رمز القسم لتقييد المعالجة')
+        parser.add_argument('--python', action='store_true',
+                            help='استخدام المحرك دون NumPy')
+
+    def handle(self, *args, **options):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        start_date = parse_date(options['start_date']) if options['start_date'] else yesterday
+        end_date = parse_date(options['end_date']) if options['end_date'] else start_date
+        if start_date is None or end_date is None or end_date < start_date:
+            raise CommandError('Invalid date range')
+
+        stats = process_daily_attendance(
+            start_date, end_date,
+            department=options['department'],
+            use_numpy=not options['python'],
+        )
+        self.stdout.write(
+            f"punches={stats['punches']} days={stats['days']} created={stats['created']} "
+            f"updated={stats['updated']} engine={stats['engine']}"
+        )
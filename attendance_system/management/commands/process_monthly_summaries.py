@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from attendance_system.summaries import generate_monthly_summaries, process_dirty_summaries
+
+
+class Command(BaseCommand):
+    help = 'إعادة حساب ملخصات الحضور الشهرية المعلمة، أو إنشاء ملخصات شهر كامل'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='سنة الملخصات المطلوب إنشاؤها')
+        parser.add_argument('--month', type=int, help='شهر الملخصات المطلوب إنشاؤها')
+        parser.add_argument('--department', type=int, help='رمز القسم لتقييد الإنشاء')
+        parser.add_argument('--loop', action='store_true',
+                            help='التشغيل المستمر كعملية خلفية لمعالجة الملخصات المعلمة')
+        parser.add_argument('--interval', type=float, default=60,
+                            help='الفاصل الزمني بالثواني بين كل فحص في وضع التشغيل المستمر')
+
+    def handle(self, *args, **options):
+        if options['year'] and options['month']:
+            created, updated = generate_monthly_summaries(
+                options['year'], options['month'], department=options['department'],
+            )
+            self.stdout.write(f'created={created} updated={updated}')
+            return
+
+        while True:
+            processed = process_dirty_summaries()
+            self.stdout.write(f'processed={processed}')
+            if not options['loop']:
+                break
+            if not processed:
+                time.sleep(options['interval'])
@@ -0,0 +1,58 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from attendance_system.devices import DeviceSimulator
+from attendance_system.models import AttendanceDevice
+from employee_management.models import Employee
+
+
+class Command(BaseCommand):
+    help = 'تشغيل محاكي أجهزة حضور عبر TCP لاختبار المزامنة محلياً'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--devices', type=int, default=100, help='عدد الأجهزة المحاكاة')
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--base-port', type=int, default=14370,
+                            help='منفذ الجهاز الأول؛ بقية الأجهزة على المنافذ التالية')
+        parser.add_argument('--users', type=int, default=50,
+                            help='عدد الموظفين المسجلين في كل جهاز')
+        parser.add_argument('--backlog-days', type=int, default=1,
+                            help='عدد أيام البصمات المخزنة مسبقاً في كل جهاز')
+        parser.add_argument('--tick', type=float, default=5,
+                            help='إضافة بصمة جديدة لكل جهاز كل N ثانية (0 للإيقاف)')
+        parser.add_argument('--register', action='store_true',
+                            help='إنشاء سجلات AttendanceDevice للأجهزة المحاكاة')
+
+    def handle(self, *args, **options):
+        ports = [options['base_port'] + i for i in range(options['devices'])]
+        user_ids = list(
+            Employee.objects.filter(employment_status='active')
+            .values_list('employee_id', flat=True)[:options['users']]
+        )
+
+        if options['register']:
+            for index, port in enumerate(ports, start=1):
+                AttendanceDevice.objects.update_or_create(
+                    device_name=f'Simulator {index:03d}',
+                    defaults={
+                        'device_type': 'other',
+                        'ip_address': options['host'],
+                        'port': port,
+                        'location': 'Simulator',
+                        'sync_interval_minutes': 1,
+                    },
+                )
+
+        simulator = DeviceSimulator(
+            host=options['host'], ports=ports, user_ids=user_ids,
+            backlog_days=options['backlog_days'], tick_seconds=options['tick'] or None,
+        )
+        self.stdout.write(
+            f"Simulating {len(ports)} devices on {options['host']}:{ports[0]}-{ports[-1]} "
+            f"with {len(user_ids)} users; run the sync with ATTENDANCE_DEVICE_DRIVER='simulator'"
+        )
+        try:
+            asyncio.run(simulator.serve_forever())
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from attendance_system.devices import DEFAULT_TIMEOUT
+from attendance_system.models import AttendanceDevice
+from attendance_system.sync import DEFAULT_WORKERS, DeviceSyncScheduler, sync_devices
+
+
+class Command(BaseCommand):
+    help = 'مزامنة سجلات البصمة من أجهزة الحضور (مرة واحدة أو كعملية مستمرة)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--device', type=int, action='append',
+                            help='مزامنة جهاز محدد فوراً (يمكن تكراره)')
+        parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                            help='عدد الأجهزة التي تتم مزامنتها بالتوازي')
+        parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                            help='مهلة الاتصال بكل جهاز بالثواني')
+        parser.add_argument('--loop', action='store_true',
+                            help='التشغيل المستمر حسب فترة المزامنة لكل جهاز')
+
+    def report(self, result):
+        self.stdout.write(
+            f"devices={result['devices']} fetched={result['fetched']} inserted={result['inserted']} "
+            f"duplicates={result['duplicates']} errors={result['errors']} "
+            f"failed={len(result['failed'])} slowest={result['slowest_seconds']:.1f}s"
+        )
+
+    def handle(self, *args, **options):
+        if options['device']:
+            devices = AttendanceDevice.objects.filter(pk__in=options['device'])
+            self.report(sync_devices(devices, workers=options['workers'], timeout=options['timeout']))
+            return
+
+        scheduler = DeviceSyncScheduler(workers=options['workers'], timeout=options['timeout'])
+        if options['loop']:
+            scheduler.run_forever()
+        else:
+            self.report(scheduler.run_once())
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.21 on 2026-10-19 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("attendance_system", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="monthlyattendancesummary",
+            name="needs_recalculation",
+            field=models.BooleanField(
+                default=False, verbose_name="بحاجة لإعادة الحساب"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="monthlyattendancesummary",
+            index=models.Index(
+                fields=["needs_recalculation", "is_finalized"],
+                name="attendance__needs_r_dc5332_idx",
+            ),
+        ),
+    ]
@@ -505,6 +505,7 @@ class MonthlyAttendanceSummary(models.Model):
         verbose_name=_("أكد بواسطة")
     )
     finalized_at = models.DateTimeField(null=True, blank=True, verbose_name=_("تاريخ التأكيد"))
+    needs_recalculation = models.BooleanField(default=False, verbose_name=_("بحاجة لإعادة الحساب"))
 
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("تاريخ الإنشاء"))
@@ -520,6 +521,7 @@ class MonthlyAttendanceSummary(models.Model):
             models.Index(fields=['employee', 'year', 'month']),
             models.Index(fields=['year', 'month']),
             models.Index(fields=['is_finalized']),
+            models.Index(fields=['needs_recalculation', 'is_finalized']),
         ]
 
     def __str__(self):
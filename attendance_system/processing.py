@@ -0,0 +1,374 @@
+"""
+محرك المعالجة المجمعة للحضور اليومي
+(Batch daily attendance engine)
+
+Loads every valid punch of a date range into columnar arrays, reduces them
+to one first-in / last-out / break pair per (employee, day) and computes
+work hours, break, late, early departure, overtime and status for all days
+at once. Results are written back with ``bulk_create`` / ``bulk_update``.
+
+The arithmetic mirrors ``signals.calculate_daily_attendance_metrics`` so a
+day processed here matches a day processed punch by punch. NumPy is used
+when installed; otherwise the same formulas run in a plain Python loop.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from employee_management.models import Employee
+
+from .ingestion import DEFAULT_BATCH_SIZE, IN_CHUNK_SIZE, _chunks
+from .models import AttendanceException, AttendanceRecord, DailyAttendance
+from .rules import get_rule_index
+from .signals import suppress_attendance_signals
+from .summaries import refresh_summaries
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+logger = logging.getLogger(__name__)
+
+PUNCH_CODES = {'check_in': 0, 'check_out': 1, 'break_out': 2, 'break_in': 3}
+MISSING = -1
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# مفتاح مركب (موظف، يوم) في عدد صحيح واحد؛ الرقم الترتيبي لليوم أقل من مليون
+_DAY_FACTOR = 1_000_000
+
+_HUNDREDTH = Decimal('0.01')
+
+METRIC_FIELDS = [
+    'check_in_time', 'check_out_time', 'break_out_time', 'break_in_time',
+    'total_work_hours', 'break_duration_minutes', 'overtime_hours',
+    'late_minutes', 'early_departure_minutes', 'status', 'attendance_rule',
+    'is_processed', 'processed_at', 'processed_by', 'updated_at',
+]
+
+
+def _seconds(value):
+    return MISSING if value is None else value.hour * 3600 + value.minute * 60 + value.second
+
+
+def _time(seconds):
+    seconds = int(seconds)
+    if seconds == MISSING:
+        return None
+    return time(seconds // 3600, seconds % 3600 // 60, seconds % 60)
+
+
+# --------------------------------------------------------------------------
+# Loading and reduction
+# --------------------------------------------------------------------------
+
+def _day_bounds(start_date, end_date):
+    start = timezone.make_aware(datetime.combine(start_date, time.min))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+    return start, end
+
+
+def load_punch_columns(start_date, end_date, employee_ids):
+    """
+    تحميل البصمات كأعمدة متوازية
+    (Load the punches of the range as parallel employee/day/second/code columns)
+    """
+    start, end = _day_bounds(start_date, end_date)
+    employees, days, seconds, codes = [], [], [], []
+    for chunk in _chunks(employee_ids):
+        rows = AttendanceRecord.objects.filter(
+            employee_id__in=chunk,
+            punch_time__gte=start,
+            punch_time__lt=end,
+            punch_type__in=list(PUNCH_CODES),
+            is_valid=True,
+        ).order_by().values_list('employee_id', 'punch_time', 'punch_type')
+        for employee_id, punch_time, punch_type in rows.iterator(chunk_size=5000):
+            local = timezone.localtime(punch_time)
+            employees.append(employee_id)
+            days.append(local.toordinal())
+            seconds.append(local.hour * 3600 + local.minute * 60 + local.second)
+            codes.append(PUNCH_CODES[punch_type])
+    return employees, days, seconds, codes
+
+
+def _reduce_numpy(employees, days, seconds, codes):
+    keys = np.asarray(employees, dtype=np.int64) * _DAY_FACTOR + np.asarray(days, dtype=np.int64)
+    seconds = np.asarray(seconds, dtype=np.int64)
+    codes = np.asarray(codes, dtype=np.int8)
+    pair_keys, inverse = np.unique(keys, return_inverse=True)
+    size = len(pair_keys)
+
+    check_in = np.full(size, SECONDS_PER_DAY, dtype=np.int64)
+    mask = codes == PUNCH_CODES['check_in']
+    np.minimum.at(check_in, inverse[mask], seconds[mask])
+    check_in[check_in == SECONDS_PER_DAY] = MISSING
+
+    latest = {}
+    for name in ('check_out', 'break_out', 'break_in'):
+        column = np.full(size, MISSING, dtype=np.int64)
+        mask = codes == PUNCH_CODES[name]
+        np.maximum.at(column, inverse[mask], seconds[mask])
+        latest[name] = column
+
+    return {
+        'employee': (pair_keys // _DAY_FACTOR).tolist(),
+        'day': (pair_keys % _DAY_FACTOR).tolist(),
+        'check_in': check_in,
+        'check_out': latest['check_out'],
+        'break_out': latest['break_out'],
+        'break_in': latest['break_in'],
+    }
+
+
+def _reduce_python(employees, days, seconds, codes):
+    pairs = defaultdict(lambda: [MISSING, MISSING, MISSING, MISSING])
+    for employee_id, day, second, code in zip(employees, days, seconds, codes):
+        slot = pairs[(employee_id, day)]
+        if code == PUNCH_CODES['check_in']:
+            if slot[0] == MISSING or second < slot[0]:
+                slot[0] = second
+        elif second > slot[code]:
+            slot[code] = second
+    keys = sorted(pairs)
+    return {
+        'employee': [employee_id for employee_id, _ in keys],
+        'day': [day for _, day in keys],
+        'check_in': [pairs[key][0] for key in keys],
+        'check_out': [pairs[key][1] for key in keys],
+        'break_out': [pairs[key][2] for key in keys],
+        'break_in': [pairs[key][3] for key in keys],
+    }
+
+
+# --------------------------------------------------------------------------
+# Rules
+# --------------------------------------------------------------------------
+
+def _rule_columns(rules_by_pair):
+    columns = defaultdict(list)
+    for rule in rules_by_pair:
+        columns['has_rule'].append(rule is not None)
+        columns['start'].append(_seconds(rule.work_start_time) if rule else MISSING)
+        columns['end'].append(_seconds(rule.work_end_time) if rule else MISSING)
+        columns['late_grace'].append(rule.late_grace_minutes if rule else 0)
+        columns['early_grace'].append(rule.early_departure_grace_minutes if rule else 0)
+        columns['threshold'].append((rule.overtime_threshold_minutes or 0) if rule else 0)
+    return columns
+
+
+# --------------------------------------------------------------------------
+# Metrics
+# --------------------------------------------------------------------------
+
+def compute_metrics_numpy(columns):
+    """حساب جميع المقاييس دفعة واحدة (Vectorised metrics over every employee/day)"""
+    ci = np.asarray(columns['check_in'], dtype=np.int64)
+    co = np.asarray(columns['check_out'], dtype=np.int64)
+    bo = np.asarray(columns['break_out'], dtype=np.int64)
+    bi = np.asarray(columns['break_in'], dtype=np.int64)
+    has_rule = np.asarray(columns['has_rule'], dtype=bool)
+    start = np.asarray(columns['start'], dtype=np.int64)
+    end = np.asarray(columns['end'], dtype=np.int64)
+    late_grace = np.asarray(columns['late_grace'], dtype=np.float64)
+    early_grace = np.asarray(columns['early_grace'], dtype=np.float64)
+    threshold = np.asarray(columns['threshold'], dtype=np.float64)
+
+    complete = has_rule & (ci != MISSING) & (co != MISSING)
+    # الوردية الليلية: الخروج في اليوم التالي
+    co_adj = np.where(co < ci, co + SECONDS_PER_DAY, co)
+    total = (co_adj - ci) / 60
+    break_minutes = np.where((bo != MISSING) & (bi != MISSING) & (bi > bo), (bi - bo) / 60, 0.0)
+    net = total - break_minutes
+
+    late = np.where(
+        complete & (start != MISSING) & (ci > start),
+        np.maximum(0, np.trunc((ci - start) / 60 - late_grace)), 0,
+    )
+    early = np.where(
+        complete & (end != MISSING) & (co_adj < end),
+        np.maximum(0, np.trunc((end - co_adj) / 60 - early_grace)), 0,
+    )
+    overtime = np.where(complete & (threshold > 0) & (net > threshold), (net - threshold) / 60, 0.0)
+
+    status = np.select(
+        [~has_rule, complete & (late > 0), complete & (early > 0), complete, (ci != MISSING) & (co == MISSING)],
+        ['incomplete', 'late', 'early_departure', 'present', 'incomplete'],
+        default='absent',
+    )
+    return {
+        'work_hours': np.where(complete, net / 60, 0.0).tolist(),
+        'break_minutes': np.where(complete, np.trunc(break_minutes), 0).astype(np.int64).tolist(),
+        'overtime_hours': overtime.tolist(),
+        'late_minutes': late.astype(np.int64).tolist(),
+        'early_minutes': early.astype(np.int64).tolist(),
+        'status': status.tolist(),
+    }
+
+
+def compute_metrics_python(columns):
+    """نفس الحساب دون NumPy (Same formulas, one row at a time)"""
+    result = defaultdict(list)
+    for i in range(len(columns['check_in'])):
+        ci, co = int(columns['check_in'][i]), int(columns['check_out'][i])
+        bo, bi = int(columns['break_out'][i]), int(columns['break_in'][i])
+        work_hours = overtime = 0.0
+        break_minutes = late = early = 0
+
+        if not columns['has_rule'][i]:
+            status = 'incomplete'
+        elif ci != MISSING and co != MISSING:
+            co_adj = co + SECONDS_PER_DAY if co < ci else co
+            total = (co_adj - ci) / 60
+            breaks = (bi - bo) / 60 if bo != MISSING and bi != MISSING and bi > bo else 0.0
+            net = total - breaks
+            break_minutes = int(breaks)
+            work_hours = net / 60
+            start, end = columns['start'][i], columns['end'][i]
+            if start != MISSING and ci > start:
+                late = max(0, int((ci - start) / 60 - columns['late_grace'][i]))
+            if end != MISSING and co_adj < end:
+                early = max(0, int((end - co_adj) / 60 - columns['early_grace'][i]))
+            threshold = columns['threshold'][i]
+            if threshold and net > threshold:
+                overtime = (net - threshold) / 60
+            status = 'late' if late > 0 else 'early_departure' if early > 0 else 'present'
+        else:
+            status = 'incomplete' if ci != MISSING else 'absent'
+
+        result['work_hours'].append(work_hours)
+        result['break_minutes'].append(break_minutes)
+        result['overtime_hours'].append(overtime)
+        result['late_minutes'].append(late)
+        result['early_minutes'].append(early)
+        result['status'].append(status)
+    return result
+
+
+# --------------------------------------------------------------------------
+# Entry point
+# --------------------------------------------------------------------------
+
+def _apply_exceptions(columns, start_date, end_date):
+    """الأوقات المعدلة في الاستثناءات المعتمدة تتقدم على البصمات"""
+    index = {(e, d): i for i, (e, d) in enumerate(zip(columns['employee'], columns['day']))}
+    exceptions = AttendanceException.objects.filter(
+        is_approved=True,
+        attendance_date__range=(start_date, end_date),
+    ).values_list('employee_id', 'attendance_date', 'adjusted_check_in', 'adjusted_check_out')
+    for employee_id, day, adjusted_in, adjusted_out in exceptions:
+        i = index.get((employee_id, day.toordinal()))
+        if i is None:
+            continue
+        if adjusted_in:
+            columns['check_in'][i] = _seconds(adjusted_in)
+        if adjusted_out:
+            columns['check_out'][i] = _seconds(adjusted_out)
+
+
+def _employee_scope(department=None, employee_ids=None):
+    employees = Employee.objects.all()
+    if department:
+        employees = employees.filter(department=department)
+    if employee_ids is not None:
+        employees = employees.filter(pk__in=employee_ids)
+    return dict(
+        (pk, (department_id, job_title_id))
+        for pk, department_id, job_title_id in employees.values_list('pk', 'department_id', 'job_title_id')
+    )
+
+
+def process_daily_attendance(start_date, end_date, department=None, employee_ids=None,
+                             processed_by=None, use_numpy=None):
+    """
+    معالجة الحضور اليومي لفترة كاملة دفعة واحدة
+    (Recompute and finalise DailyAttendance for a date range)
+
+    ``department`` limits the run to one department; ``employee_ids`` to a
+    set of employees. Returns run statistics.
+    """
+    use_numpy = NUMPY_AVAILABLE if use_numpy is None else use_numpy and NUMPY_AVAILABLE
+    scope = _employee_scope(department, employee_ids)
+    stats = {'punches': 0, 'days': 0, 'created': 0, 'updated': 0,
+             'engine': 'numpy' if use_numpy else 'python'}
+
+    employees, days, seconds, codes = load_punch_columns(start_date, end_date, list(scope))
+    stats['punches'] = len(employees)
+    if not employees:
+        return stats
+
+    reduce = _reduce_numpy if use_numpy else _reduce_python
+    columns = reduce(employees, days, seconds, codes)
+    if use_numpy:
+        for name in ('check_in', 'check_out', 'break_out', 'break_in'):
+            columns[name] = columns[name].tolist()
+    _apply_exceptions(columns, start_date, end_date)
+
+    rules = get_rule_index()
+    rules_by_pair = [
+        rules.resolve(*scope[employee_id], date.fromordinal(day))
+        for employee_id, day in zip(columns['employee'], columns['day'])
+    ]
+    columns.update(_rule_columns(rules_by_pair))
+
+    metrics = (compute_metrics_numpy if use_numpy else compute_metrics_python)(columns)
+
+    pairs = list(zip(columns['employee'], columns['day']))
+    existing = {}
+    for chunk in _chunks({employee_id for employee_id, _ in pairs}, IN_CHUNK_SIZE):
+        for daily in DailyAttendance.objects.filter(
+            employee_id__in=chunk, attendance_date__range=(start_date, end_date),
+        ):
+            existing[(daily.employee_id, daily.attendance_date.toordinal())] = daily
+
+    now = timezone.now()
+    to_create, to_update = [], []
+    for i, (employee_id, day) in enumerate(pairs):
+        daily = existing.get((employee_id, day))
+        if daily is None:
+            daily = DailyAttendance(employee_id=employee_id, attendance_date=date.fromordinal(day))
+            to_create.append(daily)
+        else:
+            to_update.append(daily)
+        daily.check_in_time = _time(columns['check_in'][i])
+        daily.check_out_time = _time(columns['check_out'][i])
+        daily.break_out_time = _time(columns['break_out'][i])
+        daily.break_in_time = _time(columns['break_in'][i])
+        daily.total_work_hours = Decimal(metrics['work_hours'][i]).quantize(_HUNDREDTH)
+        daily.break_duration_minutes = metrics['break_minutes'][i]
+        daily.overtime_hours = Decimal(metrics['overtime_hours'][i]).quantize(_HUNDREDTH)
+        daily.late_minutes = metrics['late_minutes'][i]
+        daily.early_departure_minutes = metrics['early_minutes'][i]
+        daily.status = metrics['status'][i]
+        daily.attendance_rule = rules_by_pair[i]
+        daily.is_processed = True
+        daily.processed_at = now
+        daily.processed_by = processed_by
+        daily.updated_at = now
+
+    start, end = _day_bounds(start_date, end_date)
+    with transaction.atomic(), suppress_attendance_signals():
+        DailyAttendance.objects.bulk_create(to_create, batch_size=DEFAULT_BATCH_SIZE)
+        DailyAttendance.objects.bulk_update(to_update, METRIC_FIELDS, batch_size=DEFAULT_BATCH_SIZE)
+        for chunk in _chunks(scope):
+            AttendanceRecord.objects.filter(
+                employee_id__in=chunk, punch_time__gte=start, punch_time__lt=end, is_processed=False,
+            ).update(is_processed=True)
+        refresh_summaries({
+            (employee_id, date.fromordinal(day).year, date.fromordinal(day).month)
+            for employee_id, day in pairs
+        })
+
+    stats.update(days=len(pairs), created=len(to_create), updated=len(to_update))
+    logger.info(
+        'Daily attendance %s..%s: punches=%s days=%s created=%s updated=%s engine=%s',
+        start_date, end_date, stats['punches'], stats['days'], stats['created'],
+        stats['updated'], stats['engine'],
+    )
+    return stats
@@ -0,0 +1,168 @@
+"""
+فهرس قواعد الحضور في الذاكرة
+(In-memory attendance rule resolver)
+
+Active ``AttendanceRule`` rows are loaded once into an interval index keyed
+by department and by job title over ``effective_from`` / ``effective_to``.
+Lookups are answered from memory with the same precedence as the original
+queries: the first rule (by name) that targets the employee's department or
+job title, otherwise the first rule that applies to everyone.
+
+The index is rebuilt lazily after a rule or its department / job title
+assignments change: the local copy is dropped at once and a shared version
+counter is bumped on commit so other processes rebuild too. A process reads
+that counter at most once per ``VERSION_CHECK_INTERVAL`` seconds, so other
+processes pick up a change within a second and lookups stay in memory;
+batch jobs take the index once and pass it to the lookups they run.
+"""
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import AttendanceRule
+
+RULES_VERSION_KEY = 'attendance_system:rules:version'
+
+# حد أقصى لذاكرة نتائج البحث (Bound for the memoised lookups)
+MAX_MEMO_SIZE = 50000
+# أقل مدة بين قراءتين للعداد المشترك بالثواني (Seconds between shared version reads)
+VERSION_CHECK_INTERVAL = 1.0
+
+_lock = threading.Lock()
+_index = None
+_checked_at = 0.0
+
+
+class RuleIndex:
+    """
+    فهرس فترات القواعد
+    (Interval index of the active rules)
+    """
+
+    def __init__(self, rules, version=None):
+        self.version = version
+        self.rules = {}
+        targeted = defaultdict(list)
+        general = []
+        for order, (rule, departments, job_titles) in enumerate(rules):
+            self.rules[rule.pk] = rule
+            entry = (rule.effective_from, order, rule)
+            if rule.applies_to_all:
+                general.append(entry)
+                continue
+            for department_id in departments:
+                targeted[('department', department_id)].append(entry)
+            for job_title_id in job_titles:
+                targeted[('job_title', job_title_id)].append(entry)
+
+        # كل قائمة مرتبة حسب تاريخ البداية للبحث الثنائي
+        self._targeted = {key: self._sorted(entries) for key, entries in targeted.items()}
+        self._general = self._sorted(general)
+        self._memo = {}
+
+    @staticmethod
+    def _sorted(entries):
+        entries.sort(key=lambda entry: (entry[0], entry[1]))
+        return [entry[0] for entry in entries], entries
+
+    @staticmethod
+    def _best(bucket, day):
+        """أول قاعدة (حسب الترتيب) سارية في اليوم المحدد"""
+        if not bucket:
+            return None
+        starts, entries = bucket
+        best = None
+        for _, order, rule in entries[:bisect_right(starts, day)]:
+            if rule.effective_to and rule.effective_to < day:
+                continue
+            if best is None or order < best[0]:
+                best = (order, rule)
+        return best
+
+    def resolve(self, department_id, job_title_id, day):
+        """القاعدة المطبقة على قسم ووظيفة في يوم محدد (Rule for a department/job title on a day)"""
+        key = (department_id, job_title_id, day)
+        if key in self._memo:
+            return self._memo[key]
+
+        candidates = [
+            self._best(self._targeted.get(('department', department_id)), day),
+            self._best(self._targeted.get(('job_title', job_title_id)), day),
+        ]
+        candidates = [candidate for candidate in candidates if candidate]
+        if candidates:
+            rule = min(candidates, key=lambda candidate: candidate[0])[1]
+        else:
+            best = self._best(self._general, day)
+            rule = best[1] if best else None
+
+        if len(self._memo) >= MAX_MEMO_SIZE:
+            self._memo.clear()
+        self._memo[key] = rule
+        return rule
+
+    def resolve_for(self, employee, day):
+        return self.resolve(employee.department_id, employee.job_title_id, day)
+
+
+def load_rules():
+    """تحميل القواعد النشطة مع أقسامها ووظائفها (Active rules with their M2M targets)"""
+    rules = (
+        AttendanceRule.objects.filter(is_active=True)
+        .order_by('rule_name', 'pk')
+        .prefetch_related('departments', 'job_titles')
+    )
+    return [
+        (rule, {d.pk for d in rule.departments.all()}, {j.pk for j in rule.job_titles.all()})
+        for rule in rules
+    ]
+
+
+def _shared_version():
+    version = cache.get(RULES_VERSION_KEY)
+    if version is None:
+        cache.add(RULES_VERSION_KEY, 1, None)
+        version = cache.get(RULES_VERSION_KEY, 1)
+    return version
+
+
+def get_rule_index():
+    """
+    إرجاع الفهرس الحالي أو إعادة بنائه عند تغير القواعد
+    (Return the current index, rebuilding it after rules change)
+    """
+    global _index, _checked_at
+    index = _index
+    now = time.monotonic()
+    if index is not None and now - _checked_at < VERSION_CHECK_INTERVAL:
+        return index
+    version = _shared_version()
+    if index is not None and index.version == version:
+        _checked_at = now
+        return index
+    with _lock:
+        if _index is None or _index.version != version:
+            _index = RuleIndex(load_rules(), version=version)
+        _checked_at = now
+        return _index
+
+
+def _bump_shared_version():
+    try:
+        cache.incr(RULES_VERSION_KEY)
+    except ValueError:
+        cache.set(RULES_VERSION_KEY, 2, None)
+
+
+def invalidate_rule_index():
+    """
+    إبطال الفهرس محلياً فوراً وفي بقية العمليات عند تأكيد المعاملة
+    (Drop the local index now and the other processes' copies on commit)
+    """
+    global _index
+    _index = None
+    transaction.on_commit(_bump_shared_version)
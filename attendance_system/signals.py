@@ -2,22 +2,47 @@
 Attendance System Signals
 Handle automatic processing and calculations for attendance system
 """
-from django.db.models.signals import post_save, pre_save, post_delete
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import post_save, pre_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
-from django.db import models
 from decimal import Decimal
 from datetime import datetime, time, timedelta
 from .models import (
-    AttendanceRecord, DailyAttendance, AttendanceException,
-    MonthlyAttendanceSummary, AttendanceRule
+    AttendanceRecord, DailyAttendance, AttendanceException, AttendanceRule
 )
+from .rules import get_rule_index, invalidate_rule_index
+from .summaries import apply_summary_row, mark_summary_dirty, summary_rows
+
+_signal_state = threading.local()
+
+
+@contextmanager
+def suppress_attendance_signals():
+    """
+    إيقاف المعالجة التلقائية مؤقتاً أثناء العمليات المجمعة
+    (Skip per-row processing while a batch recomputes everything once at the end)
+    """
+    previous = getattr(_signal_state, 'suppressed', False)
+    _signal_state.suppressed = True
+    try:
+        yield
+    finally:
+        _signal_state.suppressed = previous
+
+
+def signals_suppressed():
+    return getattr(_signal_state, 'suppressed', False)
 
 
 @receiver(post_save, sender=AttendanceRecord)
 def process_attendance_record(sender, instance, created, **kwargs):
     """Process attendance record and update daily attendance"""
+    if signals_suppressed():
+        return
     if created and instance.is_valid and not instance.is_processed:
         try:
             # Get or create daily attendance record
@@ -69,10 +94,10 @@ def update_daily_attendance(daily_attendance, attendance_record):
     daily_attendance.save()
 
 
-def calculate_daily_attendance_metrics(daily_attendance):
+def calculate_daily_attendance_metrics(daily_attendance, rules=None):
     """Calculate work hours, overtime, and status for daily attendance"""
     # Get applicable attendance rule
-    rule = get_applicable_attendance_rule(daily_attendance.employee, daily_attendance.attendance_date)
+    rule = get_applicable_attendance_rule(daily_attendance.employee, daily_attendance.attendance_date, rules=rules)
     daily_attendance.attendance_rule = rule
     
     if not rule:
@@ -145,26 +170,22 @@ def calculate_daily_attendance_metrics(daily_attendance):
             daily_attendance.status = 'absent'
 
 
-def get_applicable_attendance_rule(employee, date):
+def get_applicable_attendance_rule(employee, date, rules=None):
     """Get the applicable attendance rule for an employee on a specific date"""
-    rules = AttendanceRule.objects.filter(
-        is_active=True,
-        effective_from__lte=date,
-    ).filter(
-        models.Q(effective_to__isnull=True) | models.Q(effective_to__gte=date)
-    )
+    # الدفعات تمرر الفهرس الذي أخذته مرة واحدة (batches pass the index they took once)
+    if rules is None:
+        rules = get_rule_index()
+    return rules.resolve_for(employee, date)
 
-    # Check for employee-specific rules
-    employee_rules = rules.filter(
-        models.Q(applies_to_all=False) &
-        (models.Q(departments=employee.department) | models.Q(job_titles=employee.job_title))
-    ).first()
-    
-    if employee_rules:
-        return employee_rules
-    
-    # Fall back to general rules
-    return rules.filter(applies_to_all=True).first()
+
+@receiver(post_save, sender=AttendanceRule)
+@receiver(post_delete, sender=AttendanceRule)
+@receiver(m2m_changed, sender=AttendanceRule.departments.through)
+@receiver(m2m_changed, sender=AttendanceRule.job_titles.through)
+def attendance_rules_changed(sender, **kwargs):
+    """Rebuild the in-memory rule index after any rule change"""
+    if kwargs.get('action', 'post_').startswith('post_'):
+        invalidate_rule_index()
 
 
 @receiver(post_save, sender=AttendanceException)
@@ -215,78 +236,17 @@ def apply_attendance_exception(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=DailyAttendance)
 def update_monthly_summary(sender, instance, created, **kwargs):
-    """Update monthly attendance summary when daily attendance changes"""
+    """Mark the monthly summary dirty; it is recomputed once when the transaction commits"""
+    if signals_suppressed():
+        return
     if instance.is_processed:
-        try:
-            summary, created_summary = MonthlyAttendanceSummary.objects.get_or_create(
-                employee=instance.employee,
-                year=instance.attendance_date.year,
-                month=instance.attendance_date.month,
-                defaults={
-                    'total_working_days': 0,
-                    'present_days': 0,
-                    'absent_days': 0,
-                    'late_days': 0,
-                    'early_departure_days': 0,
-                    'total_work_hours': Decimal('0'),
-                    'total_overtime_hours': Decimal('0'),
-                    'total_late_minutes': 0,
-                    'total_early_departure_minutes': 0,
-                    'leave_days': 0,
-                    'holiday_days': 0,
-                    'weekend_days': 0,
-                }
-            )
-            
-            # Recalculate monthly statistics
-            calculate_monthly_summary(summary)
-            
-        except Exception as e:
-            # Log error but don't fail the daily attendance save
-            pass
+        mark_summary_dirty(
+            instance.employee_id, instance.attendance_date.year, instance.attendance_date.month
+        )
 
 
 def calculate_monthly_summary(summary):
-    """Calculate monthly attendance summary statistics"""
-    from django.db import models
-    
-    # Get all daily attendance records for the month
-    daily_records = DailyAttendance.objects.filter(
-        employee=summary.employee,
-        attendance_date__year=summary.year,
-        attendance_date__month=summary.month,
-        is_processed=True
-    )
-    
-    # Calculate statistics
-    summary.total_working_days = daily_records.exclude(
-        status__in=['holiday', 'weekend', 'leave']
-    ).count()
-    
-    summary.present_days = daily_records.filter(
-        status__in=['present', 'late', 'early_departure']
-    ).count()
-    
-    summary.absent_days = daily_records.filter(status='absent').count()
-    summary.late_days = daily_records.filter(status='late').count()
-    summary.early_departure_days = daily_records.filter(status='early_departure').count()
-    summary.leave_days = daily_records.filter(status='leave').count()
-    summary.holiday_days = daily_records.filter(status='holiday').count()
-    summary.weekend_days = daily_records.filter(status='weekend').count()
-    
-    # Calculate time statistics
-    aggregates = daily_records.aggregate(
-        total_work=models.Sum('total_work_hours'),
-        total_overtime=models.Sum('overtime_hours'),
-        total_late=models.Sum('late_minutes'),
-        total_early=models.Sum('early_departure_minutes')
-    )
-    
-    summary.total_work_hours = aggregates['total_work'] or Decimal('0')
-    summary.total_overtime_hours = aggregates['total_overtime'] or Decimal('0')
-    summary.total_late_minutes = aggregates['total_late'] or 0
-    summary.total_early_departure_minutes = aggregates['total_early'] or 0
-    
-    # Calculate performance metrics
-    summary.calculate_statistics()
+    """Calculate monthly attendance summary statistics with one aggregate query"""
+    rows = summary_rows(summary.year, summary.month, employee_ids=[summary.employee_id])
+    apply_summary_row(summary, rows.get(summary.employee_id, {}))
     summary.save()
@@ -0,0 +1,256 @@
+"""
+الملخصات الشهرية للحضور
+(Monthly attendance summaries)
+
+Every statistic of a month is computed with one grouped conditional
+aggregate over ``DailyAttendance``: one row per employee, so a whole
+department or company is summarised with a single query.
+
+Daily changes do not re-summarise the month on every save. They mark the
+(employee, year, month) key dirty; dirty keys are coalesced per transaction
+and recomputed once on commit, or, with ``ATTENDANCE_SUMMARY_DEFERRED``
+enabled, flagged with ``needs_recalculation`` for the
+``process_monthly_summaries`` worker.
+"""
+import calendar
+import logging
+import threading
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import DailyAttendance, MonthlyAttendanceSummary
+
+logger = logging.getLogger(__name__)
+
+# حد آمن لعدد المعاملات في استعلام IN على SQL Server
+IN_CHUNK_SIZE = 1000
+
+WORKING_EXCLUDED = ['holiday', 'weekend', 'leave']
+PRESENT_STATUSES = ['present', 'late', 'early_departure']
+
+SUMMARY_AGGREGATES = {
+    'total_working_days': Count('id', filter=~Q(status__in=WORKING_EXCLUDED)),
+    'present_days': Count('id', filter=Q(status__in=PRESENT_STATUSES)),
+    'absent_days': Count('id', filter=Q(status='absent')),
+    'late_days': Count('id', filter=Q(status='late')),
+    'early_departure_days': Count('id', filter=Q(status='early_departure')),
+    'leave_days': Count('id', filter=Q(status='leave')),
+    'holiday_days': Count('id', filter=Q(status='holiday')),
+    'weekend_days': Count('id', filter=Q(status='weekend')),
+    'total_work_hours': Sum('total_work_hours'),
+    'total_overtime_hours': Sum('overtime_hours'),
+    'total_late_minutes': Sum('late_minutes'),
+    'total_early_departure_minutes': Sum('early_departure_minutes'),
+}
+
+SUMMARY_FIELDS = list(SUMMARY_AGGREGATES) + [
+    'attendance_percentage', 'punctuality_percentage', 'needs_recalculation', 'updated_at',
+]
+
+_EMPTY_ROW = {
+    field: Decimal('0') if field in ('total_work_hours', 'total_overtime_hours') else 0
+    for field in SUMMARY_AGGREGATES
+}
+
+_pending = threading.local()
+
+
+def _month_records(year, month):
+    last_day = calendar.monthrange(year, month)[1]
+    return DailyAttendance.objects.filter(
+        attendance_date__range=(date(year, month, 1), date(year, month, last_day)),
+        is_processed=True,
+    )
+
+
+def summary_rows(year, month, employee_ids=None, department=None):
+    """
+    جميع إحصائيات الشهر لكل موظف في استعلام مجمع واحد
+    (One grouped conditional aggregate: employee_id -> statistics)
+    """
+    records = _month_records(year, month)
+    if department:
+        records = records.filter(employee__department=department)
+
+    rows = {}
+    chunks = [None] if employee_ids is None else [
+        list(employee_ids)[i:i + IN_CHUNK_SIZE] for i in range(0, len(employee_ids), IN_CHUNK_SIZE)
+    ]
+    for chunk in chunks:
+        scoped = records if chunk is None else records.filter(employee_id__in=chunk)
+        for row in scoped.order_by().values('employee_id').annotate(**SUMMARY_AGGREGATES):
+            rows[row.pop('employee_id')] = row
+    return rows
+
+
+def apply_summary_row(summary, row):
+    """نسخ نتائج التجميع إلى الملخص وحساب النسب (Copy aggregates and derive percentages)"""
+    for field in SUMMARY_AGGREGATES:
+        value = row.get(field)
+        setattr(summary, field, value if value is not None else _EMPTY_ROW[field])
+    summary.attendance_percentage = Decimal('0')
+    summary.punctuality_percentage = Decimal('0')
+    summary.calculate_statistics()
+    summary.needs_recalculation = False
+    return summary
+
+
+def generate_monthly_summaries(year, month, employee_ids=None, department=None):
+    """
+    إنشاء أو تحديث ملخصات الشهر دفعة واحدة
+    (Create or refresh the month's summaries with one aggregate query)
+
+    Finalized summaries are left untouched. Returns ``(created, updated)``.
+    """
+    rows = summary_rows(year, month, employee_ids=employee_ids, department=department)
+    targets = set(rows) if employee_ids is None else set(employee_ids)
+    if not targets:
+        return 0, 0
+
+    existing = {}
+    summaries = MonthlyAttendanceSummary.objects.filter(year=year, month=month)
+    target_list = list(targets)
+    for i in range(0, len(target_list), IN_CHUNK_SIZE):
+        for summary in summaries.filter(employee_id__in=target_list[i:i + IN_CHUNK_SIZE]):
+            existing[summary.employee_id] = summary
+
+    now = timezone.now()
+    to_create, to_update = [], []
+    for employee_id in targets:
+        summary = existing.get(employee_id)
+        if summary is None:
+            if employee_id not in rows:
+                continue
+            summary = MonthlyAttendanceSummary(employee_id=employee_id, year=year, month=month)
+            to_create.append(summary)
+        elif summary.is_finalized:
+            continue
+        else:
+            summary.updated_at = now
+            to_update.append(summary)
+        apply_summary_row(summary, rows.get(employee_id, _EMPTY_ROW))
+
+    with transaction.atomic():
+        MonthlyAttendanceSummary.objects.bulk_create(to_create, batch_size=IN_CHUNK_SIZE)
+        MonthlyAttendanceSummary.objects.bulk_update(to_update, SUMMARY_FIELDS, batch_size=IN_CHUNK_SIZE)
+    return len(to_create), len(to_update)
+
+
+def refresh_summaries(keys):
+    """
+    إعادة حساب مجموعة مفاتيح (موظف، سنة، شهر) باستعلام واحد لكل شهر
+    (Recompute a set of (employee, year, month) keys, one aggregate per month)
+    """
+    by_month = defaultdict(set)
+    for employee_id, year, month in keys:
+        by_month[(year, month)].add(employee_id)
+    for (year, month), employee_ids in by_month.items():
+        generate_monthly_summaries(year, month, employee_ids=employee_ids)
+
+
+# --------------------------------------------------------------------------
+# Debounced recomputation
+# --------------------------------------------------------------------------
+
+def _flag_for_worker(keys):
+    """تعليم الملخصات لإعادة الحساب لاحقاً بواسطة العامل (Queue keys for the worker)"""
+    by_month = defaultdict(set)
+    for employee_id, year, month in keys:
+        by_month[(year, month)].add(employee_id)
+    for (year, month), employee_ids in by_month.items():
+        summaries = MonthlyAttendanceSummary.objects.filter(year=year, month=month, employee_id__in=employee_ids)
+        missing = employee_ids - set(summaries.values_list('employee_id', flat=True))
+        summaries.update(needs_recalculation=True)
+        MonthlyAttendanceSummary.objects.bulk_create(
+            [MonthlyAttendanceSummary(employee_id=employee_id, year=year, month=month, needs_recalculation=True)
+             for employee_id in missing],
+            ignore_conflicts=True,
+        )
+
+
+class _DirtyBatch:
+    """
+    مفاتيح معاملة واحدة تعالج باستدعاء on_commit واحد
+    (Keys marked in one transaction, flushed by a single on_commit hook)
+    """
+
+    def __init__(self, connection):
+        self.keys = set()
+        self.hooks = connection.run_on_commit
+        self.done = False
+
+    def is_registered(self, connection):
+        """هل ما زال الاستدعاء مسجلاً في المعاملة الحالية (Is the hook still pending?)"""
+        if self.done or not connection.in_atomic_block:
+            return False
+        if self.hooks is connection.run_on_commit:
+            return True
+        # التراجع عن نقطة حفظ يعيد بناء القائمة؛ بعد الالتزام أو التراجع الكامل
+        # تكون القائمة جديدة ولا تحتوي الاستدعاء فتهمل مفاتيحه
+        if any(hook[1] == self.flush for hook in connection.run_on_commit):
+            self.hooks = connection.run_on_commit
+            return True
+        return False
+
+    def flush(self):
+        self.done = True
+        _apply_dirty(self.keys)
+
+
+def _apply_dirty(keys):
+    if not keys:
+        return
+    if getattr(settings, 'ATTENDANCE_SUMMARY_DEFERRED', False):
+        _flag_for_worker(keys)
+    else:
+        refresh_summaries(keys)
+
+
+def mark_summary_dirty(employee_id, year, month):
+    """
+    تعليم ملخص شهري كمتغير
+    (Mark a monthly summary dirty; every key is recomputed once at commit)
+
+    One ``on_commit`` hook is registered per transaction. Keys marked in a
+    transaction that rolls back are dropped with its hook. Outside a
+    transaction the key is applied at once.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _apply_dirty({(employee_id, year, month)})
+        return
+    batch = getattr(_pending, 'batch', None)
+    if batch is None or not batch.is_registered(connection):
+        batch = _pending.batch = _DirtyBatch(connection)
+        transaction.on_commit(batch.flush)
+    batch.keys.add((employee_id, year, month))
+
+
+def process_dirty_summaries(batch_size=IN_CHUNK_SIZE):
+    """
+    عامل إعادة حساب الملخصات المعلمة
+    (Worker: recompute summaries flagged with needs_recalculation)
+
+    Returns the number of summaries processed.
+    """
+    processed = 0
+    while True:
+        keys = list(
+            MonthlyAttendanceSummary.objects.filter(needs_recalculation=True, is_finalized=False)
+            .values_list('employee_id', 'year', 'month')[:batch_size]
+        )
+        if not keys:
+            break
+        refresh_summaries(keys)
+        processed += len(keys)
+        if len(keys) < batch_size:
+            break
+    if processed:
+        logger.info('Monthly attendance summaries recomputed: %s', processed)
+    return processed
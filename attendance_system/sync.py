@@ -0,0 +1,165 @@
+"""
+مزامنة أجهزة الحضور
+(Attendance device sync scheduler)
+
+Devices that are due (``last_sync_time + sync_interval_minutes``) are
+polled concurrently in a thread pool; each fetch starts from the device's
+watermark, the latest punch already stored for it. Threads only do device
+I/O: the fetched punches of a cycle are ingested together in the calling
+thread through ``ingestion.ingest_punches``, so every affected employee day
+is recomputed once per cycle.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.db.models import Max
+from django.utils import timezone
+
+from .devices import DEFAULT_TIMEOUT, DeviceError, get_driver
+from .ingestion import ingest_punches
+from .models import AttendanceDevice, AttendanceRecord
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 16
+
+
+def due_devices(now=None):
+    """
+    الأجهزة التي حان موعد مزامنتها
+    (Active auto-sync devices whose interval has elapsed)
+    """
+    now = now or timezone.now()
+    devices = AttendanceDevice.objects.filter(is_active=True, auto_sync_enabled=True)
+    return [
+        device for device in devices
+        if device.last_sync_time is None
+        or device.last_sync_time + timedelta(minutes=device.sync_interval_minutes) <= now
+    ]
+
+
+def get_watermarks(devices):
+    """آخر بصمة مخزنة لكل جهاز باستعلام واحد (Latest stored punch per device)"""
+    rows = (
+        AttendanceRecord.objects.filter(device__in=devices)
+        .order_by()
+        .values('device_id')
+        .annotate(latest=Max('punch_time'))
+    )
+    return {row['device_id']: row['latest'] for row in rows}
+
+
+def _fetch(device, since, timeout):
+    started = time.monotonic()
+    records = get_driver(device, timeout=timeout).fetch_records(since)
+    for record in records:
+        record['device'] = device.pk
+    return records, time.monotonic() - started
+
+
+def sync_devices(devices, workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT, now=None):
+    """
+    مزامنة مجموعة من الأجهزة بالتوازي
+    (Fetch from the devices concurrently and ingest everything as one batch)
+
+    Returns a dict with per-cycle counters and the ids of failed devices.
+    """
+    now = now or timezone.now()
+    devices = list(devices)
+    result = {'devices': len(devices), 'fetched': 0, 'inserted': 0, 'duplicates': 0,
+              'errors': 0, 'failed': [], 'slowest_seconds': 0.0}
+    if not devices:
+        return result
+
+    watermarks = get_watermarks(devices)
+    rows, succeeded = [], []
+    with ThreadPoolExecutor(max_workers=min(workers, len(devices))) as pool:
+        futures = {
+            pool.submit(_fetch, device, watermarks.get(device.pk), timeout): device
+            for device in devices
+        }
+        for future in as_completed(futures):
+            device = futures[future]
+            try:
+                records, elapsed = future.result()
+            except DeviceError as exc:
+                logger.warning('Device %s sync failed: %s', device.device_name, exc)
+                result['failed'].append(device.pk)
+                continue
+            except Exception:
+                # رد مشوه من الجهاز لا يوقف بقية الدورة
+                logger.exception('Device %s sync failed', device.device_name)
+                result['failed'].append(device.pk)
+                continue
+            rows.extend(records)
+            succeeded.append(device.pk)
+            result['slowest_seconds'] = max(result['slowest_seconds'], elapsed)
+
+    result['fetched'] = len(rows)
+    if rows:
+        ingested = ingest_punches(rows)
+        result.update(
+            inserted=ingested['inserted'],
+            duplicates=ingested['duplicates'],
+            errors=len(ingested['errors']),
+        )
+
+    AttendanceDevice.objects.filter(pk__in=succeeded).update(is_online=True, last_sync_time=now)
+    AttendanceDevice.objects.filter(pk__in=result['failed']).update(is_online=False)
+    return result
+
+
+class DeviceSyncScheduler:
+    """
+    جدولة مزامنة الأجهزة حسب فترة كل جهاز
+    (Poll devices on their own intervals, backing off failed ones)
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT, max_sleep=60):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_sleep = max_sleep
+        # الأجهزة الفاشلة لا تعاد محاولتها قبل انقضاء فترتها
+        self._retry_after = {}
+
+    def run_once(self, now=None):
+        now = now or timezone.now()
+        devices = [
+            device for device in due_devices(now)
+            if self._retry_after.get(device.pk, now) <= now
+        ]
+        result = sync_devices(devices, workers=self.workers, timeout=self.timeout, now=now)
+        intervals = {device.pk: device.sync_interval_minutes for device in devices}
+        for device_id in result['failed']:
+            self._retry_after[device_id] = now + timedelta(minutes=intervals[device_id])
+        for device in devices:
+            if device.pk not in result['failed']:
+                self._retry_after.pop(device.pk, None)
+        logger.info(
+            'Device sync: devices=%(devices)s fetched=%(fetched)s inserted=%(inserted)s '
+            'failed=%(failed_count)s slowest=%(slowest_seconds).1fs',
+            {**result, 'failed_count': len(result['failed'])},
+        )
+        return result
+
+    def seconds_until_next(self, now=None):
+        """المدة حتى أقرب جهاز مستحق (Sleep time until the next device is due)"""
+        now = now or timezone.now()
+        devices = AttendanceDevice.objects.filter(
+            is_active=True, auto_sync_enabled=True, last_sync_time__isnull=False,
+        ).values_list('pk', 'last_sync_time', 'sync_interval_minutes')
+        waits = [self.max_sleep]
+        for pk, last_sync, interval in devices:
+            due = max(last_sync + timedelta(minutes=interval), self._retry_after.get(pk, now))
+            waits.append((due - now).total_seconds())
+        return max(1.0, min(waits))
+
+    def run_forever(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception('Device sync cycle failed')
+            time.sleep(self.seconds_until_next())
@@ -1,3 +1,529 @@
-from django.test import TestCase
+import asyncio
+import threading
+from unittest import mock
+from datetime import date, datetime, time, timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from employee_management.models import Department, Employee, JobTitle
+
+from .devices import DeviceSimulator
+from .ingestion import ingest_punches, parse_punches
+from .models import (
+    AttendanceDevice, AttendanceRecord, AttendanceRule, DailyAttendance, MonthlyAttendanceSummary,
+)
+from .processing import NUMPY_AVAILABLE, process_daily_attendance
+from .rules import RULES_VERSION_KEY, get_rule_index
+from .signals import calculate_monthly_summary, get_applicable_attendance_rule
+from .summaries import generate_monthly_summaries, process_dirty_summaries
+from . import sync
+from .sync import DeviceSyncScheduler
+
+
+def create_employee(employee_id, department, job_title):
+    return Employee.objects.create(
+        employee_id=employee_id,
+        first_name='موظف',
+        last_name=employee_id,
+        national_id=f'10000000{employee_id.zfill(4)}',
+        email=f'{employee_id}@example.com',
+        phone_number='0500000000',
+        address='-',
+        city='Riyadh',
+        state='Riyadh',
+        date_of_birth=date(1990, 1, 1),
+        gender='M',
+        marital_status='single',
+        department=department,
+        job_title=job_title,
+        hire_date=date(2020, 1, 1),
+    )
+
+
+class AttendanceTestMixin:
+    def setUp(self):
+        # إشارات الموظفين تنشئ ملاحظات باسم مستخدم النظام (created_by_id=1)
+        get_user_model().objects.get_or_create(pk=1, defaults={'username': 'system'})
+        self.department = Department.objects.create(dept_name='الإنتاج')
+        self.job_title = JobTitle.objects.create(job_title='فني', department=self.department)
+        self.employee = create_employee('101', self.department, self.job_title)
+        self.other = create_employee('102', self.department, self.job_title)
+        self.device = AttendanceDevice.objects.create(
+            device_name='Gate', device_type='zk_teco', ip_address='10.0.0.5', location='Gate',
+        )
+        AttendanceRule.objects.create(
+            rule_name='Default', rule_type='work_schedule',
+            work_start_time=time(8, 0), work_end_time=time(16, 0),
+            late_grace_minutes=10, effective_from=date(2024, 1, 1),
+        )
+
+    def punch(self, employee_id, day, hour, minute, punch_type, record_id=''):
+        return {
+            'employee_id': employee_id,
+            'device': self.device.pk,
+            'punch_time': datetime(2025, 3, day, hour, minute).isoformat(),
+            'punch_type': punch_type,
+            'device_record_id': record_id,
+        }
+
+
+class PunchIngestionTest(AttendanceTestMixin, TestCase):
+    def test_batch_inserts_records_and_recomputes_each_day_once(self):
+        rows = [
+            self.punch('101', 2, 8, 30, 'check_in'),
+            self.punch('101', 2, 16, 0, 'check_out'),
+            self.punch('102', 2, 7, 55, 'check_in'),
+            self.punch('102', 2, 16, 5, 'check_out'),
+            self.punch('101', 3, 8, 0, 'check_in'),
+        ]
+        result = ingest_punches(rows)
+
+        self.assertEqual(result['inserted'], 5)
+        self.assertEqual(result['days_recomputed'], 3)
+        self.assertFalse(AttendanceRecord.objects.filter(is_processed=False).exists())
+
+        late = DailyAttendance.objects.get(employee=self.employee, attendance_date=date(2025, 3, 2))
+        self.assertEqual(late.check_in_time, time(8, 30))
+        self.assertEqual(late.late_minutes, 20)
+        self.assertEqual(late.status, 'late')
+        on_time = DailyAttendance.objects.get(employee=self.other, attendance_date=date(2025, 3, 2))
+        self.assertEqual(on_time.status, 'present')
+        self.assertEqual(
+            DailyAttendance.objects.get(employee=self.employee, attendance_date=date(2025, 3, 3)).status,
+            'incomplete',
+        )
+
+    def test_reimport_is_deduplicated_on_device_record_id(self):
+        rows = [self.punch('101', 2, 8, 0, 'check_in', 'R1'), self.punch('101', 2, 8, 0, 'check_in', 'R1')]
+        first = ingest_punches(rows)
+        second = ingest_punches(rows)
+
+        self.assertEqual(first['inserted'], 1)
+        self.assertEqual(first['duplicates'], 1)
+        self.assertEqual(second['inserted'], 0)
+        self.assertEqual(second['duplicates'], 2)
+        self.assertEqual(AttendanceRecord.objects.count(), 1)
+
+    def test_later_batch_merges_into_existing_day(self):
+        ingest_punches([self.punch('101', 2, 8, 0, 'check_in')])
+        ingest_punches([self.punch('101', 2, 16, 0, 'check_out')])
+
+        daily = DailyAttendance.objects.get(employee=self.employee, attendance_date=date(2025, 3, 2))
+        self.assertEqual(daily.check_in_time, time(8, 0))
+        self.assertEqual(daily.check_out_time, time(16, 0))
+        self.assertEqual(daily.total_work_hours, 8)
+
+    def test_invalid_rows_are_reported(self):
+        rows = [
+            self.punch('999', 2, 8, 0, 'check_in'),
+            self.punch('101', 2, 8, 0, 'teleport'),
+            {**self.punch('101', 2, 8, 0, 'check_in'), 'punch_time': 'yesterday'},
+        ]
+        result = ingest_punches(rows)
+        self.assertEqual(result['inserted'], 0)
+        self.assertEqual([error['row'] for error in result['errors']], [1, 2, 3])
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        rows = [self.punch('101', day, 8, 0, 'check_in') for day in range(1, 29)]
+        rows += [self.punch('102', day, 16, 0, 'check_out') for day in range(1, 29)]
+        # عدد ثابت من الاستعلامات مهما كان عدد الأيام (القواعد تبنى في الذاكرة مرة واحدة)
+        with self.assertNumQueries(15):
+            ingest_punches(rows)
+
+    def test_parse_attlog_and_csv(self):
+        attlog = '101\t2025-03-02 08:00:00\t1\t0\t0\n101\t2025-03-02 16:00:00\t15\t1\t0\n'
+        rows = parse_punches(attlog.encode(), 'attlog')
+        self.assertEqual([row['punch_type'] for row in rows], ['check_in', 'check_out'])
+        self.assertEqual(rows[1]['verification_method'], 'face')
+
+        result = ingest_punches(rows, device=self.device)
+        self.assertEqual(result['inserted'], 2)
+        self.assertEqual(ingest_punches(rows, device=self.device)['inserted'], 0)
+
+        csv_text = 'employee_id,punch_time,punch_type\n102,2025-03-02 08:00:00,check_in\n'
+        self.assertEqual(ingest_punches(parse_punches(csv_text, 'csv'), device=self.device)['inserted'], 1)
+
+    def test_bulk_api_accepts_json_batch(self):
+        user = get_user_model().objects.get(pk=1)
+        user.user_permissions.add(Permission.objects.get(
+            codename='add_attendancerecord', content_type__app_label='attendance_system',
+        ))
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse('attendance_system:api_records_bulk'),
+            data={'device': self.device.pk, 'punches': [self.punch('101', 2, 8, 0, 'check_in')]},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['inserted'], 1)
+
+        response = self.client.post(
+            reverse('attendance_system:api_records_bulk'), data=[1, 2], content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([error['error'] for error in response.json()['errors']], ['row must be an object'] * 2)
+
+    def test_bulk_api_requires_add_permission(self):
+        user = get_user_model().objects.create_user(username='clerk', password='clerkpassword')
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse('attendance_system:api_records_bulk'),
+            data={'device': self.device.pk, 'punches': [self.punch('101', 2, 8, 0, 'check_in')]},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_file_import_requires_permission_and_reports_bad_encoding(self):
+        user = get_user_model().objects.create_user(username='clerk', password='clerkpassword')
+        self.client.force_login(user)
+        url = reverse('attendance_system:record_import')
+        csv_bytes = 'employee_id,punch_time,punch_type,notes\n101,2025-03-02 08:00:00,check_in,دخول\n'.encode('cp1256')
+
+        response = self.client.post(url, {'format': 'csv', 'file': SimpleUploadedFile('punches.csv', csv_bytes)})
+        self.assertEqual(response.status_code, 403)
+
+        user.user_permissions.add(Permission.objects.get(
+            codename='add_attendancerecord', content_type__app_label='attendance_system',
+        ))
+        response = self.client.post(url, {'format': 'csv', 'file': SimpleUploadedFile('punches.csv', csv_bytes)})
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+
+class DailyAttendanceEngineTest(AttendanceTestMixin, TestCase):
+    METRICS = [
+        'check_in_time', 'check_out_time', 'break_out_time', 'break_in_time', 'total_work_hours',
+        'break_duration_minutes', 'overtime_hours', 'late_minutes', 'early_departure_minutes', 'status',
+    ]
+
+    DAYS = {
+        2: [(8, 30, 'check_in'), (16, 0, 'check_out')],
+        3: [(7, 50, 'check_in'), (12, 0, 'break_out'), (12, 45, 'break_in'), (15, 30, 'check_out')],
+        4: [(8, 0, 'check_in'), (19, 0, 'check_out')],
+        5: [(8, 0, 'check_in')],
+        6: [(22, 0, 'check_in'), (6, 0, 'check_out')],
+    }
+
+    def setUp(self):
+        super().setUp()
+        for day, punches in self.DAYS.items():
+            for hour, minute, punch_type in punches:
+                AttendanceRecord.objects.create(
+                    employee=self.employee, device=self.device, punch_type=punch_type,
+                    punch_time=timezone.make_aware(datetime(2025, 3, day, hour, minute)),
+                    verification_method='fingerprint', device_user_id='101',
+                    device_record_id=f'{day}-{hour}-{minute}',
+                )
+
+    def snapshot(self):
+        return {
+            daily.attendance_date: [getattr(daily, field) for field in self.METRICS]
+            for daily in DailyAttendance.objects.filter(employee=self.employee)
+        }
+
+    def test_matches_per_punch_processing(self):
+        expected = self.snapshot()
+        self.assertEqual(len(expected), 5)
+
+        stats = process_daily_attendance(date(2025, 3, 1), date(2025, 3, 31), use_numpy=False)
+        self.assertEqual(stats['updated'], 5)
+        self.assertEqual(self.snapshot(), expected)
+
+        if NUMPY_AVAILABLE:
+            process_daily_attendance(date(2025, 3, 1), date(2025, 3, 31), use_numpy=True)
+            self.assertEqual(self.snapshot(), expected)
+
+    def test_marks_days_processed_and_summarises_month(self):
+        DailyAttendance.objects.all().delete()
+        stats = process_daily_attendance(date(2025, 3, 1), date(2025, 3, 31))
+
+        self.assertEqual(stats['created'], 5)
+        self.assertFalse(DailyAttendance.objects.filter(is_processed=False).exists())
+        summary = MonthlyAttendanceSummary.objects.get(employee=self.employee, year=2025, month=3)
+        self.assertEqual(summary.late_days, 2)
+        self.assertEqual(summary.early_departure_days, 1)
+
+    def test_department_filter(self):
+        other_department = Department.objects.create(dept_name='الصيانة')
+        stats = process_daily_attendance(date(2025, 3, 1), date(2025, 3, 31), department=other_department.pk)
+        self.assertEqual(stats['days'], 0)
+
+    def test_process_view_checks_permission_range_and_department(self):
+        url = reverse('attendance_system:process_daily')
+        user = get_user_model().objects.create_user(username='clerk', password='clerkpassword')
+        self.client.force_login(user)
+        self.assertEqual(self.client.post(url, {'start_date': '2025-03-01'}).status_code, 403)
+
+        user.user_permissions.add(Permission.objects.get(
+            codename='change_dailyattendance', content_type__app_label='attendance_system',
+        ))
+        self.client.post(url, {'start_date': '2023-01-01', 'end_date': '2025-03-31'})
+        self.client.post(url, {'start_date': '2025-03-01', 'department': 'x'})
+        self.assertFalse(DailyAttendance.objects.filter(processed_by=user).exists())
+
+        response = self.client.post(url, {'start_date': '2025-03-03', 'department': self.department.pk})
+        self.assertRedirects(response, reverse('attendance_system:daily_list'), fetch_redirect_response=False)
+        self.assertTrue(DailyAttendance.objects.filter(processed_by=user).exists())
+
+
+class RuleResolverTest(AttendanceTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.general = AttendanceRule.objects.get(rule_name='Default')
+        self.targeted = AttendanceRule.objects.create(
+            rule_name='Production', rule_type='work_schedule', applies_to_all=False,
+            work_start_time=time(7, 0), effective_from=date(2025, 3, 1), effective_to=date(2025, 3, 31),
+        )
+        self.targeted.departments.add(self.department)
+
+    def test_targeted_rule_wins_inside_its_interval(self):
+        self.assertEqual(get_applicable_attendance_rule(self.employee, date(2025, 3, 15)), self.targeted)
+        self.assertEqual(get_applicable_attendance_rule(self.employee, date(2025, 4, 1)), self.general)
+        self.assertIsNone(get_applicable_attendance_rule(self.employee, date(2023, 1, 1)))
+
+    def test_lookups_are_served_from_memory(self):
+        get_rule_index()
+        with self.assertNumQueries(0):
+            for day in range(1, 31):
+                get_applicable_attendance_rule(self.employee, date(2025, 3, day))
+
+    def test_shared_version_is_read_at_most_once_per_interval(self):
+        index = get_rule_index()
+        with mock.patch('attendance_system.rules.cache') as shared:
+            for day in range(1, 31):
+                get_applicable_attendance_rule(self.employee, date(2025, 3, day))
+            shared.get.assert_not_called()
+
+        # تغيير من عملية أخرى يظهر بعد انقضاء المدة
+        cache.incr(RULES_VERSION_KEY)
+        self.assertIs(get_rule_index(), index)
+        with mock.patch('attendance_system.rules._checked_at', 0.0):
+            self.assertIsNot(get_rule_index(), index)
+
+    def test_m2m_and_rule_changes_rebuild_the_index(self):
+        self.assertEqual(get_applicable_attendance_rule(self.employee, date(2025, 3, 15)), self.targeted)
+
+        self.targeted.departments.remove(self.department)
+        self.assertEqual(get_applicable_attendance_rule(self.employee, date(2025, 3, 15)), self.general)
+
+        self.targeted.job_titles.add(self.job_title)
+        self.assertEqual(get_applicable_attendance_rule(self.employee, date(2025, 3, 15)), self.targeted)
+
+        self.targeted.is_active = False
+        self.targeted.save()
+        self.assertEqual(get_applicable_attendance_rule(self.employee, date(2025, 3, 15)), self.general)
+
+
+class MonthlySummaryTest(AttendanceTestMixin, TestCase):
+    def add_day(self, employee, day, status, hours='8.00', late=0):
+        return DailyAttendance.objects.create(
+            employee=employee, attendance_date=date(2025, 3, day), status=status,
+            total_work_hours=hours, late_minutes=late, is_processed=True,
+        )
+
+    def test_summary_is_one_aggregate_query(self):
+        self.add_day(self.employee, 2, 'present')
+        self.add_day(self.employee, 3, 'late', late=15)
+        self.add_day(self.employee, 4, 'absent', hours='0')
+        self.add_day(self.employee, 5, 'holiday', hours='0')
+        summary = MonthlyAttendanceSummary.objects.create(employee=self.employee, year=2025, month=3)
+
+        with self.assertNumQueries(2):
+            calculate_monthly_summary(summary)
+
+        self.assertEqual(summary.total_working_days, 3)
+        self.assertEqual(summary.present_days, 2)
+        self.assertEqual(summary.late_days, 1)
+        self.assertEqual(summary.absent_days, 1)
+        self.assertEqual(summary.holiday_days, 1)
+        self.assertEqual(summary.total_late_minutes, 15)
+        self.assertEqual(summary.total_work_hours, 16)
+
+    def test_daily_saves_are_coalesced_until_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            for day in range(1, 11):
+                self.add_day(self.employee, day, 'present')
+            self.assertFalse(MonthlyAttendanceSummary.objects.exists())
+
+        # عشرة أيام في معاملة واحدة تعيد حساب الشهر مرة واحدة فقط
+        with self.assertNumQueries(5):
+            for callback in callbacks:
+                callback()
+        summary = MonthlyAttendanceSummary.objects.get(employee=self.employee, year=2025, month=3)
+        self.assertEqual(summary.present_days, 10)
+
+    def test_one_hook_per_transaction_and_rolled_back_keys_are_dropped(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            try:
+                with transaction.atomic():
+                    self.add_day(self.other, 2, 'present')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            for day in range(1, 6):
+                self.add_day(self.employee, day, 'present')
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(
+            list(MonthlyAttendanceSummary.objects.values_list('employee_id', flat=True)), [self.employee.pk],
+        )
+
+    @override_settings(ATTENDANCE_SUMMARY_DEFERRED=True)
+    def test_deferred_mode_flags_summaries_for_the_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_day(self.employee, 2, 'present')
+        summary = MonthlyAttendanceSummary.objects.get(employee=self.employee, year=2025, month=3)
+        self.assertTrue(summary.needs_recalculation)
+        self.assertEqual(summary.present_days, 0)
+
+        self.assertEqual(process_dirty_summaries(), 1)
+        summary.refresh_from_db()
+        self.assertFalse(summary.needs_recalculation)
+        self.assertEqual(summary.present_days, 1)
+
+    def test_generate_for_all_employees_in_one_grouped_query(self):
+        self.add_day(self.employee, 2, 'present')
+        self.add_day(self.other, 2, 'late', late=5)
+        MonthlyAttendanceSummary.objects.all().delete()
+
+        # تجميع واحد + قراءة الملخصات الحالية + إدخال مجمع (داخل نقطة حفظ)
+        with self.assertNumQueries(5):
+            created, updated = generate_monthly_summaries(2025, 3)
+        self.assertEqual((created, updated), (2, 0))
+        self.assertEqual(
+            MonthlyAttendanceSummary.objects.get(employee=self.other, year=2025, month=3).late_days, 1
+        )
+
+    def test_finalized_summaries_are_not_regenerated(self):
+        self.add_day(self.employee, 2, 'present')
+        generate_monthly_summaries(2025, 3)
+        MonthlyAttendanceSummary.objects.update(is_finalized=True)
+        self.add_day(self.employee, 3, 'present')
+
+        self.assertEqual(generate_monthly_summaries(2025, 3), (0, 0))
+        self.assertEqual(MonthlyAttendanceSummary.objects.get(employee=self.employee).present_days, 1)
+
+    def test_generate_view_requires_change_permission(self):
+        self.add_day(self.employee, 2, 'present')
+        MonthlyAttendanceSummary.objects.all().delete()
+        user = get_user_model().objects.create_user(username='clerk', password='clerkpassword')
+        self.client.force_login(user)
+        url = reverse('attendance_system:generate_summary')
+
+        self.assertEqual(self.client.post(url, {'year': 2025, 'month': 3}).status_code, 403)
+        self.assertFalse(MonthlyAttendanceSummary.objects.exists())
+
+        user.user_permissions.add(Permission.objects.get(
+            codename='change_monthlyattendancesummary', content_type__app_label='attendance_system',
+        ))
+        self.client.post(url, {'year': 2025, 'month': 3})
+        self.assertTrue(MonthlyAttendanceSummary.objects.filter(employee=self.employee).exists())
+
+
+class AutocommitSummaryTest(AttendanceTestMixin, TransactionTestCase):
+    def test_save_outside_a_transaction_refreshes_the_summary(self):
+        DailyAttendance.objects.create(
+            employee=self.employee, attendance_date=date(2025, 3, 2), status='present',
+            total_work_hours='8.00', is_processed=True,
+        )
+        summary = MonthlyAttendanceSummary.objects.get(employee=self.employee, year=2025, month=3)
+        self.assertEqual(summary.present_days, 1)
+
+
+@override_settings(ATTENDANCE_DEVICE_DRIVER='simulator')
+class DeviceSyncTest(AttendanceTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.simulator = DeviceSimulator(ports=[0, 0, 0], user_ids=['101', '102'])
+        ports = asyncio.run_coroutine_threadsafe(self.simulator.start(), self.loop).result(5)
+        self.device.delete()
+        self.devices = [
+            AttendanceDevice.objects.create(
+                device_name=f'Sim {port}', device_type='other', ip_address='127.0.0.1',
+                port=port, location='Lab', sync_interval_minutes=5,
+            )
+            for port in ports
+        ]
+
+    def tearDown(self):
+        asyncio.run_coroutine_threadsafe(self.simulator.stop(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop.close()
+
+    def test_devices_are_synced_incrementally_from_their_watermark(self):
+        scheduler = DeviceSyncScheduler(workers=3, timeout=2)
+        now = timezone.now()
+
+        first = scheduler.run_once(now=now)
+        self.assertEqual(first['devices'], 3)
+        self.assertEqual(first['inserted'], 3 * 2 * 2)
+        self.assertEqual(AttendanceRecord.objects.count(), 12)
+        self.assertTrue(all(d.is_online for d in AttendanceDevice.objects.all()))
+
+        # لم يحن موعد أي جهاز بعد
+        self.assertEqual(scheduler.run_once(now=now + timedelta(minutes=1))['devices'], 0)
+
+        for device in self.simulator.devices:
+            device.tick()
+        later = scheduler.run_once(now=now + timedelta(minutes=5))
+        self.assertEqual(later['inserted'], 3)
+        # العلامة المائية شاملة، لذلك يعاد فقط ما يساويها أو يليها
+        self.assertLess(later['fetched'], 12)
+
+    def test_unreachable_device_is_marked_offline_and_backed_off(self):
+        dead = AttendanceDevice.objects.create(
+            device_name='Dead', device_type='other', ip_address='127.0.0.1', port=1, location='Lab',
+        )
+        scheduler = DeviceSyncScheduler(workers=4, timeout=1)
+        now = timezone.now()
+
+        result = scheduler.run_once(now=now)
+        self.assertEqual(result['failed'], [dead.pk])
+        self.assertEqual(result['inserted'], 12)
+        dead.refresh_from_db()
+        self.assertFalse(dead.is_online)
+        self.assertIsNone(dead.last_sync_time)
+
+        self.assertEqual(scheduler.run_once(now=now + timedelta(minutes=1))['devices'], 0)
+
+    def test_malformed_reply_fails_only_that_device(self):
+        broken = self.devices[0]
+        fetch = sync._fetch
+
+        def flaky_fetch(device, since, timeout):
+            if device.pk == broken.pk:
+                raise KeyError('records')
+            return fetch(device, since, timeout)
+
+        with mock.patch.object(sync, '_fetch', side_effect=flaky_fetch):
+            result = DeviceSyncScheduler(workers=3, timeout=2).run_once()
+
+        self.assertEqual(result['failed'], [broken.pk])
+        self.assertEqual(result['inserted'], 2 * 2 * 2)
+        broken.refresh_from_db()
+        self.assertFalse(broken.is_online)
+
+    def test_sync_view_requires_add_permission(self):
+        user = get_user_model().objects.create_user(username='clerk', password='clerkpassword')
+        self.client.force_login(user)
+        url = reverse('attendance_system:device_sync', args=[self.devices[0].pk])
+        self.assertEqual(self.client.post(url).status_code, 403)
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+        user.user_permissions.add(Permission.objects.get(
+            codename='add_attendancerecord', content_type__app_label='attendance_system',
+        ))
+        response = self.client.post(url)
+        self.assertEqual(response.json()['inserted'], 2 * 2)
@@ -72,6 +72,7 @@ api_patterns = [
     path('devices/', views.AttendanceDeviceAPIView.as_view(), name='api_devices'),
     path('rules/', views.AttendanceRuleAPIView.as_view(), name='api_rules'),
     path('records/', views.AttendanceRecordAPIView.as_view(), name='api_records'),
+    path('records/bulk/', views.AttendanceRecordBulkAPIView.as_view(), name='api_records_bulk'),
     path('daily/', views.DailyAttendanceAPIView.as_view(), name='api_daily'),
     path('exceptions/', views.AttendanceExceptionAPIView.as_view(), name='api_exceptions'),
     path('summaries/', views.MonthlyAttendanceSummaryAPIView.as_view(), name='api_summaries'),
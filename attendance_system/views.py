@@ -2,17 +2,43 @@
 Attendance System Views
 Basic view stubs for attendance system application
 """
-from django.shortcuts import render, redirect
+import json
+
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView, ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib import messages
+from django.core.exceptions import PermissionDenied
 from django.urls import reverse_lazy
 from django.http import JsonResponse
+from django.utils.dateparse import parse_date
+from employee_management.models import Department
 from .models import (
     AttendanceDevice, AttendanceRule, AttendanceRecord,
     DailyAttendance, AttendanceException, MonthlyAttendanceSummary
 )
+from .ingestion import SOURCE_FORMATS, PunchImportError, ingest_punches, parse_punches
+from .processing import process_daily_attendance
+from .summaries import generate_monthly_summaries
+from .sync import sync_devices
+
+
+# أقصى فترة تعالج في طلب واحد؛ الفترات الأطول عبر أمر الإدارة
+MAX_PROCESS_DAYS = 31
+
+
+def _department_param(request):
+    """القسم المحدد في النموذج أو None (Optional department id; ValueError if not a number)"""
+    value = request.POST.get('department')
+    return int(value) if value else None
+
+
+def _import_device(value):
+    """الجهاز المحدد في الطلب إن وجد (Optional device that applies to the whole batch)"""
+    if not value:
+        return None
+    return AttendanceDevice.objects.filter(pk=value).first() if str(value).isdigit() else None
 
 
 @method_decorator(login_required, name='dispatch')
@@ -74,6 +100,26 @@ class AttendanceDeviceDeleteView(DeleteView):
 class AttendanceDeviceSyncView(TemplateView):
     template_name = 'attendance_system/device_sync.html'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['device'] = get_object_or_404(AttendanceDevice, pk=self.kwargs['pk'])
+        return context
+
+    def post(self, request, *args, **kwargs):
+        # المزامنة تدرج بصمات جديدة
+        if not request.user.has_perm('attendance_system.add_attendancerecord'):
+            raise PermissionDenied
+        device = get_object_or_404(AttendanceDevice, pk=self.kwargs['pk'])
+        result = sync_devices([device], workers=1)
+        if result['failed']:
+            return JsonResponse({'success': False, 'error': 'تعذر الاتصال بالجهاز'}, status=502)
+        return JsonResponse({
+            'success': True,
+            'fetched': result['fetched'],
+            'inserted': result['inserted'],
+            'duplicates': result['duplicates'],
+        })
+
 
 @method_decorator(login_required, name='dispatch')
 class AttendanceDeviceTestView(TemplateView):
@@ -156,6 +202,38 @@ class ManualAttendanceRecordView(TemplateView):
 class AttendanceRecordImportView(TemplateView):
     template_name = 'attendance_system/record_import.html'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update({
+            'devices': AttendanceDevice.objects.filter(is_active=True),
+            'formats': SOURCE_FORMATS,
+        })
+        return context
+
+    def post(self, request, *args, **kwargs):
+        if not request.user.has_perm('attendance_system.add_attendancerecord'):
+            raise PermissionDenied
+        upload = request.FILES.get('file')
+        source_format = request.POST.get('format', 'csv')
+        if not upload:
+            messages.error(request, 'يرجى اختيار ملف البصمات')
+            return redirect('attendance_system:record_import')
+
+        try:
+            rows = parse_punches(upload.read(), source_format)
+        except PunchImportError as exc:
+            messages.error(request, f'تعذر قراءة الملف: {exc}')
+            return redirect('attendance_system:record_import')
+
+        result = ingest_punches(rows, device=_import_device(request.POST.get('device')))
+        messages.success(
+            request,
+            f"تم استيراد {result['inserted']} سجل، "
+            f"وتجاهل {result['duplicates']} سجل مكرر، "
+            f"و{len(result['errors'])} سجل غير صالح"
+        )
+        return redirect('attendance_system:record_list')
+
 
 # Daily Attendance Views
 @method_decorator(login_required, name='dispatch')
@@ -194,6 +272,39 @@ class MyDailyAttendanceView(TemplateView):
 class ProcessDailyAttendanceView(TemplateView):
     template_name = 'attendance_system/process_daily.html'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['departments'] = Department.objects.filter(is_active=True)
+        return context
+
+    def post(self, request, *args, **kwargs):
+        if not request.user.has_perm('attendance_system.change_dailyattendance'):
+            raise PermissionDenied
+        try:
+            start_date = parse_date(request.POST.get('start_date', ''))
+            end_date = parse_date(request.POST.get('end_date', '')) or start_date
+            department = _department_param(request)
+        except ValueError:
+            start_date = None
+        if not start_date or end_date < start_date:
+            messages.error(request, 'يرجى تحديد فترة وقسم صحيحين')
+            return redirect('attendance_system:process_daily')
+        if (end_date - start_date).days >= MAX_PROCESS_DAYS:
+            messages.error(request, f'لا يمكن معالجة أكثر من {MAX_PROCESS_DAYS} يوماً في طلب واحد')
+            return redirect('attendance_system:process_daily')
+
+        stats = process_daily_attendance(
+            start_date, end_date,
+            department=department,
+            processed_by=request.user,
+        )
+        messages.success(
+            request,
+            f"تمت معالجة {stats['days']} يوم حضور من {stats['punches']} بصمة "
+            f"({stats['created']} جديد، {stats['updated']} محدث)"
+        )
+        return redirect('attendance_system:daily_list')
+
 
 # Exception Views
 @method_decorator(login_required, name='dispatch')
@@ -265,6 +376,28 @@ class EmployeeMonthlySummaryView(TemplateView):
 class GenerateMonthlySummaryView(TemplateView):
     template_name = 'attendance_system/generate_summary.html'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['departments'] = Department.objects.filter(is_active=True)
+        return context
+
+    def post(self, request, *args, **kwargs):
+        if not request.user.has_perm('attendance_system.change_monthlyattendancesummary'):
+            raise PermissionDenied
+        try:
+            year = int(request.POST.get('year', ''))
+            month = int(request.POST.get('month', ''))
+            if not 1 <= month <= 12:
+                raise ValueError
+            department = _department_param(request)
+        except ValueError:
+            messages.error(request, 'يرجى تحديد سنة وشهر وقسم صحيحين')
+            return redirect('attendance_system:generate_summary')
+
+        created, updated = generate_monthly_summaries(year, month, department=department)
+        messages.success(request, f'تم إنشاء {created} ملخص وتحديث {updated} ملخص لشهر {month}/{year}')
+        return redirect('attendance_system:summary_list')
+
 
 @method_decorator(login_required, name='dispatch')
 class FinalizeMonthlySummaryView(TemplateView):
@@ -311,6 +444,31 @@ class AttendanceRecordAPIView(TemplateView):
         return JsonResponse({'message': 'Attendance Record API endpoint'})
 
 
+@method_decorator(login_required, name='dispatch')
+class AttendanceRecordBulkAPIView(TemplateView):
+    """
+    استيراد دفعة من البصمات عبر JSON أو ملف مرفوع
+    (Bulk punch ingestion: JSON body ``{"device": id, "punches": [...]}`` or a file upload)
+    """
+
+    def post(self, request, *args, **kwargs):
+        if not request.user.has_perm('attendance_system.add_attendancerecord'):
+            raise PermissionDenied
+        try:
+            if request.FILES.get('file'):
+                rows = parse_punches(request.FILES['file'].read(), request.POST.get('format', 'csv'))
+                device = _import_device(request.POST.get('device'))
+            else:
+                rows = parse_punches(request.body, 'json')
+                payload = json.loads(request.body)
+                device = _import_device(payload.get('device') if isinstance(payload, dict) else None)
+        except PunchImportError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+
+        result = ingest_punches(rows, device=device)
+        return JsonResponse(result, status=201 if result['inserted'] else 200)
+
+
 @method_decorator(login_required, name='dispatch')
 class DailyAttendanceAPIView(TemplateView):
     def get(self, request, *args, **kwargs):
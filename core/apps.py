@@ -7,4 +7,8 @@ class CoreConfig(AppConfig):
     
     def ready(self):
         # Import the custom collations module to register the collations
-        import core.db_collations
\ No newline at end of file
+        import core.db_collations
+
+        # تسجيل تغييرات النماذج المتزامنة (Feed the delta-sync change log)
+        from core.changes import connect_change_log
+        connect_change_log()
@@ -0,0 +1,175 @@
+"""
+ذاكرة تخزين مؤقت مشتركة على SQLite
+(SQLite-backed cache shared by every process on the host)
+
+A Django cache backend that needs no external service: entries live in one
+SQLite file in WAL mode, so all workers of the deployment see the same
+throttle counters, version keys and cached statistics, and they survive a
+restart. Integers are stored as SQL integers so ``incr`` is a single atomic
+``UPDATE``; other values are pickled.
+
+Configure with ``'BACKEND': 'core.cache.SQLiteCache'`` and the database file
+as ``LOCATION``. Expired rows are removed on read and culled periodically
+once ``MAX_ENTRIES`` is exceeded.
+
+Consumers reach the named aliases of ``settings.CACHES`` through the
+proxies below, like ``django.core.cache.cache`` for ``default``.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.connection import ConnectionProxy
+
+THROTTLE_CACHE_ALIAS = 'throttle'
+STATS_CACHE_ALIAS = 'stats'
+AI_CACHE_ALIAS = 'ai'
+
+# عدادات تحديد معدل الطلبات (API rate limit counters)
+throttle_cache = ConnectionProxy(caches, THROTTLE_CACHE_ALIAS)
+# التقارير والإحصائيات المحسوبة (Cached reports and statistics)
+stats_cache = ConnectionProxy(caches, STATS_CACHE_ALIAS)
+# ردود نماذج الذكاء الاصطناعي (Cached AI model responses)
+ai_cache = ConnectionProxy(caches, AI_CACHE_ALIAS)
+
+# كل كم عملية كتابة يفحص حجم الجدول (Writes between two cull checks)
+CULL_EVERY = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    cache_key TEXT PRIMARY KEY,
+    value BLOB,
+    expires REAL
+)
+"""
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+
+    def _connection(self):
+        """اتصال لكل خيط ولكل عملية (One connection per thread and process)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+            self._local.writes = 0
+        return connection
+
+    @staticmethod
+    def _encode(value):
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _after_write(self, connection):
+        self._local.writes += 1
+        if self._local.writes % CULL_EVERY == 0:
+            self._cull(connection)
+
+    def _cull(self, connection):
+        connection.execute('DELETE FROM cache_entries WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+        count = connection.execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+        if count > self._max_entries:
+            connection.execute(
+                'DELETE FROM cache_entries WHERE cache_key IN ('
+                'SELECT cache_key FROM cache_entries ORDER BY expires IS NULL, expires LIMIT ?)',
+                (max(count // self._cull_frequency, 1) if self._cull_frequency else count,),
+            )
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        row = connection.execute(
+            'SELECT value, expires FROM cache_entries WHERE cache_key = ?', (key,),
+        ).fetchone()
+        if row is None:
+            return default
+        if row[1] is not None and row[1] <= time.time():
+            connection.execute('DELETE FROM cache_entries WHERE cache_key = ? AND expires <= ?', (key, time.time()))
+            return default
+        return self._decode(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache_entries (cache_key, value, expires) VALUES (?, ?, ?)',
+            (key, self._encode(value), self.get_backend_timeout(timeout)),
+        )
+        self._after_write(connection)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute('DELETE FROM cache_entries WHERE cache_key = ? AND expires <= ?', (key, time.time()))
+            added = connection.execute(
+                'INSERT OR IGNORE INTO cache_entries (cache_key, value, expires) VALUES (?, ?, ?)',
+                (key, self._encode(value), self.get_backend_timeout(timeout)),
+            ).rowcount == 1
+        self._after_write(connection)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute(
+            'UPDATE cache_entries SET expires = ? WHERE cache_key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        ).rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        """
+        زيادة ذرية في قاعدة البيانات
+        (Atomic increment; raises ValueError for a missing or non-integer key)
+        """
+        key = self.make_and_validate_key(key, version=version)
+        rows = self._connection().execute(
+            "UPDATE cache_entries SET value = value + ? WHERE cache_key = ? AND typeof(value) = 'integer' "
+            'AND (expires IS NULL OR expires > ?) RETURNING value',
+            (delta, key, time.time()),
+        ).fetchall()
+        if not rows:
+            raise ValueError("Key '%s' not found" % key)
+        return rows[0][0]
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute(
+            'DELETE FROM cache_entries WHERE cache_key = ?', (key,),
+        ).rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute(
+            'SELECT 1 FROM cache_entries WHERE cache_key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache_entries')
+
+    def close(self, **kwargs):
+        # الاتصالات تبقى مفتوحة طوال عمر الخيط لتجنب إعادة فتح الملف مع كل طلب
+        pass
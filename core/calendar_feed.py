@@ -0,0 +1,75 @@
+"""
+أدوات مشتركة لخلاصات التقويم بصيغة JSON
+(Shared helpers for range-bounded JSON calendar feeds)
+"""
+import hashlib
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+# أقصى مدة يمكن طلبها في نافذة واحدة (Maximum window a single request may cover)
+MAX_RANGE_DAYS = 62
+
+
+class CalendarRangeError(ValueError):
+    """خطأ في معاملات نطاق التقويم (Invalid calendar range parameters)"""
+
+
+def _parse_bound(value):
+    if not value:
+        return None
+    parsed = parse_datetime(value.replace(' ', '+'))
+    if parsed is None:
+        day = parse_date(value[:10])
+        if day is None:
+            return None
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_calendar_range(request):
+    """
+    قراءة معاملات start/end من الطلب والتحقق منها
+    (Read and validate the start/end window sent by the calendar widget)
+
+    Returns aware datetimes ``(start, end)``; raises ``CalendarRangeError`` when
+    a bound is missing, malformed, reversed or wider than ``MAX_RANGE_DAYS``.
+    """
+    start = _parse_bound(request.GET.get('start'))
+    end = _parse_bound(request.GET.get('end'))
+    if start is None or end is None:
+        raise CalendarRangeError('start and end are required ISO dates')
+    if end <= start:
+        raise CalendarRangeError('end must be after start')
+    if end - start > timedelta(days=MAX_RANGE_DAYS):
+        raise CalendarRangeError(f'range may not exceed {MAX_RANGE_DAYS} days')
+    return start, end
+
+
+def calendar_range_error_response(error):
+    """استجابة خطأ موحدة لنطاق غير صالح (Uniform 400 response for a bad range)"""
+    return JsonResponse({'error': str(error)}, status=400)
+
+
+def etag_json_response(request, data):
+    """
+    إرجاع JSON مع ETag والرد بـ 304 إذا لم تتغير البيانات
+    (Return JSON with a strong ETag, answering If-None-Match with 304)
+    """
+    body = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':'))
+    etag = '"{}"'.format(hashlib.md5(body.encode('utf-8')).hexdigest())
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    if etag in [tag.strip() for tag in if_none_match.split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json; charset=utf-8')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
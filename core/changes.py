@@ -0,0 +1,220 @@
+"""
+سجل التغييرات للمزامنة التزايدية
+(Change log for incremental delta sync)
+
+Saving or deleting a tracked model appends one row to ``ChangeLogEntry``
+inside the same transaction, so a rolled back write leaves no entry. The
+entry id is the change token: a client that has seen everything up to
+token ``n`` asks for the entries of its model with ``id > n`` through the
+``(model_label, id)`` index, so a sync costs in proportion to the number
+of changes, not to the size of the table.
+
+Ids are assigned at insert time but become visible at commit, so a write
+that commits late could hide behind a token a client has already passed.
+Entries younger than ``CHANGE_LOG_LAG_SECONDS`` (default 5) are held back
+until the next sync for that reason, and the bound is enforced on the
+writer's side: a transaction that commits more than half the lag after
+logging its changes logs them again, with new ids, right after the commit.
+The repeated entries are harmless, since only the last action of a row
+counts.
+
+Bulk writes (``QuerySet.update``, ``bulk_create``) send no signals; code
+that uses them on a tracked model calls ``record_changes`` itself.
+
+Every write to a tracked or otherwise versioned model also bumps a
+per-model version counter in the shared ``stats`` cache. Response caches
+(``api.caching``) derive their validators from these counters, so they
+can tell that nothing changed without querying the tables. A counter
+missing from the cache (never set, evicted or flushed) is seeded with the
+current time in nanoseconds, above any value it held before, so an old
+ETag is never handed out again.
+"""
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .cache import stats_cache
+
+from .models import ChangeLogEntry
+
+TRACKED_MODELS = [
+    'tasks.Task',
+    'meetings.Meeting',
+    'inventory.TblProducts',
+    'hr_stubs.Employee',
+]
+
+# نماذج لها عداد إصدار فقط دون سجل تغييرات
+VERSIONED_MODELS = TRACKED_MODELS + [
+    'inventory.TblCategories',
+    'inventory.Product',
+    'inventory.Category',
+    'hr_stubs.Department',
+    'api.AIConfiguration',
+    settings.AUTH_USER_MODEL,
+]
+
+DEFAULT_LAG_SECONDS = 5
+MODEL_VERSION_KEY = 'changes:version:{label}'
+
+
+class ChangeTokenExpired(Exception):
+    """الرمز أقدم من السجل المحفوظ؛ يلزم مزامنة كاملة (Token predates the retained log)"""
+
+
+def is_tracked(model):
+    return model._meta.label in TRACKED_MODELS
+
+
+def _version_key(model):
+    return MODEL_VERSION_KEY.format(label=model._meta.label_lower)
+
+
+def model_versions(models):
+    """
+    أرقام إصدارات النماذج من الذاكرة المشتركة
+    (Current version counters of ``models``, in order, with one cache round trip)
+    """
+    keys = [_version_key(model) for model in models]
+    versions = stats_cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            seed = time.time_ns()
+            stats_cache.add(key, seed, None)
+            versions[key] = stats_cache.get(key, seed)
+    return [versions[key] for key in keys]
+
+
+def _increment_version(key):
+    try:
+        stats_cache.incr(key)
+    except ValueError:
+        stats_cache.add(key, time.time_ns(), None)
+
+
+def bump_model_version(model):
+    """
+    زيادة رقم إصدار النموذج
+    (Bump the version of ``model`` now, and again when the transaction commits)
+
+    The immediate bump stops readers from reusing responses cached before
+    the write; the second one drops anything cached from the
+    not-yet-committed state in between.
+    """
+    key = _version_key(model)
+    _increment_version(key)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _increment_version(key))
+
+
+def _lag():
+    return timedelta(seconds=getattr(settings, 'CHANGE_LOG_LAG_SECONDS', DEFAULT_LAG_SECONDS))
+
+
+def _log_entries(label, pks, action):
+    ChangeLogEntry.objects.bulk_create(
+        [ChangeLogEntry(model_label=label, object_pk=str(pk), action=action) for pk in pks],
+        batch_size=1000,
+    )
+
+
+def _relog_if_late(label, pks, action, logged_at):
+    """إعادة تسجيل تغييرات معاملة التزمت متأخرة (Log again after a late commit)"""
+    # نصف المهلة هامش لفروق الساعة بين الخوادم
+    if timezone.now() - logged_at >= _lag() / 2:
+        _log_entries(label, pks, action)
+
+
+def record_changes(model, pks, action='upsert'):
+    """تسجيل تغيير عدة سجلات دفعة واحدة (Log a change of several rows at once)"""
+    label = model._meta.label_lower
+    pks = list(pks)
+    logged_at = timezone.now()
+    _log_entries(label, pks, action)
+    bump_model_version(model)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _relog_if_late(label, pks, action, logged_at))
+
+
+def _record_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_changes(sender, [instance.pk])
+
+
+def _record_delete(sender, instance, **kwargs):
+    record_changes(sender, [instance.pk], action='delete')
+
+
+def _bump_version(sender, **kwargs):
+    bump_model_version(sender)
+
+
+def connect_change_log():
+    for label in TRACKED_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(_record_save, sender=model, dispatch_uid=f'change_log_save_{label}')
+        post_delete.connect(_record_delete, sender=model, dispatch_uid=f'change_log_delete_{label}')
+    for label in VERSIONED_MODELS:
+        if label not in TRACKED_MODELS:
+            model = apps.get_model(label)
+            post_save.connect(_bump_version, sender=model, dispatch_uid=f'model_version_save_{label}')
+            post_delete.connect(_bump_version, sender=model, dispatch_uid=f'model_version_delete_{label}')
+
+
+def _cutoff():
+    return timezone.now() - _lag()
+
+
+def current_token():
+    """
+    أحدث رمز يمكن تقديمه الآن
+    (Newest token that is safe to hand out: the last entry older than the lag)
+    """
+    return ChangeLogEntry.objects.filter(changed_at__lt=_cutoff()).order_by('-id').values_list(
+        'id', flat=True,
+    ).first() or 0
+
+
+def changes_since(model, token=None, since_time=None, limit=500):
+    """
+    التغييرات منذ رمز أو وقت محدد
+    (Changes of ``model`` after ``token``, or after ``since_time``)
+
+    Returns ``(upserted_pks, deleted_pks, next_token, has_more)``; only the
+    last action of each row counts. Raises ``ChangeTokenExpired`` when older
+    entries have been pruned past the token.
+    """
+    watermark = current_token()
+    entries = ChangeLogEntry.objects.filter(model_label=model._meta.label_lower, id__lte=watermark)
+    if token is not None:
+        oldest = ChangeLogEntry.objects.order_by('id').values_list('id', flat=True).first()
+        if oldest is not None and token < oldest - 1:
+            raise ChangeTokenExpired(token)
+        entries = entries.filter(id__gt=token)
+    elif since_time is not None:
+        entries = entries.filter(changed_at__gt=since_time)
+
+    rows = list(entries.order_by('id').values_list('id', 'object_pk', 'action')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    latest = {}
+    for _, pk, action in rows:
+        latest.pop(pk, None)
+        latest[pk] = action
+    pk_field = model._meta.pk
+    upserted = [pk_field.to_python(pk) for pk, action in latest.items() if action == 'upsert']
+    deleted = [pk_field.to_python(pk) for pk, action in latest.items() if action == 'delete']
+    next_token = rows[-1][0] if has_more else max(watermark, token or 0)
+    return upserted, deleted, next_token, has_more
+
+
+def prune_change_log(days):
+    """حذف التغييرات الأقدم من عدد أيام (Delete entries older than ``days``)"""
+    deleted, _ = ChangeLogEntry.objects.filter(changed_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
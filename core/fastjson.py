@@ -0,0 +1,79 @@
+"""
+ترميز JSON سريع
+(Fast JSON encoding for API and AJAX responses)
+
+``dumps`` encodes with ``orjson`` when it is installed and falls back to
+the standard library otherwise; both produce the same document. Decimal
+values are written as JSON numbers, dates and datetimes as ISO 8601,
+UUIDs as strings and lazy translation strings as their text, so views
+can hand querysets' ``values()`` straight over instead of converting
+every row in Python.
+
+``FastJsonResponse`` is a drop-in for ``JsonResponse``; the DRF renderer
+is ``api.renderers.FastJSONRenderer``.
+"""
+import datetime
+import decimal
+import json
+import uuid
+
+from django.http import HttpResponse
+from django.utils.functional import Promise
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+def _default(value):
+    """أنواع لا يرمزها orjson مباشرة (Types orjson does not encode natively)"""
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, Promise):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+class FastJSONEncoder(json.JSONEncoder):
+    """مرمز المكتبة القياسية بنفس مخرجات orjson (Stdlib fallback matching orjson's output)"""
+
+    def default(self, value):
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        return _default(value)
+
+
+def dumps(data, indent=False, default=None):
+    """
+    ترميز البيانات إلى بايتات UTF-8
+    (Encode ``data`` as UTF-8 JSON bytes; ``default`` handles extra types)
+    """
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=default or _default, option=option)
+    return json.dumps(
+        data, cls=FastJSONEncoder, default=default, ensure_ascii=False, allow_nan=False,
+        indent=2 if indent else None, separators=None if indent else (',', ':'),
+    ).encode('utf-8')
+
+
+class FastJsonResponse(HttpResponse):
+    """
+    رد JSON بالترميز السريع
+    (``JsonResponse`` encoded with ``dumps``)
+    """
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError('In order to allow non-dict objects to be serialized set the safe parameter to False.')
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
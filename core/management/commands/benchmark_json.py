@@ -0,0 +1,96 @@
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core import fastjson
+
+
+def product_rows(count, seed):
+    """صفوف أصناف بنفس شكل values() (Rows shaped like a TblProducts values() query)"""
+    generator = random.Random(seed)
+    stamp = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+    return [
+        {
+            'product_id': f'P{number:06d}',
+            'product_name': f'صنف رقم {number}',
+            'qte_in_stock': Decimal(generator.randint(0, 100000)).scaleb(-2),
+            'minimum_threshold': Decimal(generator.randint(0, 5000)).scaleb(-2),
+            'maximum_threshold': Decimal(generator.randint(5000, 90000)).scaleb(-2),
+            'unit_price': Decimal(generator.randint(100, 1000000)).scaleb(-2),
+            'cat_name': 'قطع غيار',
+            'cat_id': generator.randint(1, 40),
+            'location': f'A-{generator.randint(1, 99)}',
+            'updated_at': stamp,
+            'token': uuid.UUID(int=number),
+        }
+        for number in range(count)
+    ]
+
+
+def float_loop(rows):
+    """التحويل اليدوي الحالي في العروض (The per-row float() conversion the views do today)"""
+    return [
+        {
+            **row,
+            'qte_in_stock': float(row['qte_in_stock'] or 0),
+            'minimum_threshold': float(row['minimum_threshold'] or 0),
+            'maximum_threshold': float(row['maximum_threshold'] or 0),
+            'unit_price': float(row['unit_price'] or 0),
+        }
+        for row in rows
+    ]
+
+
+class Command(BaseCommand):
+    help = 'قياس سرعة ترميز JSON على قائمة أصناف كبيرة'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=20000, help='عدد الأصناف (الافتراضي: 20000)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=5, help='أفضل زمن من عدة تكرارات')
+
+    def handle(self, *args, **options):
+        rows = product_rows(options['count'], options['seed'])
+        payload = {'success': True, 'products': rows, 'count': len(rows)}
+
+        def stdlib_json_response():
+            data = {**payload, 'products': float_loop(rows)}
+            return json.dumps(data, cls=DjangoJSONEncoder).encode('utf-8')
+
+        def fastjson_stdlib():
+            available, fastjson.ORJSON_AVAILABLE = fastjson.ORJSON_AVAILABLE, False
+            try:
+                return fastjson.dumps(payload)
+            finally:
+                fastjson.ORJSON_AVAILABLE = available
+
+        encoders = [('JsonResponse', stdlib_json_response), ('stdlib', fastjson_stdlib)]
+        if fastjson.ORJSON_AVAILABLE:
+            encoders.append(('orjson', lambda: fastjson.dumps(payload)))
+
+        reference = None
+        timings = {}
+        for name, encode in encoders:
+            best = None
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                body = encode()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = (best, len(body))
+            if name != 'JsonResponse':
+                decoded = json.loads(body)
+                if reference is None:
+                    reference = decoded
+                elif decoded != reference:
+                    raise CommandError(f'{name} output differs from the stdlib fallback')
+
+        self.stdout.write(f'products={len(rows)} orjson={"yes" if fastjson.ORJSON_AVAILABLE else "no"}')
+        for name, (seconds, size) in timings.items():
+            self.stdout.write(f'{name:>12}: {seconds * 1000:8.1f} ms  {size / 1024:,.0f} KiB')
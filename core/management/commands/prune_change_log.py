@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.changes import prune_change_log
+
+
+class Command(BaseCommand):
+    help = 'حذف سجل التغييرات الأقدم من مدة الاحتفاظ (العملاء الأقدم يحتاجون مزامنة كاملة)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30,
+                            help='مدة الاحتفاظ بالأيام (الافتراضي: 30)')
+
+    def handle(self, *args, **options):
+        deleted = prune_change_log(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} change log entries'))
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.21 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="DocumentSequence",
+            fields=[
+                (
+                    "name",
+                    models.CharField(
+                        max_length=100,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="اسم السلسلة",
+                    ),
+                ),
+                (
+                    "next_value",
+                    models.BigIntegerField(default=1, verbose_name="الرقم التالي"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="تاريخ التحديث"),
+                ),
+            ],
+            options={
+                "verbose_name": "تسلسل مستندات",
+                "verbose_name_plural": "تسلسلات المستندات",
+                "db_table": "core_document_sequence",
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.21 on 2026-10-19 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeLogEntry",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "model_label",
+                    models.CharField(max_length=100, verbose_name="النموذج"),
+                ),
+                (
+                    "object_pk",
+                    models.CharField(max_length=100, verbose_name="معرف السجل"),
+                ),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[("upsert", "إضافة أو تعديل"), ("delete", "حذف")],
+                        max_length=10,
+                        verbose_name="العملية",
+                    ),
+                ),
+                (
+                    "changed_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="وقت التغيير"),
+                ),
+            ],
+            options={
+                "verbose_name": "تغيير مسجل",
+                "verbose_name_plural": "سجل التغييرات",
+                "db_table": "core_change_log",
+                "indexes": [
+                    models.Index(
+                        fields=["model_label", "id"],
+                        name="core_change_model_l_e5364c_idx",
+                    ),
+                    models.Index(
+                        fields=["changed_at"], name="core_change_changed_f27fc5_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
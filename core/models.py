@@ -0,0 +1,49 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class DocumentSequence(models.Model):
+    """
+    عداد أرقام المستندات
+    (Counter row of one numbered document series, e.g. ``LR2025``)
+    """
+    name = models.CharField(max_length=100, primary_key=True, verbose_name=_("اسم السلسلة"))
+    next_value = models.BigIntegerField(default=1, verbose_name=_("الرقم التالي"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("تاريخ التحديث"))
+
+    class Meta:
+        verbose_name = _("تسلسل مستندات")
+        verbose_name_plural = _("تسلسلات المستندات")
+        db_table = 'core_document_sequence'
+
+    def __str__(self):
+        return f"{self.name} ({self.next_value})"
+
+
+class ChangeLogEntry(models.Model):
+    """
+    سجل تغييرات المزامنة التزايدية
+    (One insert/update/delete of a tracked model, read by delta-sync clients)
+    """
+    ACTION_CHOICES = [
+        ('upsert', _("إضافة أو تعديل")),
+        ('delete', _("حذف")),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    model_label = models.CharField(max_length=100, verbose_name=_("النموذج"))
+    object_pk = models.CharField(max_length=100, verbose_name=_("معرف السجل"))
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, verbose_name=_("العملية"))
+    changed_at = models.DateTimeField(auto_now_add=True, verbose_name=_("وقت التغيير"))
+
+    class Meta:
+        verbose_name = _("تغيير مسجل")
+        verbose_name_plural = _("سجل التغييرات")
+        db_table = 'core_change_log'
+        indexes = [
+            models.Index(fields=['model_label', 'id']),
+            models.Index(fields=['changed_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.model_label}:{self.object_pk} {self.action}"
@@ -0,0 +1,78 @@
+"""
+ترقيم الصفحات بالمفتاح (Keyset pagination)
+(Cursor based pagination that avoids OFFSET scans and COUNT(*) queries)
+"""
+import base64
+import json
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """رمز صفحة غير صالح (A cursor token that cannot be decoded)"""
+
+
+def encode_cursor(value, pk):
+    """
+    ترميز موضع الصفحة إلى نص آمن للاستخدام في الروابط
+    (Encode a (value, pk) position into a URL-safe token)
+    """
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    raw = json.dumps([value, pk], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, field, pk_field=None):
+    """
+    فك ترميز موضع الصفحة، يرفع InvalidCursor إذا كان الرمز غير صالح
+    (Decode a cursor token back into (value, pk); None for the first page)
+
+    A corrupt token raises ``InvalidCursor`` rather than silently restarting
+    from the first page.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        value, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return field.to_python(value), pk_field.to_python(pk) if pk_field else int(pk)
+    except Exception:
+        raise InvalidCursor(token)
+
+
+def keyset_paginate(queryset, cursor, page_size, field_name, descending=True):
+    """
+    إرجاع صفحة من النتائج مرتبة حسب (الحقل، المعرف) مع رمز الصفحة التالية
+    (Return one page ordered by (field, pk) plus the cursor of the next page)
+
+    The queryset is re-ordered on ``field_name`` with ``pk`` as tie breaker, so
+    every page is a single index range scan regardless of its depth. Raises
+    ``InvalidCursor`` for a corrupt ``cursor``.
+    """
+    field = queryset.model._meta.get_field(field_name)
+    position = decode_cursor(cursor, field, queryset.model._meta.pk)
+
+    if descending:
+        queryset = queryset.order_by(f'-{field_name}', '-pk')
+        if position:
+            value, pk = position
+            queryset = queryset.filter(
+                Q(**{f'{field_name}__lt': value}) | Q(**{field_name: value, 'pk__lt': pk})
+            )
+    else:
+        queryset = queryset.order_by(field_name, 'pk')
+        if position:
+            value, pk = position
+            queryset = queryset.filter(
+                Q(**{f'{field_name}__gt': value}) | Q(**{field_name: value, 'pk__gt': pk})
+            )
+
+    # جلب عنصر إضافي لمعرفة وجود صفحة تالية (Fetch one extra row to detect a next page)
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, field_name), last.pk)
+    return items, next_cursor
@@ -0,0 +1,181 @@
+"""
+مولد أرقام المستندات
+(Document number allocator)
+
+Every numbered series (``LR2025``, ``PS202503``, ...) has one counter row in
+``DocumentSequence``. A reservation increments the counter with a single
+``UPDATE``, which holds the row lock until the transaction ends, so two
+writers can never receive the same number. Allocation no longer scans the
+document table; that scan only seeds a series the first time it is used.
+
+Single numbers come from a block reserved per process
+(``DOCUMENT_SEQUENCE_BLOCK_SIZE``, default 50), so most documents need no
+query at all. Numbers are therefore unique and increasing within a process
+but may have gaps, and documents from different processes interleave. A
+block reserved inside a transaction is kept only after that transaction
+commits; a rollback leaves no numbers in the cache.
+
+A form that shows the number before the document exists uses
+``preview_document_number``, which reserves nothing; the number is
+allocated when the document is saved and may differ from the preview.
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, router, transaction
+from django.db.models import F
+from django.db.models.functions import Length
+
+from .models import DocumentSequence
+
+DEFAULT_BLOCK_SIZE = 50
+
+_lock = threading.Lock()
+_blocks = {}
+_pid = os.getpid()
+
+
+def block_size():
+    return getattr(settings, 'DOCUMENT_SEQUENCE_BLOCK_SIZE', DEFAULT_BLOCK_SIZE)
+
+
+def max_suffix(queryset, field_name, prefix):
+    """
+    أكبر رقم مستخدم بعد البادئة
+    (Largest numeric suffix already used after ``prefix``; 0 when none)
+
+    Longer values sort first, so ``LR202510000`` wins over ``LR20259999``.
+    """
+    values = queryset.filter(**{f'{field_name}__startswith': prefix}).annotate(
+        _number_length=Length(field_name),
+    ).order_by('-_number_length', f'-{field_name}').values_list(field_name, flat=True)
+    for value in values.iterator():
+        suffix = value[len(prefix):]
+        if suffix.isdigit():
+            return int(suffix)
+    return 0
+
+
+def reserve(name, count=1, seed=None, using=None):
+    """
+    حجز أرقام متتالية من السلسلة
+    (Reserve ``count`` consecutive numbers and return the first one)
+
+    ``seed`` returns the last number already used and is only called when
+    the series does not exist yet.
+    """
+    using = using or router.db_for_write(DocumentSequence)
+    sequences = DocumentSequence.objects.using(using)
+    with transaction.atomic(using=using):
+        if sequences.filter(name=name).update(next_value=F('next_value') + count):
+            return sequences.values_list('next_value', flat=True).get(name=name) - count
+        start = (seed() if seed else 0) + 1
+        try:
+            with transaction.atomic(using=using):
+                sequences.create(name=name, next_value=start + count)
+            return start
+        except IntegrityError:
+            # أنشأتها عملية أخرى في الوقت نفسه
+            sequences.filter(name=name).update(next_value=F('next_value') + count)
+            return sequences.values_list('next_value', flat=True).get(name=name) - count
+
+
+def _store_block(key, start, end):
+    with _lock:
+        block = _blocks.get(key)
+        if block is None or block[0] >= block[1]:
+            _blocks[key] = [start, end]
+
+
+def _take_cached(key):
+    global _pid
+    with _lock:
+        # العملية المتفرعة لا ترث كتل العملية الأم
+        if _pid != os.getpid():
+            _blocks.clear()
+            _pid = os.getpid()
+        block = _blocks.get(key)
+        if block is None or block[0] >= block[1]:
+            return None
+        value = block[0]
+        block[0] += 1
+        return value
+
+
+def next_value(name, seed=None, using=None):
+    """
+    الرقم التالي من كتلة العملية
+    (Next number of a series, served from this process's reserved block)
+    """
+    using = using or router.db_for_write(DocumentSequence)
+    key = (using, name)
+    value = _take_cached(key)
+    if value is not None:
+        return value
+
+    size = max(block_size(), 1)
+    start = reserve(name, size, seed=seed, using=using)
+    if size > 1:
+        if transaction.get_connection(using).in_atomic_block:
+            transaction.on_commit(lambda: _store_block(key, start + 1, start + size), using=using)
+        else:
+            _store_block(key, start + 1, start + size)
+    return start
+
+
+def peek_value(name, seed=None, using=None):
+    """
+    الرقم التالي المتوقع بدون حجزه
+    (The number ``next_value`` would most likely return, without reserving it)
+    """
+    using = using or router.db_for_write(DocumentSequence)
+    with _lock:
+        block = _blocks.get((using, name)) if _pid == os.getpid() else None
+        if block is not None and block[0] < block[1]:
+            return block[0]
+    value = DocumentSequence.objects.using(using).filter(name=name).values_list('next_value', flat=True).first()
+    if value is not None:
+        return value
+    return (seed() if seed else 0) + 1
+
+
+def reset_cache():
+    """تفريغ الكتل المحجوزة في العملية (Forget this process's reserved blocks)"""
+    with _lock:
+        _blocks.clear()
+
+
+def _series(model, field_name, prefix):
+    name = f'{model._meta.label_lower}:{prefix}'
+    return name, lambda: max_suffix(model._default_manager.all(), field_name, prefix)
+
+
+def document_number(model, field_name, prefix, width=4):
+    """
+    رقم مستند جديد مثل LR20250001
+    (New document number: ``prefix`` followed by the zero-padded counter)
+    """
+    name, seed = _series(model, field_name, prefix)
+    return f'{prefix}{next_value(name, seed=seed):0{width}d}'
+
+
+def preview_document_number(model, field_name, prefix, width=4):
+    """
+    معاينة رقم المستند التالي بدون حجزه
+    (Likely next number of a series, for display only)
+    """
+    name, seed = _series(model, field_name, prefix)
+    return f'{prefix}{peek_value(name, seed=seed):0{width}d}'
+
+
+def document_numbers(model, field_name, prefix, count, width=4):
+    """
+    أرقام متتالية لدفعة مستندات بحجز واحد
+    (``count`` consecutive numbers for a batch, in one reservation)
+    """
+    if count <= 0:
+        return []
+    name, seed = _series(model, field_name, prefix)
+    start = reserve(name, count, seed=seed)
+    return [f'{prefix}{number:0{width}d}' for number in range(start, start + count)]
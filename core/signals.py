@@ -0,0 +1,12 @@
+"""
+إشارات مشتركة بين التطبيقات
+(Signals shared between apps)
+"""
+from django.dispatch import Signal
+
+# ترسل بعد كتابة دفعية (bulk_create / bulk_update) داخل نفس المعاملة،
+# لأن هذه الكتابة لا ترسل post_save.
+# Arguments: ``created`` and ``updated`` (lists of instances) and
+# ``changed_fields`` (pk of each updated instance -> names of the fields
+# whose value changed).
+bulk_saved = Signal()
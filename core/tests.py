@@ -0,0 +1,155 @@
+import shutil
+import tempfile
+import json
+import threading
+import uuid
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils.translation import gettext_lazy
+
+from core import fastjson, sequences
+from core.cache import SQLiteCache
+from core.models import DocumentSequence
+from inventory.forms import VoucherForm
+from inventory.models_local import Voucher
+from Purchase_orders.models import PurchaseRequest
+
+
+class DocumentSequenceTest(TestCase):
+    def setUp(self):
+        sequences.reset_cache()
+        self.addCleanup(sequences.reset_cache)
+        self.user = get_user_model().objects.create_user(username='seq', password='x')
+
+    def create_request(self, number):
+        return PurchaseRequest.objects.create(request_number=number, requested_by=self.user)
+
+    def test_reserve_is_consecutive_without_scanning_documents(self):
+        self.assertEqual(sequences.reserve('test', 3), 1)
+        # UPDATE و SELECT داخل نقطة حفظ
+        with self.assertNumQueries(4):
+            self.assertEqual(sequences.reserve('test', 2), 4)
+        self.assertEqual(DocumentSequence.objects.get(name='test').next_value, 6)
+
+    def test_new_series_is_seeded_from_existing_numbers(self):
+        self.create_request('PR-2025-09999')
+        self.create_request('PR-2025-10000')
+        self.create_request('PR-2025-ABCDE')
+        numbers = sequences.document_numbers(PurchaseRequest, 'request_number', 'PR-2025-', 2, width=5)
+        self.assertEqual(numbers, ['PR-2025-10001', 'PR-2025-10002'])
+
+    @override_settings(DOCUMENT_SEQUENCE_BLOCK_SIZE=10)
+    def test_block_is_cached_only_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(sequences.next_value('block'), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual([sequences.next_value('block') for _ in range(9)], list(range(2, 11)))
+        self.assertEqual(sequences.next_value('block'), 11)
+
+        # حجز ملغى لا يترك أرقاماً في الذاكرة
+        sequences.reset_cache()
+        with self.captureOnCommitCallbacks(execute=False):
+            with transaction.atomic():
+                self.assertEqual(sequences.next_value('rollback'), 1)
+                transaction.set_rollback(True)
+        self.assertEqual(sequences.next_value('rollback'), 1)
+
+    def test_preview_does_not_reserve(self):
+        self.create_request('PR-2025-00007')
+        preview = sequences.preview_document_number(PurchaseRequest, 'request_number', 'PR-2025-', width=5)
+        self.assertEqual(preview, 'PR-2025-00008')
+        self.assertFalse(DocumentSequence.objects.exists())
+        self.assertEqual(sequences.document_number(PurchaseRequest, 'request_number', 'PR-2025-', width=5), preview)
+
+    def test_voucher_number_is_allocated_on_save(self):
+        prefix = Voucher.number_prefix('إذن صرف')
+        Voucher.objects.create(voucher_number=f'{prefix}001', voucher_type='إذن صرف', date=date.today())
+        data = {'voucher_type': 'إذن صرف', 'date': date.today(), 'department': '', 'recipient': 'x'}
+        # رقم المعاينة المأخوذ بالفعل لا يمنع الحفظ
+        form = VoucherForm(data={**data, 'voucher_number': f'{prefix}001'})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['voucher_number'], '')
+        # الرقم اليدوي خارج السلسلة يبقى كما هو
+        form = VoucherForm(data={**data, 'voucher_number': 'MANUAL-1'})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['voucher_number'], 'MANUAL-1')
+
+    def test_document_number_format(self):
+        day = date.today()
+        number = PurchaseRequest.new_request_number()
+        self.assertEqual(number, f'PR-{day.year}-00001')
+
+
+class SQLiteCacheTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.location = f'{directory}/cache.sqlite3'
+        self.cache = SQLiteCache(self.location, {'KEY_PREFIX': 'test'})
+
+    def test_values_expiry_and_add(self):
+        self.cache.set('report', {'total': 3}, 60)
+        self.assertEqual(self.cache.get('report'), {'total': 3})
+        self.assertFalse(self.cache.add('report', 'other'))
+        # عملية أخرى على الملف نفسه ترى القيمة
+        self.assertEqual(SQLiteCache(self.location, {'KEY_PREFIX': 'test'}).get('report'), {'total': 3})
+
+        with mock.patch('core.cache.time.time', return_value=self.cache.get_backend_timeout(60) + 1):
+            self.assertIsNone(self.cache.get('report'))
+            self.assertTrue(self.cache.add('report', 'fresh'))
+
+    def test_incr_is_atomic_across_threads(self):
+        self.cache.set('hits', 0)
+
+        def hit():
+            for _ in range(50):
+                self.cache.incr('hits')
+
+        threads = [threading.Thread(target=hit) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('hits'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+
+class FastJsonTest(TestCase):
+    payload = {
+        'amount': Decimal('12.50'),
+        'when': datetime(2025, 3, 1, 8, 30, tzinfo=dt_timezone.utc),
+        'day': date(2025, 3, 1),
+        'token': uuid.UUID(int=7),
+        'label': gettext_lazy('Active'),
+        1: 'non-string key',
+        'name': 'صنف',
+    }
+    expected = {
+        'amount': 12.5,
+        'when': '2025-03-01T08:30:00+00:00',
+        'day': '2025-03-01',
+        'token': '00000000-0000-0000-0000-000000000007',
+        'label': 'Active',
+        '1': 'non-string key',
+        'name': 'صنف',
+    }
+
+    def test_encoders_agree(self):
+        self.assertEqual(json.loads(fastjson.dumps(self.payload)), self.expected)
+        with mock.patch.object(fastjson, 'ORJSON_AVAILABLE', False):
+            body = fastjson.dumps(self.payload)
+        self.assertEqual(json.loads(body), self.expected)
+        self.assertIn('صنف'.encode('utf-8'), body)
+
+    def test_response(self):
+        response = fastjson.FastJsonResponse({'items': [Decimal('1.5')]})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content), {'items': [1.5]})
+        with self.assertRaises(TypeError):
+            fastjson.FastJsonResponse([1, 2])
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from employee_tasks.reminders import DEFAULT_BATCH_SIZE, process_due_reminders
+
+
+class Command(BaseCommand):
+    help = 'إرسال تذكيرات المهام المستحقة (مرة واحدة أو كعملية مستمرة)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='عدد التذكيرات في كل دفعة')
+        parser.add_argument('--loop', action='store_true',
+                            help='التشغيل المستمر كعملية خلفية')
+        parser.add_argument('--interval', type=float, default=30,
+                            help='الفاصل الزمني بالثواني بين كل فحص في وضع التشغيل المستمر')
+
+    def handle(self, *args, **options):
+        while True:
+            metrics = process_due_reminders(batch_size=options['batch_size'])
+            self.stdout.write(
+                f"sent={metrics['sent']} batches={metrics['batches']} "
+                f"max_drift={metrics['max_drift_seconds']:.1f}s "
+                f"backlog={metrics['backlog']} claimable={metrics['claimable']} oldest_lag={metrics['oldest_lag_seconds']:.1f}s"
+            )
+            if not options['loop']:
+                break
+            # نعود فوراً فقط إذا أرسلنا شيئاً وبقي ما يمكننا أخذه، وإلا ننتظر
+            # (صفوف تحجزها عملية أخرى لا تمنع الانتظار)
+            if not metrics['sent'] or not metrics['claimable']:
+                time.sleep(options['interval'])
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.21 on 2026-10-19 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee_tasks', '0002_alter_employeetask_options'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employeetask',
+            index=models.Index(
+                fields=['assigned_to', 'due_date'],
+                name='employee_ta_assigne_1b18e9_idx',
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.21 on 2026-10-19 17:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee_tasks', '0003_employeetask_employee_ta_assigne_1b18e9_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='taskreminder',
+            index=models.Index(
+                fields=['is_sent', 'reminder_date'],
+                name='employee_ta_is_sent_bfef47_idx',
+            ),
+        ),
+    ]
@@ -78,6 +78,9 @@ class EmployeeTask(models.Model):
         verbose_name = _('مهمة الموظف')
         verbose_name_plural = _('مهام الموظفين')
         ordering = ['-created_at', 'priority']
+        indexes = [
+            models.Index(fields=['assigned_to', 'due_date']),
+        ]
         permissions = [
             ("view_dashboard", "Can view employee tasks dashboard"),
             ("view_mytask", "Can view my employee tasks"),
@@ -138,3 +141,6 @@ class TaskReminder(models.Model):
         verbose_name = _('تذكير المهمة')
         verbose_name_plural = _('تذكيرات المهام')
         ordering = ['reminder_date']
+        indexes = [
+            models.Index(fields=['is_sent', 'reminder_date']),
+        ]
@@ -0,0 +1,113 @@
+"""
+خدمات إحصائيات مهام الموظفين
+(Employee task statistics: one grouped query, cached per user)
+"""
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from core.cache import stats_cache
+
+from .models import EmployeeTask
+
+STATS_CACHE_TIMEOUT = 60 * 5
+STATS_VERSION_KEY = 'employee_tasks:stats:version:{scope}'
+STATS_KEY = 'employee_tasks:stats:{scope}:{version}:{day}'
+
+# المهام غير المنجزة التي تحسب متأخرة بعد تاريخ الاستحقاق
+OPEN_STATUSES = ['pending', 'in_progress']
+
+# نطاق المشرف يرى جميع المهام
+ALL_SCOPE = 'all'
+
+
+def _scope_for(user):
+    return ALL_SCOPE if user.is_superuser else str(user.pk)
+
+
+def _get_version(scope):
+    key = STATS_VERSION_KEY.format(scope=scope)
+    version = stats_cache.get(key)
+    if version is None:
+        stats_cache.add(key, 1, None)
+        version = stats_cache.get(key, 1)
+    return version
+
+
+def invalidate_task_stats(*user_ids):
+    """
+    إبطال إحصائيات المستخدمين المحددين وإحصائيات المشرف
+    (Invalidate the cached stats of the given users and of the superuser scope)
+    """
+    scopes = {ALL_SCOPE} | {str(user_id) for user_id in user_ids if user_id}
+    for scope in scopes:
+        key = STATS_VERSION_KEY.format(scope=scope)
+        try:
+            stats_cache.incr(key)
+        except ValueError:
+            stats_cache.set(key, 2, None)
+
+
+def visible_tasks(user):
+    """
+    المهام التي يمكن للمستخدم رؤيتها
+    (Tasks visible to the user: all for superusers, created or assigned otherwise)
+    """
+    if user.is_superuser:
+        return EmployeeTask.objects.all()
+    return EmployeeTask.objects.filter(Q(created_by=user) | Q(assigned_to=user))
+
+
+def compute_task_stats(tasks, today=None):
+    """
+    حساب جميع الإحصائيات باستعلام مجمع واحد
+    (Compute every status x priority count and overdue counts in one GROUP BY)
+    """
+    today = today or timezone.now().date()
+    rows = (
+        tasks.order_by()
+        .values('status', 'priority')
+        .annotate(
+            count=Count('id'),
+            overdue=Count('id', filter=Q(due_date__lt=today, status__in=OPEN_STATUSES)),
+        )
+    )
+
+    by_status = {status: 0 for status, _ in EmployeeTask.STATUS_CHOICES}
+    by_priority = {priority: 0 for priority, _ in EmployeeTask.PRIORITY_CHOICES}
+    overdue_by_priority = {priority: 0 for priority, _ in EmployeeTask.PRIORITY_CHOICES}
+    matrix = {}
+    total = 0
+    overdue = 0
+
+    for row in rows:
+        status, priority, count = row['status'], row['priority'], row['count']
+        matrix.setdefault(status, {})[priority] = count
+        by_status[status] = by_status.get(status, 0) + count
+        by_priority[priority] = by_priority.get(priority, 0) + count
+        overdue_by_priority[priority] = overdue_by_priority.get(priority, 0) + row['overdue']
+        total += count
+        overdue += row['overdue']
+
+    return {
+        'total': total,
+        'by_status': by_status,
+        'by_priority': by_priority,
+        'matrix': matrix,
+        'overdue': overdue,
+        'overdue_by_priority': overdue_by_priority,
+    }
+
+
+def get_task_stats(user):
+    """
+    إرجاع إحصائيات مهام المستخدم من الذاكرة المؤقتة أو حسابها
+    (Return the user's task stats, cached until one of their tasks changes)
+    """
+    scope = _scope_for(user)
+    today = timezone.now().date()
+    key = STATS_KEY.format(scope=scope, version=_get_version(scope), day=today.isoformat())
+    stats = stats_cache.get(key)
+    if stats is None:
+        stats = compute_task_stats(visible_tasks(user), today=today)
+        stats_cache.set(key, stats, STATS_CACHE_TIMEOUT)
+    return stats
@@ -1,8 +1,9 @@
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import post_save, pre_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.utils import timezone
 
 from .models import EmployeeTask, TaskStep, TaskReminder
+from .services import invalidate_task_stats
 
 # تنفيذ إشارات للمهام
 @receiver(post_save, sender=EmployeeTask)
@@ -62,6 +63,8 @@ def task_step_post_save(sender, instance, created, **kwargs):
                     status='completed',
                     completion_date=timezone.now().date()
                 )
+                # update() لا يرسل إشارات، لذا نبطل الإحصائيات يدوياً
+                invalidate_task_stats(task.created_by_id, task.assigned_to_id)
 
 # تنفيذ إشارات لتذكيرات المهام
 @receiver(post_save, sender=TaskReminder)
@@ -71,3 +74,30 @@ def task_reminder_post_save(sender, instance, created, **kwargs):
     """
     # يمكن إضافة منطق إضافي هنا إذا لزم الأمر
     pass
+
+# إبطال إحصائيات المهام المخزنة مؤقتاً
+@receiver(pre_save, sender=EmployeeTask)
+def task_stats_pre_save(sender, instance, **kwargs):
+    """
+    حفظ المالكين السابقين للمهمة لإبطال إحصائياتهم عند إعادة التكليف
+    """
+    instance._previous_owner_ids = ()
+    if instance.pk:
+        previous = EmployeeTask.objects.filter(pk=instance.pk).values_list(
+            'created_by_id', 'assigned_to_id'
+        ).first()
+        if previous:
+            instance._previous_owner_ids = previous
+
+
+@receiver(post_save, sender=EmployeeTask)
+@receiver(post_delete, sender=EmployeeTask)
+def task_stats_invalidate(sender, instance, **kwargs):
+    """
+    إبطال إحصائيات منشئ المهمة والمكلف بها (الحاليين والسابقين)
+    """
+    invalidate_task_stats(
+        instance.created_by_id,
+        instance.assigned_to_id,
+        *getattr(instance, '_previous_owner_ids', ()),
+    )
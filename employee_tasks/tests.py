@@ -1,3 +1,138 @@
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.cache import stats_cache
+from notifications.models import Notification
+
+from .models import EmployeeTask, TaskReminder, TaskStep
+from .reminders import process_due_reminders
+from .services import get_task_stats
+
+User = get_user_model()
+
+
+class CalendarEventsTest(TestCase):
+    """اختبارات خلاصة تقويم المهام"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='adminpassword')
+        self.client.login(username='admin', password='adminpassword')
+        self.url = reverse('employee_tasks:calendar_events')
+
+    def _task(self, title, start_date, due_date):
+        return EmployeeTask.objects.create(
+            title=title, description='وصف', created_by=self.admin, assigned_to=self.admin,
+            start_date=start_date, due_date=due_date,
+        )
+
+    def test_returns_tasks_overlapping_range(self):
+        spanning = self._task('ممتدة', date(2025, 2, 20), date(2025, 3, 5))
+        inside = self._task('داخل', date(2025, 3, 10), date(2025, 3, 12))
+        self._task('سابقة', date(2025, 1, 1), date(2025, 1, 10))
+        TaskStep.objects.create(task=inside, description='خطوة', created_by=self.admin)
+
+        response = self.client.get(self.url, {'start': '2025-03-01', 'end': '2025-04-01'})
+        self.assertEqual(response.status_code, 200)
+        events = {event['id']: event for event in response.json()}
+        self.assertEqual(set(events), {spanning.pk, inside.pk})
+        self.assertEqual(len(events[inside.pk]['extendedProps']['steps']), 1)
+
+    def test_if_none_match_returns_not_modified(self):
+        self._task('داخل', date(2025, 3, 10), date(2025, 3, 12))
+        params = {'start': '2025-03-01', 'end': '2025-04-01'}
+        first = self.client.get(self.url, params)
+        second = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+
+
+class TaskStatsServiceTest(TestCase):
+    """اختبارات خدمة إحصائيات المهام"""
+
+    def setUp(self):
+        stats_cache.clear()
+        self.creator = User.objects.create_user(username='creator', password='creatorpassword')
+        self.assignee = User.objects.create_user(username='assignee', password='assigneepassword')
+        self.outsider = User.objects.create_user(username='outsider', password='outsiderpassword')
+        today = timezone.now().date()
+        self.overdue = EmployeeTask.objects.create(
+            title='متأخرة', description='x', created_by=self.creator, assigned_to=self.assignee,
+            priority='high', start_date=today - timedelta(days=10), due_date=today - timedelta(days=1),
+        )
+        EmployeeTask.objects.create(
+            title='مكتملة', description='x', created_by=self.creator, status='completed',
+            start_date=today, due_date=today + timedelta(days=3),
+        )
+
+    def test_counts_come_from_one_query(self):
+        with self.assertNumQueries(1):
+            stats = get_task_stats(self.creator)
+        self.assertEqual(stats['total'], 2)
+        self.assertEqual(stats['by_status']['pending'], 1)
+        self.assertEqual(stats['by_status']['completed'], 1)
+        self.assertEqual(stats['by_priority']['high'], 1)
+        self.assertEqual(stats['matrix']['pending']['high'], 1)
+        self.assertEqual(stats['overdue'], 1)
+        self.assertEqual(stats['overdue_by_priority']['high'], 1)
+
+        with self.assertNumQueries(0):
+            get_task_stats(self.creator)
+
+    def test_save_invalidates_previous_and_new_assignees(self):
+        self.assertEqual(get_task_stats(self.assignee)['total'], 1)
+        self.assertEqual(get_task_stats(self.outsider)['total'], 0)
+
+        self.overdue.assigned_to = self.outsider
+        self.overdue.save()
+
+        self.assertEqual(get_task_stats(self.assignee)['total'], 0)
+        self.assertEqual(get_task_stats(self.outsider)['total'], 1)
+
+
+class TaskReminderProcessingTest(TestCase):
+    """اختبارات معالجة تذكيرات المهام"""
+
+    def setUp(self):
+        self.creator = User.objects.create_user(username='creator', password='creatorpassword')
+        self.assignee = User.objects.create_user(username='assignee', password='assigneepassword')
+        today = timezone.now().date()
+        self.task = EmployeeTask.objects.create(
+            title='مهمة', description='x', created_by=self.creator, assigned_to=self.assignee,
+            start_date=today, due_date=today + timedelta(days=2),
+        )
+
+    def test_sends_due_reminders_once_in_batches(self):
+        now = timezone.now()
+        for minutes in range(5):
+            TaskReminder.objects.create(task=self.task, reminder_date=now - timedelta(minutes=minutes + 1))
+        future = TaskReminder.objects.create(task=self.task, reminder_date=now + timedelta(hours=1))
+
+        metrics = process_due_reminders(now=now, batch_size=2)
+        self.assertEqual(metrics['sent'], 5)
+        self.assertEqual(metrics['batches'], 3)
+        self.assertEqual(metrics['backlog'], 0)
+        self.assertEqual(metrics['claimable'], 0)
+        self.assertGreaterEqual(metrics['max_drift_seconds'], 5 * 60)
+        self.assertEqual(Notification.objects.filter(user=self.assignee).count(), 5)
+
+        future.refresh_from_db()
+        self.assertFalse(future.is_sent)
+        self.assertEqual(process_due_reminders(now=now)['sent'], 0)
 
-# Create your tests here.
+    def test_loop_waits_when_nothing_was_sent(self):
+        # تراكم تحجزه عملية أخرى لا يجعل الحلقة تدور دون انتظار
+        metrics = {'sent': 0, 'batches': 0, 'max_drift_seconds': 0.0, 'backlog': 3,
+                   'claimable': 0, 'oldest_lag_seconds': 60.0}
+        with mock.patch('employee_tasks.management.commands.process_task_reminders.process_due_reminders',
+                        return_value=metrics), \
+                mock.patch('employee_tasks.management.commands.process_task_reminders.time.sleep',
+                           side_effect=[None, KeyboardInterrupt]) as sleep:
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('process_task_reminders', '--loop', '--interval', '5', stdout=StringIO())
+        self.assertEqual(sleep.call_count, 2)
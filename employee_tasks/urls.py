@@ -34,6 +34,7 @@ urlpatterns = [
     
     # Calendar
     path('calendar/', views.calendar, name='calendar'),
+    path('calendar/events/', views.calendar_events, name='calendar_events'),
     
     # Analytics
     path('analytics/', views.analytics, name='analytics'),
@@ -4,11 +4,17 @@ from django.contrib import messages
 from django.utils import timezone
 from django.db.models import Count, Q
 from django.http import JsonResponse
+from django.urls import reverse
 from datetime import datetime, timedelta
 
+from core.calendar_feed import (
+    CalendarRangeError, calendar_range_error_response, etag_json_response, parse_calendar_range,
+)
+
 from .models import TaskCategory, EmployeeTask, TaskStep, TaskReminder
 from .forms import TaskCategoryForm, EmployeeTaskForm, TaskStepForm, TaskReminderForm, TaskFilterForm
 from .decorators import can_access_task, employee_tasks_module_permission_required
+from .services import OPEN_STATUSES, get_task_stats, visible_tasks
 
 # Dashboard Views
 @login_required
@@ -18,72 +24,20 @@ def dashboard(request):
     عرض لوحة تحكم مهام الموظفين
     """
     user = request.user
-    is_superuser = user.is_superuser
 
-    # الإحصائيات العامة
-    if is_superuser:
-        # المشرف يرى جميع المهام
-        total_tasks = EmployeeTask.objects.count()
-        pending_tasks = EmployeeTask.objects.filter(status='pending').count()
-        in_progress_tasks = EmployeeTask.objects.filter(status='in_progress').count()
-        completed_tasks = EmployeeTask.objects.filter(status='completed').count()
-
-        # المهام المتأخرة
-        today = timezone.now().date()
-        overdue_tasks = EmployeeTask.objects.filter(
-            due_date__lt=today,
-            status__in=['pending', 'in_progress']
-        ).count()
-
-        # المهام الحديثة
-        recent_tasks = EmployeeTask.objects.order_by('-created_at')[:5]
-
-        # المهام القادمة
-        upcoming_tasks = EmployeeTask.objects.filter(
-            due_date__gte=today,
-            status__in=['pending', 'in_progress']
-        ).order_by('due_date')[:5]
+    # الإحصائيات العامة من استعلام مجمع واحد (مخزنة مؤقتاً لكل مستخدم)
+    stats = get_task_stats(user)
+    tasks = visible_tasks(user)
+    today = timezone.now().date()
 
-    else:
-        # المستخدم العادي يرى المهام الخاصة به فقط
-        total_tasks = EmployeeTask.objects.filter(
-            Q(created_by=user) | Q(assigned_to=user)
-        ).count()
-
-        pending_tasks = EmployeeTask.objects.filter(
-            Q(created_by=user) | Q(assigned_to=user),
-            status='pending'
-        ).count()
-
-        in_progress_tasks = EmployeeTask.objects.filter(
-            Q(created_by=user) | Q(assigned_to=user),
-            status='in_progress'
-        ).count()
-
-        completed_tasks = EmployeeTask.objects.filter(
-            Q(created_by=user) | Q(assigned_to=user),
-            status='completed'
-        ).count()
-
-        # المهام المتأخرة
-        today = timezone.now().date()
-        overdue_tasks = EmployeeTask.objects.filter(
-            Q(created_by=user) | Q(assigned_to=user),
-            due_date__lt=today,
-            status__in=['pending', 'in_progress']
-        ).count()
-
-        # المهام الحديثة
-        recent_tasks = EmployeeTask.objects.filter(
-            Q(created_by=user) | Q(assigned_to=user)
-        ).order_by('-created_at')[:5]
+    # المهام الحديثة
+    recent_tasks = tasks.order_by('-created_at')[:5]
 
-        # المهام القادمة
-        upcoming_tasks = EmployeeTask.objects.filter(
-            Q(created_by=user) | Q(assigned_to=user),
-            due_date__gte=today,
-            status__in=['pending', 'in_progress']
-        ).order_by('due_date')[:5]
+    # المهام القادمة
+    upcoming_tasks = tasks.filter(
+        due_date__gte=today,
+        status__in=OPEN_STATUSES
+    ).order_by('due_date')[:5]
 
     # تصنيفات المهام
     categories = TaskCategory.objects.annotate(
@@ -91,11 +45,11 @@ def dashboard(request):
     ).order_by('-task_count')[:5]
 
     context = {
-        'total_tasks': total_tasks,
-        'pending_tasks': pending_tasks,
-        'in_progress_tasks': in_progress_tasks,
-        'completed_tasks': completed_tasks,
-        'overdue_tasks': overdue_tasks,
+        'total_tasks': stats['total'],
+        'pending_tasks': stats['by_status']['pending'],
+        'in_progress_tasks': stats['by_status']['in_progress'],
+        'completed_tasks': stats['by_status']['completed'],
+        'overdue_tasks': stats['overdue'],
         'recent_tasks': recent_tasks,
         'upcoming_tasks': upcoming_tasks,
         'categories': categories,
@@ -589,22 +543,71 @@ def calendar(request):
     """
     عرض تقويم المهام
     """
-    user = request.user
-    is_superuser = user.is_superuser
+    # يتم تحميل المهام من calendar_events حسب الفترة المعروضة فقط
+    return render(request, 'employee_tasks/calendar.html')
 
-    # الحصول على المهام
-    if is_superuser:
-        tasks = EmployeeTask.objects.all()
-    else:
-        tasks = EmployeeTask.objects.filter(
-            Q(created_by=user) | Q(assigned_to=user)
+@login_required
+@permission_required('employee_tasks.view_employeetask', login_url='accounts:access_denied')
+def calendar_events(request):
+    """
+    خلاصة JSON لمهام الفترة المعروضة في التقويم
+    """
+    try:
+        start, end = parse_calendar_range(request)
+    except CalendarRangeError as error:
+        return calendar_range_error_response(error)
+
+    # المهام المتقاطعة مع النطاق: تبدأ قبل نهايته وتستحق بعد بدايته
+    tasks = visible_tasks(request.user).filter(
+        start_date__lt=end.date(),
+        due_date__gte=start.date(),
+    )
+
+    rows = list(
+        tasks.order_by('due_date', 'id').values(
+            'id', 'title', 'description', 'status', 'priority', 'progress',
+            'start_date', 'due_date', 'created_by__username', 'assigned_to__username',
+            'category__name', 'category__color',
         )
+    )
+
+    # خطوات المهام المعروضة في استعلام واحد
+    steps_by_task = {}
+    for step in TaskStep.objects.filter(task_id__in=[row['id'] for row in rows]).order_by('created_at').values(
+        'task_id', 'description', 'completed'
+    ):
+        steps_by_task.setdefault(step['task_id'], []).append({
+            'description': step['description'],
+            'completed': step['completed'],
+        })
 
-    context = {
-        'tasks': tasks,
-    }
-
-    return render(request, 'employee_tasks/calendar.html', context)
+    status_labels = dict(EmployeeTask.STATUS_CHOICES)
+    priority_labels = dict(EmployeeTask.PRIORITY_CHOICES)
+    events = []
+    for row in rows:
+        events.append({
+            'id': row['id'],
+            'title': row['title'],
+            'start': row['start_date'],
+            'end': row['due_date'],
+            'className': f"task-{row['status']}",
+            'extendedProps': {
+                'description': row['description'],
+                'status': str(status_labels.get(row['status'], row['status'])),
+                'statusValue': row['status'],
+                'priority': str(priority_labels.get(row['priority'], row['priority'])),
+                'priorityValue': row['priority'],
+                'progress': row['progress'],
+                'createdBy': row['created_by__username'],
+                'assignedTo': row['assigned_to__username'] or 'غير مسند',
+                'category': row['category__name'] or 'بدون تصنيف',
+                'categoryColor': row['category__color'] or '#6c757d',
+                'detailUrl': reverse('employee_tasks:task_detail', args=[row['id']]),
+                'editUrl': reverse('employee_tasks:task_edit', args=[row['id']]),
+                'steps': steps_by_task.get(row['id'], []),
+            },
+        })
+    return etag_json_response(request, events)
 
 # Analytics View
 @login_required
@@ -614,38 +617,19 @@ def analytics(request):
     عرض تحليلات المهام
     """
     user = request.user
-    is_superuser = user.is_superuser
 
     # الحصول على المهام
-    if is_superuser:
-        tasks = EmployeeTask.objects.all()
-    else:
-        tasks = EmployeeTask.objects.filter(
-            Q(created_by=user) | Q(assigned_to=user)
-        )
-
-    # إحصائيات حسب الحالة
-    status_stats = {
-        'pending': tasks.filter(status='pending').count(),
-        'in_progress': tasks.filter(status='in_progress').count(),
-        'completed': tasks.filter(status='completed').count(),
-        'cancelled': tasks.filter(status='cancelled').count(),
-        'deferred': tasks.filter(status='deferred').count(),
-    }
+    tasks = visible_tasks(user)
 
-    # إحصائيات حسب الأولوية
-    priority_stats = {
-        'low': tasks.filter(priority='low').count(),
-        'medium': tasks.filter(priority='medium').count(),
-        'high': tasks.filter(priority='high').count(),
-        'urgent': tasks.filter(priority='urgent').count(),
-    }
+    # إحصائيات حسب الحالة والأولوية من استعلام مجمع واحد
+    stats = get_task_stats(user)
+    status_stats = stats['by_status']
+    priority_stats = stats['by_priority']
 
     # إحصائيات حسب التصنيف
-    categories = TaskCategory.objects.all()
-    category_stats = {}
-    for category in categories:
-        category_stats[category.name] = tasks.filter(category=category).count()
+    category_stats = {category.name: 0 for category in TaskCategory.objects.all()}
+    for row in tasks.filter(category__isnull=False).order_by().values('category__name').annotate(count=Count('id')):
+        category_stats[row['category__name']] = row['count']
 
     # إحصائيات حسب الشهر
     today = timezone.now().date()
@@ -669,6 +653,7 @@ def analytics(request):
     context = {
         'status_stats': status_stats,
         'priority_stats': priority_stats,
+        'overdue_tasks': stats['overdue'],
         'category_stats': category_stats,
         'monthly_tasks': monthly_tasks,
     }
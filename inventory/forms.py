@@ -158,6 +158,9 @@ class VoucherForm(forms.ModelForm):
         self.fields['customer'].required = False
         self.fields['supplier_voucher_number'].required = False
         self.fields['recipient'].required = False
+        # رقم الإذن الجديد يولد عند الحفظ إذا ترك فارغاً
+        if self.instance._state.adding:
+            self.fields['voucher_number'].required = False
 
         if 'instance' in kwargs and kwargs['instance']:
             voucher_type = kwargs['instance'].voucher_type
@@ -169,6 +172,17 @@ class VoucherForm(forms.ModelForm):
         if voucher_type:
             self.set_required_fields(voucher_type)
 
+    def clean(self):
+        cleaned_data = super().clean()
+        voucher_type = cleaned_data.get('voucher_type')
+        number = cleaned_data.get('voucher_number') or ''
+        # الرقم المعروض بصيغة الترقيم التلقائي معاينة فقط؛ يستبدل بالرقم المحجوز عند الحفظ
+        # (a number in the auto series is re-allocated on save, so it cannot collide with it)
+        if self.instance._state.adding and voucher_type and (
+                not number or number.startswith(Voucher.number_prefix(voucher_type))):
+            cleaned_data['voucher_number'] = ''
+        return cleaned_data
+
     def set_required_fields(self, voucher_type):
         if voucher_type == 'إذن اضافة' or voucher_type == 'إذن مرتجع مورد':
             self.fields['supplier'].required = True
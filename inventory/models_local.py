@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 class Category(models.Model):
@@ -128,6 +129,13 @@ class Voucher(models.Model):
         ('اذن مرتجع عميل', 'اذن مرتجع عميل'),
         ('إذن مرتجع مورد', 'إذن مرتجع مورد'),
     )
+    # بادئة الترقيم التلقائي لكل نوع (Series code of auto-numbered vouchers)
+    NUMBER_CODES = {
+        'إذن اضافة': 'ADD',
+        'إذن صرف': 'DIS',
+        'اذن مرتجع عميل': 'CRT',
+        'إذن مرتجع مورد': 'SRT',
+    }
 
     voucher_number = models.CharField(max_length=100, primary_key=True, verbose_name=_("رقم الإذن"))
     voucher_type = models.CharField(max_length=20, choices=VOUCHER_TYPES, verbose_name=_("نوع الإذن"))
@@ -144,6 +152,12 @@ class Voucher(models.Model):
     def __str__(self):
         return f"{self.voucher_number} - {self.get_voucher_type_display()}"
 
+    @classmethod
+    def number_prefix(cls, voucher_type):
+        """بادئة رقم الإذن لليوم، مثل ADD-20250301- (Prefix of today's auto numbers)"""
+        code = cls.NUMBER_CODES.get(voucher_type, 'V')
+        return f"{code}-{timezone.now().strftime('%Y%m%d')}-"
+
     @property
     def items_count(self):
         return self.items.count()
@@ -588,22 +588,12 @@ function updateProductDetailsInRow(row, product) {
 function generateVoucherNumber() {
     const voucherType = document.getElementById('id_voucher_type').value;
 
-    fetch('/inventory/api/generate-voucher-number/', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-            'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
-        },
-        body: JSON.stringify({
-            voucher_type: voucherType
-        })
-    })
+    // معاينة فقط: الرقم الفعلي يحجز عند حفظ الإذن
+    fetch('/inventory/api/generate-voucher-number/?type=' + encodeURIComponent(voucherType))
     .then(response => response.json())
     .then(data => {
-        if (data.success) {
+        if (data.voucher_number) {
             document.getElementById('id_voucher_number').value = data.voucher_number;
-        } else {
-            console.error('خطأ في توليد رقم الإذن:', data.message);
         }
     })
     .catch(error => {
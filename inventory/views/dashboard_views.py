@@ -6,8 +6,8 @@ from django.db.models import F
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
 
+from core.fastjson import FastJsonResponse
 from inventory.decorators import inventory_module_permission_required
 from inventory.models_local import Product, Voucher
 
@@ -78,4 +78,4 @@ def check_low_stock(request):
         minimum_threshold__gt=0
     ).values('product_id', 'name', 'quantity', 'minimum_threshold')
 
-    return JsonResponse(list(low_stock_products), safe=False)
+    return FastJsonResponse(list(low_stock_products), safe=False)
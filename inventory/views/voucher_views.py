@@ -13,6 +13,7 @@ from django.utils.decorators import method_decorator
 from django.core.exceptions import ValidationError
 from datetime import datetime
 
+from core.sequences import document_number, preview_document_number
 from inventory.decorators import inventory_class_permission_required
 from inventory.models_local import (
     Product, Voucher, VoucherItem, Supplier, Customer, Department
@@ -138,6 +139,12 @@ class VoucherCreateView(CreateView):
 
     def form_valid(self, form):
         try:
+            # الرقم التلقائي يحجز عند الحفظ فقط
+            if not form.instance.voucher_number:
+                form.instance.voucher_number = document_number(
+                    Voucher, 'voucher_number', Voucher.number_prefix(form.instance.voucher_type), width=3,
+                )
+
             # Save the form to create the voucher
             response = super().form_valid(form)
             voucher = self.object
@@ -378,32 +385,12 @@ class VoucherDetailView(DetailView):
 
 @login_required
 def generate_voucher_number(request):
-    """Generate a new voucher number based on the voucher type"""
+    """Preview the next voucher number of the voucher type, without reserving it"""
     voucher_type = request.GET.get('type', '')
 
-    prefix = ''
-    if voucher_type == 'إذن اضافة':
-        prefix = 'ADD'
-    elif voucher_type == 'إذن صرف':
-        prefix = 'DIS'
-    elif voucher_type == 'اذن مرتجع عميل':
-        prefix = 'CRT'
-    elif voucher_type == 'إذن مرتجع مورد':
-        prefix = 'SRT'
-    else:
-        prefix = 'V'
-
-    # Get date part and random number for uniqueness
-    date_part = timezone.now().strftime('%Y%m%d')
-
-    # Get the count of vouchers for today for this type + 1
-    today = timezone.now().date()
-    count = Voucher.objects.filter(
-        date=today,
-        voucher_number__startswith=f"{prefix}-{date_part}"
-    ).count() + 1
-
-    # Format with leading zeros for the count (e.g., 001, 002, etc.)
-    voucher_number = f"{prefix}-{date_part}-{count:03d}"
+    # معاينة فقط: الرقم يحجز عند حفظ الإذن، فلا يضيع رقم بطلب معاينة
+    voucher_number = preview_document_number(
+        Voucher, 'voucher_number', Voucher.number_prefix(voucher_type), width=3,
+    )
 
     return JsonResponse({'voucher_number': voucher_number})
@@ -12,6 +12,8 @@ from decimal import Decimal
 import uuid
 from datetime import date, timedelta
 
+from core.sequences import document_number
+
 User = get_user_model()
 
 
@@ -305,18 +307,9 @@ class LeaveRequest(models.Model):
     def save(self, *args, **kwargs):
         if not self.request_number:
             # Generate unique request number
-            year = timezone.now().year
-            last_request = LeaveRequest.objects.filter(
-                request_number__startswith=f'LR{year}'
-            ).order_by('-request_number').first()
-
-            if last_request:
-                last_number = int(last_request.request_number[-4:])
-                new_number = last_number + 1
-            else:
-                new_number = 1
-
-            self.request_number = f'LR{year}{new_number:04d}'
+            self.request_number = document_number(
+                LeaveRequest, 'request_number', f'LR{timezone.now().year}',
+            )
 
         super().save(*args, **kwargs)
 
@@ -8,3 +8,10 @@ class MeetingsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'meetings'
     verbose_name = 'نظام الاجتماعات'
+
+    def ready(self):
+        """
+        تهيئة التطبيق عند بدء التشغيل
+        """
+        # استيراد إشارات التطبيق
+        import meetings.signals
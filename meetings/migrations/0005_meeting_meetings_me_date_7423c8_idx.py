@@ -0,0 +1,17 @@
+# Generated by Django 4.2.21 on 2026-10-19 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetings', '0004_meetingtaskstep'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='meeting',
+            index=models.Index(fields=['date'], name='meetings_me_date_7423c8_idx'),
+        ),
+    ]
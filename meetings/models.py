@@ -51,6 +51,9 @@ class Meeting(models.Model):
     class Meta:
         verbose_name = "اجتماع"
         verbose_name_plural = "الاجتماعات"
+        indexes = [
+            models.Index(fields=['date']),
+        ]
         permissions = [
             ("view_meetingtask", "Can view meeting tasks"),
             ("add_meetingtask", "Can add meeting tasks"),
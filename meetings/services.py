@@ -0,0 +1,102 @@
+"""
+خدمات تقارير الاجتماعات
+(Meeting report services: grouped aggregates with a versioned cache)
+"""
+import hashlib
+import json
+
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+
+from core.cache import stats_cache
+
+REPORTS_CACHE_VERSION_KEY = 'meetings:reports:version'
+REPORTS_CACHE_TIMEOUT = 60 * 10
+
+MONTHS_AR = [
+    'يناير', 'فبراير', 'مارس', 'أبريل', 'مايو', 'يونيو',
+    'يوليو', 'أغسطس', 'سبتمبر', 'أكتوبر', 'نوفمبر', 'ديسمبر'
+]
+
+
+def get_reports_cache_version():
+    """
+    الحصول على رقم إصدار ذاكرة التقارير المؤقتة
+    (Current version of the reports cache; bumped on every meeting/task write)
+    """
+    version = stats_cache.get(REPORTS_CACHE_VERSION_KEY)
+    if version is None:
+        stats_cache.add(REPORTS_CACHE_VERSION_KEY, 1, None)
+        version = stats_cache.get(REPORTS_CACHE_VERSION_KEY, 1)
+    return version
+
+
+def invalidate_reports_cache():
+    """
+    إبطال جميع التقارير المخزنة مؤقتاً بزيادة رقم الإصدار
+    (Invalidate every cached report by bumping the version number)
+    """
+    try:
+        stats_cache.incr(REPORTS_CACHE_VERSION_KEY)
+    except ValueError:
+        stats_cache.set(REPORTS_CACHE_VERSION_KEY, 2, None)
+
+
+def _filters_signature(filters):
+    raw = json.dumps(filters, sort_keys=True, default=str)
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def build_report_summary(meetings):
+    """
+    حساب ملخص التقرير باستعلامين مجمعين فقط
+    (Build the report summary with two grouped queries)
+    """
+    totals = meetings.aggregate(
+        total=Count('id', distinct=True),
+        pending=Count('id', filter=Q(status='pending'), distinct=True),
+        completed=Count('id', filter=Q(status='completed'), distinct=True),
+        cancelled=Count('id', filter=Q(status='cancelled'), distinct=True),
+        tasks=Count('meeting_tasks', distinct=True),
+        attendees=Count('attendees', distinct=True),
+    )
+
+    # بيانات الاجتماعات حسب الشهر (Meetings per month, single GROUP BY)
+    monthly_rows = (
+        meetings.order_by()
+        .annotate(month=TruncMonth('date'))
+        .values('month')
+        .annotate(count=Count('id'))
+        .order_by('month')
+    )
+    monthly_data = [
+        {
+            'month_name': f"{MONTHS_AR[row['month'].month - 1]} {row['month'].year}",
+            'count': row['count'],
+        }
+        for row in monthly_rows
+    ]
+
+    total = totals['total']
+    return {
+        'total_meetings': total,
+        'pending_count': totals['pending'],
+        'completed_count': totals['completed'],
+        'cancelled_count': totals['cancelled'],
+        'monthly_data': monthly_data,
+        'avg_tasks': (totals['tasks'] / total) if total else 0,
+        'avg_attendees': (totals['attendees'] / total) if total else 0,
+    }
+
+
+def get_report_summary(meetings, filters):
+    """
+    إرجاع ملخص التقرير من الذاكرة المؤقتة أو حسابه وتخزينه
+    (Return the cached summary for this filter signature, computing it on a miss)
+    """
+    key = 'meetings:reports:{}:{}'.format(get_reports_cache_version(), _filters_signature(filters))
+    summary = stats_cache.get(key)
+    if summary is None:
+        summary = build_report_summary(meetings)
+        stats_cache.set(key, summary, REPORTS_CACHE_TIMEOUT)
+    return summary
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Meeting, MeetingTask, Attendee
+from .services import invalidate_reports_cache
+
+
+@receiver(post_save, sender=Meeting)
+@receiver(post_delete, sender=Meeting)
+@receiver(post_save, sender=MeetingTask)
+@receiver(post_delete, sender=MeetingTask)
+@receiver(post_save, sender=Attendee)
+@receiver(post_delete, sender=Attendee)
+def meeting_data_changed(sender, **kwargs):
+    """
+    إبطال تقارير الاجتماعات المخزنة مؤقتاً عند أي تعديل
+    """
+    invalidate_reports_cache()
@@ -0,0 +1,50 @@
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from meetings.models import Attendee, Meeting
+
+User = get_user_model()
+
+
+class MeetingCalendarFeedTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='adminpassword')
+        self.client.login(username='admin', password='adminpassword')
+
+        tz = timezone.get_current_timezone()
+        self.inside = Meeting.objects.create(
+            title='داخل النطاق', topic='x', created_by=self.admin,
+            date=timezone.make_aware(datetime(2025, 3, 15, 9, 0), tz),
+        )
+        Meeting.objects.create(
+            title='خارج النطاق', topic='x', created_by=self.admin,
+            date=timezone.make_aware(datetime(2025, 5, 1, 9, 0), tz),
+        )
+        Attendee.objects.create(meeting=self.inside, user=self.admin)
+        self.url = reverse('meetings:calendar_events')
+
+    def test_returns_only_meetings_in_range(self):
+        response = self.client.get(self.url, {'start': '2025-03-01', 'end': '2025-04-01'})
+        self.assertEqual(response.status_code, 200)
+        events = response.json()
+        self.assertEqual([event['id'] for event in events], [self.inside.pk])
+        self.assertEqual(events[0]['extendedProps']['attendeesCount'], 1)
+
+    def test_if_none_match_returns_not_modified(self):
+        params = {'start': '2025-03-01', 'end': '2025-04-01'}
+        first = self.client.get(self.url, params)
+        second = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+
+        Meeting.objects.filter(pk=self.inside.pk).update(title='عنوان جديد')
+        third = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(third.status_code, 200)
+
+    def test_rejects_missing_or_oversized_range(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        response = self.client.get(self.url, {'start': '2025-01-01', 'end': '2025-12-31'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from meetings.models import Attendee, Meeting, MeetingTask
+from meetings.views import MEETINGS_PAGE_SIZE
+
+User = get_user_model()
+
+
+class MeetingListQueryTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='member', password='memberpassword')
+        self.other = User.objects.create_user(username='other', password='otherpassword')
+        self.client.login(username='member', password='memberpassword')
+
+    def _create_meetings(self, count, start=0):
+        now = timezone.now()
+        for i in range(start, start + count):
+            meeting = Meeting.objects.create(
+                title=f'اجتماع {i}',
+                date=now - timedelta(hours=i),
+                topic='موضوع',
+                created_by=self.other,
+            )
+            Attendee.objects.create(meeting=meeting, user=self.user)
+            MeetingTask.objects.create(meeting=meeting, description='مهمة')
+
+    def _count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('meetings:list'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_meetings(self):
+        self._create_meetings(2)
+        # الطلب الأول ينشئ إعدادات النظام الافتراضية (First request creates default system settings)
+        self._count_queries()
+        baseline = self._count_queries()
+        self._create_meetings(10, start=2)
+        self.assertEqual(self._count_queries(), baseline)
+
+    def test_access_flag_and_counts_are_annotated(self):
+        self._create_meetings(1)
+        Meeting.objects.create(title='خاص', date=timezone.now(), topic='x', created_by=self.other)
+
+        response = self.client.get(reverse('meetings:list'))
+        meetings = response.context['meetings']
+        self.assertEqual(len(meetings), 1)
+        self.assertTrue(meetings[0].user_can_access)
+        self.assertEqual(meetings[0].attendees_count, 1)
+        self.assertEqual(meetings[0].tasks_count, 1)
+
+    def test_keyset_pagination_walks_all_meetings(self):
+        self._create_meetings(MEETINGS_PAGE_SIZE + 5)
+
+        first = self.client.get(reverse('meetings:list'))
+        self.assertEqual(len(first.context['meetings']), MEETINGS_PAGE_SIZE)
+        self.assertIsNotNone(first.context['next_cursor'])
+
+        second = self.client.get(reverse('meetings:list'), {'cursor': first.context['next_cursor']})
+        self.assertEqual(len(second.context['meetings']), 5)
+        self.assertIsNone(second.context['next_cursor'])
+
+        seen = {m.pk for m in first.context['meetings']} | {m.pk for m in second.context['meetings']}
+        self.assertEqual(len(seen), MEETINGS_PAGE_SIZE + 5)
+
+    def test_corrupt_cursor_is_not_found(self):
+        response = self.client.get(reverse('meetings:list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
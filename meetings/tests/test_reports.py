@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.cache import stats_cache
+from meetings.models import Attendee, Meeting, MeetingTask
+
+User = get_user_model()
+
+
+class MeetingReportsTestCase(TestCase):
+    def setUp(self):
+        stats_cache.clear()
+        self.admin = User.objects.create_superuser(username='admin', password='adminpassword')
+        self.client.login(username='admin', password='adminpassword')
+
+        tz = timezone.get_current_timezone()
+        self.january = Meeting.objects.create(
+            title='يناير', topic='x', created_by=self.admin,
+            date=timezone.make_aware(datetime(2025, 1, 10, 10, 0), tz),
+        )
+        self.february = Meeting.objects.create(
+            title='فبراير', topic='x', created_by=self.admin, status='completed',
+            date=timezone.make_aware(datetime(2025, 2, 10, 10, 0), tz),
+        )
+        MeetingTask.objects.create(meeting=self.january, description='a', status='completed')
+        MeetingTask.objects.create(meeting=self.january, description='b')
+        Attendee.objects.create(meeting=self.january, user=self.admin)
+
+    def test_summary_and_per_meeting_counts(self):
+        response = self.client.get(reverse('meetings:reports'))
+        self.assertEqual(response.status_code, 200)
+        context = response.context
+
+        self.assertEqual(context['total_meetings'], 2)
+        self.assertEqual(context['pending_count'], 1)
+        self.assertEqual(context['completed_count'], 1)
+        self.assertEqual([m['count'] for m in context['monthly_data']], [1, 1])
+        self.assertEqual(context['avg_tasks'], 1)
+
+        rows = {m.pk: m for m in context['meetings']}
+        self.assertEqual(rows[self.january.pk].tasks_count, 2)
+        self.assertEqual(rows[self.january.pk].completed_tasks_count, 1)
+        self.assertEqual(rows[self.january.pk].attendees_count, 1)
+
+    def test_cached_summary_is_invalidated_on_task_write(self):
+        self.client.get(reverse('meetings:reports'))
+        MeetingTask.objects.create(meeting=self.february, description='c')
+
+        response = self.client.get(reverse('meetings:reports'))
+        self.assertEqual(response.context['avg_tasks'], 1.5)
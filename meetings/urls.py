@@ -18,6 +18,7 @@ urlpatterns = [
 
     # التقويم
     path('calendar/', views.calendar_view, name='calendar'),
+    path('calendar/events/', views.calendar_events, name='calendar_events'),
 
     # التقارير
     path('reports/', views.reports, name='reports'),
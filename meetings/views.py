@@ -1,5 +1,5 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from .models import Meeting, Attendee, MeetingTask
 import json
 from .forms import MeetingForm, MeetingTaskStepForm, MeetingTaskStatusForm
@@ -8,10 +8,23 @@ from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from datetime import datetime, timedelta
-from django.db.models import Count, Avg, Q
+from django.db.models import Count, Q, Exists, OuterRef, Value, BooleanField
+from django.core.paginator import Paginator
+from django.urls import reverse
+from core.calendar_feed import (
+    CalendarRangeError, calendar_range_error_response, etag_json_response, parse_calendar_range,
+)
+from core.pagination import InvalidCursor, keyset_paginate
+from .services import get_report_summary
 
 User = get_user_model()
 
+# عدد الاجتماعات في كل صفحة من قائمة الاجتماعات
+MEETINGS_PAGE_SIZE = 30
+
+# عدد الاجتماعات في كل صفحة من التقارير
+REPORTS_PAGE_SIZE = 50
+
 @login_required
 def dashboard(request):
     """عرض لوحة تحكم الاجتماعات"""
@@ -66,15 +79,19 @@ def dashboard(request):
 
 @login_required
 def meeting_list(request):
+    # كل الاجتماعات المعروضة متاحة للمستخدم بعد التصفية
+    meetings = Meeting.objects.annotate(
+        user_can_access=Value(True, output_field=BooleanField())
+    )
+
     # تصفية الاجتماعات حسب صلاحية الوصول للمستخدم
-    if request.user.is_superuser:
-        # المدير العام يرى جميع الاجتماعات
-        meetings = Meeting.objects.all().order_by('-date')
-    else:
-        # المستخدمون العاديون يرون فقط الاجتماعات التي أنشؤوها أو مدعوون إليها
-        meetings = Meeting.objects.filter(
-            Q(created_by=request.user) | Q(attendees__user=request.user)
-        ).distinct().order_by('-date')
+    if not request.user.is_superuser:
+        # المستخدمون العاديون يرون فقط الاجتماعات التي أنشؤوها أو مدعوون إليها،
+        # والتحقق من الحضور داخل الاستعلام الرئيسي بدلاً من استعلام لكل اجتماع
+        meetings = meetings.filter(
+            Q(created_by=request.user)
+            | Exists(Attendee.objects.filter(meeting=OuterRef('pk'), user=request.user))
+        )
 
     # تطبيق عوامل التصفية
     date_from = request.GET.get('date_from')
@@ -96,20 +113,30 @@ def meeting_list(request):
             Q(title__icontains=search) | Q(topic__icontains=search)
         )
 
-    # إضافة معلومات الحضور لكل اجتماع لتحديد إمكانية الوصول
-    meetings_with_access = []
-    for meeting in meetings:
-        # التحقق من إمكانية الوصول للمستخدم الحالي
-        user_can_access = (
-            request.user.is_superuser or
-            meeting.attendees.filter(user=request.user).exists() or
-            meeting.created_by == request.user
+    # عدد الحضور والمهام ومنشئ الاجتماع في نفس الاستعلام
+    meetings = meetings.select_related('created_by').annotate(
+        attendees_count=Count('attendees', distinct=True),
+        tasks_count=Count('meeting_tasks', distinct=True),
+    )
+
+    # ترقيم الصفحات بالمفتاح (التاريخ، المعرف) بدون OFFSET أو COUNT
+    cursor = request.GET.get('cursor')
+    try:
+        meetings_page, next_cursor = keyset_paginate(
+            meetings, cursor, MEETINGS_PAGE_SIZE, 'date', descending=True
         )
-        meeting.user_can_access = user_can_access
-        meetings_with_access.append(meeting)
+    except InvalidCursor:
+        raise Http404('Invalid cursor')
+
+    # الحفاظ على عوامل التصفية في رابط الصفحة التالية
+    query_params = request.GET.copy()
+    query_params.pop('cursor', None)
 
     return render(request, 'meetings/meeting_list.html', {
-        'meetings': meetings_with_access,
+        'meetings': meetings_page,
+        'next_cursor': next_cursor,
+        'is_first_page': not cursor,
+        'filter_query': query_params.urlencode(),
         'date_from': date_from,
         'date_to': date_to,
         'status': status,
@@ -352,8 +379,47 @@ def remove_attendee(request, pk):
 @permission_required('meetings.view_meeting', login_url='accounts:access_denied')
 def calendar_view(request):
     """عرض تقويم الاجتماعات"""
-    meetings = Meeting.objects.all()
-    return render(request, 'meetings/calendar.html', {'meetings': meetings})
+    # يتم تحميل الاجتماعات من calendar_events حسب الشهر المعروض فقط
+    return render(request, 'meetings/calendar.html')
+
+@login_required
+@permission_required('meetings.view_meeting', login_url='accounts:access_denied')
+def calendar_events(request):
+    """خلاصة JSON لاجتماعات النطاق الزمني المعروض في التقويم"""
+    try:
+        start, end = parse_calendar_range(request)
+    except CalendarRangeError as error:
+        return calendar_range_error_response(error)
+
+    # استعلام واحد بالحقول المطلوبة فقط ضمن النطاق (يستخدم فهرس التاريخ)
+    rows = (
+        Meeting.objects.filter(date__gte=start, date__lt=end)
+        .annotate(attendees_count=Count('attendees'))
+        .order_by('date', 'id')
+        .values(
+            'id', 'title', 'date', 'status', 'topic', 'attendees_count',
+            'created_by__username', 'created_by__first_name', 'created_by__last_name',
+        )
+    )
+
+    status_labels = dict(Meeting.STATUS_CHOICES)
+    events = []
+    for row in rows:
+        creator = f"{row['created_by__first_name'] or ''} {row['created_by__last_name'] or ''}".strip()
+        events.append({
+            'id': row['id'],
+            'title': row['title'],
+            'start': row['date'],
+            'className': f"meeting-{row['status']}",
+            'extendedProps': {
+                'topic': row['topic'],
+                'status': status_labels.get(row['status'], row['status']),
+                'creator': creator or row['created_by__username'],
+                'attendeesCount': row['attendees_count'],
+                'detailUrl': reverse('meetings:detail', args=[row['id']]),
+            },
+        })
+    return etag_json_response(request, events)
 
 @login_required
 def meeting_task_detail(request, task_id):
@@ -457,55 +523,47 @@ def reports(request):
     if creator:
         meetings = meetings.filter(created_by_id=creator)
     
-    # إحصائيات حالة الاجتماعات
-    pending_count = meetings.filter(status='pending').count()
-    completed_count = meetings.filter(status='completed').count()
-    cancelled_count = meetings.filter(status='cancelled').count()
-    
-    # بيانات الاجتماعات حسب الشهر
-    monthly_data = []
-    months_ar = [
-        'يناير', 'فبراير', 'مارس', 'أبريل', 'مايو', 'يونيو',
-        'يوليو', 'أغسطس', 'سبتمبر', 'أكتوبر', 'نوفمبر', 'ديسمبر'
-    ]
-    
-    # الحصول على الأشهر التي تحتوي على اجتماعات
-    meeting_months = meetings.dates('date', 'month')
-    
-    for month in meeting_months:
-        month_count = meetings.filter(date__year=month.year, date__month=month.month).count()
-        month_name = f"{months_ar[month.month - 1]} {month.year}"
-        monthly_data.append({
-            'month_name': month_name,
-            'count': month_count
-        })
-    
-    # حساب متوسط المهام والحضور لكل اجتماع
-    avg_tasks = meetings.annotate(tasks_count=Count('meeting_tasks')).aggregate(avg=Avg('tasks_count'))['avg'] or 0
-    avg_attendees = meetings.annotate(attendees_count=Count('attendees')).aggregate(avg=Avg('attendees_count'))['avg'] or 0
-    
-    # إضافة عدد المهام المكتملة لكل اجتماع
-    meeting_list = []
-    for meeting in meetings:
-        # حساب عدد المهام المكتملة
-        meeting.completed_tasks_count = meeting.meeting_tasks.filter(status='completed').count()
-        meeting_list.append(meeting)
-    
-    # الحصول على قائمة المستخدمين للفلتر
-    users = User.objects.all()
-    
+    # ملخص التقرير من استعلامات مجمعة ومخزن مؤقتاً حسب معايير التصفية
+    summary = get_report_summary(meetings, {
+        'date_from': date_from,
+        'date_to': date_to,
+        'status': status,
+        'creator': creator,
+    })
+
+    # عدد الحضور والمهام والمهام المكتملة لكل اجتماع في نفس الاستعلام
+    meetings = meetings.select_related('created_by').annotate(
+        attendees_count=Count('attendees', distinct=True),
+        tasks_count=Count('meeting_tasks', distinct=True),
+        completed_tasks_count=Count(
+            'meeting_tasks', filter=Q(meeting_tasks__status='completed'), distinct=True
+        ),
+    ).order_by('-date', '-id')
+
+    # ترقيم صفحات قائمة الاجتماعات
+    paginator = Paginator(meetings, REPORTS_PAGE_SIZE)
+    # العدد الإجمالي معروف من الملخص، لا حاجة لاستعلام COUNT إضافي
+    paginator.count = summary['total_meetings']
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    # الحفاظ على عوامل التصفية في روابط الصفحات
+    query_params = request.GET.copy()
+    query_params.pop('page', None)
+
+    # قائمة منشئي الاجتماعات فقط للفلتر
+    users = User.objects.filter(
+        id__in=Meeting.objects.values('created_by')
+    ).only('id', 'username', 'first_name', 'last_name')
+
     # التاريخ الحالي للطباعة
     now = timezone.now()
     
     context = {
-        'meetings': meeting_list,
-        'pending_count': pending_count,
-        'completed_count': completed_count,
-        'cancelled_count': cancelled_count,
-        'monthly_data': monthly_data,
-        'avg_tasks': avg_tasks,
-        'avg_attendees': avg_attendees,
+        'meetings': page_obj,
+        'page_obj': page_obj,
+        'filter_query': query_params.urlencode(),
         'users': users,
         'now': now,
+        **summary,
     }
     return render(request, 'meetings/reports.html', context)
@@ -8,44 +8,81 @@ from django.contrib.auth import get_user_model
 from inventory.models import TblProducts, TblInvoiceitems
 from accounts.models import Users_Login_New
 
-from .utils import create_inventory_notification
+from core.signals import bulk_saved
+
+from .models import Notification
+from .utils import build_notification, create_inventory_notification
 
 User = get_user_model()
 
 # إشارات المخزن (Inventory)
+def product_threshold_kwargs(instance):
+    """معطيات تنبيه الحد الأدنى أو النفاد لمنتج (kwargs for ``create_inventory_notification``, or None)"""
+    # التحقق من وجود كمية محددة وحد أدنى محدد
+    if instance.qte_in_stock is None or instance.minimum_threshold is None:
+        return None
+
+    # إذا وصل المنتج للحد الأدنى
+    if instance.qte_in_stock <= instance.minimum_threshold and instance.qte_in_stock > 0:
+        return dict(
+            title=_('منتج وصل للحد الأدنى'),
+            message=_(f'المنتج {instance.product_name} وصل للحد الأدنى. الكمية المتبقية: {instance.qte_in_stock}'),
+            priority='high',
+            content_object=instance,
+            url=f'/inventory/products/detail/{instance.product_id}/'
+        )
+
+    # إذا نفد المنتج من المخزن
+    elif instance.qte_in_stock <= 0:
+        return dict(
+            title=_('منتج نفد من المخزن'),
+            message=_(f'المنتج {instance.product_name} نفد من المخزن. يرجى إعادة الطلب.'),
+            priority='urgent',
+            content_object=instance,
+            url=f'/inventory/products/detail/{instance.product_id}/'
+        )
+    return None
+
+
 @receiver(post_save, sender=TblProducts)
 def product_threshold_notification(sender, instance, **kwargs):
     """إنشاء تنبيه عند وصول المنتج للحد الأدنى أو نفاده من المخزن"""
-    # التحقق من وجود كمية محددة وحد أدنى محدد
-    if instance.qte_in_stock is not None and instance.minimum_threshold is not None:
-        # الحصول على مستخدمي النظام المسؤولين عن المخزن
-        # هنا نفترض أن المستخدمين المسؤولين عن المخزن هم المستخدمين النشطين
-        # يمكن تعديل هذا الشرط حسب هيكل النظام
-        inventory_managers = Users_Login_New.objects.filter(is_active=True)
-        
-        # إذا وصل المنتج للحد الأدنى
-        if instance.qte_in_stock <= instance.minimum_threshold and instance.qte_in_stock > 0:
-            for manager in inventory_managers:
-                create_inventory_notification(
-                    user=manager,
-                    title=_('منتج وصل للحد الأدنى'),
-                    message=_(f'المنتج {instance.product_name} وصل للحد الأدنى. الكمية المتبقية: {instance.qte_in_stock}'),
-                    priority='high',
-                    content_object=instance,
-                    url=f'/inventory/products/detail/{instance.product_id}/'
-                )
-        
-        # إذا نفد المنتج من المخزن
-        elif instance.qte_in_stock <= 0:
-            for manager in inventory_managers:
-                create_inventory_notification(
-                    user=manager,
-                    title=_('منتج نفد من المخزن'),
-                    message=_(f'المنتج {instance.product_name} نفد من المخزن. يرجى إعادة الطلب.'),
-                    priority='urgent',
-                    content_object=instance,
-                    url=f'/inventory/products/detail/{instance.product_id}/'
-                )
+    notification = product_threshold_kwargs(instance)
+    if notification is None:
+        return
+    # الحصول على مستخدمي النظام المسؤولين عن المخزن
+    # هنا نفترض أن المستخدمين المسؤولين عن المخزن هم المستخدمين النشطين
+    # يمكن تعديل هذا الشرط حسب هيكل النظام
+    inventory_managers = Users_Login_New.objects.filter(is_active=True)
+    for manager in inventory_managers:
+        create_inventory_notification(user=manager, **notification)
+
+
+@receiver(bulk_saved, sender=TblProducts)
+def bulk_product_threshold_notification(sender, created, updated, changed_fields, **kwargs):
+    """
+    تنبيهات المنتجات التي تغيرت حدودها أو كمياتها في كتابة دفعية
+    (Same notifications as ``product_threshold_notification``, saved with
+    one ``bulk_create``)
+    """
+    watched = {'qte_in_stock', 'minimum_threshold'}
+    pks = [product.pk for product in created]
+    pks += [product.pk for product in updated if watched & changed_fields[product.pk]]
+    if not pks:
+        return
+    # الحقول غير المحملة في الدفعة (الكمية والاسم) تقرأ باستعلام واحد
+    products = TblProducts.objects.only(
+        'product_id', 'product_name', 'qte_in_stock', 'minimum_threshold'
+    ).filter(pk__in=pks)
+    pending = [notification for notification in map(product_threshold_kwargs, products) if notification]
+    if not pending:
+        return
+    inventory_managers = list(Users_Login_New.objects.filter(is_active=True))
+    Notification.objects.bulk_create([
+        build_notification(user=manager, notification_type='inventory', icon='fas fa-boxes', **notification)
+        for notification in pending
+        for manager in inventory_managers
+    ], batch_size=500)
 
 
 @receiver(post_save, sender=TblInvoiceitems)
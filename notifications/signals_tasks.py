@@ -4,68 +4,103 @@ from django.utils.translation import gettext_lazy as _
 
 from tasks.models import Task, TaskStep
 
-from .utils import create_meeting_notification
+from core.signals import bulk_saved
+
+from .models import Notification
+from .utils import build_notification, create_meeting_notification
 
 # إشارات المهام (Tasks)
-@receiver(post_save, sender=Task)
-def task_notification(sender, instance, created, **kwargs):
-    """إنشاء تنبيه عند إنشاء أو تحديث مهمة"""
+def task_notification_kwargs(instance, created):
+    """معطيات تنبيهات إنشاء أو تحديث مهمة (kwargs for ``create_meeting_notification``)"""
+    notifications = []
     if created:
         # إنشاء تنبيه للمستخدم المكلف بالمهمة
-        create_meeting_notification(
+        notifications.append(dict(
             user=instance.assigned_to,
             title=_('تم تكليفك بمهمة جديدة'),
             message=_(f'تم تكليفك بمهمة جديدة: {instance.description[:50]}'),
             priority='high',
             content_object=instance,
             url=f'/tasks/{instance.pk}/'
-        )
-        
+        ))
+
         # إنشاء تنبيه للمستخدم الذي أنشأ المهمة (إذا كان مختلفًا)
         if instance.created_by and instance.created_by != instance.assigned_to:
-            create_meeting_notification(
+            notifications.append(dict(
                 user=instance.created_by,
                 title=_('تم إنشاء مهمة جديدة'),
                 message=_(f'تم إنشاء مهمة جديدة وتكليفها إلى {instance.assigned_to.username}: {instance.description[:50]}'),
                 priority='medium',
                 content_object=instance,
                 url=f'/tasks/{instance.pk}/'
-            )
+            ))
     else:
         # إذا تم تغيير حالة المهمة
         if instance.status == 'completed':
             # إنشاء تنبيه للمستخدم الذي أنشأ المهمة
             if instance.created_by:
-                create_meeting_notification(
+                notifications.append(dict(
                     user=instance.created_by,
                     title=_('تم إكمال المهمة'),
                     message=_(f'تم إكمال المهمة: {instance.description[:50]} بواسطة {instance.assigned_to.username}'),
                     priority='medium',
                     content_object=instance,
                     url=f'/tasks/{instance.pk}/'
-                )
+                ))
         elif instance.status == 'in_progress':
             # إنشاء تنبيه للمستخدم الذي أنشأ المهمة
             if instance.created_by and instance.created_by != instance.assigned_to:
-                create_meeting_notification(
+                notifications.append(dict(
                     user=instance.created_by,
                     title=_('تم بدء العمل على المهمة'),
                     message=_(f'تم بدء العمل على المهمة: {instance.description[:50]} بواسطة {instance.assigned_to.username}'),
                     priority='low',
                     content_object=instance,
                     url=f'/tasks/{instance.pk}/'
-                )
+                ))
         elif instance.status == 'canceled':
             # إنشاء تنبيه للمستخدم الذي أنشأ المهمة
             if instance.created_by and instance.created_by != instance.assigned_to:
-                create_meeting_notification(
+                notifications.append(dict(
                     user=instance.created_by,
                     title=_('تم إلغاء المهمة'),
                     message=_(f'تم إلغاء المهمة: {instance.description[:50]}'),
                     priority='medium',
                     content_object=instance,
                     url=f'/tasks/{instance.pk}/'
-                )
+                ))
+    return notifications
+
+
+@receiver(post_save, sender=Task)
+def task_notification(sender, instance, created, **kwargs):
+    """إنشاء تنبيه عند إنشاء أو تحديث مهمة"""
+    for notification in task_notification_kwargs(instance, created):
+        create_meeting_notification(**notification)
+
+
+@receiver(bulk_saved, sender=Task)
+def bulk_task_notification(sender, created, updated, changed_fields, **kwargs):
+    """
+    تنبيهات المهام المكتوبة دفعة واحدة
+    (Same notifications as ``task_notification``, for the tasks of a bulk
+    write whose status changed, saved with one ``bulk_create``)
+    """
+    created_ids = {task.pk for task in created}
+    # المهمة المكررة في الدفعة تنبه مرة واحدة
+    pks = list(dict.fromkeys(
+        [task.pk for task in created] + [task.pk for task in updated if 'status' in changed_fields[task.pk]]
+    ))
+    if not pks:
+        return
+    # قراءة واحدة للمهام مع المستخدمين بدلاً من استعلام لكل مهمة
+    tasks = Task.objects.select_related('assigned_to', 'created_by').in_bulk(pks)
+    notifications = [
+        build_notification(notification_type='meetings', icon='fas fa-users', **notification)
+        for pk in pks
+        for notification in task_notification_kwargs(tasks[pk], created=pk in created_ids)
+    ]
+    Notification.objects.bulk_create(notifications, batch_size=500)
 
 
 @receiver(post_save, sender=TaskStep)
@@ -3,6 +3,33 @@ from django.utils import timezone
 from .models import Notification
 
 
+def build_notification(user, title, message, notification_type, priority='medium',
+                       content_object=None, url=None, icon=None):
+    """
+    تجهيز تنبيه بدون حفظه، ليحفظ مع غيره بـ bulk_create
+    (Same arguments as ``create_notification``; returns the unsaved instance)
+    """
+    notification = Notification(
+        user=user,
+        title=title,
+        message=message,
+        notification_type=notification_type,
+        priority=priority,
+        url=url
+    )
+
+    if icon:
+        notification.icon = icon
+
+    # إذا كان هناك كائن مرتبط، قم بتعيينه
+    # معرف الكائن رقمي، فالمفاتيح النصية (مثل رمز المنتج) لا تربط
+    if content_object and str(content_object.pk).isdigit():
+        notification.content_type = ContentType.objects.get_for_model(content_object)
+        notification.object_id = content_object.pk
+
+    return notification
+
+
 def create_notification(user, title, message, notification_type, priority='medium',
                         content_object=None, url=None, icon=None):
     """
@@ -21,23 +48,10 @@ def create_notification(user, title, message, notification_type, priority='mediu
     Returns:
         كائن التنبيه الذي تم إنشاؤه
     """
-    notification = Notification(
-        user=user,
-        title=title,
-        message=message,
-        notification_type=notification_type,
-        priority=priority,
-        url=url
+    notification = build_notification(
+        user, title, message, notification_type, priority=priority,
+        content_object=content_object, url=url, icon=icon,
     )
-
-    if icon:
-        notification.icon = icon
-
-    # إذا كان هناك كائن مرتبط، قم بتعيينه
-    if content_object:
-        notification.content_type = ContentType.objects.get_for_model(content_object)
-        notification.object_id = content_object.pk
-
     notification.save()
     return notification
 
@@ -0,0 +1,123 @@
+"""
+حساب قسائم الرواتب في الذاكرة
+(Pure in-memory payslip calculation)
+
+Nothing here touches the database or imports Django models, so chunks of
+employees can be computed in worker processes. Inputs and results are plain
+dicts of ``Decimal`` values; ``engine.py`` loads the inputs for a whole
+period and persists the results.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+ALLOWANCE_TYPES = ('allowance', 'bonus', 'overtime', 'commission')
+DEDUCTION_TYPES = ('deduction', 'tax', 'insurance', 'loan_deduction', 'advance_deduction')
+
+ZERO = Decimal('0')
+CENT = Decimal('0.01')
+
+# ساعات الشهر لحساب أجر الساعة (30 يوماً × 8 ساعات)
+MONTHLY_HOURS = Decimal('240')
+OVERTIME_MULTIPLIER = Decimal('1.5')
+
+INSURANCE_RATE = Decimal('0.02')
+
+
+def money(value):
+    """تقريب مبلغ إلى هللتين (Round an amount to two decimal places)"""
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def prorated_basic(basic_salary, working_days, present_days):
+    """الراتب الأساسي بنسبة أيام الحضور (Basic salary pro-rated by attendance)"""
+    if working_days > 0:
+        return money(basic_salary * Decimal(str(present_days / working_days)))
+    return money(basic_salary)
+
+
+def component_amount(component, basic_salary):
+    """مبلغ مكون من هيكل الراتب (Amount of one salary structure component)"""
+    if component['calculation_method'] == 'percentage':
+        percentage = component['percentage'] or component['percentage_rate'] or ZERO
+        return money(basic_salary * (percentage / 100))
+    return money(component['amount'])
+
+
+def overtime_amount(basic_salary, overtime_hours):
+    if overtime_hours > 0:
+        hourly_rate = basic_salary / MONTHLY_HOURS
+        return money(overtime_hours * hourly_rate * OVERTIME_MULTIPLIER)
+    return ZERO
+
+
+def compute_payslip(item):
+    """
+    حساب قسيمة موظف واحد
+    (Compute one employee's payslip fields and component lines)
+
+    ``item`` holds the employee's structure ``basic_salary``, ``attendance``
+    counters, structure ``components`` and approved ``transactions``.
+    Transactions that map to a component already on the payslip are added
+    to that line, since a payslip holds one line per component. Tax is not
+    computed here: the engine evaluates a whole chunk against the tax table.
+    """
+    attendance = item['attendance']
+    basic = prorated_basic(item['basic_salary'], attendance['working_days'], attendance['present_days'])
+
+    lines = {}
+    for component in item['components']:
+        lines[component['component_id']] = {
+            'component_id': component['component_id'],
+            'component_type': component['component_type'],
+            'amount': component_amount(component, basic),
+            'calculation_base': basic,
+            'rate_or_percentage': component['percentage'],
+            'calculation_notes': '',
+        }
+    for transaction in item['transactions']:
+        note = f"Transaction: {transaction['description']}"
+        line = lines.get(transaction['component_id'])
+        if line is None:
+            lines[transaction['component_id']] = {
+                'component_id': transaction['component_id'],
+                'component_type': transaction['component_type'],
+                'amount': money(transaction['amount']),
+                'calculation_base': None,
+                'rate_or_percentage': None,
+                'calculation_notes': note,
+            }
+        else:
+            line['amount'] += money(transaction['amount'])
+            line['calculation_notes'] = '\n'.join(filter(None, [line['calculation_notes'], note]))
+
+    allowances = sum(
+        (line['amount'] for line in lines.values() if line['component_type'] in ALLOWANCE_TYPES), ZERO,
+    )
+    deductions = sum(
+        (line['amount'] for line in lines.values() if line['component_type'] in DEDUCTION_TYPES), ZERO,
+    )
+    gross = basic + allowances
+
+    return {
+        'employee_id': item['employee_id'],
+        'fields': {
+            'salary_structure_id': item['salary_structure_id'],
+            'working_days': attendance['working_days'],
+            'present_days': attendance['present_days'],
+            'absent_days': attendance['absent_days'],
+            'leave_days': attendance['leave_days'],
+            'overtime_hours': attendance['overtime_hours'],
+            'basic_salary': basic,
+            'total_allowances': allowances,
+            'overtime_amount': overtime_amount(basic, attendance['overtime_hours']),
+            'gross_salary': gross,
+            'total_deductions': deductions,
+            'insurance_deduction': money(basic * INSURANCE_RATE),
+            'net_salary': gross - deductions,
+        },
+        'lines': list(lines.values()),
+    }
+
+
+def compute_chunk(items):
+    """حساب مجموعة قسائم (Compute a chunk; the unit of work sent to a worker process)"""
+    return [compute_payslip(item) for item in items]
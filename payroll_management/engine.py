@@ -0,0 +1,353 @@
+"""
+محرك حساب الرواتب دفعة واحدة
+(Batch payroll calculation engine)
+
+Everything a period needs is loaded up front with a fixed number of
+queries: the salary structures in effect, their components, one grouped
+attendance aggregate and the approved transactions. Payslips are then
+computed in memory by ``calculation.compute_chunk``, one chunk per
+department, optionally across a process pool; each chunk's tax is evaluated
+in one call against the compiled tax table, and every chunk is written
+with ``bulk_create`` / ``bulk_update`` in its own transaction so
+``PayrollPeriod.processing_progress`` advances while the run is going.
+
+Bulk writes bypass the per-payslip signals; the period totals are
+recomputed once at the end.
+"""
+import logging
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from attendance_system.models import DailyAttendance
+from core.sequences import document_numbers
+from employee_management.models import Employee
+
+from .calculation import ZERO, compute_chunk
+from .models import (
+    EmployeePayslip, EmployeeSalaryComponent, EmployeeSalaryStructure, PayrollPeriod,
+    PayrollTransaction, PayslipComponent, SalaryComponent,
+)
+from .signals import calculate_payroll_period_totals
+from .tax import get_tax_table
+from .totals import PROCESSED_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# حد آمن لعدد المعاملات في استعلام IN على SQL Server
+IN_CHUNK_SIZE = 1000
+
+# أكبر عدد من الموظفين في وحدة عمل واحدة
+MAX_CHUNK_SIZE = 500
+
+# القسائم المعتمدة أو المدفوعة أو الملغاة لا يعاد حسابها
+LOCKED_STATUSES = ['approved', 'paid', 'cancelled']
+
+ATTENDANCE_AGGREGATES = {
+    'working_days': Count('id', filter=~Q(status__in=['holiday', 'weekend'])),
+    'present_days': Count('id', filter=Q(status__in=['present', 'late', 'early_departure'])),
+    'absent_days': Count('id', filter=Q(status='absent')),
+    'leave_days': Count('id', filter=Q(status='leave')),
+    'overtime_hours': Sum('overtime_hours'),
+}
+
+EMPTY_ATTENDANCE = {
+    'working_days': 0, 'present_days': 0, 'absent_days': 0, 'leave_days': 0, 'overtime_hours': ZERO,
+}
+
+PAYSLIP_FIELDS = [
+    'salary_structure_id', 'working_days', 'present_days', 'absent_days', 'leave_days',
+    'overtime_hours', 'basic_salary', 'total_allowances', 'overtime_amount', 'gross_salary',
+    'total_deductions', 'tax_deduction', 'insurance_deduction', 'net_salary',
+    'status', 'calculation_date', 'updated_at',
+]
+
+
+class PayrollCalculationError(ValueError):
+    """تعذر حساب الفترة (The period cannot be calculated)"""
+
+
+def _chunks(items, size=IN_CHUNK_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def period_employees(period, employee_ids=None, department=None):
+    """
+    الموظفون المشمولون بالفترة
+    (Active employees employed during the period)
+    """
+    employees = Employee.objects.filter(
+        is_active=True, hire_date__lte=period.end_date,
+    ).exclude(termination_date__lt=period.start_date)
+    if department:
+        employees = employees.filter(department=department)
+    if employee_ids is not None:
+        employees = employees.filter(pk__in=list(employee_ids))
+    return dict(employees.order_by().values_list('pk', 'department_id'))
+
+
+def load_structures(period, employee_ids):
+    """هيكل الراتب الساري لكل موظف (Latest salary structure in effect, per employee)"""
+    structures = {}
+    queryset = EmployeeSalaryStructure.objects.filter(
+        is_active=True, effective_from__lte=period.end_date,
+    ).filter(
+        Q(effective_to__isnull=True) | Q(effective_to__gte=period.start_date)
+    ).order_by('employee_id', '-effective_from').values_list('pk', 'employee_id', 'basic_salary')
+    for chunk in _chunks(employee_ids):
+        for pk, employee_id, basic_salary in queryset.filter(employee_id__in=chunk):
+            structures.setdefault(employee_id, (pk, basic_salary))
+    return structures
+
+
+def load_structure_components(structure_ids):
+    """مكونات هياكل الرواتب مجمعة حسب الهيكل (Active structure components, by structure)"""
+    components = defaultdict(list)
+    queryset = EmployeeSalaryComponent.objects.filter(is_active=True).values(
+        'salary_structure_id', 'component_id', 'amount', 'percentage',
+        'component__component_type', 'component__calculation_method', 'component__percentage_rate',
+    )
+    for chunk in _chunks(structure_ids):
+        for row in queryset.filter(salary_structure_id__in=chunk):
+            components[row['salary_structure_id']].append({
+                'component_id': row['component_id'],
+                'component_type': row['component__component_type'],
+                'calculation_method': row['component__calculation_method'],
+                'amount': row['amount'],
+                'percentage': row['percentage'],
+                'percentage_rate': row['component__percentage_rate'],
+            })
+    return components
+
+
+def load_attendance(period, employee_ids):
+    """
+    إحصائيات الحضور لكل موظف باستعلام مجمع واحد
+    (Attendance counters per employee from one grouped aggregate)
+    """
+    attendance = {}
+    records = DailyAttendance.objects.filter(
+        attendance_date__range=(period.start_date, period.end_date), is_processed=True,
+    ).order_by().values('employee_id')
+    for chunk in _chunks(employee_ids):
+        for row in records.filter(employee_id__in=chunk).annotate(**ATTENDANCE_AGGREGATES):
+            row['overtime_hours'] = row['overtime_hours'] or ZERO
+            attendance[row.pop('employee_id')] = row
+    return attendance
+
+
+def transaction_components(transaction_types):
+    """
+    مكون الراتب المقابل لكل نوع معاملة، وإنشاء المفقود منها
+    (Salary component used for each transaction type, creating missing ones)
+    """
+    components = {}
+    active = SalaryComponent.objects.filter(
+        component_type__in=transaction_types, is_active=True,
+    ).order_by('display_order', 'component_name')
+    for component in active:
+        components.setdefault(component.component_type, component)
+    labels = dict(PayrollTransaction.TRANSACTION_TYPES)
+    for transaction_type in set(transaction_types) - set(components):
+        components[transaction_type], _ = SalaryComponent.objects.get_or_create(
+            component_name=str(labels.get(transaction_type, transaction_type)),
+            component_type=transaction_type,
+            defaults={'calculation_method': 'fixed', 'is_active': True},
+        )
+    return {key: (component.pk, component.component_type) for key, component in components.items()}
+
+
+def load_transactions(period, employee_ids):
+    """المعاملات المعتمدة للفترة مجمعة حسب الموظف (Approved transactions, by employee)"""
+    rows = []
+    queryset = PayrollTransaction.objects.filter(payroll_period=period, is_approved=True).order_by(
+        'created_at', 'pk',
+    ).values('employee_id', 'transaction_type', 'amount', 'description')
+    for chunk in _chunks(employee_ids):
+        rows.extend(queryset.filter(employee_id__in=chunk))
+
+    components = transaction_components({row['transaction_type'] for row in rows}) if rows else {}
+    transactions = defaultdict(list)
+    for row in rows:
+        component_id, component_type = components[row['transaction_type']]
+        transactions[row['employee_id']].append({
+            'component_id': component_id,
+            'component_type': component_type,
+            'amount': row['amount'],
+            'description': row['description'],
+        })
+    return transactions
+
+
+def load_period_inputs(period, employee_ids=None, department=None):
+    """
+    مدخلات الحساب لجميع موظفي الفترة
+    (Calculation inputs for the period, grouped by department)
+
+    Employees without a salary structure in effect, or whose payslip is
+    already approved, paid or cancelled, are left out. Returns the inputs,
+    the number of employees in scope and how many of them already have an
+    approved or paid payslip.
+    """
+    employees = period_employees(period, employee_ids=employee_ids, department=department)
+    locked = {}
+    for chunk in _chunks(employees):
+        locked.update(EmployeePayslip.objects.filter(
+            payroll_period=period, employee_id__in=chunk, status__in=LOCKED_STATUSES,
+        ).values_list('employee_id', 'status'))
+    candidates = [employee_id for employee_id in employees if employee_id not in locked]
+
+    structures = load_structures(period, candidates)
+    components = load_structure_components([pk for pk, _ in structures.values()])
+    attendance = load_attendance(period, structures)
+    transactions = load_transactions(period, structures)
+
+    by_department = defaultdict(list)
+    for employee_id, (structure_id, basic_salary) in structures.items():
+        by_department[employees[employee_id]].append({
+            'employee_id': employee_id,
+            'salary_structure_id': structure_id,
+            'basic_salary': basic_salary,
+            'attendance': attendance.get(employee_id, EMPTY_ATTENDANCE),
+            'components': components.get(structure_id, []),
+            'transactions': transactions.get(employee_id, []),
+        })
+    already_processed = sum(1 for status in locked.values() if status in PROCESSED_STATUSES)
+    return by_department, len(employees), already_processed
+
+
+def _work_units(by_department):
+    """وحدات العمل: قسم لكل وحدة، مع تقسيم الأقسام الكبيرة"""
+    for department_id in sorted(by_department, key=lambda pk: (pk is None, pk)):
+        items = sorted(by_department[department_id], key=lambda item: item['employee_id'])
+        yield from _chunks(items, MAX_CHUNK_SIZE)
+
+
+def _persist(period, results, track_progress):
+    """حفظ نتائج وحدة عمل في معاملة واحدة (Write one chunk's results atomically)"""
+    now = timezone.now()
+    existing = {}
+    for chunk in _chunks([result['employee_id'] for result in results]):
+        for payslip in EmployeePayslip.objects.filter(payroll_period=period, employee_id__in=chunk):
+            existing[payslip.employee_id] = payslip
+
+    to_create, to_update, lines = [], [], []
+    for result in results:
+        payslip = existing.get(result['employee_id'])
+        if payslip is None:
+            payslip = EmployeePayslip(
+                employee_id=result['employee_id'], payroll_period=period,
+            )
+            to_create.append(payslip)
+        else:
+            to_update.append(payslip)
+        for field, value in result['fields'].items():
+            setattr(payslip, field, value)
+        payslip.status = 'calculated'
+        payslip.calculation_date = now
+        payslip.updated_at = now
+        lines.extend(
+            PayslipComponent(
+                payslip=payslip,
+                component_id=line['component_id'],
+                amount=line['amount'],
+                calculation_base=line['calculation_base'],
+                rate_or_percentage=line['rate_or_percentage'],
+                calculation_notes=line['calculation_notes'],
+            )
+            for line in result['lines']
+        )
+
+    with transaction.atomic():
+        # أرقام القسائم الجديدة بحجز واحد يلغى مع المعاملة
+        numbers = document_numbers(
+            EmployeePayslip, 'payslip_number', EmployeePayslip.number_prefix(period), len(to_create),
+        )
+        for payslip, number in zip(to_create, numbers):
+            payslip.payslip_number = number
+        for chunk in _chunks([payslip.pk for payslip in to_update]):
+            PayslipComponent.objects.filter(payslip_id__in=chunk).delete()
+        EmployeePayslip.objects.bulk_create(to_create, batch_size=IN_CHUNK_SIZE)
+        EmployeePayslip.objects.bulk_update(to_update, PAYSLIP_FIELDS, batch_size=IN_CHUNK_SIZE)
+        PayslipComponent.objects.bulk_create(lines, batch_size=IN_CHUNK_SIZE)
+        if track_progress:
+            PayrollPeriod.objects.filter(pk=period.pk).update(
+                processed_employees=F('processed_employees') + len(results),
+            )
+    return len(to_create), len(to_update)
+
+
+def _computed_units(units, workers):
+    """حساب وحدات العمل محلياً أو عبر مجموعة عمليات (Compute units serially or in a process pool)"""
+    if workers <= 1 or len(units) <= 1:
+        for unit in units:
+            yield compute_chunk(unit)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(units))) as pool:
+        futures = [pool.submit(compute_chunk, unit) for unit in units]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def calculate_payroll(period, employee_ids=None, department=None, workers=None, user=None):
+    """
+    حساب قسائم رواتب الفترة دفعة واحدة
+    (Calculate the payslips of a period in bulk)
+
+    Without ``employee_ids`` or ``department`` the whole period is run: its
+    status moves to ``in_progress`` and ``processed_employees`` is advanced
+    after every chunk, then the period is marked ``calculated``.
+    ``workers`` defaults to ``PAYROLL_CALCULATION_WORKERS`` (1, in process).
+
+    Returns a dict with ``employees``, ``calculated``, ``created``,
+    ``updated`` and ``skipped`` counters.
+    """
+    if not period.is_editable:
+        raise PayrollCalculationError(f'Payroll period {period.pk} is {period.status}')
+    if workers is None:
+        workers = getattr(settings, 'PAYROLL_CALCULATION_WORKERS', 1)
+    full_run = employee_ids is None and department is None
+
+    by_department, employee_count, already_processed = load_period_inputs(
+        period, employee_ids=employee_ids, department=department,
+    )
+    units = list(_work_units(by_department))
+    calculated = sum(len(unit) for unit in units)
+    stats = {'employees': employee_count, 'calculated': calculated, 'created': 0, 'updated': 0,
+             'skipped': employee_count - calculated}
+
+    if full_run:
+        period.status = 'in_progress'
+        period.total_employees = employee_count
+        period.processed_employees = already_processed
+        period.save(update_fields=['status', 'total_employees', 'processed_employees', 'updated_at'])
+
+    tax_table = get_tax_table(period.end_date)
+    for results in _computed_units(units, workers):
+        # ضريبة الوحدة كاملة في استدعاء واحد
+        taxes = tax_table.evaluate([result['fields']['gross_salary'] for result in results])
+        for result, tax in zip(results, taxes):
+            result['fields']['tax_deduction'] = tax
+        created, updated = _persist(period, results, track_progress=full_run)
+        stats['created'] += created
+        stats['updated'] += updated
+
+    # الإجماليات تحسب مرة واحدة بعد انتهاء الدفعة
+    if full_run:
+        period.status = 'calculated'
+        period.calculated_by = user
+        period.calculated_at = timezone.now()
+        period.save(update_fields=['status', 'calculated_by', 'calculated_at', 'updated_at'])
+    calculate_payroll_period_totals(period)
+
+    logger.info(
+        'Payroll period %s calculated: employees=%s calculated=%s created=%s updated=%s workers=%s',
+        period.pk, stats['employees'], stats['calculated'], stats['created'], stats['updated'], workers,
+    )
+    return stats
@@ -0,0 +1,63 @@
+import random
+import time
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from payroll_management.tax import NUMPY_AVAILABLE, get_tax_table
+
+
+def reference_tax(salary, rules):
+    """الحساب المرجعي بـ Decimal راتباً براتب (Per-salary Decimal reference)"""
+    salary = salary.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    total = Decimal('0')
+    for rule in rules:
+        rate = Decimal(rule.rate) / 10000
+        minimum = Decimal(rule.minimum) / 100
+        maximum = Decimal(rule.maximum) / 100 if rule.maximum is not None else None
+        if rule.method == 'flat_rate':
+            if salary > minimum:
+                total += (salary if maximum is None else min(salary, maximum)) * rate
+        else:
+            taxable = salary - minimum
+            if maximum is not None:
+                taxable = min(taxable, maximum - minimum)
+            total += max(taxable, Decimal('0')) * rate
+    return total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+class Command(BaseCommand):
+    help = 'قياس أداء محرك الضريبة على رواتب عشوائية'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000, help='عدد الرواتب (الافتراضي: 100000)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--date', help='تاريخ الجدول YYYY-MM-DD (الافتراضي: اليوم)')
+
+    def handle(self, *args, **options):
+        day = timezone.localdate()
+        if options['date']:
+            day = timezone.datetime.strptime(options['date'], '%Y-%m-%d').date()
+        generator = random.Random(options['seed'])
+        salaries = [
+            Decimal(generator.randint(150000, 6000000)).scaleb(-2) for _ in range(options['count'])
+        ]
+        table = get_tax_table(day)
+
+        timings = {}
+        started = time.perf_counter()
+        expected = [reference_tax(salary, table.rules) for salary in salaries]
+        timings['decimal_loop'] = time.perf_counter() - started
+
+        engines = [('python', False)] + ([('numpy', True)] if NUMPY_AVAILABLE else [])
+        for name, use_numpy in engines:
+            started = time.perf_counter()
+            result = table.evaluate(salaries, use_numpy=use_numpy)
+            timings[name] = time.perf_counter() - started
+            if result != expected:
+                raise CommandError(f'{name} engine differs from the Decimal reference')
+
+        self.stdout.write(f'salaries={len(salaries)} rules={len(table.rules)} results identical')
+        for name, seconds in timings.items():
+            self.stdout.write(f'{name:>13}: {seconds:.3f}s ({len(salaries) / seconds:,.0f}/s)')
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll_management.engine import PayrollCalculationError, calculate_payroll
+from payroll_management.models import PayrollPeriod
+
+
+class Command(BaseCommand):
+    help = 'حساب قسائم رواتب فترة كاملة دفعة واحدة'
+
+    def add_arguments(self, parser):
+        parser.add_argument('period', type=int, help='معرف فترة الراتب')
+        parser.add_argument('--workers', type=int,
+                            help='عدد العمليات المتوازية (الافتراضي: PAYROLL_CALCULATION_WORKERS)')
+        parser.add_argument('--department', type=int,
+                            help='رمز القسم لتقييد الحساب')
+
+    def handle(self, *args, **options):
+        try:
+            period = PayrollPeriod.objects.get(pk=options['period'])
+        except PayrollPeriod.DoesNotExist:
+            raise CommandError(f"Payroll period {options['period']} does not exist")
+
+        started = time.monotonic()
+        try:
+            stats = calculate_payroll(period, department=options['department'], workers=options['workers'])
+        except PayrollCalculationError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(
+            f"employees={stats['employees']} calculated={stats['calculated']} "
+            f"created={stats['created']} updated={stats['updated']} skipped={stats['skipped']} "
+            f"seconds={time.monotonic() - started:.1f}"
+        )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll_management.totals import check_period_totals
+
+
+class Command(BaseCommand):
+    help = 'التحقق من تطابق إجماليات فترات الرواتب مع إعادة الحساب الكاملة'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', type=int, action='append', dest='periods',
+                            help='معرف فترة الراتب (يمكن تكراره؛ الافتراضي: جميع الفترات)')
+        parser.add_argument('--fix', action='store_true',
+                            help='تصحيح الإجماليات غير المتطابقة')
+
+    def handle(self, *args, **options):
+        mismatches = check_period_totals(options['periods'], fix=options['fix'])
+        for period, field, stored, expected in mismatches:
+            self.stdout.write(f'period={period.pk} {field}: stored={stored} expected={expected}')
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('All payroll period totals match'))
+        elif options['fix']:
+            self.stdout.write(self.style.WARNING(f'Fixed {len(mismatches)} mismatched totals'))
+        else:
+            raise CommandError(f'{len(mismatches)} mismatched totals; rerun with --fix to correct them')
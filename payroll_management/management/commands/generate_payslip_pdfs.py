@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll_management.models import PayrollPeriod
+from payroll_management.payslips import generate_period_pdfs, process_requested_pdfs
+
+
+class Command(BaseCommand):
+    help = 'إصدار ملفات PDF لقسائم رواتب فترة كاملة بالتوازي، أو للفترات المطلوبة من الواجهة'
+
+    def add_arguments(self, parser):
+        parser.add_argument('period', type=int, nargs='?',
+                            help='معرف فترة الراتب (بدونه تعالج الفترات المطلوبة)')
+        parser.add_argument('--workers', type=int,
+                            help='عدد العمليات المتوازية (الافتراضي: PAYSLIP_PDF_WORKERS أو عدد المعالجات)')
+        parser.add_argument('--loop', action='store_true',
+                            help='التشغيل المستمر كعملية خلفية لمعالجة الفترات المطلوبة')
+        parser.add_argument('--interval', type=float, default=30,
+                            help='الفاصل الزمني بالثواني بين كل فحص في وضع التشغيل المستمر')
+
+    def handle(self, *args, **options):
+        if options['period'] is None:
+            while True:
+                processed = process_requested_pdfs(workers=options['workers'])
+                self.stdout.write(f'periods={processed}')
+                if not options['loop']:
+                    return
+                if not processed:
+                    time.sleep(options['interval'])
+
+        try:
+            period = PayrollPeriod.objects.get(pk=options['period'])
+        except PayrollPeriod.DoesNotExist:
+            raise CommandError(f"Payroll period {options['period']} does not exist")
+
+        started = time.monotonic()
+        stats = generate_period_pdfs(period, workers=options['workers'])
+        self.stdout.write(
+            f"payslips={stats['payslips']} rendered={stats['rendered']} cached={stats['cached']} "
+            f"seconds={time.monotonic() - started:.1f}"
+        )
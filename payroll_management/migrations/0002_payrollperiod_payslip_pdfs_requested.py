@@ -0,0 +1,20 @@
+# Generated by Django 4.2.21 on 2026-10-19 18:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payroll_management", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payrollperiod",
+            name="payslip_pdfs_requested",
+            field=models.BooleanField(
+                default=False, verbose_name="بانتظار إصدار القسائم"
+            ),
+        ),
+    ]
@@ -12,6 +12,8 @@ from decimal import Decimal
 import uuid
 from datetime import date, timedelta
 
+from core.sequences import document_number
+
 User = get_user_model()
 
 
@@ -254,6 +256,7 @@ class PayrollPeriod(models.Model):
         verbose_name=_("اعتمد بواسطة")
     )
     approved_at = models.DateTimeField(null=True, blank=True, verbose_name=_("تاريخ الاعتماد"))
+    payslip_pdfs_requested = models.BooleanField(default=False, verbose_name=_("بانتظار إصدار القسائم"))
 
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("تاريخ الإنشاء"))
@@ -455,22 +458,17 @@ class EmployeePayslip(models.Model):
     def get_absolute_url(self):
         return reverse('payroll_management:payslip_detail', kwargs={'pk': self.id})
 
+    @staticmethod
+    def number_prefix(period):
+        """بادئة أرقام قسائم شهر الفترة (Payslip number prefix of the period's month)"""
+        return f'PS{period.start_date.year}{period.start_date.month:02d}'
+
     def save(self, *args, **kwargs):
         if not self.payslip_number:
             # Generate unique payslip number
-            year = self.payroll_period.start_date.year
-            month = self.payroll_period.start_date.month
-            last_payslip = EmployeePayslip.objects.filter(
-                payslip_number__startswith=f'PS{year}{month:02d}'
-            ).order_by('-payslip_number').first()
-
-            if last_payslip:
-                last_number = int(last_payslip.payslip_number[-4:])
-                new_number = last_number + 1
-            else:
-                new_number = 1
-
-            self.payslip_number = f'PS{year}{month:02d}{new_number:04d}'
+            self.payslip_number = document_number(
+                EmployeePayslip, 'payslip_number', self.number_prefix(self.payroll_period),
+            )
 
         super().save(*args, **kwargs)
 
@@ -0,0 +1,274 @@
+"""
+خدمة إصدار قسائم الرواتب
+(Payslip PDF service)
+
+A payslip is first flattened into a plain document (strings only) with its
+components; the SHA-256 of that document and the layout version names the
+cached PDF on disk, so a payslip is rendered again only when something
+printed on it changes. The cache lives outside ``MEDIA_ROOT`` (which is
+served publicly) unless ``PAYSLIP_PDF_CACHE_DIR`` says otherwise.
+
+Whole periods are rendered by the ``generate_payslip_pdfs`` worker in a
+process pool; views only flag a period (``request_period_pdfs``), and bulk
+downloads stream a ZIP of the cached files without holding the archive in
+memory.
+"""
+import hashlib
+import json
+import logging
+import os
+import zipfile
+from smtplib import SMTPException
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+
+from .models import EmployeePayslip, PayrollPeriod
+from .pdf import LAYOUT_VERSION, render_to_file
+
+logger = logging.getLogger(__name__)
+
+FONT_CANDIDATES = [
+    os.path.join(settings.BASE_DIR, 'static', 'fonts', 'Amiri-Regular.ttf'),
+    '/usr/share/fonts/truetype/noto/NotoNaskhArabic-Regular.ttf',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+]
+
+ZIP_CHUNK_SIZE = 64 * 1024
+
+
+def cache_dir():
+    return getattr(settings, 'PAYSLIP_PDF_CACHE_DIR', os.path.join(settings.BASE_DIR, 'private', 'payslips'))
+
+
+def font_path():
+    """الخط العربي المستخدم في القسائم (Configured font, else the first installed candidate)"""
+    configured = getattr(settings, 'PAYSLIP_PDF_FONT', None)
+    if configured:
+        return configured
+    return next((path for path in FONT_CANDIDATES if os.path.exists(path)), None)
+
+
+def payslip_queryset():
+    return EmployeePayslip.objects.select_related(
+        'employee', 'employee__department', 'payroll_period', 'salary_structure',
+    ).prefetch_related('payslip_components__component')
+
+
+def build_document(payslip):
+    """
+    تحويل القسيمة إلى مستند نصي بكل ما يطبع عليها
+    (Flatten a payslip and its components into everything that is printed)
+    """
+    employee = payslip.employee
+    period = payslip.payroll_period
+    components = sorted(
+        payslip.payslip_components.all(),
+        key=lambda line: (line.component.display_order, line.component.component_name),
+    )
+    document = {
+        'company': getattr(settings, 'PAYSLIP_COMPANY_NAME', 'الدولية'),
+        'payslip_number': payslip.payslip_number,
+        'employee_name': employee.full_name,
+        'employee_code': employee.employee_id,
+        'department': employee.department.dept_name if employee.department else '',
+        'period_name': period.period_name,
+        'period_start': period.start_date,
+        'period_end': period.end_date,
+        'pay_date': period.pay_date,
+        'currency': payslip.salary_structure.currency,
+        'lines': [
+            {'name': line.component.component_name, 'amount': line.amount} for line in components
+        ],
+    }
+    for field in ('working_days', 'present_days', 'absent_days', 'leave_days', 'overtime_hours',
+                  'basic_salary', 'total_allowances', 'gross_salary', 'total_deductions',
+                  'tax_deduction', 'insurance_deduction', 'net_salary'):
+        document[field] = getattr(payslip, field)
+    # كل القيم نصوص حتى يكون البصم ثابتاً وقابلاً للنقل إلى العمليات
+    return json.loads(json.dumps(document, default=str, ensure_ascii=False))
+
+
+def content_hash(document):
+    payload = json.dumps({'layout': LAYOUT_VERSION, 'document': document}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def cache_path(digest):
+    return os.path.join(cache_dir(), digest[:2], f'{digest}.pdf')
+
+
+def _render_missing(jobs, workers):
+    """رسم الملفات غير المخزنة محلياً أو عبر مجموعة عمليات"""
+    font = font_path()
+    if workers <= 1 or len(jobs) <= 1:
+        for document, path in jobs:
+            render_to_file(document, path, font)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        futures = [pool.submit(render_to_file, document, path, font) for document, path in jobs]
+        for future in as_completed(futures):
+            future.result()
+
+
+def _pdf_jobs(payslips):
+    """مسارات القسائم وما ينقصها من ملفات (Paths, and the documents still to render)"""
+    paths, jobs = {}, []
+    for payslip in payslips:
+        document = build_document(payslip)
+        path = cache_path(content_hash(document))
+        paths[payslip.pk] = path
+        if not os.path.exists(path):
+            jobs.append((document, path))
+    # قسيمتان بمحتوى متطابق تشتركان في ملف واحد
+    return paths, list({path: (document, path) for document, path in jobs}.values())
+
+
+def ensure_pdfs(payslips, workers=None):
+    """
+    ضمان وجود ملف PDF مخزن لكل قسيمة
+    (Make sure every payslip has a cached PDF; render only the missing ones)
+
+    Returns ``(paths, rendered)``: payslip id -> PDF path, and how many were
+    rendered now. ``workers`` defaults to ``PAYSLIP_PDF_WORKERS``, else one
+    process per CPU.
+    """
+    if workers is None:
+        workers = getattr(settings, 'PAYSLIP_PDF_WORKERS', None) or os.cpu_count() or 1
+    paths, jobs = _pdf_jobs(payslips)
+    _render_missing(jobs, workers)
+    return paths, len(jobs)
+
+
+def payslip_pdf_path(payslip):
+    """مسار ملف قسيمة واحدة (PDF path of one payslip, rendering it if needed)"""
+    paths, _ = ensure_pdfs(payslip_queryset().filter(pk=payslip.pk), workers=1)
+    return paths[payslip.pk]
+
+
+def period_payslips(period):
+    return payslip_queryset().filter(payroll_period=period).exclude(status='cancelled').order_by('payslip_number')
+
+
+def generate_period_pdfs(period, workers=None):
+    """
+    إصدار ملفات قسائم الفترة بالتوازي
+    (Render every payslip of a period in parallel)
+    """
+    payslips = list(period_payslips(period))
+    paths, rendered = ensure_pdfs(payslips, workers=workers)
+    logger.info('Payslip PDFs for period %s: payslips=%s rendered=%s', period.pk, len(payslips), rendered)
+    return {'payslips': len(payslips), 'rendered': rendered, 'cached': len(set(paths.values())) - rendered}
+
+
+class _ZipBuffer:
+    """مخزن كتابة فقط تفرغه الدالة المولدة بعد كل ملف (Write-only buffer drained by the generator)"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(entries):
+    """
+    بث أرشيف ZIP من ملفات على القرص
+    (Yield a ZIP archive of ``(arcname, path)`` entries chunk by chunk)
+
+    PDFs are already compressed, so they are stored as is.
+    """
+    buffer = _ZipBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for arcname, path in entries:
+            with open(path, 'rb') as source, archive.open(arcname, mode='w', force_zip64=True) as target:
+                for chunk in iter(lambda: source.read(ZIP_CHUNK_SIZE), b''):
+                    target.write(chunk)
+                    yield buffer.drain()
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def request_period_pdfs(period):
+    """طلب إصدار قسائم الفترة من العامل (Flag a period for the PDF worker)"""
+    PayrollPeriod.objects.filter(pk=period.pk).update(payslip_pdfs_requested=True)
+
+
+def process_requested_pdfs(workers=None):
+    """
+    عامل إصدار قسائم الفترات المطلوبة
+    (Worker: render the PDFs of every flagged period)
+
+    The flag is cleared before rendering, so a request made meanwhile is
+    served by the next run. Returns the number of periods processed.
+    """
+    processed = 0
+    for period in PayrollPeriod.objects.filter(payslip_pdfs_requested=True):
+        PayrollPeriod.objects.filter(pk=period.pk).update(payslip_pdfs_requested=False)
+        generate_period_pdfs(period, workers=workers)
+        processed += 1
+    return processed
+
+
+def _zip_entries(payslips, paths):
+    return [
+        (f'{payslip.payslip_number}_{payslip.employee.employee_id}.pdf', paths[payslip.pk])
+        for payslip in payslips
+    ]
+
+
+def period_zip_entries(period, workers=None):
+    """ملفات قسائم الفترة بأسماء مقروءة (Archive names and cached paths for a period)"""
+    payslips = list(period_payslips(period))
+    paths, _ = ensure_pdfs(payslips, workers=workers)
+    return _zip_entries(payslips, paths)
+
+
+def cached_period_zip_entries(period):
+    """
+    ملفات الفترة إن كانت كلها جاهزة
+    (Like ``period_zip_entries`` without rendering; ``None`` if any PDF is missing)
+    """
+    payslips = list(period_payslips(period))
+    paths, jobs = _pdf_jobs(payslips)
+    if jobs:
+        return None
+    return _zip_entries(payslips, paths)
+
+
+def email_payslip(payslip):
+    """
+    إرسال القسيمة إلى بريد الموظف
+    (Email the payslip PDF to the employee; False when it could not be sent)
+    """
+    if not payslip.employee.email:
+        return False
+    try:
+        path = payslip_pdf_path(payslip)
+        message = EmailMessage(
+            subject=f'قسيمة راتب {payslip.payroll_period.period_name}',
+            body=f'مرفق قسيمة راتبك رقم {payslip.payslip_number}.',
+            to=[payslip.employee.email],
+        )
+        with open(path, 'rb') as pdf:
+            message.attach(f'{payslip.payslip_number}.pdf', pdf.read(), 'application/pdf')
+        return bool(message.send())
+    except (OSError, SMTPException):
+        # ملف غير موجود أو خادم بريد لا يرد (missing PDF, unreachable mail server)
+        logger.exception('Could not email payslip %s', payslip.payslip_number)
+        return False
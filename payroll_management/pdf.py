@@ -0,0 +1,136 @@
+"""
+رسم قسيمة الراتب بصيغة PDF
+(Payslip PDF renderer)
+
+Draws one payslip document (the plain dict built by ``payslips.py``) as an
+A4 page laid out right-to-left. The module imports no Django models so it
+can run in worker processes. Arabic text is shaped with ``arabic_reshaper``
+and reordered with ``python-bidi`` when they are installed; the font must
+contain Arabic glyphs (see ``PAYSLIP_PDF_FONT``).
+"""
+import io
+import os
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+try:
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+    ARABIC_SHAPING_AVAILABLE = True
+except ImportError:
+    ARABIC_SHAPING_AVAILABLE = False
+    arabic_reshaper = None
+    get_display = None
+
+# يغير عند تعديل التخطيط لإبطال الملفات المخزنة
+LAYOUT_VERSION = 1
+
+FALLBACK_FONT = 'Helvetica'
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 18 * mm
+LINE_HEIGHT = 7 * mm
+
+_registered_fonts = {}
+
+
+def shape(text):
+    """تشكيل النص العربي وترتيبه للعرض (Shape and reorder Arabic text for drawing)"""
+    text = str(text)
+    if not ARABIC_SHAPING_AVAILABLE or not text:
+        return text
+    return get_display(arabic_reshaper.reshape(text))
+
+
+def register_font(font_path):
+    """تسجيل الخط مرة واحدة لكل عملية (Register a TTF font once per process)"""
+    if not font_path or not os.path.exists(font_path):
+        return FALLBACK_FONT
+    if font_path not in _registered_fonts:
+        name = f'PayslipFont{len(_registered_fonts)}'
+        pdfmetrics.registerFont(TTFont(name, font_path))
+        _registered_fonts[font_path] = name
+    return _registered_fonts[font_path]
+
+
+class _Page:
+    """مساعد رسم من اليمين إلى اليسار (Right-to-left drawing helper)"""
+
+    def __init__(self, pdf, font):
+        self.pdf = pdf
+        self.font = font
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def text(self, label, value='', size=10):
+        self.pdf.setFont(self.font, size)
+        self.pdf.drawRightString(PAGE_WIDTH - MARGIN, self.y, shape(label))
+        if value != '':
+            self.pdf.drawString(MARGIN, self.y, shape(value))
+        self.y -= LINE_HEIGHT * size / 10
+
+    def rule(self):
+        self.pdf.line(MARGIN, self.y + LINE_HEIGHT / 2, PAGE_WIDTH - MARGIN, self.y + LINE_HEIGHT / 2)
+        self.y -= LINE_HEIGHT / 2
+
+    def section(self, title):
+        self.y -= LINE_HEIGHT / 2
+        self.text(title, size=12)
+        self.rule()
+
+
+def render_payslip_pdf(document, font_path=None):
+    """
+    رسم قسيمة واحدة وإرجاع بايتات PDF
+    (Render one payslip document and return the PDF bytes)
+    """
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, invariant=1)
+    pdf.setTitle(document['payslip_number'])
+    page = _Page(pdf, register_font(font_path))
+
+    page.text(document['company'], size=16)
+    page.text(f"قسيمة راتب - {document['period_name']}", size=13)
+    page.rule()
+    page.text('رقم القسيمة', document['payslip_number'])
+    page.text('الموظف', f"{document['employee_name']} ({document['employee_code']})")
+    page.text('القسم', document['department'])
+    page.text('الفترة', f"{document['period_start']} - {document['period_end']}")
+    page.text('تاريخ الدفع', document['pay_date'])
+
+    page.section('الحضور')
+    for label, key in (('أيام العمل', 'working_days'), ('أيام الحضور', 'present_days'),
+                       ('أيام الغياب', 'absent_days'), ('أيام الإجازة', 'leave_days'),
+                       ('ساعات العمل الإضافي', 'overtime_hours')):
+        page.text(label, document[key])
+
+    page.section('المستحقات والاستقطاعات')
+    page.text('الراتب الأساسي', document['basic_salary'])
+    for line in document['lines']:
+        page.text(line['name'], line['amount'])
+    page.rule()
+    for label, key in (('إجمالي البدلات', 'total_allowances'), ('الراتب الإجمالي', 'gross_salary'),
+                       ('إجمالي الخصومات', 'total_deductions'), ('خصم الضريبة', 'tax_deduction'),
+                       ('خصم التأمين', 'insurance_deduction')):
+        page.text(label, document[key])
+    page.rule()
+    page.text('الراتب الصافي', f"{document['net_salary']} {document['currency']}", size=13)
+
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def render_to_file(document, path, font_path=None):
+    """
+    رسم قسيمة وحفظها ذرياً في المسار
+    (Render into ``path`` atomically; the unit of work of the process pool)
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as output:
+        output.write(render_payslip_pdf(document, font_path))
+    os.replace(temp_path, path)
+    return path
@@ -2,17 +2,25 @@
 Payroll Management Signals
 Handle automatic calculations and processing for payroll management
 """
-from django.db.models.signals import post_save, pre_save, post_delete
+from django.db.models.signals import post_init, post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
-from django.utils import timezone
 from django.db import models
 from decimal import Decimal
 from datetime import datetime, date, timedelta
+import logging
+from .calculation import ALLOWANCE_TYPES, DEDUCTION_TYPES
 from .models import (
     PayrollPeriod, PayrollTransaction, EmployeePayslip, 
-    PayslipComponent, EmployeeSalaryStructure
+    PayslipComponent, EmployeeSalaryStructure, TaxConfiguration
 )
+from .tax import invalidate_tax_tables
+from .totals import (
+    TOTAL_FIELDS, ZERO_CONTRIBUTION, apply_contribution_delta, contribution, defer_period,
+    empty_totals, period_totals, recalculate_period_totals, totals_deferred,
+)
+
+logger = logging.getLogger(__name__)
 
 
 @receiver(post_save, sender=PayrollPeriod)
@@ -36,71 +44,93 @@ def initialize_payroll_period(sender, instance, created, **kwargs):
 def update_payroll_period_on_transaction(sender, instance, created, **kwargs):
     """Update payroll period when transactions are added"""
     if instance.is_approved and instance.is_processed:
+        if totals_deferred():
+            defer_period(instance.payroll_period_id)
+            return
         # Recalculate period totals
         calculate_payroll_period_totals(instance.payroll_period)
 
 
+@receiver(post_init, sender=EmployeePayslip)
+def snapshot_payslip_contribution(sender, instance, **kwargs):
+    """Remember what the loaded payslip adds to its period totals"""
+    if instance.get_deferred_fields():
+        # Deferred fields would cost a query each; fall back to a full recompute
+        instance._period_contribution = None
+    else:
+        instance._period_contribution = (instance.payroll_period_id, contribution(instance))
+
+
 @receiver(post_save, sender=EmployeePayslip)
 def update_payroll_period_on_payslip(sender, instance, created, **kwargs):
-    """Update payroll period when payslips are processed"""
-    if instance.status in ['calculated', 'approved', 'paid']:
-        # Update processed employee count
-        processed_count = EmployeePayslip.objects.filter(
-            payroll_period=instance.payroll_period,
-            status__in=['calculated', 'approved', 'paid']
-        ).count()
-        
-        instance.payroll_period.processed_employees = processed_count
-        instance.payroll_period.save(update_fields=['processed_employees'])
-        
-        # Recalculate period totals
+    """Apply the payslip's change to its period totals"""
+    new = contribution(instance)
+    snapshot = None if created else instance._period_contribution
+    instance._period_contribution = (instance.payroll_period_id, new)
+
+    if totals_deferred():
+        defer_period(instance.payroll_period_id)
+        if snapshot:
+            defer_period(snapshot[0])
+        return
+    if not created and snapshot is None:
         calculate_payroll_period_totals(instance.payroll_period)
+        return
+
+    old_period_id, old = snapshot or (instance.payroll_period_id, ZERO_CONTRIBUTION)
+    if old_period_id != instance.payroll_period_id:
+        apply_contribution_delta(old_period_id, old, ZERO_CONTRIBUTION)
+        old = ZERO_CONTRIBUTION
+    apply_contribution_delta(instance.payroll_period_id, old, new)
+
+
+@receiver(post_delete, sender=EmployeePayslip)
+def update_payroll_period_on_payslip_delete(sender, instance, **kwargs):
+    """Remove a deleted payslip from its period totals"""
+    if totals_deferred():
+        defer_period(instance.payroll_period_id)
+        return
+    if instance._period_contribution is None:
+        recalculate_period_totals([instance.payroll_period_id])
+        return
+    period_id, old = instance._period_contribution
+    apply_contribution_delta(period_id, old, ZERO_CONTRIBUTION)
 
 
 def calculate_payroll_period_totals(payroll_period):
-    """Calculate total amounts for a payroll period"""
-    payslips = EmployeePayslip.objects.filter(
-        payroll_period=payroll_period,
-        status__in=['calculated', 'approved', 'paid']
-    )
-    
-    totals = payslips.aggregate(
-        total_gross=models.Sum('gross_salary'),
-        total_deductions=models.Sum('total_deductions'),
-        total_net=models.Sum('net_salary')
-    )
-    
-    payroll_period.total_gross_salary = totals['total_gross'] or Decimal('0')
-    payroll_period.total_deductions = totals['total_deductions'] or Decimal('0')
-    payroll_period.total_net_salary = totals['total_net'] or Decimal('0')
-    
-    payroll_period.save(update_fields=[
-        'total_gross_salary', 'total_deductions', 'total_net_salary'
-    ])
+    """Recalculate processed count and total amounts for a payroll period"""
+    totals = period_totals([payroll_period.pk]).get(payroll_period.pk) or empty_totals()
+    for field, value in totals.items():
+        setattr(payroll_period, field, value)
+
+    payroll_period.save(update_fields=TOTAL_FIELDS)
 
 
 @receiver(pre_save, sender=EmployeePayslip)
 def calculate_payslip_totals(sender, instance, **kwargs):
     """Calculate payslip totals before saving"""
-    if instance.pk:
-        # Calculate totals from components
-        components = PayslipComponent.objects.filter(payslip=instance)
-        
-        # Calculate allowances and bonuses
-        allowances = components.filter(
-            component__component_type__in=['allowance', 'bonus', 'overtime', 'commission']
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0')
-        
-        # Calculate deductions
-        deductions = components.filter(
-            component__component_type__in=['deduction', 'tax', 'insurance', 'loan_deduction', 'advance_deduction']
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0')
-        
-        # Update payslip totals
-        instance.total_allowances = allowances
-        instance.total_deductions = deductions
-        instance.gross_salary = instance.basic_salary + allowances
-        instance.net_salary = instance.gross_salary - deductions
+    allowances = deductions = Decimal('0')
+    if not instance._state.adding:
+        # Calculate allowances and deductions from components in one query
+        totals = PayslipComponent.objects.filter(payslip=instance).aggregate(
+            allowances=models.Sum('amount', filter=models.Q(component__component_type__in=ALLOWANCE_TYPES)),
+            deductions=models.Sum('amount', filter=models.Q(component__component_type__in=DEDUCTION_TYPES)),
+        )
+        allowances = totals['allowances'] or Decimal('0')
+        deductions = totals['deductions'] or Decimal('0')
+
+    # Update payslip totals
+    instance.total_allowances = allowances
+    instance.total_deductions = deductions
+    instance.gross_salary = instance.basic_salary + allowances
+    instance.net_salary = instance.gross_salary - deductions
+
+
+@receiver(post_save, sender=TaxConfiguration)
+@receiver(post_delete, sender=TaxConfiguration)
+def tax_configuration_changed(sender, **kwargs):
+    """Rebuild the compiled tax tables after a configuration change"""
+    invalidate_tax_tables()
 
 
 @receiver(post_save, sender='employee_management.Employee')
@@ -121,199 +151,13 @@ def create_default_salary_structure(sender, instance, created, **kwargs):
 
 def calculate_employee_payslip(employee, payroll_period):
     """Calculate payslip for an employee in a specific period"""
-    try:
-        # Get active salary structure
-        salary_structure = EmployeeSalaryStructure.objects.filter(
-            employee=employee,
-            is_active=True,
-            effective_from__lte=payroll_period.end_date
-        ).filter(
-            models.Q(effective_to__isnull=True) | models.Q(effective_to__gte=payroll_period.start_date)
-        ).first()
-        
-        if not salary_structure:
-            return None
-        
-        # Get or create payslip
-        payslip, created = EmployeePayslip.objects.get_or_create(
-            employee=employee,
-            payroll_period=payroll_period,
-            defaults={
-                'salary_structure': salary_structure,
-                'basic_salary': salary_structure.basic_salary,
-                'status': 'draft'
-            }
-        )
-        
-        # Get attendance data
-        attendance_data = get_employee_attendance_data(employee, payroll_period)
-        
-        # Update attendance information
-        payslip.working_days = attendance_data['working_days']
-        payslip.present_days = attendance_data['present_days']
-        payslip.absent_days = attendance_data['absent_days']
-        payslip.leave_days = attendance_data['leave_days']
-        payslip.overtime_hours = attendance_data['overtime_hours']
-        
-        # Calculate pro-rated basic salary
-        if payslip.working_days > 0:
-            attendance_ratio = payslip.present_days / payslip.working_days
-            payslip.basic_salary = salary_structure.basic_salary * Decimal(str(attendance_ratio))
-        
-        # Calculate salary components
-        calculate_salary_components(payslip, salary_structure)
-        
-        # Calculate overtime
-        calculate_overtime_amount(payslip)
-        
-        # Get approved transactions
-        transactions = PayrollTransaction.objects.filter(
-            employee=employee,
-            payroll_period=payroll_period,
-            is_approved=True
-        )
-        
-        # Apply transactions
-        for transaction in transactions:
-            create_payslip_component_from_transaction(payslip, transaction)
-        
-        # Calculate taxes and deductions
-        calculate_taxes_and_deductions(payslip)
-        
-        # Update status and save
-        payslip.status = 'calculated'
-        payslip.calculation_date = timezone.now()
-        payslip.save()
-        
-        return payslip
-        
-    except Exception as e:
-        # Log error and return None
-        return None
+    from .engine import calculate_payroll
 
-
-def get_employee_attendance_data(employee, payroll_period):
-    """Get attendance data for an employee in a payroll period"""
     try:
-        from attendance_system.models import DailyAttendance
-        
-        daily_records = DailyAttendance.objects.filter(
-            employee=employee,
-            attendance_date__range=[payroll_period.start_date, payroll_period.end_date],
-            is_processed=True
-        )
-        
-        working_days = daily_records.exclude(status__in=['holiday', 'weekend']).count()
-        present_days = daily_records.filter(status__in=['present', 'late', 'early_departure']).count()
-        absent_days = daily_records.filter(status='absent').count()
-        leave_days = daily_records.filter(status='leave').count()
-        
-        overtime_hours = daily_records.aggregate(
-            total_overtime=models.Sum('overtime_hours')
-        )['total_overtime'] or Decimal('0')
-        
-        return {
-            'working_days': working_days,
-            'present_days': present_days,
-            'absent_days': absent_days,
-            'leave_days': leave_days,
-            'overtime_hours': overtime_hours
-        }
-        
-    except ImportError:
-        # Attendance system not available
-        return {
-            'working_days': 30,  # Default
-            'present_days': 30,
-            'absent_days': 0,
-            'leave_days': 0,
-            'overtime_hours': Decimal('0')
-        }
-
-
-def calculate_salary_components(payslip, salary_structure):
-    """Calculate salary components for a payslip"""
-    # Clear existing components
-    PayslipComponent.objects.filter(payslip=payslip).delete()
-    
-    # Get employee salary components
-    employee_components = salary_structure.salary_components.filter(is_active=True)
-    
-    for emp_component in employee_components:
-        component = emp_component.component
-        
-        # Calculate amount based on calculation method
-        if component.calculation_method == 'fixed':
-            amount = emp_component.amount
-        elif component.calculation_method == 'percentage':
-            base_amount = payslip.basic_salary
-            percentage = emp_component.percentage or component.percentage_rate or Decimal('0')
-            amount = base_amount * (percentage / 100)
-        else:
-            amount = emp_component.amount
-        
-        # Create payslip component
-        PayslipComponent.objects.create(
-            payslip=payslip,
-            component=component,
-            amount=amount,
-            calculation_base=payslip.basic_salary,
-            rate_or_percentage=emp_component.percentage
-        )
-
-
-def calculate_overtime_amount(payslip):
-    """Calculate overtime amount for a payslip"""
-    if payslip.overtime_hours > 0:
-        # Calculate hourly rate (basic salary / 30 days / 8 hours)
-        hourly_rate = payslip.basic_salary / Decimal('240')  # 30 days * 8 hours
-        overtime_multiplier = Decimal('1.5')  # Standard overtime multiplier
-        
-        payslip.overtime_amount = payslip.overtime_hours * hourly_rate * overtime_multiplier
-    else:
-        payslip.overtime_amount = Decimal('0')
-
-
-def calculate_taxes_and_deductions(payslip):
-    """Calculate taxes and mandatory deductions"""
-    # This is a simplified calculation - should be based on TaxConfiguration
-    taxable_income = payslip.gross_salary
-    
-    # Simple tax calculation (should use TaxConfiguration)
-    if taxable_income > Decimal('3000'):
-        payslip.tax_deduction = (taxable_income - Decimal('3000')) * Decimal('0.05')
-    else:
-        payslip.tax_deduction = Decimal('0')
-    
-    # Insurance deduction (example: 2% of basic salary)
-    payslip.insurance_deduction = payslip.basic_salary * Decimal('0.02')
-
-
-def create_payslip_component_from_transaction(payslip, transaction):
-    """Create payslip component from a payroll transaction"""
-    from .models import SalaryComponent
-    
-    # Try to find matching component or create a generic one
-    try:
-        component = SalaryComponent.objects.get(
-            component_type=transaction.transaction_type,
-            is_active=True
-        )
-    except SalaryComponent.DoesNotExist:
-        # Create a generic component for this transaction type
-        component, created = SalaryComponent.objects.get_or_create(
-            component_name=f"{transaction.get_transaction_type_display()}",
-            component_type=transaction.transaction_type,
-            defaults={
-                'calculation_method': 'fixed',
-                'is_active': True
-            }
-        )
-    
-    # Create payslip component
-    PayslipComponent.objects.create(
-        payslip=payslip,
-        component=component,
-        amount=transaction.amount,
-        calculation_notes=f"Transaction: {transaction.description}"
-    )
+        calculate_payroll(payroll_period, employee_ids=[employee.pk])
+    except Exception:
+        logger.exception('Payslip calculation failed for employee %s', employee.pk)
+        return None
+    return EmployeePayslip.objects.filter(
+        employee=employee, payroll_period=payroll_period, status='calculated',
+    ).first()
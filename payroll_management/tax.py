@@ -0,0 +1,200 @@
+"""
+محرك شرائح الضريبة
+(Tax bracket engine)
+
+Active ``TaxConfiguration`` rows are compiled into an immutable table of
+integer rules (amounts in halalas, rates in hundredths of a percent) and a
+whole batch of gross salaries is evaluated in one vectorized NumPy call.
+All arithmetic is done on integers, and only the final per-salary tax is
+rounded to halalas (half up), so results match ``Decimal`` arithmetic
+exactly.
+
+Rule semantics:
+
+* ``progressive`` / ``bracket`` — the rate applies to the part of the salary
+  between ``minimum_taxable_amount`` and ``maximum_taxable_amount``; several
+  rows together form a bracket table.
+* ``flat_rate`` — once the salary exceeds the minimum, the rate applies to
+  the whole salary, capped at the maximum.
+
+Without any configuration in effect the historical default applies: 5% of the part
+above 3000. Compiled tables are cached per process and rebuilt when a
+shared version counter is bumped after a configuration change.
+"""
+import threading
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import TaxConfiguration
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+TAX_VERSION_KEY = 'payroll_management:tax:version'
+
+# المعدل بأجزاء المئة من النسبة المئوية: الضريبة بالهللة = المبلغ × المعدل / 10000
+RATE_SCALE = 10000
+
+# حد أقصى لعدد الجداول المترجمة حسب التاريخ (Bound for tables compiled per date)
+MAX_TABLES = 64
+
+TaxRule = namedtuple('TaxRule', ['method', 'rate', 'minimum', 'maximum'])
+
+DEFAULT_RULES = (TaxRule('progressive', 500, 300000, None),)
+
+_lock = threading.Lock()
+_tables = None
+
+
+def to_halalas(amount):
+    """تحويل مبلغ إلى عدد صحيح من الهللات (Amount as an integer number of halalas)"""
+    return int(Decimal(amount).scaleb(2).to_integral_value(ROUND_HALF_UP))
+
+
+def compile_rule(config):
+    return TaxRule(
+        method='flat_rate' if config.calculation_method == 'flat_rate' else 'progressive',
+        rate=int(config.tax_rate * 100),
+        minimum=to_halalas(config.minimum_taxable_amount or 0),
+        maximum=to_halalas(config.maximum_taxable_amount) if config.maximum_taxable_amount is not None else None,
+    )
+
+
+class TaxTable:
+    """
+    جدول شرائح ثابت
+    (Immutable compiled bracket table)
+    """
+    __slots__ = ('rules', 'version')
+
+    def __init__(self, rules, version=None):
+        object.__setattr__(self, 'rules', tuple(rules) or DEFAULT_RULES)
+        object.__setattr__(self, 'version', version)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('TaxTable is immutable')
+
+    @staticmethod
+    def _scaled_python(income, rules):
+        total = 0
+        for rule in rules:
+            if rule.method == 'flat_rate':
+                taxable = 0
+                if income > rule.minimum:
+                    taxable = income if rule.maximum is None else min(income, rule.maximum)
+            else:
+                taxable = income - rule.minimum
+                if rule.maximum is not None:
+                    taxable = min(taxable, rule.maximum - rule.minimum)
+                taxable = max(taxable, 0)
+            total += taxable * rule.rate
+        return total
+
+    def _scaled_numpy(self, incomes):
+        total = np.zeros(len(incomes), dtype=np.int64)
+        for rule in self.rules:
+            if rule.method == 'flat_rate':
+                capped = incomes if rule.maximum is None else np.minimum(incomes, rule.maximum)
+                taxable = np.where(incomes > rule.minimum, capped, 0)
+            else:
+                taxable = incomes - rule.minimum
+                if rule.maximum is not None:
+                    taxable = np.minimum(taxable, rule.maximum - rule.minimum)
+                taxable = np.maximum(taxable, 0)
+            total += taxable * rule.rate
+        return total
+
+    def evaluate(self, salaries, use_numpy=None):
+        """
+        ضريبة مجموعة رواتب في استدعاء واحد
+        (Tax for a batch of salaries, as two-place Decimals)
+        """
+        if use_numpy is None:
+            use_numpy = NUMPY_AVAILABLE
+        incomes = [to_halalas(salary) for salary in salaries]
+        if use_numpy and incomes:
+            scaled = self._scaled_numpy(np.array(incomes, dtype=np.int64)).tolist()
+        else:
+            scaled = [self._scaled_python(income, self.rules) for income in incomes]
+        # التقريب نصف للأعلى مرة واحدة لكل راتب (المبالغ غير سالبة)
+        return [Decimal((value + RATE_SCALE // 2) // RATE_SCALE).scaleb(-2) for value in scaled]
+
+    def tax_for(self, salary):
+        return self.evaluate([salary], use_numpy=False)[0]
+
+
+class TaxTableSet:
+    """
+    الإعدادات النشطة مع جداولها المترجمة حسب التاريخ
+    (Active configurations, compiled into one table per effective date)
+    """
+
+    def __init__(self, configs, version=None):
+        self.version = version
+        self._configs = [(config.effective_from, config.effective_to, compile_rule(config)) for config in configs]
+        self._tables = {}
+
+    def for_date(self, day):
+        table = self._tables.get(day)
+        if table is None:
+            rules = [
+                rule for start, end, rule in self._configs
+                if start <= day and (end is None or end >= day)
+            ]
+            table = TaxTable(rules, version=self.version)
+            if len(self._tables) >= MAX_TABLES:
+                self._tables.clear()
+            self._tables[day] = table
+        return table
+
+
+def load_configurations():
+    return list(TaxConfiguration.objects.filter(is_active=True).order_by('effective_from', 'pk'))
+
+
+def _shared_version():
+    version = cache.get(TAX_VERSION_KEY)
+    if version is None:
+        cache.add(TAX_VERSION_KEY, 1, None)
+        version = cache.get(TAX_VERSION_KEY, 1)
+    return version
+
+
+def get_tax_table(day):
+    """
+    جدول الضريبة الساري في تاريخ محدد
+    (Tax table in effect on a date, rebuilt after configuration changes)
+    """
+    global _tables
+    version = _shared_version()
+    tables = _tables
+    if tables is None or tables.version != version:
+        with _lock:
+            if _tables is None or _tables.version != version:
+                _tables = TaxTableSet(load_configurations(), version=version)
+            tables = _tables
+    return tables.for_date(day)
+
+
+def _bump_shared_version():
+    try:
+        cache.incr(TAX_VERSION_KEY)
+    except ValueError:
+        cache.set(TAX_VERSION_KEY, 2, None)
+
+
+def invalidate_tax_tables():
+    """
+    إبطال الجداول محلياً فوراً وفي بقية العمليات عند تأكيد المعاملة
+    (Drop the local tables now and the other processes' copies on commit)
+    """
+    global _tables
+    _tables = None
+    transaction.on_commit(_bump_shared_version)
@@ -1,3 +1,441 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from io import StringIO
+from smtplib import SMTPException
+from unittest import mock
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.contrib.messages import get_messages
+from django.core import mail
+from django.db import connection
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from attendance_system.models import DailyAttendance
+from core.sequences import reset_cache
+from employee_management.models import Department, Employee, JobTitle
+
+from .engine import calculate_payroll
+from .models import (
+    EmployeePayslip, EmployeeSalaryComponent, EmployeeSalaryStructure, PayrollPeriod,
+    PayrollTransaction, PayslipComponent, SalaryComponent, TaxConfiguration,
+)
+from .payslips import email_payslip, ensure_pdfs, generate_period_pdfs, period_zip_entries, process_requested_pdfs, stream_zip
+from .signals import calculate_employee_payslip
+from .tax import TaxRule, TaxTable, get_tax_table
+from .totals import check_period_totals, deferred_period_totals
+
+
+def create_employee(employee_id, department, job_title):
+    return Employee.objects.create(
+        employee_id=employee_id,
+        first_name='موظف',
+        last_name=employee_id,
+        national_id=f'20000000{employee_id.zfill(4)}',
+        email=f'{employee_id}@example.com',
+        phone_number='0500000000',
+        address='-',
+        city='Riyadh',
+        state='Riyadh',
+        date_of_birth=date(1990, 1, 1),
+        gender='M',
+        marital_status='single',
+        department=department,
+        job_title=job_title,
+        hire_date=date(2020, 1, 1),
+    )
+
+
+class PayrollTestMixin:
+    def setUp(self):
+        # إشارات الموظفين تنشئ سجلات باسم مستخدم النظام (created_by_id=1)
+        self.user, _ = get_user_model().objects.get_or_create(pk=1, defaults={'username': 'system'})
+        self.department = Department.objects.create(dept_name='المالية')
+        self.job_title = JobTitle.objects.create(
+            job_title='محاسب', department=self.department, min_salary=Decimal('3000'),
+        )
+        self.employee = create_employee('201', self.department, self.job_title)
+        self.other = create_employee('202', self.department, self.job_title)
+
+        structure = EmployeeSalaryStructure.objects.get(employee=self.employee)
+        structure.basic_salary = Decimal('6000')
+        structure.save()
+        housing = SalaryComponent.objects.create(
+            component_name='بدل سكن', component_type='allowance', calculation_method='percentage',
+        )
+        transport = SalaryComponent.objects.create(
+            component_name='بدل نقل', component_type='allowance', calculation_method='fixed',
+        )
+        EmployeeSalaryComponent.objects.create(
+            salary_structure=structure, component=housing, amount=0, percentage=Decimal('25'),
+        )
+        EmployeeSalaryComponent.objects.create(salary_structure=structure, component=transport, amount=500)
+
+        self.period = self.create_period()
+
+    def create_period(self, name='مارس 2025'):
+        return PayrollPeriod.objects.create(
+            period_name=name, start_date=date(2025, 3, 1), end_date=date(2025, 3, 31), pay_date=date(2025, 3, 31),
+        )
+
+    def add_attendance(self, employee, present, absent, overtime_per_day=Decimal('0')):
+        statuses = ['present'] * present + ['absent'] * absent
+        DailyAttendance.objects.bulk_create([
+            DailyAttendance(
+                employee=employee, attendance_date=date(2025, 3, 1) + timedelta(days=offset),
+                status=status, overtime_hours=overtime_per_day if status == 'present' else 0,
+                is_processed=True,
+            )
+            for offset, status in enumerate(statuses)
+        ])
+
+    def add_transaction(self, transaction_type, amount, approved=True):
+        return PayrollTransaction.objects.create(
+            employee=self.employee, payroll_period=self.period, transaction_type=transaction_type,
+            description=transaction_type, amount=Decimal(amount), is_approved=approved,
+            created_by=self.user,
+        )
+
+
+class PayrollEngineTest(PayrollTestMixin, TestCase):
+    def test_calculates_period_in_bulk(self):
+        self.add_attendance(self.employee, present=18, absent=2, overtime_per_day=Decimal('0.25'))
+        self.add_transaction('bonus', '300')
+        self.add_transaction('deduction', '100')
+        self.add_transaction('bonus', '999', approved=False)
+
+        stats = calculate_payroll(self.period, user=self.user)
+
+        self.assertEqual(stats, {'employees': 2, 'calculated': 2, 'created': 2, 'updated': 0, 'skipped': 0})
+        payslip = EmployeePayslip.objects.get(employee=self.employee, payroll_period=self.period)
+        self.assertEqual(payslip.status, 'calculated')
+        self.assertEqual((payslip.working_days, payslip.present_days, payslip.absent_days), (20, 18, 2))
+        self.assertEqual(payslip.basic_salary, Decimal('5400.00'))
+        self.assertEqual(payslip.total_allowances, Decimal('2150.00'))
+        self.assertEqual(payslip.gross_salary, Decimal('7550.00'))
+        self.assertEqual(payslip.total_deductions, Decimal('100.00'))
+        self.assertEqual(payslip.net_salary, Decimal('7450.00'))
+        self.assertEqual(payslip.overtime_amount, Decimal('151.88'))
+        self.assertEqual(payslip.tax_deduction, Decimal('227.50'))
+        self.assertEqual(payslip.insurance_deduction, Decimal('108.00'))
+        self.assertEqual(
+            sorted(payslip.payslip_components.values_list('amount', flat=True)),
+            [Decimal('100.00'), Decimal('300.00'), Decimal('500.00'), Decimal('1350.00')],
+        )
+
+        self.period.refresh_from_db()
+        self.assertEqual(self.period.status, 'calculated')
+        self.assertEqual(self.period.calculated_by, self.user)
+        self.assertEqual(self.period.processing_progress, 100)
+        self.assertEqual(self.period.total_gross_salary, Decimal('10550.00'))
+        self.assertEqual(self.period.total_net_salary, Decimal('10450.00'))
+        self.assertEqual(
+            sorted(EmployeePayslip.objects.values_list('payslip_number', flat=True)),
+            ['PS2025030001', 'PS2025030002'],
+        )
+
+    def test_recalculation_updates_in_place_and_skips_approved(self):
+        calculate_payroll(self.period)
+        EmployeePayslip.objects.filter(employee=self.other).update(status='approved')
+        self.period.status = 'in_progress'
+        self.period.save()
+        EmployeeSalaryStructure.objects.filter(employee=self.employee).update(basic_salary=Decimal('8000'))
+
+        stats = calculate_payroll(self.period)
+
+        self.assertEqual((stats['created'], stats['updated'], stats['skipped']), (0, 1, 1))
+        payslip = EmployeePayslip.objects.get(employee=self.employee)
+        self.assertEqual(payslip.basic_salary, Decimal('8000.00'))
+        self.assertEqual(payslip.total_allowances, Decimal('2500.00'))
+        self.assertEqual(PayslipComponent.objects.filter(payslip=payslip).count(), 2)
+        self.assertEqual(EmployeePayslip.objects.get(employee=self.other).status, 'approved')
+
+    def test_query_count_does_not_grow_with_employees(self):
+        # الدورة الأولى تنشئ سلسلة أرقام القسائم
+        calculate_payroll(self.period)
+        period = self.create_period('مارس 2025 - ثانية')
+        with CaptureQueriesContext(connection) as small:
+            calculate_payroll(period)
+        for number in range(203, 213):
+            create_employee(str(number), self.department, self.job_title)
+        period = self.create_period('مارس 2025 - إعادة')
+        with CaptureQueriesContext(connection) as large:
+            calculate_payroll(period)
+        self.assertEqual(len(small), len(large))
+
+    def test_process_pool_matches_in_process_results(self):
+        sales = Department.objects.create(dept_name='المبيعات')
+        for number in range(203, 207):
+            create_employee(str(number), sales, self.job_title)
+        self.add_attendance(self.employee, present=15, absent=5)
+        pooled = self.create_period('مارس 2025 - متوازي')
+
+        calculate_payroll(self.period, workers=1)
+        calculate_payroll(pooled, workers=2)
+
+        def nets(period):
+            return dict(EmployeePayslip.objects.filter(payroll_period=period).values_list('employee_id', 'net_salary'))
+        self.assertEqual(len(nets(pooled)), 6)
+        self.assertEqual(nets(self.period), nets(pooled))
+
+    def test_single_employee_calculation_uses_engine(self):
+        payslip = calculate_employee_payslip(self.employee, self.period)
+
+        self.assertEqual(payslip.net_salary, Decimal('8000.00'))
+        self.assertEqual(EmployeePayslip.objects.count(), 1)
+        self.period.refresh_from_db()
+        self.assertEqual(self.period.status, 'draft')
+        self.assertEqual(self.period.total_net_salary, Decimal('8000.00'))
+
+    def test_calculate_view_and_progress(self):
+        self.client.force_login(self.user)
+        url = reverse('payroll_management:period_calculate', args=[self.period.pk])
+        self.assertEqual(self.client.post(url).status_code, 403)
+        self.assertFalse(EmployeePayslip.objects.exists())
+
+        self.user.user_permissions.add(Permission.objects.get(
+            codename='change_payrollperiod', content_type__app_label='payroll_management',
+        ))
+        response = self.client.post(url)
+        self.assertRedirects(
+            response, reverse('payroll_management:period_detail', args=[self.period.pk]),
+            fetch_redirect_response=False,
+        )
+
+        response = self.client.get(reverse('payroll_management:period_progress', args=[self.period.pk]))
+        self.assertEqual(response.json()['progress'], 100)
+        self.assertEqual(response.json()['status'], 'calculated')
+
+
+class PeriodTotalsTest(PayrollTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(reset_cache)
+        self.structures = {
+            structure.employee_id: structure for structure in EmployeeSalaryStructure.objects.all()
+        }
+
+    def create_payslip(self, employee, gross, status='calculated'):
+        return EmployeePayslip.objects.create(
+            employee=employee, payroll_period=self.period, status=status, basic_salary=Decimal(gross),
+            salary_structure=self.structures[employee.pk],
+        )
+
+    def assertTotals(self, processed, net):
+        self.period.refresh_from_db()
+        self.assertEqual(self.period.processed_employees, processed)
+        self.assertEqual(self.period.total_net_salary, Decimal(net))
+        self.assertEqual(check_period_totals([self.period.pk]), [])
+
+    def test_payslip_saves_apply_deltas(self):
+        # 1000.005 is stored as 1000.00 (half-even), and so is its contribution;
+        # the first save reserves a block of payslip numbers for the next ones
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.create_payslip(self.employee, '1000.005')
+        with self.assertNumQueries(2):
+            second = self.create_payslip(self.other, '2500')
+        self.assertTotals(2, '3500.00')
+
+        second.basic_salary = Decimal('2000')
+        with self.assertNumQueries(3):
+            second.save()
+        self.assertTotals(2, '3000.00')
+
+        first.status = 'draft'
+        first.save()
+        self.assertTotals(1, '2000')
+
+        second.delete()
+        self.assertTotals(0, '0')
+
+    def test_deferred_block_recomputes_once(self):
+        with deferred_period_totals():
+            for employee in (self.employee, self.other):
+                self.create_payslip(employee, '1500')
+            self.period.refresh_from_db()
+            self.assertEqual(self.period.processed_employees, 0)
+        self.assertTotals(2, '3000')
+
+    def test_check_command_reports_and_fixes_drift(self):
+        self.create_payslip(self.employee, '1200')
+        PayrollPeriod.objects.filter(pk=self.period.pk).update(total_net_salary=Decimal('1'))
+
+        with self.assertRaises(CommandError):
+            call_command('check_payroll_totals', period=[self.period.pk], stdout=StringIO())
+        call_command('check_payroll_totals', fix=True, stdout=StringIO())
+        self.assertTotals(1, '1200')
+
+
+class PayslipPdfTest(PayrollTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        settings_override = override_settings(PAYSLIP_PDF_CACHE_DIR=self.cache_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        calculate_payroll(self.period)
+
+    def test_unchanged_payslips_are_not_rendered_again(self):
+        self.assertEqual(generate_period_pdfs(self.period), {'payslips': 2, 'rendered': 2, 'cached': 0})
+        self.assertEqual(generate_period_pdfs(self.period), {'payslips': 2, 'rendered': 0, 'cached': 2})
+
+        payslip = EmployeePayslip.objects.get(employee=self.other)
+        payslip.basic_salary = Decimal('3100')
+        payslip.save()
+        self.assertEqual(generate_period_pdfs(self.period), {'payslips': 2, 'rendered': 1, 'cached': 1})
+
+    def test_process_pool_renders_pdfs(self):
+        paths, rendered = ensure_pdfs(EmployeePayslip.objects.all(), workers=2)
+        self.assertEqual(rendered, 2)
+        for path in paths.values():
+            with open(path, 'rb') as pdf:
+                self.assertEqual(pdf.read(5), b'%PDF-')
+
+    def test_zip_is_streamed_from_cached_files(self):
+        entries = period_zip_entries(self.period)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(stream_zip(entries))))
+
+        self.assertEqual(archive.namelist(), ['PS2025030001_201.pdf', 'PS2025030002_202.pdf'])
+        with open(entries[0][1], 'rb') as pdf:
+            self.assertEqual(archive.read('PS2025030001_201.pdf'), pdf.read())
+
+    def test_zip_download_leaves_rendering_to_the_worker(self):
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+        url = reverse('payroll_management:period_payslips_zip', args=[self.period.pk])
+
+        response = self.client.get(url)
+        self.assertRedirects(
+            response, reverse('payroll_management:period_detail', args=[self.period.pk]),
+            fetch_redirect_response=False,
+        )
+        self.period.refresh_from_db()
+        self.assertTrue(self.period.payslip_pdfs_requested)
+
+        self.assertEqual(process_requested_pdfs(workers=1), 1)
+        self.assertEqual(process_requested_pdfs(workers=1), 0)
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 2)
+
+    def test_print_view_allows_owner_of_approved_payslip_only(self):
+        owner = get_user_model().objects.create_user('owner', password='x')
+        Employee.objects.filter(pk=self.employee.pk).update(user_account=owner)
+        payslip = EmployeePayslip.objects.get(employee=self.employee)
+        url = reverse('payroll_management:payslip_print', args=[payslip.pk])
+
+        self.client.force_login(owner)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        EmployeePayslip.objects.filter(pk=payslip.pk).update(status='approved')
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(b''.join(response.streaming_content)[:5], b'%PDF-')
+
+        other = EmployeePayslip.objects.get(employee=self.other)
+        response = self.client.get(reverse('payroll_management:payslip_print', args=[other.pk]))
+        self.assertEqual(response.status_code, 403)
+
+
+    def test_email_failures_are_reported_not_raised(self):
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+        payslip = EmployeePayslip.objects.get(employee=self.employee)
+        url = reverse('payroll_management:payslip_email', args=[payslip.pk])
+
+        with mock.patch('payroll_management.payslips.EmailMessage.send', side_effect=SMTPException('down')):
+            response = self.client.post(url)
+        self.assertEqual([str(m) for m in get_messages(response.wsgi_request)], ['تعذر إرسال القسيمة'])
+        with mock.patch('payroll_management.payslips.payslip_pdf_path', return_value='/missing/payslip.pdf'):
+            self.assertFalse(email_payslip(payslip))
+
+        Employee.objects.filter(pk=self.employee.pk).update(email='')
+        payslip.refresh_from_db()
+        self.assertFalse(email_payslip(payslip))
+        response = self.client.post(url)
+        self.assertEqual(str(list(get_messages(response.wsgi_request))[-1]), 'لا يوجد بريد إلكتروني مسجل للموظف')
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class TaxEngineTest(TestCase):
+    def test_brackets_and_flat_rules(self):
+        table = TaxTable([
+            TaxRule('progressive', 500, 300000, 1000000),
+            TaxRule('progressive', 1000, 1000000, None),
+            TaxRule('flat_rate', 250, 2000000, 3000000),
+        ])
+        taxes = table.evaluate(['2999.99', '5000', '12000', '25000', '40000'])
+        self.assertEqual(taxes, [
+            Decimal('0.00'), Decimal('100.00'), Decimal('550.00'),
+            Decimal('2475.00'), Decimal('4100.00'),
+        ])
+
+    def test_numpy_and_python_paths_round_half_up_identically(self):
+        table = TaxTable([TaxRule('progressive', 250, 0, None), TaxRule('flat_rate', 1, 10000, None)])
+        salaries = [Decimal(cents).scaleb(-2) for cents in range(0, 200000, 7)]
+        self.assertEqual(table.evaluate(salaries, use_numpy=True), table.evaluate(salaries, use_numpy=False))
+        # 2.5% من 0.30 = 0.0075 تقرب إلى 0.01
+        self.assertEqual(table.tax_for('0.30'), Decimal('0.01'))
+        self.assertEqual(table.tax_for('0.10'), Decimal('0.00'))
+
+    def test_table_is_rebuilt_after_configuration_change(self):
+        day = date(2025, 3, 31)
+        self.assertEqual(get_tax_table(day).tax_for('5000'), Decimal('100.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            config = TaxConfiguration.objects.create(
+                tax_name='ضريبة ثابتة', calculation_method='flat_rate', tax_rate=Decimal('10'),
+                minimum_taxable_amount=Decimal('4000'), effective_from=date(2025, 1, 1),
+            )
+        self.assertEqual(get_tax_table(day).tax_for('5000'), Decimal('500.00'))
+        with self.assertNumQueries(0):
+            get_tax_table(day)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            config.delete()
+        self.assertEqual(get_tax_table(day).tax_for('5000'), Decimal('100.00'))
+
+
+class BulkTransactionTest(PayrollTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+
+    def test_bulk_create_reports_each_item(self):
+        closed = self.create_period('فبراير 2025')
+        closed.status = 'closed'
+        closed.save()
+        items = [
+            {'employee': self.employee.pk, 'payroll_period': str(self.period.pk),
+             'transaction_type': 'bonus', 'description': 'مكافأة', 'amount': '250.00'},
+            {'employee': self.other.pk, 'payroll_period': str(self.period.pk),
+             'transaction_type': 'deduction', 'description': 'خصم', 'amount': '100.00'},
+            {'employee': self.employee.pk, 'payroll_period': str(closed.pk),
+             'transaction_type': 'bonus', 'description': 'مكافأة', 'amount': '10.00'},
+            {'employee': self.employee.pk, 'payroll_period': str(self.period.pk),
+             'transaction_type': 'unknown', 'description': '-', 'amount': '1'},
+        ]
+        response = self.client.post(
+            reverse('payroll_management:bulk_transaction_create'), items, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['created'], body['failed']), (2, 2))
+        self.assertIn('payroll_period', body['results'][2]['errors'])
+        self.assertIn('transaction_type', body['results'][3]['errors'])
+        self.assertEqual(
+            sorted(PayrollTransaction.objects.values_list('amount', flat=True)), [Decimal('100.00'), Decimal('250.00')],
+        )
+        self.assertTrue(PayrollTransaction.objects.filter(created_by=self.user).exists())
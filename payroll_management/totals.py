@@ -0,0 +1,158 @@
+"""
+إجماليات فترات الرواتب
+(Payroll period totals)
+
+A period's ``processed_employees`` and salary totals are sums over its
+calculated, approved and paid payslips. Saving one payslip no longer
+re-aggregates the whole period: the payslip's contribution is snapshotted
+when it is loaded, and on save only the difference is applied with an
+``F()`` update. Contributions are rounded exactly as the database stores
+them, so the running totals stay identical to a full recompute; the
+``check_payroll_totals`` command verifies that.
+
+Inside ``deferred_period_totals()`` the per-save work is skipped and every
+touched period is recomputed once when the block exits.
+"""
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db.backends.utils import format_number
+from django.db.models import Count, F, Sum
+
+from .models import EmployeePayslip, PayrollPeriod
+
+PROCESSED_STATUSES = ['calculated', 'approved', 'paid']
+
+# حقل الفترة -> حقل القسيمة الذي يجمع فيه
+AMOUNT_FIELDS = {
+    'total_gross_salary': 'gross_salary',
+    'total_deductions': 'total_deductions',
+    'total_net_salary': 'net_salary',
+}
+TOTAL_FIELDS = ['processed_employees'] + list(AMOUNT_FIELDS)
+
+ZERO_CONTRIBUTION = (0, Decimal('0'), Decimal('0'), Decimal('0'))
+
+_state = threading.local()
+
+
+def _stored_amount(payslip, field_name):
+    """القيمة كما ستخزن في قاعدة البيانات (The value rounded as the database stores it)"""
+    field = EmployeePayslip._meta.get_field(field_name)
+    value = getattr(payslip, field_name)
+    if value is None:
+        return Decimal('0')
+    return Decimal(format_number(Decimal(value), field.max_digits, field.decimal_places))
+
+
+def contribution(payslip):
+    """
+    مساهمة القسيمة في إجماليات فترتها
+    (What a payslip adds to its period: count, gross, deductions, net)
+    """
+    if payslip.status not in PROCESSED_STATUSES:
+        return ZERO_CONTRIBUTION
+    return (1,) + tuple(_stored_amount(payslip, field) for field in AMOUNT_FIELDS.values())
+
+
+def apply_contribution_delta(period_id, old, new):
+    """تطبيق فرق المساهمة على الفترة بتحديث ذري (Apply the difference with one F() update)"""
+    delta = [new_value - old_value for old_value, new_value in zip(old, new)]
+    if not any(delta):
+        return
+    PayrollPeriod.objects.filter(pk=period_id).update(**{
+        field: F(field) + value for field, value in zip(TOTAL_FIELDS, delta)
+    })
+
+
+def period_totals(period_ids=None):
+    """
+    إعادة حساب الإجماليات كاملة باستعلام مجمع واحد
+    (Full recompute: period_id -> totals, from one grouped aggregate)
+    """
+    payslips = EmployeePayslip.objects.filter(status__in=PROCESSED_STATUSES)
+    if period_ids is not None:
+        payslips = payslips.filter(payroll_period_id__in=list(period_ids))
+    aggregates = {'processed_employees': Count('id')}
+    aggregates.update({total: Sum(field) for total, field in AMOUNT_FIELDS.items()})
+
+    totals = {}
+    for row in payslips.order_by().values('payroll_period_id').annotate(**aggregates):
+        totals[row.pop('payroll_period_id')] = {
+            field: row[field] if row[field] is not None else Decimal('0') for field in TOTAL_FIELDS
+        }
+    return totals
+
+
+def empty_totals():
+    return dict(zip(TOTAL_FIELDS, ZERO_CONTRIBUTION))
+
+
+def recalculate_period_totals(period_ids):
+    """كتابة الإجماليات المعاد حسابها لعدة فترات (Write fully recomputed totals)"""
+    period_ids = list(period_ids)
+    totals = period_totals(period_ids)
+    periods = list(PayrollPeriod.objects.filter(pk__in=period_ids).only('pk', *TOTAL_FIELDS))
+    for period in periods:
+        for field, value in totals.get(period.pk, empty_totals()).items():
+            setattr(period, field, value)
+    PayrollPeriod.objects.bulk_update(periods, TOTAL_FIELDS)
+    return periods
+
+
+def check_period_totals(period_ids=None, fix=False):
+    """
+    مقارنة الإجماليات المخزنة بإعادة الحساب الكاملة
+    (Compare stored totals with a full recompute)
+
+    Returns ``(period, field, stored, expected)`` tuples for every mismatch;
+    with ``fix`` the expected values are written.
+    """
+    periods = PayrollPeriod.objects.order_by('pk').only('pk', 'period_name', *TOTAL_FIELDS)
+    if period_ids is not None:
+        periods = periods.filter(pk__in=list(period_ids))
+    periods = list(periods)
+    totals = period_totals([period.pk for period in periods] if period_ids is not None else None)
+
+    mismatches, to_fix = [], []
+    for period in periods:
+        expected = totals.get(period.pk, empty_totals())
+        for field in TOTAL_FIELDS:
+            stored = getattr(period, field)
+            if stored != expected[field]:
+                mismatches.append((period, field, stored, expected[field]))
+                setattr(period, field, expected[field])
+                if period not in to_fix:
+                    to_fix.append(period)
+    if fix and to_fix:
+        PayrollPeriod.objects.bulk_update(to_fix, TOTAL_FIELDS)
+    return mismatches
+
+
+def totals_deferred():
+    return getattr(_state, 'periods', None) is not None
+
+
+def defer_period(period_id):
+    """تسجيل فترة لإعادة الحساب عند نهاية الكتلة المؤجلة"""
+    _state.periods.add(period_id)
+
+
+@contextmanager
+def deferred_period_totals():
+    """
+    تأجيل تحديث إجماليات الفترات حتى نهاية الدفعة
+    (Skip per-payslip total updates; recompute touched periods once on exit)
+    """
+    if totals_deferred():
+        yield
+        return
+    _state.periods = set()
+    try:
+        yield
+        periods = _state.periods
+    finally:
+        _state.periods = None
+    if periods:
+        recalculate_period_totals(periods)
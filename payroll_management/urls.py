@@ -33,6 +33,8 @@ period_patterns = [
     path('<int:pk>/', views.PayrollPeriodDetailView.as_view(), name='period_detail'),
     path('<int:pk>/edit/', views.PayrollPeriodUpdateView.as_view(), name='period_edit'),
     path('<int:pk>/calculate/', views.PayrollPeriodCalculateView.as_view(), name='period_calculate'),
+    path('<int:pk>/progress/', views.PayrollPeriodProgressView.as_view(), name='period_progress'),
+    path('<int:pk>/payslips.zip', views.PayrollPeriodPayslipsDownloadView.as_view(), name='period_payslips_zip'),
     path('<int:pk>/approve/', views.PayrollPeriodApproveView.as_view(), name='period_approve'),
     path('<int:pk>/close/', views.PayrollPeriodCloseView.as_view(), name='period_close'),
     path('<int:pk>/reopen/', views.PayrollPeriodReopenView.as_view(), name='period_reopen'),
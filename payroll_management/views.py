@@ -2,17 +2,40 @@
 Payroll Management Views
 Basic view stubs for payroll management application
 """
-from django.shortcuts import render, redirect
+import json
+
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView, ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib import messages
 from django.urls import reverse_lazy
-from django.http import JsonResponse
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
 from .models import (
     SalaryComponent, EmployeeSalaryStructure, PayrollPeriod,
     PayrollTransaction, EmployeePayslip, TaxConfiguration, PayrollReport
 )
+from .engine import PayrollCalculationError, calculate_payroll
+from .payslips import (
+    cached_period_zip_entries, email_payslip, payslip_pdf_path, payslip_queryset, request_period_pdfs, stream_zip,
+)
+
+from api.bulk import BulkRequestError, bulk_write
+from api.serializers import PayrollTransactionBulkSerializer
+
+VIEW_PAYSLIPS_PERMISSION = 'payroll_management.view_employeepayslip'
+EMPLOYEE_VISIBLE_STATUSES = ['approved', 'paid']
+
+
+def _get_visible_payslip(request, pk):
+    """قسيمة يحق للمستخدم رؤيتها: صلاحية العرض أو قسيمته المعتمدة"""
+    payslip = get_object_or_404(payslip_queryset(), pk=pk)
+    if request.user.has_perm(VIEW_PAYSLIPS_PERMISSION):
+        return payslip
+    if payslip.employee.user_account_id == request.user.pk and payslip.status in EMPLOYEE_VISIBLE_STATUSES:
+        return payslip
+    raise PermissionDenied
 
 
 @method_decorator(login_required, name='dispatch')
@@ -148,6 +171,42 @@ class PayrollPeriodUpdateView(UpdateView):
 class PayrollPeriodCalculateView(TemplateView):
     template_name = 'payroll_management/period_calculate.html'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['period'] = get_object_or_404(PayrollPeriod, pk=self.kwargs['pk'])
+        return context
+
+    def post(self, request, *args, **kwargs):
+        if not request.user.has_perm('payroll_management.change_payrollperiod'):
+            raise PermissionDenied
+        period = get_object_or_404(PayrollPeriod, pk=kwargs['pk'])
+        try:
+            stats = calculate_payroll(period, user=request.user)
+        except PayrollCalculationError:
+            messages.error(request, 'لا يمكن حساب فترة راتب غير قابلة للتعديل')
+            return redirect('payroll_management:period_detail', pk=period.pk)
+
+        messages.success(
+            request,
+            f"تم حساب {stats['calculated']} قسيمة راتب من {stats['employees']} موظف "
+            f"({stats['created']} جديدة، {stats['updated']} محدثة)"
+        )
+        return redirect('payroll_management:period_detail', pk=period.pk)
+
+
+@method_decorator(login_required, name='dispatch')
+class PayrollPeriodProgressView(TemplateView):
+    """تقدم حساب فترة الراتب (Calculation progress, polled while a period runs)"""
+
+    def get(self, request, *args, **kwargs):
+        period = get_object_or_404(PayrollPeriod, pk=kwargs['pk'])
+        return JsonResponse({
+            'status': period.status,
+            'total_employees': period.total_employees,
+            'processed_employees': period.processed_employees,
+            'progress': round(period.processing_progress, 1),
+        })
+
 
 @method_decorator(login_required, name='dispatch')
 class PayrollPeriodApproveView(TemplateView):
@@ -209,8 +268,28 @@ class PayrollTransactionDeleteView(DeleteView):
 
 @method_decorator(login_required, name='dispatch')
 class BulkTransactionCreateView(TemplateView):
+    """
+    إدخال معاملات الرواتب دفعة واحدة
+    (GET shows the import page; POST takes a JSON array of transactions)
+    """
     template_name = 'payroll_management/bulk_transaction.html'
 
+    def post(self, request, *args, **kwargs):
+        if not request.user.has_perm('payroll_management.add_payrolltransaction'):
+            raise PermissionDenied
+        try:
+            items = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        try:
+            body = bulk_write(
+                PayrollTransactionBulkSerializer, items, context={'request': request},
+                create_kwargs={'created_by': request.user},
+            )
+        except BulkRequestError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        return JsonResponse(body, json_dumps_params={'ensure_ascii': False})
+
 
 # Payslip Views
 @method_decorator(login_required, name='dispatch')
@@ -244,23 +323,81 @@ class EmployeePayslipApproveView(TemplateView):
 class EmployeePayslipPrintView(TemplateView):
     template_name = 'payroll_management/payslip_print.html'
 
+    def get(self, request, *args, **kwargs):
+        payslip = _get_visible_payslip(request, kwargs['pk'])
+        return FileResponse(
+            open(payslip_pdf_path(payslip), 'rb'),
+            content_type='application/pdf',
+            filename=f'{payslip.payslip_number}.pdf',
+            as_attachment='download' in request.GET,
+        )
+
 
 @method_decorator(login_required, name='dispatch')
 class EmployeePayslipEmailView(TemplateView):
     template_name = 'payroll_management/payslip_email.html'
 
+    def post(self, request, *args, **kwargs):
+        payslip = _get_visible_payslip(request, kwargs['pk'])
+        if not payslip.employee.email:
+            messages.error(request, 'لا يوجد بريد إلكتروني مسجل للموظف')
+        elif email_payslip(payslip):
+            messages.success(request, f'تم إرسال القسيمة إلى {payslip.employee.email}')
+        else:
+            messages.error(request, 'تعذر إرسال القسيمة')
+        return redirect('payroll_management:payslip_detail', pk=payslip.pk)
+
 
 @method_decorator(login_required, name='dispatch')
 class MyPayslipsView(ListView):
     model = EmployeePayslip
     template_name = 'payroll_management/my_payslips.html'
     context_object_name = 'payslips'
+    paginate_by = 12
+
+    def get_queryset(self):
+        return EmployeePayslip.objects.filter(
+            employee__user_account=self.request.user,
+            status__in=EMPLOYEE_VISIBLE_STATUSES,
+        ).select_related('payroll_period')
 
 
 @method_decorator(login_required, name='dispatch')
 class GeneratePayslipsView(TemplateView):
     template_name = 'payroll_management/generate_payslips.html'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['periods'] = PayrollPeriod.objects.exclude(status='draft')
+        return context
+
+    def post(self, request, *args, **kwargs):
+        if not request.user.has_perm(VIEW_PAYSLIPS_PERMISSION):
+            raise PermissionDenied
+        period = get_object_or_404(PayrollPeriod, pk=request.POST.get('period'))
+        request_period_pdfs(period)
+        messages.success(request, 'تم طلب إصدار قسائم الفترة، وسيتم تجهيزها في الخلفية')
+        return redirect('payroll_management:period_detail', pk=period.pk)
+
+
+@method_decorator(login_required, name='dispatch')
+class PayrollPeriodPayslipsDownloadView(TemplateView):
+    """تنزيل قسائم الفترة في ملف ZIP مبثوث (Streamed ZIP of a period's payslips)"""
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.has_perm(VIEW_PAYSLIPS_PERMISSION):
+            raise PermissionDenied
+        period = get_object_or_404(PayrollPeriod, pk=kwargs['pk'])
+        entries = cached_period_zip_entries(period)
+        if entries is None:
+            # لا يرسم الطلب القسائم؛ يتولاها العامل ثم يعاد التنزيل
+            request_period_pdfs(period)
+            messages.info(request, 'يجري تجهيز قسائم الفترة، يرجى إعادة التنزيل بعد قليل')
+            return redirect('payroll_management:period_detail', pk=period.pk)
+        response = StreamingHttpResponse(stream_zip(entries), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="payslips_{period.pk}.zip"'
+        return response
+
 
 # Tax Configuration Views
 @method_decorator(login_required, name='dispatch')
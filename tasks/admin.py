@@ -4,6 +4,9 @@ from django.utils.html import format_html
 from django.urls import reverse
 from django.db.models import Count, Q
 from django.utils import timezone
+
+from core.changes import record_changes
+
 from .models import Task, TaskStep
 
 class TaskStepInline(admin.TabularInline):
@@ -159,18 +162,21 @@ class TaskAdmin(admin.ModelAdmin):
 
     def mark_as_completed(self, request, queryset):
         """Bulk action to mark tasks as completed"""
+        record_changes(Task, queryset.values_list('pk', flat=True))
         updated = queryset.update(status='completed')
         self.message_user(request, f'تم تحديث {updated} مهمة إلى مكتملة')
     mark_as_completed.short_description = _('تحديد كمكتملة')
 
     def mark_as_in_progress(self, request, queryset):
         """Bulk action to mark tasks as in progress"""
+        record_changes(Task, queryset.values_list('pk', flat=True))
         updated = queryset.update(status='in_progress')
         self.message_user(request, f'تم تحديث {updated} مهمة إلى قيد التنفيذ')
     mark_as_in_progress.short_description = _('تحديد كقيد التنفيذ')
 
     def mark_as_high_priority(self, request, queryset):
         """Bulk action to mark tasks as high priority"""
+        record_changes(Task, queryset.values_list('pk', flat=True))
         updated = queryset.update(priority='high')
         self.message_user(request, f'تم تحديث {updated} مهمة إلى أولوية عالية')
     mark_as_high_priority.short_description = _('تحديد كأولوية عالية')
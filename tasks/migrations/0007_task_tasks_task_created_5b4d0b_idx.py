@@ -0,0 +1,19 @@
+# Generated by Django 4.2.21 on 2026-10-19 17:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0006_alter_task_assigned_to_alter_task_created_by_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["created_at", "id"], name="tasks_task_created_5b4d0b_idx"
+            ),
+        ),
+    ]
@@ -139,6 +139,8 @@ class Task(models.Model):
             models.Index(fields=['priority']),
             models.Index(fields=['status', 'assigned_to']),
             models.Index(fields=['status', 'end_date']),
+            # ترقيم صفحات الواجهة بالمؤشر (API keyset pagination)
+            models.Index(fields=['created_at', 'id']),
         ]
         permissions = [
             ("view_dashboard", "Can view tasks dashboard"),
@@ -20,6 +20,8 @@ from .forms import (
     TaskForm, TaskStepForm, TaskFilterForm,
     BulkTaskUpdateForm, TaskStatusUpdateForm
 )
+from core.changes import record_changes
+from core.fastjson import FastJsonResponse
 from meetings.models import Meeting
 from tasks.decorators import tasks_module_permission_required, can_access_task
 
@@ -745,6 +747,10 @@ def bulk_task_update(request):
                 updated_count = tasks.count()
                 tasks.delete()
 
+            if action != 'delete':
+                # التحديث الجماعي لا يطلق إشارات الحفظ
+                record_changes(Task, task_ids)
+
             return JsonResponse({
                 'success': True,
                 'message': f'تم تحديث {updated_count} مهمة بنجاح'
@@ -839,7 +845,7 @@ def task_search_api(request):
                 'is_overdue': task.is_overdue,
             })
 
-        return JsonResponse({'results': results})
+        return FastJsonResponse({'results': results})
 
     except Exception as e:
         logger.error(f"Error in task search: {str(e)}")